@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+from flask import Blueprint, request, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from models.chess import ChessNotation
+from utils.response import make_response
+from utils.practice import game_plies
+from utils.engine import chess, get_analysis_engine, AnalysisTooLargeError
+
+# 创建蓝图
+analysis_bp = Blueprint('analysis', __name__)
+
+def _int_param(data, name, default, minimum, maximum):
+    """读取整数参数，超出范围时返回错误信息"""
+    value = data.get(name, default)
+    if not isinstance(value, int) or isinstance(value, bool) or not minimum <= value <= maximum:
+        return None, f"{name} 须为{minimum}到{maximum}之间的整数"
+    return value, None
+
+# 路由：分析棋谱中的局面
+@analysis_bp.route('/notations/<int:notation_id>/analysis', methods=['POST'])
+@jwt_required()
+def analyze_notation(notation_id):
+    """
+    分析棋谱中的各个局面，请求体（均可省略）:
+        {"depth": 4, "movetime_ms": 500, "from_ply": 0, "to_ply": 20}
+
+    ply 为局面之前已走的半回合数（0为初始局面）。已分析过的局面（包括其他棋谱中的相同局面）
+    直接取缓存结果，其余局面分发到分析进程池中并行搜索，每个局面搜索到 depth 或用完 movetime_ms 为止。
+    返回每个局面的评估（白方视角，厘兵）、最佳走法、主要变例、搜索深度、节点数、每秒节点数和
+    是否来自缓存，以及整个请求的汇总（节点数和速度只统计本次实际搜索的局面）。
+    未命中缓存的局面数 × movetime_ms ÷ 分析进程数超过 ANALYSIS_REQUEST_TIMEOUT 时返回400，
+    搜索到期仍未完成时返回504。
+    """
+    if chess is None:
+        return make_response(None, "服务器未安装python-chess，无法分析棋局", 501)
+
+    user_id = get_jwt_identity()
+    notation = ChessNotation.query.filter_by(id=notation_id, user_id=user_id).first()
+    if not notation:
+        return make_response(None, "棋谱不存在或无权访问", 404)
+
+    config = current_app.config
+    data = request.get_json(silent=True) or {}
+    depth, error = _int_param(data, 'depth', config['ANALYSIS_DEFAULT_DEPTH'], 1, config['ANALYSIS_MAX_DEPTH'])
+    if error:
+        return make_response(None, error, 400)
+    movetime_ms, error = _int_param(data, 'movetime_ms', config['ANALYSIS_DEFAULT_MOVETIME_MS'], 10,
+                                    config['ANALYSIS_MAX_MOVETIME_MS'])
+    if error:
+        return make_response(None, error, 400)
+
+    # 能在棋盘上走出的部分，遇到识别错误的步骤时截断
+    moves = []
+    for _, uci in game_plies(notation.moves):
+        if uci is None:
+            break
+        moves.append(uci)
+    from_ply, error = _int_param(data, 'from_ply', 0, 0, len(moves))
+    if error:
+        return make_response(None, error, 400)
+    to_ply, error = _int_param(data, 'to_ply', len(moves), from_ply, len(moves))
+    if error:
+        return make_response(None, error, 400)
+    if to_ply - from_ply + 1 > config['ANALYSIS_MAX_POSITIONS']:
+        return make_response(None, f"一次最多分析{config['ANALYSIS_MAX_POSITIONS']}个局面", 400)
+
+    board = chess.Board()
+    fens, played = [], []
+    for ply in range(to_ply + 1):
+        if ply >= from_ply:
+            fens.append(board.fen())
+            played.append(board.san(chess.Move.from_uci(moves[ply])) if ply < len(moves) else None)
+        if ply < len(moves):
+            board.push_uci(moves[ply])
+
+    engine = get_analysis_engine()
+    start = time.perf_counter()
+    try:
+        results = engine.analyze(fens, depth, movetime_ms / 1000)
+    except AnalysisTooLargeError as e:
+        return make_response(None, str(e), 400)
+    elapsed = time.perf_counter() - start
+
+    for offset, result in enumerate(results):
+        result['ply'] = from_ply + offset
+        result['move_played'] = played[offset]
+    searched = [result for result in results if not result['cached']]
+    nodes = sum(result['nodes'] for result in searched)
+    search_seconds = sum(result['time_ms'] for result in searched) / 1000
+    return make_response({
+        'notation_id': notation.id,
+        'engine': engine.engine_name,
+        'depth': depth,
+        'movetime_ms': movetime_ms,
+        'total_plies': len(moves),
+        # 棋谱中有无法走出的步骤时，只分析到这一步之前
+        'truncated': len(moves) < len(game_plies(notation.moves)),
+        'positions': results,
+        'cached_positions': len(results) - len(searched),
+        'nodes': nodes,
+        'time_ms': round(elapsed * 1000, 1),
+        # 单个分析进程的搜索速度，以及按请求耗时计算的总吞吐（多进程并行时更高）
+        'nps': int(nodes / search_seconds) if search_seconds > 0 else 0,
+        'throughput_nps': int(nodes / elapsed) if elapsed > 0 else 0
+    })
@@ -4,7 +4,7 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import (
     create_access_token, create_refresh_token, 
-    jwt_required, get_jwt_identity, get_jwt
+    jwt_required, get_jwt_identity, get_jwt, decode_token, current_user
 )
 from datetime import timedelta
 from werkzeug.security import check_password_hash
@@ -12,6 +12,8 @@ from werkzeug.security import check_password_hash
 from models import db
 from models.user import User
 from utils.response import make_response
+from utils.revocation import get_revocation_store, revoke_user_tokens
+from utils.avatar import avatar_srcset
 
 # 创建蓝图
 auth_bp = Blueprint('auth', __name__)
@@ -83,7 +85,8 @@ def register():
                 'username': new_user.username,
                 'email': new_user.email,
                 'name': new_user.name,
-                'avatar': new_user.avatar
+                'avatar': new_user.avatar,
+                'avatar_srcset': avatar_srcset(new_user.avatar)
             }
         }), 201
     except (NameError, AttributeError):
@@ -106,9 +109,14 @@ def login():
         # 查询用户
         user = User.query.filter_by(email=email).first()
         
-        if not user or not check_password_hash(user.password_hash, password):
+        if not user or not user.verify_password(password):
             return jsonify({'message': '邮箱或密码错误'}), 401
         
+        # 哈希算法或成本参数调整后，用户登录时透明地重新计算哈希
+        if db.session.is_modified(user):
+            db.session.commit()
+            current_app.logger.info(f"已按新参数更新密码哈希，用户ID: {user.id}")
+        
         # 创建访问令牌和刷新令牌，确保将用户ID转换为字符串
         access_token = create_access_token(identity=str(user.id))
         refresh_token = create_refresh_token(identity=str(user.id))
@@ -123,7 +131,8 @@ def login():
                 'username': user.username,
                 'email': user.email,
                 'name': user.name,
-                'avatar': user.avatar
+                'avatar': user.avatar,
+                'avatar_srcset': avatar_srcset(user.avatar)
             }
         }), 200
     except (NameError, AttributeError):
@@ -158,11 +167,6 @@ def refresh():
     current_user_id = get_jwt_identity()
     current_app.logger.info(f"刷新令牌请求，用户ID: {current_user_id}")
     
-    # 记录请求头和请求体
-    auth_header = request.headers.get('Authorization', '')
-    current_app.logger.debug(f"Authorization头: {auth_header}")
-    current_app.logger.debug(f"请求体: {request.get_json()}")
-    
     try:
         # 创建新的访问令牌，确保用户ID是字符串
         # 如果current_user_id已经是字符串，这一步不会有变化
@@ -174,7 +178,6 @@ def refresh():
         response_data = {
             'access_token': access_token
         }
-        current_app.logger.debug(f"响应数据: {response_data}")
         
         return make_response(response_data)
     except Exception as e:
@@ -189,9 +192,8 @@ def get_current_user():
     current_app.logger.info(f"获取当前用户信息，用户ID: {current_user_id}, 类型: {type(current_user_id)}")
     
     try:
-        # 确保用户ID是整数
-        user_id = int(current_user_id) if isinstance(current_user_id, str) else current_user_id
-        user = User.query.get(user_id)
+        # 当前用户已在JWT校验时解析（带缓存），无需再次查询
+        user = current_user
         
         if not user:
             current_app.logger.warning(f"用户不存在，ID: {current_user_id}")
@@ -214,9 +216,8 @@ def change_password():
     current_app.logger.info(f"修改密码请求，用户ID: {current_user_id}, 类型: {type(current_user_id)}")
     
     try:
-        # 确保用户ID是整数
-        user_id = int(current_user_id) if isinstance(current_user_id, str) else current_user_id
-        user = User.query.get(user_id)
+        # 当前用户已在JWT校验时解析（带缓存），无需再次查询
+        user = current_user
         
         if not user:
             current_app.logger.warning(f"用户不存在，ID: {current_user_id}")
@@ -237,11 +238,12 @@ def change_password():
         
         try:
             # 更新密码
-            user.password = new_password
+            user.set_password(new_password)
             db.session.commit()
             current_app.logger.info(f"密码修改成功，用户ID: {current_user_id}")
             
-            return make_response(None, "密码修改成功")
+            # 撤销此前签发的所有令牌，并为当前客户端签发新令牌
+            return make_response(revoke_user_tokens(user.id), "密码修改成功")
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"修改密码失败: {str(e)}")
@@ -285,8 +287,19 @@ def logout():
     current_user_id = get_jwt_identity()
     current_app.logger.info(f"用户注销请求，用户ID: {current_user_id}, 类型: {type(current_user_id)}")
     
-    # 这里可以添加令牌到黑名单的逻辑
-    # 例如：jti = get_jwt()['jti']
-    # 将jti添加到黑名单数据库中
+    store = get_revocation_store()
+    try:
+        jwt_data = get_jwt()
+        store.revoke_token(jwt_data['jti'], int(current_user_id), jwt_data['exp'])
+        
+        # 同时提交了刷新令牌时一并撤销
+        data = request.get_json(silent=True) or {}
+        if data.get('refresh_token'):
+            refresh_data = decode_token(data['refresh_token'], allow_expired=True)
+            if refresh_data.get('sub') == jwt_data.get('sub'):
+                store.revoke_token(refresh_data['jti'], int(current_user_id), refresh_data['exp'])
+    except Exception as e:
+        current_app.logger.error(f"撤销令牌失败: {str(e)}")
+        return make_response(None, f"注销失败: {str(e)}", 500)
     
-    return make_response(None, "注销成功") 
\ No newline at end of file
+    return make_response(None, "注销成功")
\ No newline at end of file
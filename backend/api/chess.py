@@ -8,175 +8,203 @@ import os
 import uuid
 import json
 from datetime import datetime
+from sqlalchemy import update, delete
 
 from models.chess import ChessNotation
 from models.db import db
 from utils.response import make_response
 from utils.ai import parse_chess_notation
+from utils.cache import get_notation_cache
+from utils.admission import AdmissionRejected, rate_limited
+from utils.resilience import ProviderUnavailable
+from api.profiles import admin_required
 
 # 创建蓝图
 chess_bp = Blueprint('chess', __name__)
 
-# 路由：上传棋谱图片
-@chess_bp.route('/upload', methods=['POST'])
-# 暂时注释掉JWT认证要求，用于测试
+def save_upload_image():
+    """
+    校验并保存上传的棋谱图片，同步和异步（ASGI）入口共用
 
-def upload_chess_image():
-    # 如果有JWT认证，则获取用户ID，否则使用默认值
-    try:
-        user_id = get_jwt_identity()
-    except:
-        user_id = 1  # 使用默认用户ID
-    
-    # 打印请求信息
-    print("=" * 50)
-    print("请求方法:", request.method)
-    print("请求内容类型:", request.content_type)
-    print("请求头:", dict(request.headers))
-    print("表单数据:", request.form.to_dict() if request.form else "无表单数据")
-    print("请求文件:", [f.filename for f in request.files.values()] if request.files else "无文件")
-    print("请求体:", request.get_data(as_text=True)[:200] + "..." if len(request.get_data(as_text=True)) > 200 else request.get_data(as_text=True))
-    print("=" * 50)
+    Returns:
+        (文件路径, 图片URL, 错误响应)，校验失败时前两项为None
+    """
+    logger = current_app.logger
+    logger.debug("上传棋谱图片请求，内容类型: %s, 文件字段: %s", request.content_type, list(request.files.keys()))
     
     # 检查请求中的文件
     if not request.files:
-        print("请求中没有文件")
-        return make_response(None, "未找到文件", 400)
+        logger.warning("上传请求中没有文件")
+        return None, None, make_response(None, "未找到文件", 400)
     
     if 'file' not in request.files:
-        print("未找到'file'字段，但有其他文件字段:", list(request.files.keys()))
+        logger.debug("未找到'file'字段，但有其他文件字段: %s", list(request.files.keys()))
         
         # 如果只有一个文件，尝试使用它
         if len(request.files) == 1:
             key = list(request.files.keys())[0]
             file = request.files[key]
-            print(f"使用唯一的文件字段 '{key}' 代替 'file'")
+            logger.debug("使用唯一的文件字段 '%s' 代替 'file'", key)
         else:
-            return make_response(None, "未找到文件", 400)
+            return None, None, make_response(None, "未找到文件", 400)
     else:
         file = request.files['file']
     
-    print("文件名:", file.filename)
-    print("文件类型:", file.content_type)
+    logger.debug("文件名: %s, 文件类型: %s", file.filename, file.content_type)
     
     if file.filename == '':
-        return make_response(None, "未选择文件", 400)
+        return None, None, make_response(None, "未选择文件", 400)
     
     # 验证文件类型
     if not file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-        return make_response(None, "不支持的文件类型", 400)
+        return None, None, make_response(None, "不支持的文件类型", 400)
     
-    # 验证文件大小
-    file_content = file.read()
+    # 验证文件大小（定位到末尾获取大小，无需把文件读入内存）
+    file.seek(0, os.SEEK_END)
+    file_size = file.tell()
     file.seek(0)  # 重置文件指针
     
-    print("文件大小:", len(file_content), "字节")
+    logger.debug("文件大小: %s 字节", file_size)
     
-    if len(file_content) > current_app.config.get('MAX_CONTENT_LENGTH', 5 * 1024 * 1024):
+    if file_size > current_app.config.get('MAX_CONTENT_LENGTH', 5 * 1024 * 1024):
         max_size_mb = current_app.config.get('MAX_CONTENT_LENGTH', 5 * 1024 * 1024) / (1024 * 1024)
-        return make_response(None, f"文件大小不能超过{max_size_mb}MB", 400)
+        return None, None, make_response(None, f"文件大小不能超过{max_size_mb}MB", 400)
     
-    if file:
-        # 确保上传目录存在
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        # 生成安全的文件名
-        filename = secure_filename(f"{uuid.uuid4()}_{file.filename}")
-        file_path = os.path.join(upload_folder, filename)
-        
-        print("保存路径:", file_path)
-        
-        file.save(file_path)
-        
-        # 构建图片URL
-        image_url = f"/uploads/{filename}"
-        
-        print("图片URL:", image_url)
-        
-        # 尝试调用AI解析棋谱
-        moves = ""
-        try:
-            # 获取默认模型
-            default_model = current_app.config.get('AI_MODEL', 'gpt-4-vision')
-            # 调用AI解析棋谱
-            moves = parse_chess_notation(file_path, default_model, is_file_path=True)
-            print("AI解析结果:", moves)
-        except Exception as e:
-            print("AI解析失败:", str(e))
-            # 解析失败不影响上传，只是返回空的moves
-            moves = ""
-        
-        return make_response({
-            "image_url": image_url,
-            "moves": moves
-        })
-
-# 路由：解析棋谱
-@chess_bp.route('/parse', methods=['POST'])
-@jwt_required()
-def parse_notation():
-    # 获取用户ID
-    user_id = get_jwt_identity()
-    current_app.logger.info(f"解析棋谱请求，用户ID: {user_id}")
+    # 确保上传目录存在
+    upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+    os.makedirs(upload_folder, exist_ok=True)
+    
+    # 生成安全的文件名
+    filename = secure_filename(f"{uuid.uuid4()}_{file.filename}")
+    file_path = os.path.join(upload_folder, filename)
+    
+    logger.debug("保存路径: %s", file_path)
+    
+    file.save(file_path)
+    
+    # 构建图片URL
+    image_url = f"/uploads/{filename}"
     
+    logger.info("棋谱图片已保存: %s", image_url)
+    return file_path, image_url, None
+
+def save_parse_image():
+    """
+    保存待解析的棋谱图片到临时路径，同步和异步（ASGI）入口共用
+
+    Returns:
+        (临时文件路径, 模型名称, 错误响应)，校验失败时前两项为None
+    """
     # 检查请求中的文件
     if 'file' not in request.files:
         current_app.logger.error("解析棋谱请求中未找到文件")
-        return make_response(None, "未找到文件", 400)
+        return None, None, make_response(None, "未找到文件", 400)
     
     file = request.files['file']
     
     if file.filename == '':
         current_app.logger.error("解析棋谱请求中未选择文件")
-        return make_response(None, "未选择文件", 400)
+        return None, None, make_response(None, "未选择文件", 400)
     
     # 获取模型参数
     model = request.form.get('model', 'gpt-4-vision')
     current_app.logger.info(f"使用模型: {model}, 文件名: {file.filename}")
     
+    # 保存上传的文件到临时目录，文件名加随机前缀，避免同名文件的并发请求互相覆盖或删除
+    filename = secure_filename(f"{uuid.uuid4()}_{file.filename}")
+    temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    file.save(temp_path)
+    current_app.logger.info(f"文件已保存到临时路径: {temp_path}")
+    return temp_path, model, None
+
+def remove_temp_file(temp_path):
+    """删除临时文件，删除失败只记录日志"""
+    try:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+            current_app.logger.info(f"临时文件已删除: {temp_path}")
+    except Exception as cleanup_error:
+        current_app.logger.error(f"删除临时文件失败: {str(cleanup_error)}")
+
+def parse_error_response(e):
+    """解析棋谱失败时的错误响应"""
+    current_app.logger.error(f"解析棋谱失败: {str(e)}")
+    
+    # 返回更详细的错误信息
+    error_message = str(e)
+    error_code = 500
+    
+    # 根据错误类型返回不同的状态码
+    if "权限不足" in error_message or "未授权" in error_message:
+        error_code = 403
+    elif "验证失败" in error_message:
+        error_code = 422
+    elif "未找到" in error_message:
+        error_code = 404
+    
+    return make_response(None, f"解析棋谱失败: {error_message}", error_code)
+
+# 路由：上传棋谱图片
+@chess_bp.route('/upload', methods=['POST'])
+@jwt_required()
+@rate_limited
+def upload_chess_image():
+    file_path, image_url, error = save_upload_image()
+    if error:
+        return error
+    
+    # 尝试调用AI解析棋谱
+    moves = ""
     try:
-        # 保存上传的文件到临时目录
-        filename = secure_filename(file.filename)
-        temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(temp_path)
-        current_app.logger.info(f"文件已保存到临时路径: {temp_path}")
+        # 获取默认模型
+        default_model = current_app.config.get('AI_MODEL', 'gpt-4-vision')
+        # 调用AI解析棋谱
+        moves = parse_chess_notation(file_path, default_model, is_file_path=True, user_id=get_jwt_identity())
+        current_app.logger.debug("AI解析结果: %s", moves)
+    except AdmissionRejected:
+        # 限流时删除已保存的图片，由错误处理器返回429
+        os.remove(file_path)
+        raise
+    except Exception as e:
+        current_app.logger.warning("AI解析失败: %s", str(e))
+        # 解析失败不影响上传，只是返回空的moves
+        moves = ""
+    
+    return make_response({
+        "image_url": image_url,
+        "moves": moves
+    })
+
+# 路由：解析棋谱
+@chess_bp.route('/parse', methods=['POST'])
+@jwt_required()
+@rate_limited
+def parse_notation():
+    # 获取用户ID
+    user_id = get_jwt_identity()
+    current_app.logger.info(f"解析棋谱请求，用户ID: {user_id}")
+    
+    temp_path = None
+    try:
+        temp_path, model, error = save_parse_image()
+        if error:
+            return error
         
         # 调用AI解析棋谱，传入文件路径而不是URL
-        moves = parse_chess_notation(temp_path, model, is_file_path=True)
+        moves = parse_chess_notation(temp_path, model, is_file_path=True, user_id=user_id)
         current_app.logger.info(f"棋谱解析成功，步骤数: {len(moves.split()) if moves else 0}")
         
-        # 解析完成后删除临时文件
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-            current_app.logger.info(f"临时文件已删除: {temp_path}")
-            
         return make_response({
             "moves": moves
         })
+    except (AdmissionRejected, ProviderUnavailable):
+        # 由错误处理器返回429/503和 Retry-After
+        raise
     except Exception as e:
-        current_app.logger.error(f"解析棋谱失败: {str(e)}")
-        # 确保临时文件被删除
-        try:
-            if 'temp_path' in locals() and os.path.exists(temp_path):
-                os.remove(temp_path)
-                current_app.logger.info(f"异常处理中删除临时文件: {temp_path}")
-        except Exception as cleanup_error:
-            current_app.logger.error(f"删除临时文件失败: {str(cleanup_error)}")
-        
-        # 返回更详细的错误信息
-        error_message = str(e)
-        error_code = 500
-        
-        # 根据错误类型返回不同的状态码
-        if "权限不足" in error_message or "未授权" in error_message:
-            error_code = 403
-        elif "验证失败" in error_message:
-            error_code = 422
-        elif "未找到" in error_message:
-            error_code = 404
-        
-        return make_response(None, f"解析棋谱失败: {error_message}", error_code)
+        return parse_error_response(e)
+    finally:
+        # 解析完成或失败后都删除临时文件
+        remove_temp_file(temp_path)
 
 # 路由：创建棋谱
 @chess_bp.route('/notations', methods=['POST'])
@@ -189,7 +217,7 @@ def create_chess_notation():
     
     # 获取请求数据
     data = request.json
-    current_app.logger.debug(f"请求数据: {data}")
+    current_app.logger.debug("请求数据: %s", data)
     
     # 提取字段
     title = data.get('title')
@@ -222,6 +250,7 @@ def create_chess_notation():
         # 保存到数据库
         db.session.add(notation)
         db.session.commit()
+        get_notation_cache().invalidate_user(user_id)
         
         current_app.logger.info(f"棋谱创建成功，ID: {notation.id}, 标题: {notation.title}")
         return make_response(notation.to_dict())
@@ -245,40 +274,50 @@ def get_chess_notations():
     difficulty = request.args.get('difficulty', '')
     tags = request.args.getlist('tags')
     
-    # 构建查询
-    query = ChessNotation.query.filter_by(user_id=user_id)
-    
-    # 应用筛选条件
-    if keyword:
-        query = query.filter(
-            (ChessNotation.title.ilike(f'%{keyword}%')) | 
-            (ChessNotation.description.ilike(f'%{keyword}%'))
+    def load_notations():
+        # 构建查询
+        query = ChessNotation.query.filter_by(user_id=user_id)
+        
+        # 应用筛选条件
+        if keyword:
+            query = query.filter(
+                (ChessNotation.title.ilike(f'%{keyword}%')) | 
+                (ChessNotation.description.ilike(f'%{keyword}%'))
+            )
+        
+        if difficulty:
+            query = query.filter_by(difficulty=difficulty)
+        
+        if tags:
+            for tag in tags:
+                query = query.filter(ChessNotation.tags.contains([tag]))
+        
+        # 获取总数
+        total = query.count()
+        
+        # 分页
+        notations = query.order_by(ChessNotation.created_at.desc()).paginate(
+            page=page, per_page=size, error_out=False
         )
-    
-    if difficulty:
-        query = query.filter_by(difficulty=difficulty)
-    
-    if tags:
-        for tag in tags:
-            query = query.filter(ChessNotation.tags.contains([tag]))
-    
-    # 获取总数
-    total = query.count()
-    
-    # 分页
-    notations = query.order_by(ChessNotation.created_at.desc()).paginate(
-        page=page, per_page=size, error_out=False
-    )
-    
-    # 转换为字典列表
-    notation_list = [notation.to_dict() for notation in notations.items]
-    
-    return make_response({
-        "data": notation_list,
-        "total": total,
-        "page": page,
-        "size": size
-    })
+        
+        # 转换为字典列表
+        notation_list = [notation.to_dict() for notation in notations.items]
+        
+        return {
+            "data": notation_list,
+            "total": total,
+            "page": page,
+            "size": size
+        }
+    
+    params = {
+        'page': page,
+        'size': size,
+        'keyword': keyword,
+        'difficulty': difficulty,
+        'tags': sorted(tags)
+    }
+    return make_response(get_notation_cache().get_or_load(user_id, 'list', params, load_notations))
 
 # 路由：获取棋谱详情
 @chess_bp.route('/notations/<int:notation_id>', methods=['GET'])
@@ -286,12 +325,16 @@ def get_chess_notations():
 def get_chess_notation(notation_id):
     user_id = get_jwt_identity()
     
-    notation = ChessNotation.query.filter_by(id=notation_id, user_id=user_id).first()
+    def load_notation():
+        notation = ChessNotation.query.filter_by(id=notation_id, user_id=user_id).first()
+        return notation.to_dict() if notation else None
+    
+    notation = get_notation_cache().get_or_load(user_id, 'detail', {'id': notation_id}, load_notation)
     
     if not notation:
         return make_response(None, "棋谱不存在或无权访问", 404)
     
-    return make_response(notation.to_dict())
+    return make_response(notation)
 
 # 路由：更新棋谱
 @chess_bp.route('/notations/<int:notation_id>', methods=['PUT'])
@@ -330,6 +373,7 @@ def update_chess_notation(notation_id):
         
         # 保存到数据库
         db.session.commit()
+        get_notation_cache().invalidate_user(user_id)
         
         return make_response(notation.to_dict())
     except Exception as e:
@@ -351,8 +395,231 @@ def delete_chess_notation(notation_id):
     try:
         db.session.delete(notation)
         db.session.commit()
+        get_notation_cache().invalidate_user(user_id)
         return make_response(None, "删除成功")
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"删除棋谱失败: {str(e)}")
-        return make_response(None, f"删除棋谱失败: {str(e)}", 500) 
\ No newline at end of file
+        return make_response(None, f"删除棋谱失败: {str(e)}", 500) 
+
+# 批量接口允许更新的字段
+BATCH_UPDATABLE_FIELDS = ('title', 'description', 'moves', 'image_url', 'difficulty', 'tags')
+
+def _get_batch_items(data, key):
+    """
+    从请求数据中取出批量操作列表并校验数量
+    
+    Returns:
+        (操作列表, 错误响应)，校验通过时错误响应为None
+    """
+    items = data.get(key) if isinstance(data, dict) else None
+    
+    if not isinstance(items, list) or not items:
+        return None, make_response(None, f"{key}必须是非空数组", 400)
+    
+    max_items = current_app.config.get('CHESS_BATCH_MAX_ITEMS', 1000)
+    if len(items) > max_items:
+        return None, make_response(None, f"单次批量操作不能超过{max_items}条", 400)
+    
+    return items, None
+
+def _parse_notation_id(value):
+    """将批量操作中的棋谱ID转换为整数，无效时返回None"""
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _query_owned_ids(user_id, notation_ids):
+    """一次查询出属于当前用户的棋谱ID集合"""
+    if not notation_ids:
+        return set()
+    rows = db.session.query(ChessNotation.id).filter(
+        ChessNotation.user_id == user_id,
+        ChessNotation.id.in_(notation_ids)
+    )
+    return {row.id for row in rows}
+
+# 路由：批量创建棋谱
+@chess_bp.route('/notations/batch', methods=['POST'])
+@jwt_required()
+def batch_create_chess_notations():
+    """批量创建棋谱，所有棋谱在同一个事务中提交"""
+    current_user_id = get_jwt_identity()
+    items, error = _get_batch_items(request.json, 'items')
+    if error:
+        return error
+    
+    current_app.logger.info(f"批量创建棋谱请求，用户ID: {current_user_id}, 数量: {len(items)}")
+    
+    try:
+        user_id = int(current_user_id) if isinstance(current_user_id, str) else current_user_id
+        
+        results = [None] * len(items)
+        pending = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not item.get('title') or not item.get('moves'):
+                results[index] = {'index': index, 'status': 'invalid', 'message': '标题和棋谱步骤不能为空'}
+                continue
+            
+            notation = ChessNotation(
+                title=item['title'],
+                description=item.get('description', ''),
+                moves=item['moves'],
+                image_url=item.get('image_url', ''),
+                difficulty=item.get('difficulty', 'medium'),
+                tags=item.get('tags', []),
+                user_id=user_id
+            )
+            pending.append((index, notation))
+        
+        if pending:
+            db.session.add_all([notation for _, notation in pending])
+            # flush后即可拿到自增ID，提交后无需逐条刷新对象
+            db.session.flush()
+            for index, notation in pending:
+                results[index] = {'index': index, 'status': 'created', 'id': notation.id}
+            db.session.commit()
+            get_notation_cache().invalidate_user(user_id)
+        
+        current_app.logger.info(f"批量创建棋谱完成，用户ID: {user_id}, 成功: {len(pending)}, 失败: {len(items) - len(pending)}")
+        return make_response({'results': results, 'succeeded': len(pending), 'failed': len(items) - len(pending)})
+    except ValueError as e:
+        current_app.logger.error(f"用户ID格式错误: {current_user_id}, 错误: {str(e)}")
+        return make_response(None, f"用户ID格式错误", 400)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"批量创建棋谱失败: {str(e)}")
+        return make_response(None, f"批量创建棋谱失败: {str(e)}", 500)
+
+# 路由：批量更新棋谱
+@chess_bp.route('/notations/batch', methods=['PUT'])
+@jwt_required()
+def batch_update_chess_notations():
+    """
+    批量更新棋谱
+    
+    修改内容相同的棋谱合并为一条 UPDATE ... WHERE id IN (...) 语句，
+    例如给500盘棋打上相同标签只需一条语句和一次提交。
+    """
+    current_user_id = get_jwt_identity()
+    items, error = _get_batch_items(request.json, 'items')
+    if error:
+        return error
+    
+    current_app.logger.info(f"批量更新棋谱请求，用户ID: {current_user_id}, 数量: {len(items)}")
+    
+    try:
+        user_id = int(current_user_id) if isinstance(current_user_id, str) else current_user_id
+        
+        notation_ids = [_parse_notation_id(item.get('id')) if isinstance(item, dict) else None for item in items]
+        owned_ids = _query_owned_ids(user_id, [i for i in notation_ids if i is not None])
+        
+        results = []
+        # 修改内容（序列化后）-> (修改字段, 棋谱ID列表)
+        groups = {}
+        seen = set()
+        for index, (item, notation_id) in enumerate(zip(items, notation_ids)):
+            if notation_id is None:
+                results.append({'index': index, 'status': 'invalid', 'message': '无效的棋谱ID'})
+                continue
+            if notation_id in seen:
+                results.append({'index': index, 'id': notation_id, 'status': 'invalid', 'message': '棋谱ID重复'})
+                continue
+            seen.add(notation_id)
+            if notation_id not in owned_ids:
+                results.append({'index': index, 'id': notation_id, 'status': 'not_found', 'message': '棋谱不存在或无权访问'})
+                continue
+            
+            changes = {field: item[field] for field in BATCH_UPDATABLE_FIELDS if field in item}
+            if not changes:
+                results.append({'index': index, 'id': notation_id, 'status': 'invalid', 'message': '没有可更新的字段'})
+                continue
+            
+            group_key = json.dumps(changes, sort_keys=True, ensure_ascii=False)
+            groups.setdefault(group_key, (changes, []))[1].append(notation_id)
+            results.append({'index': index, 'id': notation_id, 'status': 'updated'})
+        
+        if groups:
+            now = datetime.utcnow()
+            for changes, ids in groups.values():
+                db.session.execute(
+                    update(ChessNotation)
+                    .where(ChessNotation.user_id == user_id, ChessNotation.id.in_(ids))
+                    .values(**changes, updated_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+            db.session.commit()
+            get_notation_cache().invalidate_user(user_id)
+        
+        succeeded = sum(len(ids) for _, ids in groups.values())
+        current_app.logger.info(f"批量更新棋谱完成，用户ID: {user_id}, 成功: {succeeded}, 语句数: {len(groups)}")
+        return make_response({'results': results, 'succeeded': succeeded, 'failed': len(items) - succeeded})
+    except ValueError as e:
+        current_app.logger.error(f"用户ID格式错误: {current_user_id}, 错误: {str(e)}")
+        return make_response(None, f"用户ID格式错误", 400)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"批量更新棋谱失败: {str(e)}")
+        return make_response(None, f"批量更新棋谱失败: {str(e)}", 500)
+
+# 路由：批量删除棋谱
+@chess_bp.route('/notations/batch', methods=['DELETE'])
+@jwt_required()
+def batch_delete_chess_notations():
+    """批量删除棋谱，使用一条 DELETE ... WHERE id IN (...) 语句"""
+    current_user_id = get_jwt_identity()
+    items, error = _get_batch_items(request.json, 'ids')
+    if error:
+        return error
+    
+    current_app.logger.info(f"批量删除棋谱请求，用户ID: {current_user_id}, 数量: {len(items)}")
+    
+    try:
+        user_id = int(current_user_id) if isinstance(current_user_id, str) else current_user_id
+        
+        notation_ids = [_parse_notation_id(item) for item in items]
+        owned_ids = _query_owned_ids(user_id, [i for i in notation_ids if i is not None])
+        
+        results = []
+        seen = set()
+        for index, notation_id in enumerate(notation_ids):
+            if notation_id is None:
+                results.append({'index': index, 'status': 'invalid', 'message': '无效的棋谱ID'})
+            elif notation_id in seen:
+                results.append({'index': index, 'id': notation_id, 'status': 'invalid', 'message': '棋谱ID重复'})
+            elif notation_id in owned_ids:
+                seen.add(notation_id)
+                results.append({'index': index, 'id': notation_id, 'status': 'deleted'})
+            else:
+                seen.add(notation_id)
+                results.append({'index': index, 'id': notation_id, 'status': 'not_found', 'message': '棋谱不存在或无权访问'})
+        
+        if owned_ids:
+            db.session.execute(
+                delete(ChessNotation)
+                .where(ChessNotation.user_id == user_id, ChessNotation.id.in_(owned_ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            get_notation_cache().invalidate_user(user_id)
+        
+        succeeded = sum(1 for result in results if result['status'] == 'deleted')
+        current_app.logger.info(f"批量删除棋谱完成，用户ID: {user_id}, 删除: {succeeded}")
+        return make_response({'results': results, 'succeeded': succeeded, 'failed': len(results) - succeeded})
+    except ValueError as e:
+        current_app.logger.error(f"用户ID格式错误: {current_user_id}, 错误: {str(e)}")
+        return make_response(None, f"用户ID格式错误", 400)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"批量删除棋谱失败: {str(e)}")
+        return make_response(None, f"批量删除棋谱失败: {str(e)}", 500)
+
+# 路由：查看棋谱缓存统计
+@chess_bp.route('/cache/stats', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """返回棋谱查询缓存的命中率和内存占用，需要管理员令牌（flask profiler sign 生成）"""
+    return make_response(get_notation_cache().stats())
\ No newline at end of file
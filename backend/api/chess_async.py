@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+棋谱图片识别接口的异步版本，只在ASGI入口（asgi:app）中生效
+
+与 api/chess.py 中的同名接口共用校验、保存和错误处理逻辑，请求和响应格式完全相同；
+区别在于等待AI模型返回期间不占用线程。
+"""
+
+import os
+from flask import current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from api.chess import parse_error_response, remove_temp_file, save_parse_image, save_upload_image
+from utils.admission import AdmissionRejected, rate_limited
+from utils.ai import parse_chess_notation_async
+from utils.asgi import AsyncView
+from utils.resilience import ProviderUnavailable
+from utils.response import make_response
+
+
+class UploadChessImageView(AsyncView):
+    """POST /api/chess/upload"""
+
+    @jwt_required()
+    @rate_limited
+    def prepare(self):
+        file_path, image_url, error = save_upload_image()
+        return (file_path, image_url, get_jwt_identity()), error
+
+    async def call(self, state):
+        file_path, _, user_id = state
+        default_model = current_app.config.get('AI_MODEL', 'gpt-4-vision')
+        return await parse_chess_notation_async(file_path, default_model, user_id)
+
+    def finish(self, state, moves, error):
+        file_path, image_url, _ = state
+        if isinstance(error, AdmissionRejected):
+            # 限流时删除已保存的图片，由错误处理器返回429
+            os.remove(file_path)
+            raise error
+        if error is not None:
+            current_app.logger.warning("AI解析失败: %s", str(error))
+            # 解析失败不影响上传，只是返回空的moves
+            moves = ""
+        else:
+            current_app.logger.debug("AI解析结果: %s", moves)
+        return make_response({
+            "image_url": image_url,
+            "moves": moves
+        })
+
+
+class ParseNotationView(AsyncView):
+    """POST /api/chess/parse"""
+
+    @jwt_required()
+    @rate_limited
+    def prepare(self):
+        current_app.logger.info(f"解析棋谱请求，用户ID: {get_jwt_identity()}")
+        try:
+            temp_path, model, error = save_parse_image()
+        except Exception as e:
+            return None, parse_error_response(e)
+        return (temp_path, model, get_jwt_identity()), error
+
+    async def call(self, state):
+        temp_path, model, user_id = state
+        return await parse_chess_notation_async(temp_path, model, user_id)
+
+    def finish(self, state, moves, error):
+        temp_path, _, _ = state
+        remove_temp_file(temp_path)
+        if isinstance(error, (AdmissionRejected, ProviderUnavailable)):
+            raise error
+        if error is not None:
+            return parse_error_response(error)
+        current_app.logger.info(f"棋谱解析成功，步骤数: {len(moves.split()) if moves else 0}")
+        return make_response({
+            "moves": moves
+        })
+
+
+# 端点名 -> 异步视图，端点名与 api/chess.py 中注册的同步视图一致
+ASYNC_VIEWS = {
+    'chess.upload_chess_image': UploadChessImageView(),
+    'chess.parse_notation': ParseNotationView(),
+}
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import Blueprint, request, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from models.chess import ChessNotation
+from models.practice import PracticeSession
+from models.db import db
+from utils.response import make_response
+from utils.practice import game_plies, get_practice_tracker
+
+# 创建蓝图
+practice_bp = Blueprint('practice', __name__)
+
+# 路由：开始练习
+@practice_bp.route('/practice/sessions', methods=['POST'])
+@jwt_required()
+def start_practice():
+    """按棋谱开始一次练习，请求体: {"notation_id": 1}"""
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    notation_id = data.get('notation_id')
+    if not isinstance(notation_id, int):
+        return make_response(None, "缺少棋谱ID", 400)
+
+    notation = ChessNotation.query.filter_by(id=notation_id, user_id=user_id).first()
+    if not notation:
+        return make_response(None, "棋谱不存在或无权访问", 404)
+
+    total_plies = len(game_plies(notation.moves))
+    if not total_plies:
+        return make_response(None, "棋谱中没有可练习的走法", 400)
+
+    try:
+        session = PracticeSession(user_id=int(user_id), notation_id=notation.id, total_plies=total_plies)
+        db.session.add(session)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"开始练习失败: {str(e)}")
+        return make_response(None, f"开始练习失败: {str(e)}", 500)
+
+    get_practice_tracker().remember_session(session.id, session.user_id, notation.moves)
+    return make_response(session.to_dict(), "练习已开始", 201)
+
+# 路由：获取练习状态
+@practice_bp.route('/practice/sessions/<int:session_id>', methods=['GET'])
+@jwt_required()
+def get_practice(session_id):
+    user_id = get_jwt_identity()
+    # 先写入本进程缓冲中的走法，返回的进度包含刚提交的步骤
+    get_practice_tracker().buffer.flush()
+    session = PracticeSession.query.filter_by(id=session_id, user_id=user_id).first()
+    if not session:
+        return make_response(None, "练习不存在或无权访问", 404)
+    return make_response(session.to_dict())
+
+# 路由：提交一步棋
+@practice_bp.route('/practice/sessions/<int:session_id>/moves', methods=['POST'])
+@jwt_required()
+def submit_practice_move(session_id):
+    """
+    提交练习中的一步棋，请求体: {"ply": 0, "move": "e4"}
+
+    ply 为这一步的半回合序号（从0开始），move 可以是SAN（e4、Nf3、O-O）或坐标（e2e4）。
+    按棋谱校验后立即返回结果，记录由写后缓冲批量写入数据库。
+    进度只随从第0步起连续走对的步骤推进，跳过前面的步骤提交后面的步骤不计入进度。
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    ply = data.get('ply')
+    move = data.get('move')
+    if not isinstance(ply, int) or isinstance(ply, bool) or not isinstance(move, str):
+        return make_response(None, "缺少步骤序号或走法", 400)
+
+    try:
+        result = get_practice_tracker().submit(session_id, user_id, ply, move)
+    except ValueError as e:
+        return make_response(None, str(e), 400)
+
+    if result is None:
+        return make_response(None, "练习不存在或无权访问", 404)
+    return make_response(result)
+
+# 路由：获取所有棋谱的练习进度
+@practice_bp.route('/practice/progress', methods=['GET'])
+@jwt_required()
+def get_practice_progress():
+    """按棋谱汇总当前用户的练习次数、完成次数和正确率，最近练习的在前"""
+    return make_response(get_practice_tracker().progress(get_jwt_identity()))
+
+# 路由：获取单个棋谱的练习进度
+@practice_bp.route('/notations/<int:notation_id>/progress', methods=['GET'])
+@jwt_required()
+def get_notation_progress(notation_id):
+    """单个棋谱的练习进度和正确率，以及出错最多的步骤"""
+    user_id = get_jwt_identity()
+    notation = ChessNotation.query.filter_by(id=notation_id, user_id=user_id).first()
+    if not notation:
+        return make_response(None, "棋谱不存在或无权访问", 404)
+
+    tracker = get_practice_tracker()
+    rows = tracker.progress(user_id, notation_id)
+    progress = rows[0] if rows else {
+        'notation_id': notation_id, 'sessions': 0, 'completed_sessions': 0, 'attempts': 0,
+        'correct': 0, 'incorrect': 0, 'accuracy': None, 'best_progress': 0, 'last_practiced_at': None
+    }
+    progress['total_plies'] = len(game_plies(notation.moves))
+    progress['hardest_plies'] = tracker.hardest_plies(user_id, notation_id)
+    return make_response(progress)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from functools import wraps
+from flask import Blueprint, Response, current_app
+
+from utils.response import make_response
+from utils.profiler import list_profiles, load_profile, request_token, to_collapsed, verify_token
+
+# 创建蓝图
+profiles_bp = Blueprint('profiles', __name__)
+
+def admin_required(func):
+    """要求请求携带有效的管理员剖析令牌（flask profiler sign 生成）"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not verify_token(current_app.config.get('PROFILER_SECRET'), request_token()):
+            return make_response(None, "需要有效的管理员令牌", 403)
+        return func(*args, **kwargs)
+    return wrapper
+
+@profiles_bp.route('', methods=['GET'])
+@admin_required
+def get_profiles():
+    """列出已保存的剖析结果，按时间倒序"""
+    return make_response(list_profiles(current_app.config.get('PROFILER_DIR', 'profiles')))
+
+@profiles_bp.route('/<profile_id>', methods=['GET'])
+@admin_required
+def get_profile(profile_id):
+    """获取单个剖析结果的完整数据（调用栈采样和SQL语句）"""
+    profile = load_profile(current_app.config.get('PROFILER_DIR', 'profiles'), profile_id)
+    if profile is None:
+        return make_response(None, "剖析结果不存在", 404)
+    return make_response(profile)
+
+@profiles_bp.route('/<profile_id>/collapsed', methods=['GET'])
+@admin_required
+def download_collapsed(profile_id):
+    """以折叠栈格式下载，可直接用 flamegraph.pl 或 speedscope 生成火焰图"""
+    profile = load_profile(current_app.config.get('PROFILER_DIR', 'profiles'), profile_id)
+    if profile is None:
+        return make_response(None, "剖析结果不存在", 404)
+    return Response(
+        to_collapsed(profile),
+        mimetype='text/plain',
+        headers={'Content-Disposition': f'attachment; filename={profile_id}.folded'}
+    )
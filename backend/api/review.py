@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask import Blueprint, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from models.chess import ChessNotation
+from models.review import ReviewItem
+from utils.response import make_response
+from utils.practice import game_plies, match_move
+from utils.review import PRACTICE_CORRECT_GRADE, PRACTICE_WRONG_GRADE, get_review_scheduler
+
+# 创建蓝图
+review_bp = Blueprint('review', __name__)
+
+# 单次最多返回的到期复习项数
+MAX_DUE_LIMIT = 100
+
+# 路由：获取到期的复习项
+@review_bp.route('/review/due', methods=['GET'])
+@jwt_required()
+def get_due_reviews():
+    """
+    今天要复习的内容：最早到期的N个复习项（棋谱中的一步）
+
+    查询参数：limit 返回数量（默认20，最多100）。
+    每项附带棋谱标题、回合数和走棋方；due_count 为到期总数（最多数到1000）；
+    没有到期项时 next_due_at 为下一项的到期时间。
+    """
+    user_id = int(get_jwt_identity())
+    limit = request.args.get('limit', 20, type=int)
+    if not limit or not 1 <= limit <= MAX_DUE_LIMIT:
+        return make_response(None, f"limit 须在1到{MAX_DUE_LIMIT}之间", 400)
+
+    scheduler = get_review_scheduler()
+    items = scheduler.due(user_id, limit)
+    titles = {}
+    if items:
+        titles = dict(
+            ChessNotation.query.with_entities(ChessNotation.id, ChessNotation.title)
+            .filter(ChessNotation.id.in_({item.notation_id for item in items}))
+        )
+
+    result = []
+    for item in items:
+        data = item.to_dict()
+        data['title'] = titles.get(item.notation_id)
+        data['move_number'] = item.ply // 2 + 1
+        data['color'] = 'white' if item.ply % 2 == 0 else 'black'
+        result.append(data)
+
+    next_due_at = None if items else scheduler.next_due_at(user_id)
+    return make_response({
+        'items': result,
+        'due_count': scheduler.due_count(user_id) if items else 0,
+        'next_due_at': next_due_at.isoformat() if next_due_at else None
+    })
+
+# 路由：作答一个复习项
+@review_bp.route('/review/items/<int:item_id>', methods=['POST'])
+@jwt_required()
+def answer_review(item_id):
+    """
+    作答一个复习项，请求体: {"move": "Nf3"} 或 {"grade": 4}
+
+    提交走法时按棋谱校验，走对记4分、走错记1分；也可以直接给出0-5的自评分数。
+    返回是否走对和更新后的复习项（含下次到期时间）。
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    move = data.get('move')
+    grade = data.get('grade')
+
+    correct = None
+    if isinstance(move, str) and move.strip():
+        item = ReviewItem.query.filter_by(id=item_id, user_id=user_id).first()
+        if not item:
+            return make_response(None, "复习项不存在或无权访问", 404)
+        notation = ChessNotation.query.filter_by(id=item.notation_id, user_id=user_id).first()
+        plies = game_plies(notation.moves) if notation else ()
+        if item.ply >= len(plies):
+            return make_response(None, "棋谱已修改，这一步不存在", 409)
+        correct = match_move(plies[item.ply], move)
+        grade = PRACTICE_CORRECT_GRADE if correct else PRACTICE_WRONG_GRADE
+    elif not isinstance(grade, int) or isinstance(grade, bool) or not 0 <= grade <= 5:
+        return make_response(None, "须提供走法或0-5的评分", 400)
+
+    item = get_review_scheduler().grade(user_id, item_id, grade)
+    if item is None:
+        return make_response(None, "复习项不存在或无权访问", 404)
+    return make_response({'correct': correct, 'grade': grade, 'item': item.to_dict()})
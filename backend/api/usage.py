@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timedelta
+from flask import Blueprint, request
+
+from api.profiles import admin_required
+from utils.response import make_response
+from utils.usage import GROUP_COLUMNS, get_usage_tracker
+
+# 创建蓝图
+usage_bp = Blueprint('usage', __name__)
+
+@usage_bp.route('', methods=['GET'])
+@admin_required
+def get_usage_report():
+    """
+    AI调用用量报表
+
+    查询参数：days 最近多少天（含今天，默认7），group_by 分组字段（user_id/provider/model/day，默认user_id）。
+    返回按费用倒序的分组汇总，以及按图片大小分档的统计和最大的几张图片。
+    """
+    days = request.args.get('days', 7, type=int)
+    group_by = request.args.get('group_by', 'user_id')
+    if not days or not 1 <= days <= 366:
+        return make_response(None, "days 须在1到366之间", 400)
+    if group_by not in GROUP_COLUMNS:
+        return make_response(None, f"group_by 须为 {', '.join(GROUP_COLUMNS)} 之一", 400)
+
+    tracker = get_usage_tracker()
+    end = datetime.utcnow().date()
+    start = end - timedelta(days=days - 1)
+    return make_response({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'group_by': group_by,
+        'rows': tracker.report(start, end, group_by),
+        'images': tracker.image_report(start, end),
+    })
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
 from werkzeug.utils import secure_filename
 import os
 import uuid
@@ -10,6 +10,9 @@ import uuid
 from models.user import User
 from models.db import db
 from utils.response import make_response
+from utils.revocation import revoke_user_tokens
+from utils.avatar import AvatarError, avatar_srcset, avatar_url, process_avatar
+from utils.usage import get_usage_tracker
 
 # 创建蓝图
 user_bp = Blueprint('user', __name__)
@@ -39,10 +42,8 @@ def get_profile():
     current_app.logger.info(f"获取用户资料请求，用户ID: {current_user_id}, 类型: {type(current_user_id)}")
     
     try:
-        # 查询用户，确保用户ID是整数
-        # 如果current_user_id是字符串形式的数字，需要转换为整数
-        user_id = int(current_user_id) if isinstance(current_user_id, str) else current_user_id
-        user = User.query.get(user_id)
+        # 当前用户已在JWT校验时解析（带缓存），无需再次查询
+        user = current_user
         
         if not user:
             current_app.logger.warning(f"用户不存在，ID: {current_user_id}")
@@ -55,6 +56,7 @@ def get_profile():
             'email': user.email,
             'name': user.name,
             'avatar': user.avatar,
+            'avatar_srcset': avatar_srcset(user.avatar),
             'created_at': user.created_at.isoformat() if hasattr(user, 'created_at') and user.created_at else None
         })
     except ValueError as e:
@@ -84,9 +86,8 @@ def update_profile():
         return make_response(None, "请求数据不能为空", 400)
     
     try:
-        # 查询用户，确保用户ID是整数
-        user_id = int(current_user_id) if isinstance(current_user_id, str) else current_user_id
-        user = User.query.get(user_id)
+        # 当前用户已在JWT校验时解析（带缓存），无需再次查询
+        user = current_user
         
         if not user:
             current_app.logger.warning(f"用户不存在，ID: {current_user_id}")
@@ -95,11 +96,11 @@ def update_profile():
         # 更新用户信息
         if 'name' in data:
             user.name = data['name']
-            current_app.logger.debug(f"更新用户名称: {data['name']}")
+            current_app.logger.debug("更新用户名称: %s", data['name'])
         
         if 'avatar' in data:
             user.avatar = data['avatar']
-            current_app.logger.debug(f"更新用户头像: {data['avatar']}")
+            current_app.logger.debug("更新用户头像: %s", data['avatar'])
         
         # 保存到数据库
         db.session.commit()
@@ -112,7 +113,8 @@ def update_profile():
                 'username': user.username,
                 'email': user.email,
                 'name': user.name,
-                'avatar': user.avatar
+                'avatar': user.avatar,
+                'avatar_srcset': avatar_srcset(user.avatar)
             }
         })
     except ValueError as e:
@@ -128,15 +130,14 @@ def update_profile():
 @jwt_required()
 def change_password():
     """修改当前用户的密码"""
-    current_user_id = get_jwt_identity()
     data = request.get_json()
     
     if not data or not data.get('old_password') or not data.get('new_password'):
         return jsonify({'message': '请提供旧密码和新密码'}), 400
     
     try:
-        # 查询用户
-        user = User.query.get(current_user_id)
+        # 当前用户已在JWT校验时解析（带缓存），无需再次查询
+        user = current_user
         
         if not user:
             return jsonify({'message': '用户不存在'}), 404
@@ -151,7 +152,8 @@ def change_password():
         # 保存到数据库
         db.session.commit()
         
-        return jsonify({'message': '密码修改成功'}), 200
+        # 撤销此前签发的所有令牌，返回新令牌
+        return jsonify({'message': '密码修改成功', **revoke_user_tokens(user.id)}), 200
     except (NameError, AttributeError):
         # 如果模型不存在，返回演示消息
         return jsonify({'message': '密码修改功能暂未实现'}), 501
@@ -160,7 +162,7 @@ def change_password():
 @user_bp.route('/avatar', methods=['POST'])
 @jwt_required()
 def upload_avatar():
-    """上传用户头像"""
+    """上传用户头像，裁剪为正方形并生成多种尺寸的WebP和JPEG"""
     current_user_id = get_jwt_identity()
     
     if 'avatar' not in request.files:
@@ -171,31 +173,60 @@ def upload_avatar():
     if file.filename == '':
         return jsonify({'message': '没有选择文件'}), 400
     
+    # 头像只需读入内存处理，原图不保存
+    data = file.read(current_app.config.get('AVATAR_MAX_UPLOAD_SIZE', 5 * 1024 * 1024) + 1)
+    if len(data) > current_app.config.get('AVATAR_MAX_UPLOAD_SIZE', 5 * 1024 * 1024):
+        return jsonify({'message': '头像文件过大'}), 400
+    
     try:
-        # 查询用户
-        user = User.query.get(current_user_id)
+        # 当前用户已在JWT校验时解析（带缓存），无需再次查询
+        user = current_user
         
         if not user:
             return jsonify({'message': '用户不存在'}), 404
         
-        # 保存文件
-        filename = f"avatar_{current_user_id}_{os.path.basename(file.filename)}"
-        upload_folder = os.path.join(os.getcwd(), 'uploads', 'avatars')
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        file_path = os.path.join(upload_folder, filename)
-        file.save(file_path)
-        
-        # 更新用户头像
-        user.avatar = f"/uploads/avatars/{filename}"
+        sizes = current_app.config.get('AVATAR_SIZES', (32, 64, 128, 256))
+        digest, written = process_avatar(
+            data,
+            os.path.join(current_app.config['UPLOAD_FOLDER'], 'avatars'),
+            sizes=sizes,
+            webp_quality=current_app.config.get('AVATAR_WEBP_QUALITY', 80),
+            jpeg_quality=current_app.config.get('AVATAR_JPEG_QUALITY', 85),
+            max_pixels=current_app.config.get('AVATAR_MAX_PIXELS', 40000000)
+        )
+        current_app.logger.info(
+            f"头像处理完成，用户ID: {current_user_id}, 原图 {len(data)} 字节, "
+            f"各尺寸字节数: {written}"
+        )
+        
+        # avatar字段保存默认尺寸的JPEG，不支持srcset的客户端也能直接显示
+        user.avatar = avatar_url(digest, current_app.config.get('AVATAR_DEFAULT_SIZE', 128), 'jpeg')
         
         # 保存到数据库
         db.session.commit()
         
         return jsonify({
             'message': '头像上传成功',
-            'avatar': user.avatar
+            'avatar': user.avatar,
+            'avatar_srcset': avatar_srcset(user.avatar, sizes)
         }), 200
+    except AvatarError as e:
+        return jsonify({'message': str(e)}), 400
     except (NameError, AttributeError):
         # 如果模型不存在，返回演示消息
-        return jsonify({'message': '头像上传功能暂未实现'}), 501 
\ No newline at end of file
+        return jsonify({'message': '头像上传功能暂未实现'}), 501
+
+# 路由：AI识别用量
+@user_bp.route('/usage', methods=['GET'])
+@jwt_required()
+def get_usage():
+    """当前用户今天（UTC）的AI识别次数、估算费用和剩余预算"""
+    tracker = get_usage_tracker()
+    calls, cost = tracker.spent_today(get_jwt_identity())
+    budget = tracker.daily_budget
+    return make_response({
+        'calls': calls,
+        'cost_usd': cost / 1000000,
+        'daily_budget_usd': budget or None,
+        'remaining_usd': max(0.0, budget - cost / 1000000) if budget else None
+    })
@@ -2,12 +2,29 @@
 # -*- coding: utf-8 -*-
 
 import os
+import math
 import logging
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, get_jwt_identity
 from dotenv import load_dotenv
 from models.db import db, init_db  # 导入数据库实例和初始化函数
+from models.migrate import db_cli
+from utils.cache import init_cache, init_user_cache, get_user_cache
+from utils.revocation import init_revocation, get_revocation_store
+from utils.hashing import init_password_hasher, HashingBusyError
+from utils.engine import init_analysis_engine, AnalysisBusyError, AnalysisTimeoutError
+from utils.admission import init_admission, AdmissionRejected
+from utils.resilience import init_resilience, ProviderUnavailable
+from utils.usage import init_usage, usage_cli
+from utils.sweeper import init_sweeper, sweeper_cli
+from utils.review import init_review
+from utils.practice import init_practice
+from utils.log import init_logging, register_request_logging
+from utils.json_provider import init_json_provider
+from utils.compression import init_compression
+from utils.metrics import init_metrics
+from utils.profiler import init_profiler, profiler_cli
 
 # 加载环境变量
 load_dotenv()
@@ -17,9 +34,9 @@ def create_app(config_name=None):
     app = Flask(__name__)
     
     # 配置应用
+    # 使用 FLASK_DEBUG 代替已弃用的 FLASK_ENV
+    debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() in ('true', '1', 't')
     if config_name is None:
-        # 使用 FLASK_DEBUG 代替已弃用的 FLASK_ENV
-        debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() in ('true', '1', 't')
         config_name = 'development' if debug_mode else 'production'
     
     # 从config模块导入配置
@@ -34,14 +51,13 @@ def create_app(config_name=None):
         app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
         app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
     
-    # 配置日志
-    log_level = logging.DEBUG if debug_mode else logging.INFO
-    logging.basicConfig(
-        level=log_level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    app.logger.setLevel(log_level)
-    app.logger.info(f"应用启动，环境: {config_name}, 日志级别: {logging.getLevelName(log_level)}")
+    # 配置日志（队列 + 后台线程输出）
+    log_level = logging.DEBUG if debug_mode else logging.getLevelName(app.config.get('LOG_LEVEL', 'INFO'))
+    init_logging(app, log_level)
+    app.logger.info("应用启动，环境: %s, 日志级别: %s", config_name, logging.getLevelName(log_level))
+    
+    # 注册高性能JSON提供者
+    init_json_provider(app)
     
     # 初始化CORS，允许所有来源的请求
     CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
@@ -54,26 +70,31 @@ def create_app(config_name=None):
     app.config['JWT_BLACKLIST_TOKEN_CHECKS'] = ['access', 'refresh']
     app.config['JWT_ERROR_MESSAGE_KEY'] = 'message'
     
-    # JWT加载回调
+    # JWT加载回调：每个请求只解析一次当前用户（current_user），跨请求使用短TTL缓存
     @jwt.user_lookup_loader
     def user_lookup_callback(_jwt_header, jwt_data):
-        app.logger.debug(f"JWT用户查找回调: {jwt_data}")
-        return jwt_data["sub"]
+        app.logger.debug("JWT用户查找回调，用户ID: %s", jwt_data["sub"])
+        return get_user_cache().get(jwt_data["sub"])
+    
+    @jwt.user_lookup_error_loader
+    def user_lookup_error_callback(_jwt_header, jwt_data):
+        app.logger.warning("令牌对应的用户不存在，用户ID: %s", jwt_data.get("sub"))
+        return jsonify({"code": 404, "message": "用户不存在"}), 404
     
     # JWT错误处理
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
-        app.logger.warning(f"JWT令牌已过期: {jwt_payload}")
+        app.logger.warning("JWT令牌已过期，用户ID: %s", jwt_payload.get("sub"))
         return jsonify({"code": 401, "message": "令牌已过期，请重新登录"}), 401
     
     @jwt.invalid_token_loader
     def invalid_token_callback(error_string):
-        app.logger.warning(f"无效的JWT令牌: {error_string}")
+        app.logger.warning("无效的JWT令牌: %s", error_string)
         return jsonify({"code": 401, "message": "无效的令牌"}), 401
     
     @jwt.unauthorized_loader
     def unauthorized_callback(error_string):
-        app.logger.warning(f"未授权的请求: {error_string}")
+        app.logger.warning("未授权的请求: %s", error_string)
         return jsonify({"code": 401, "message": "缺少令牌"}), 401
     
     @jwt.token_verification_failed_loader
@@ -81,17 +102,61 @@ def create_app(config_name=None):
         app.logger.warning("令牌验证失败")
         return jsonify({"code": 401, "message": "令牌验证失败"}), 401
     
+    # 检查令牌是否已撤销（注销、修改密码），常规情况只查内存副本
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return get_revocation_store().is_revoked(jwt_payload)
+    
     @jwt.revoked_token_loader
     def revoked_token_callback(jwt_header, jwt_payload):
-        app.logger.warning(f"已撤销的令牌: {jwt_payload}")
+        app.logger.warning("已撤销的令牌，用户ID: %s", jwt_payload.get("sub"))
         return jsonify({"code": 401, "message": "令牌已被撤销"}), 401
     
     # 初始化数据库
     init_db(app)
+    app.cli.add_command(db_cli)
+    
+    # 初始化棋谱查询缓存和已认证用户缓存
+    init_cache(app)
+    init_user_cache(app)
+    
+    # 初始化令牌撤销存储
+    init_revocation(app)
+    
+    # 初始化密码哈希服务（独立进程池计算哈希）
+    init_password_hasher(app)
+    
+    # 初始化AI接口准入控制（令牌桶限流、模型并发上限）
+    init_admission(app)
+    
+    # 初始化AI模型调用的重试和熔断策略
+    init_resilience(app)
+    
+    # 初始化AI调用用量记录和每日预算
+    init_usage(app)
+    app.cli.add_command(usage_cli)
+    
+    # 初始化间隔重复复习安排和棋谱练习记录（走法经写后缓冲批量写入）
+    init_review(app)
+    init_practice(app)
+    
+    # 初始化棋局分析服务（搜索在独立的进程池中执行）
+    init_analysis_engine(app)
+    
+    # 注册指标采集（请求耗时、SQL次数、AI调用耗时）
+    with app.app_context():
+        init_metrics(app, db.engine)
+        # 按需的单请求剖析（签名令牌或按比例采样）
+        init_profiler(app, db.engine)
+    app.cli.add_command(profiler_cli)
     
     # 确保上传目录存在
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
+    # 定期清理上传目录中没有被引用的文件
+    init_sweeper(app)
+    app.cli.add_command(sweeper_cli)
+    
     # 注册蓝图
     try:
         # 认证蓝图
@@ -102,10 +167,34 @@ def create_app(config_name=None):
         from api.chess import chess_bp
         app.register_blueprint(chess_bp, url_prefix='/api/chess')
         
+        # 棋谱练习蓝图
+        from api.practice import practice_bp
+        app.register_blueprint(practice_bp, url_prefix='/api/chess')
+        
+        # 间隔重复复习蓝图
+        from api.review import review_bp
+        app.register_blueprint(review_bp, url_prefix='/api/chess')
+        
+        # 棋局分析蓝图
+        from api.analysis import analysis_bp
+        app.register_blueprint(analysis_bp, url_prefix='/api/chess')
+        
         # 用户蓝图
         from api.user import user_bp
         app.register_blueprint(user_bp, url_prefix='/api/user')
         
+        # 剖析结果管理蓝图
+        from api.profiles import profiles_bp
+        app.register_blueprint(profiles_bp, url_prefix='/api/admin/profiles')
+        
+        # AI调用用量报表蓝图
+        from api.usage import usage_bp
+        app.register_blueprint(usage_bp, url_prefix='/api/admin/usage')
+        
+        # 按配置预加载AI模型SDK（默认首次调用时才加载）
+        from utils.ai import preload_providers
+        preload_providers(app)
+        
     except ImportError as e:
         # 如果蓝图模块不存在，创建一个简单的路由
         app.logger.error(f"注册蓝图失败: {str(e)}")
@@ -113,13 +202,8 @@ def create_app(config_name=None):
         def health_check():
             return jsonify({"status": "ok", "message": "API服务正常运行"})
     
-    # 添加请求日志中间件
-    @app.before_request
-    def log_request_info():
-        app.logger.debug('请求头: %s', request.headers)
-        app.logger.debug('请求方法: %s, 路径: %s', request.method, request.path)
-        if request.is_json:
-            app.logger.debug('请求JSON: %s', request.json)
+    # 添加请求日志中间件（按级别和采样率开启，敏感信息脱敏）
+    register_request_logging(app)
     
     # 添加CORS预检请求的响应处理
     @app.after_request
@@ -127,10 +211,11 @@ def create_app(config_name=None):
         response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
         response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
         response.headers.add('Access-Control-Allow-Credentials', 'true')
-        app.logger.debug('响应状态: %s', response.status)
-        app.logger.debug('响应头: %s', response.headers)
         return response
     
+    # 注册响应压缩
+    init_compression(app)
+    
     # 注册错误处理器
     register_error_handlers(app)
     
@@ -145,6 +230,52 @@ def register_error_handlers(app):
             'message': '请求的资源不存在'
         }), 404
     
+    @app.errorhandler(HashingBusyError)
+    def hashing_busy(error):
+        response = jsonify({
+            'code': 503,
+            'message': '服务繁忙，请稍后重试'
+        })
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response, 503
+    
+    @app.errorhandler(AnalysisBusyError)
+    def analysis_busy(error):
+        response = jsonify({
+            'code': 503,
+            'message': '棋局分析服务繁忙，请稍后重试'
+        })
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response, 503
+    
+    @app.errorhandler(AnalysisTimeoutError)
+    def analysis_timeout(error):
+        app.logger.warning(f"棋局分析超时: {str(error)}")
+        return jsonify({
+            'code': 504,
+            'message': '棋局分析超时，请减少局面数或搜索时间后重试'
+        }), 504
+    
+    @app.errorhandler(AdmissionRejected)
+    def admission_rejected(error):
+        response = jsonify({
+            'code': 429,
+            'message': '今日AI识别额度已用完' if error.reason == 'budget_exceeded' else '请求过于频繁，请稍后重试',
+            'reason': error.reason
+        })
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response, 429
+    
+    @app.errorhandler(ProviderUnavailable)
+    def provider_unavailable(error):
+        response = jsonify({
+            'code': 503,
+            'message': 'AI识别服务暂时不可用，请稍后重试'
+        })
+        if error.retry_after:
+            response.headers['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+        return response, 503
+    
     @app.errorhandler(500)
     def internal_server_error(error):
         return jsonify({
@@ -152,8 +283,8 @@ def register_error_handlers(app):
             'message': '服务器内部错误'
         }), 500
 
-# 直接运行此文件时执行
+# 直接运行此文件时执行（开发服务器，生产环境请使用 gunicorn -c gunicorn.conf.py wsgi:app）
 if __name__ == '__main__':
     app = create_app()
     port = int(os.getenv('PORT', 5001))  # 默认使用5001端口
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=app.debug)
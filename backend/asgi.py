@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+生产环境ASGI入口
+
+棋谱识别接口（/api/chess/upload、/api/chess/parse）在事件循环中等待AI模型返回，
+一个worker可同时挂起大量识别请求；其余接口仍在线程池中按WSGI执行。
+
+配合 gunicorn.conf.py 使用:
+    GUNICORN_WORKER_CLASS=uvicorn gunicorn -c gunicorn.conf.py asgi:app
+"""
+
+from api.chess_async import ASYNC_VIEWS
+from utils.asgi import AsgiApp
+# 复用WSGI入口创建的应用，gunicorn.conf.py 的 post_fork 也从 wsgi 中导入它
+from wsgi import app as flask_app
+
+app = AsgiApp(flask_app, ASYNC_VIEWS)
@@ -0,0 +1 @@
+# 性能基准测试包初始化文件
\ No newline at end of file
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+AI接口准入控制的开销测量
+
+1. 单次操作：对每种共享状态后端（memory / sqlite / redis）测量一次令牌桶扣减
+   和一次并发名额占用加释放的耗时，分别在单线程和多线程竞争下测量；
+2. 接口开销：通过测试客户端请求 /api/chess/parse（零延迟的mock模型），
+   对比关闭准入控制与各后端下每个请求的平均耗时。
+
+redis后端需要通过 --redis-url 指定可用的实例。
+
+用法（在backend目录下执行）:
+    python -m benchmarks.bench_admission
+    python -m benchmarks.bench_admission --iterations 20000 --threads 8 --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import io
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# 1x1像素的PNG图片
+PNG_BYTES = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082'
+)
+
+
+def make_backend(name, tmpdir, redis_url):
+    from utils.admission import MemoryAdmissionBackend, RedisAdmissionBackend, SQLiteAdmissionBackend
+    if name == 'memory':
+        return MemoryAdmissionBackend()
+    if name == 'sqlite':
+        return SQLiteAdmissionBackend(os.path.join(tmpdir, f'admission_{time.time_ns()}.db'))
+    return RedisAdmissionBackend(redis_url, prefix=f'bench-admission-{time.time_ns()}:')
+
+
+def run_threads(threads, iterations, func):
+    """多线程执行 func(线程序号, 次数)，返回每次操作的平均耗时（微秒）"""
+    per_thread = iterations // threads
+    workers = [threading.Thread(target=func, args=(index, per_thread)) for index in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e6
+
+
+def measure_operations(backend, iterations, threads):
+    from utils.admission import AdmissionController
+
+    # 速率设得足够高，只测量扣减本身而不触发拒绝
+    controller = AdmissionController(backend, user_rate=1e9, user_burst=10 ** 9,
+                                     global_rate=1e9, global_burst=10 ** 9, max_concurrent=10 ** 6)
+
+    def take(index, count):
+        for i in range(count):
+            controller.check_rate(f'{index}-{i % 100}')
+
+    def slot(index, count):
+        for _ in range(count):
+            with controller.provider_slot('mock'):
+                pass
+
+    return run_threads(threads, iterations, take), run_threads(threads, iterations, slot)
+
+
+def measure_requests(app, token, requests):
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    def post():
+        response = client.post('/api/chess/parse', headers=headers,
+                               data={'file': (io.BytesIO(PNG_BYTES), 'board.png'), 'model': 'mock'},
+                               content_type='multipart/form-data')
+        if response.status_code != 200:
+            raise RuntimeError(f'请求失败: {response.status_code} {response.get_json()}')
+
+    for _ in range(20):
+        post()
+    start = time.perf_counter()
+    for _ in range(requests):
+        post()
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AI接口准入控制的开销测量')
+    parser.add_argument('--iterations', type=int, default=5000, help='每种操作的执行次数')
+    parser.add_argument('--threads', type=int, default=8, help='竞争测试的线程数')
+    parser.add_argument('--requests', type=int, default=500, help='每种配置的接口请求数')
+    parser.add_argument('--redis-url', help='Redis兼容实例地址，不指定则跳过redis后端')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ.update({
+        'DATABASE_URI': f"sqlite:///{os.path.join(tmpdir, 'admission_bench.db')}",
+        'DB_AUTO_UPGRADE': 'True',
+        'SECRET_KEY': 'bench-secret',
+        'JWT_SECRET_KEY': 'bench-jwt-secret',
+        'UPLOAD_FOLDER': os.path.join(tmpdir, 'uploads'),
+        'AI_ADMISSION_BACKEND': 'memory',
+        'LOG_LEVEL': 'WARNING',
+    })
+
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from models.db import db
+    from models.user import User
+    from utils.admission import AdmissionController
+    from utils.ai import register_provider
+
+    @register_provider('mock', 'json')
+    def parse_with_mock(image_path):
+        return '1.e4 e5'
+
+    app = create_app()
+    logging.disable(logging.WARNING)
+    backends = ['memory', 'sqlite'] + (['redis'] if args.redis_url else [])
+
+    print(f"{'后端':<8}{'扣减令牌(us)':>14}{f'x{args.threads}线程':>12}{'占用名额(us)':>14}{f'x{args.threads}线程':>12}")
+    for name in backends:
+        single = measure_operations(make_backend(name, tmpdir, args.redis_url), args.iterations, 1)
+        contended = measure_operations(make_backend(name, tmpdir, args.redis_url), args.iterations, args.threads)
+        print(f"{name:<8}{single[0]:>14.1f}{contended[0]:>12.1f}{single[1]:>14.1f}{contended[1]:>12.1f}")
+
+    with app.app_context():
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('bench-password')
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=str(user.id))
+
+    results = {}
+    for name in ['none'] + backends:
+        if name == 'none':
+            controller = AdmissionController(None)
+        else:
+            controller = AdmissionController(make_backend(name, tmpdir, args.redis_url), user_rate=1e9,
+                                             user_burst=10 ** 9, global_rate=1e9, global_burst=10 ** 9,
+                                             max_concurrent=100)
+        app.extensions['admission'] = controller
+        results[name] = measure_requests(app, token, args.requests)
+        print(f"接口测量完成: {name}", file=sys.stderr)
+
+    print(f"\n{'后端':<8}{'/parse请求(us)':>16}{'增加(us)':>10}")
+    for name, request_us in results.items():
+        print(f"{name:<8}{request_us:>16.1f}{request_us - results['none']:>+10.1f}")
+
+
+if __name__ == '__main__':
+    main()
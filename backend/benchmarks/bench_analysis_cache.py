@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分析结果缓存的基准测试
+
+生成一个棋谱库：每盘棋从几条常见开局中随机选一条，走完开局后随机走到指定步数，
+因此不同棋谱的前若干步大量重合。依次分析整个棋谱库：
+    no-cache - 不使用缓存，每个局面都搜索
+    cold     - 缓存为空，棋谱库内重复的局面（共同的开局）只搜索一次
+    warm     - 再次分析同一个棋谱库，全部命中缓存
+统计每种方式实际搜索的局面数、总耗时和每个局面的平均耗时。
+随后向缓存中填入 --entries 条随机条目，测量查找一盘棋全部局面的延迟和超过上限时的淘汰耗时。
+
+需要安装python-chess。在请求线程中搜索（workers=0），结果只反映搜索量的差别。
+
+用法（在backend目录下执行）:
+    python -m benchmarks.bench_analysis_cache
+    python -m benchmarks.bench_analysis_cache --games 200 --plies 24 --depth 3 --entries 500000
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+OPENINGS = [
+    'e4 e5 Nf3 Nc6 Bb5 a6 Ba4 Nf6 O-O Be7',
+    'e4 e5 Nf3 Nc6 Bc4 Bc5 c3 Nf6',
+    'e4 c5 Nf3 d6 d4 cxd4 Nxd4 Nf6 Nc3 a6',
+    'e4 e6 d4 d5 Nc3 Bb4',
+    'e4 c6 d4 d5 Nc3 dxe4 Nxe4 Bf5',
+    'd4 d5 c4 e6 Nc3 Nf6 Bg5 Be7',
+    'd4 Nf6 c4 g6 Nc3 Bg7 e4 d6',
+    'c4 e5 Nc3 Nf6 Nf3 Nc6',
+]
+
+
+def generate_library(games, plies, seed):
+    """生成棋谱库，返回每盘棋各局面的FEN列表"""
+    import chess
+    rng = random.Random(seed)
+    library = []
+    for _ in range(games):
+        board = chess.Board()
+        for san in rng.choice(OPENINGS).split():
+            board.push_san(san)
+        while board.ply() < plies and not board.is_game_over():
+            board.push(rng.choice(list(board.legal_moves)))
+        replay = chess.Board()
+        fens = [replay.fen()]
+        for move in board.move_stack:
+            replay.push(move)
+            fens.append(replay.fen())
+        library.append(fens)
+    return library
+
+
+def analyze_library(engine, library, depth):
+    """分析整个棋谱库，返回 (搜索的局面数, 耗时秒数)"""
+    import utils.engine
+    # 清空上一种方式留下的置换表，各方式都从空的置换表开始
+    utils.engine._searcher = None
+    searched = 0
+    start = time.perf_counter()
+    for fens in library:
+        searched += sum(1 for result in engine.analyze(fens, depth) if not result['cached'])
+    return searched, time.perf_counter() - start
+
+
+def fill_cache(db, entries, engine, seed):
+    """填入随机条目，使缓存表达到 entries 条"""
+    from models.analysis import AnalysisCacheEntry
+    rng = random.Random(seed)
+    table = AnalysisCacheEntry.__table__
+    now = datetime.utcnow()
+    result = json.dumps({'best_move': 'e2e4', 'best_move_san': 'e4', 'score_cp': 20, 'mate': None, 'pv': ['e4'],
+                         'nodes': 1000, 'time_ms': 10.0, 'nps': 100000, 'engine': engine})
+    with db.engine.begin() as conn:
+        count = conn.execute(db.select(db.func.count()).select_from(table)).scalar()
+        batch = []
+        for _ in range(max(0, entries - count)):
+            batch.append({'position_hash': rng.randint(-(1 << 63), (1 << 63) - 1), 'engine': engine, 'depth': 3,
+                          'target_depth': 3, 'movetime_ms': None, 'result': result, 'mate': None,
+                          'created_at': now, 'last_used_at': now - timedelta(seconds=rng.randint(60, 86400 * 30))})
+            if len(batch) >= 10000:
+                conn.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(table.insert(), batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分析结果缓存的基准测试')
+    parser.add_argument('--games', type=int, default=50, help='棋谱数')
+    parser.add_argument('--plies', type=int, default=20, help='每盘棋的半回合数')
+    parser.add_argument('--depth', type=int, default=3, help='搜索深度')
+    parser.add_argument('--entries', type=int, default=200000, help='测量查找延迟时缓存表的条目数')
+    parser.add_argument('--rounds', type=int, default=200, help='查找延迟的测量次数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='analysis-cache-bench-')
+    os.environ.update({
+        'DATABASE_URI': f"sqlite:///{os.path.join(tmpdir, 'analysis.db')}",
+        'DB_AUTO_UPGRADE': 'True',
+        'LOG_LEVEL': 'WARNING',
+        'SECRET_KEY': 'bench-secret',
+        'JWT_SECRET_KEY': 'bench-jwt-secret',
+        'UPLOAD_FOLDER': os.path.join(tmpdir, 'uploads'),
+        'UPLOAD_GC_INTERVAL': '0',
+        'ANALYSIS_WORKERS': '0',
+    })
+
+    from app import create_app
+    from models.db import db
+    from utils.analysis_cache import AnalysisCache, position_hash
+    from utils.engine import chess, AnalysisEngine, engine_version
+
+    if chess is None:
+        print('未安装python-chess，无法运行', file=sys.stderr)
+        sys.exit(1)
+
+    app = create_app()
+    logging.disable(logging.WARNING)
+    library = generate_library(args.games, args.plies, args.seed)
+    total = sum(len(fens) for fens in library)
+    unique = len({position_hash(chess.Board(fen)) for fens in library for fen in fens})
+
+    with app.app_context():
+        cache = AnalysisCache(db, max_entries=0)
+        print(f'\n棋谱库: {args.games} 盘，{total} 个局面（不同局面 {unique} 个），深度 {args.depth}')
+        print(f"{'方式':<10}{'搜索局面数':>10}{'耗时(s)':>10}{'每局面(ms)':>12}")
+        for label, engine in (
+            ('no-cache', AnalysisEngine(workers=0)),
+            ('cold', AnalysisEngine(workers=0, cache=cache)),
+            ('warm', AnalysisEngine(workers=0, cache=cache)),
+        ):
+            searched, elapsed = analyze_library(engine, library, args.depth)
+            print(f'{label:<10}{searched:>10}{elapsed:>10.2f}{elapsed / total * 1000:>12.2f}')
+
+        # 大缓存表上的查找延迟：每次查找一盘棋的全部局面
+        engine_name = engine_version()
+        print(f'\n填充缓存表到 {args.entries} 条...', file=sys.stderr)
+        fill_cache(db, args.entries, engine_name, args.seed)
+        hashes = [{position_hash(chess.Board(fen)) for fen in fens} for fens in library]
+        durations = []
+        for index in range(args.rounds):
+            start = time.perf_counter()
+            cache.lookup(hashes[index % len(hashes)], engine_name, args.depth, None)
+            durations.append((time.perf_counter() - start) * 1000)
+        durations.sort()
+        print(f'缓存 {args.entries} 条时查找一盘棋（{args.plies + 1} 个局面）: '
+              f'p50 {statistics.median(durations):.2f}ms, p99 {durations[int(len(durations) * 0.99) - 1]:.2f}ms')
+
+        cache.max_entries = args.entries // 2
+        start = time.perf_counter()
+        deleted = cache.evict()
+        print(f'淘汰到上限 {cache.max_entries} 的90%: 删除 {deleted} 条，耗时 {time.perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+棋谱识别接口的同步（gthread）与异步（uvicorn + asgi:app）入口对比
+
+用临时SQLite数据库分别启动 gunicorn benchmarks.mock_app:app（gthread）和
+benchmarks.mock_app:asgi_app（uvicorn worker），mock识别模型固定等待 --mock-latency 毫秒，
+模拟AI接口的响应时间。多个并发级别下持续请求 /api/chess/upload（AI_MODEL=mock），统计：
+    req/s     - 吞吐量
+    p50/p99   - 延迟
+    在途      - 吞吐量 x 模型延迟，即同时在等待模型返回的请求数
+    错误      - 非200响应或连接错误
+
+测试期间关闭限速和模型并发上限，只比较两种入口本身能同时挂起多少个请求。
+gthread的在途请求数受线程数限制；uvicorn等待模型期间不占用线程，只受模型和客户端限制。
+
+用法（在backend目录下执行，需安装uvicorn）:
+    python -m benchmarks.bench_async
+    python -m benchmarks.bench_async --concurrency 10 50 200 --mock-latency 1000 --threads 8 --duration 15
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_server import BACKEND_DIR, free_port, wait_for_port
+from benchmarks.load_test import PNG_BYTES, LoadClient
+
+MODES = {
+    'gthread': ('gthread', 'benchmarks.mock_app:app'),
+    'uvicorn': ('uvicorn', 'benchmarks.mock_app:asgi_app'),
+}
+
+
+def start_server(mode, port, env, args):
+    worker_class, entry = MODES[mode]
+    env = dict(env)
+    env.update({
+        'GUNICORN_WORKER_CLASS': worker_class,
+        'GUNICORN_WORKERS': str(args.workers),
+        'GUNICORN_THREADS': str(args.threads),
+        'ASGI_WSGI_THREADS': str(args.threads),
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'GUNICORN_ACCESS_LOG': '',
+        'GUNICORN_LOG_LEVEL': 'warning',
+        # 在途请求可能排队较久，避免worker被判定超时
+        'GUNICORN_TIMEOUT': '300',
+        # 等待时间过长的worker回收会影响结果
+        'GUNICORN_MAX_REQUESTS': '0',
+    })
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', entry],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    wait_for_port(port)
+    return process
+
+
+def login(port):
+    client = LoadClient(port)
+    account = {'username': 'async', 'email': 'async@example.com', 'password': 'async-password'}
+    client.request('POST', '/api/auth/register', account)
+    _, body = client.request('POST', '/api/auth/login', {'email': account['email'], 'password': account['password']})
+    return body['access_token']
+
+
+def pick(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000 if values else 0.0
+
+
+def run_load(port, token, concurrency, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        client = LoadClient(port, token)
+        client.conn.timeout = 300
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status, _ = client.upload('/api/chess/upload', 'board.png', PNG_BYTES)
+            except Exception:
+                status = 0
+                client = LoadClient(port, token)
+                client.conn.timeout = 300
+            # 只统计在测试时长内完成的请求
+            if time.perf_counter() > deadline:
+                break
+            if status == 200:
+                local.append(time.perf_counter() - start)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / duration,
+        'p50_ms': pick(latencies, 50),
+        'p99_ms': pick(latencies, 99),
+        'errors': errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='棋谱识别接口的同步与异步入口对比')
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES), help='测试的入口')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50, 200], help='依次测试的并发客户端数')
+    parser.add_argument('--duration', type=float, default=15, help='每个并发级别的测试时长（秒）')
+    parser.add_argument('--mock-latency', type=float, default=1000, help='mock识别模型的延迟（毫秒）')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn worker进程数')
+    parser.add_argument('--threads', type=int, default=8, help='gthread的线程数，也是uvicorn下执行同步代码的线程数')
+    parser.add_argument('--output', help='结果JSON的保存路径')
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env = dict(os.environ)
+            for key in ('OPENAI_API_KEY', 'GEMINI_API_KEY', 'ANTHROPIC_API_KEY'):
+                env.pop(key, None)
+            env.update({
+                'DATABASE_URI': f"sqlite:///{os.path.join(tmpdir, 'async.db')}",
+                'SECRET_KEY': 'bench-secret',
+                'JWT_SECRET_KEY': 'bench-jwt-secret',
+                'FLASK_DEBUG': 'False',
+                'DB_AUTO_UPGRADE': 'True',
+                'LOG_LEVEL': 'WARNING',
+                'UPLOAD_FOLDER': os.path.join(tmpdir, 'uploads'),
+                'GUNICORN_PID_FILE': os.path.join(tmpdir, 'gunicorn.pid'),
+                'AI_MODEL': 'mock',
+                'MOCK_PROVIDER_LATENCY_MS': str(args.mock_latency),
+                'AI_ADMISSION_SQLITE_PATH': os.path.join(tmpdir, 'admission.db'),
+                'AI_RATE_LIMIT_USER': '0',
+                'AI_RATE_LIMIT_GLOBAL': '0',
+                'AI_MAX_CONCURRENT': '0',
+                'PYTHONPATH': BACKEND_DIR,
+            })
+            port = free_port()
+            process = start_server(mode, port, env, args)
+            try:
+                token = login(port)
+                for concurrency in args.concurrency:
+                    print(f'{mode}: 并发 {concurrency}...', file=sys.stderr)
+                    results[(mode, concurrency)] = run_load(port, token, concurrency, args.duration)
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait(timeout=60)
+
+    latency_s = args.mock_latency / 1000
+    print(f"\nCPU核心数: {os.cpu_count()}, worker: {args.workers}, 线程: {args.threads}, 模型延迟: {args.mock_latency:.0f}ms")
+    print(f"{'入口':<9}{'并发':>6}{'请求数':>8}{'req/s':>9}{'p50(ms)':>10}{'p99(ms)':>10}{'在途':>8}{'错误':>6}")
+    for (mode, concurrency), result in results.items():
+        print(f"{mode:<9}{concurrency:>6}{result['requests']:>8}{result['rps']:>9.1f}{result['p50_ms']:>10.0f}"
+              f"{result['p99_ms']:>10.0f}{result['rps'] * latency_s:>8.1f}{result['errors']:>6}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump([{'mode': mode, 'concurrency': concurrency, **result}
+                       for (mode, concurrency), result in results.items()], f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+头像处理流水线的耗时和体积测量
+
+对一张手机照片大小的图片（默认生成 3024x4032 的带噪点JPEG，也可用 --image 指定真实照片）
+执行头像处理，输出处理耗时，以及每种尺寸和格式相对原图的字节数和缩小倍数。
+页面上的头像显示尺寸为32~80像素，在2倍屏上实际加载64或128像素的变体。
+
+用法（在backend目录下执行）:
+    python -m benchmarks.bench_avatar
+    python -m benchmarks.bench_avatar --image ~/Pictures/photo.jpg --repeat 10
+"""
+
+import argparse
+import io
+import statistics
+import tempfile
+import time
+
+from PIL import Image
+
+
+def sample_photo(width, height, seed=42):
+    """生成近似照片的JPEG：渐变背景叠加噪点，带EXIF方向信息"""
+    noise = [Image.effect_noise((width, height), 40 + index * 10) for index in range(3)]
+    gradient = Image.linear_gradient('L').resize((width, height))
+    channels = [Image.blend(gradient, layer, 0.5) for layer in noise]
+    image = Image.merge('RGB', channels)
+    exif = Image.Exif()
+    exif[0x0112] = 6  # 需要旋转90度
+    exif[0x010F] = 'BenchCamera'
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=92, exif=exif)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='头像处理流水线的耗时和体积测量')
+    parser.add_argument('--image', help='使用指定的图片文件')
+    parser.add_argument('--width', type=int, default=3024, help='生成图片的宽度')
+    parser.add_argument('--height', type=int, default=4032, help='生成图片的高度')
+    parser.add_argument('--repeat', type=int, default=5, help='处理次数')
+    args = parser.parse_args()
+
+    from utils.avatar import process_avatar
+
+    if args.image:
+        with open(args.image, 'rb') as f:
+            data = f.read()
+    else:
+        data = sample_photo(args.width, args.height)
+
+    timings = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for index in range(args.repeat):
+            # 每次写入新目录，避免命中“文件已存在”而跳过编码
+            start = time.perf_counter()
+            _, written = process_avatar(data, f'{tmpdir}/{index}')
+            timings.append((time.perf_counter() - start) * 1000)
+
+    with Image.open(io.BytesIO(data)) as image:
+        print(f"原图: {image.format} {image.width}x{image.height}, {len(data)} 字节")
+    print(f"处理耗时: 中位 {statistics.median(timings):.1f}ms, 最大 {max(timings):.1f}ms（{args.repeat}次）\n")
+    print(f"{'尺寸':>6}{'WebP字节':>10}{'缩小倍数':>10}{'JPEG字节':>10}{'缩小倍数':>10}")
+    for size in sorted(written):
+        webp, jpeg = written[size]['webp'], written[size]['jpeg']
+        print(f"{size:>6}{webp:>10}{len(data) / webp:>10.0f}{jpeg:>10}{len(data) / jpeg:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
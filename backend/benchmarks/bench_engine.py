@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+棋局分析引擎基准测试
+
+1. 搜索器对比：在几个典型局面上分别打开/关闭走法排序和置换表，搜索到相同深度，
+   统计搜索节点数、耗时和每秒节点数（nps），反映剪枝效果；
+2. 吞吐对比：把一盘棋的全部局面交给 AnalysisEngine，分别在请求线程中直接搜索（workers=0）
+   和用不同大小的进程池并行搜索，统计整盘分析耗时和总吞吐（节点/秒）。
+
+需要安装python-chess。
+
+用法（在backend目录下执行）:
+    python -m benchmarks.bench_engine
+    python -m benchmarks.bench_engine --depth 4 --workers 0 1 2 4
+
+多进程的吞吐提升取决于可用的CPU核心数，单核机器上进程池与直接搜索相当。
+"""
+
+import argparse
+import sys
+import time
+
+from utils.engine import chess, Searcher, AnalysisEngine
+
+POSITIONS = {
+    'opening': 'r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3',
+    'middlegame': 'r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP3PPP/R2QKB1R w KQ - 0 9',
+    'tactics': 'r1b1kbnr/pppp1ppp/8/4N1q1/2BnP3/8/PPPP1PPP/RNBQK2R w KQkq - 1 5',
+    'endgame': '8/5pk1/6p1/3P4/1p6/1P3KP1/8/8 w - - 0 1',
+}
+
+GAME = ('e4 e5 Nf3 Nc6 Bb5 a6 Ba4 Nf6 O-O Be7 Re1 b5 Bb3 d6 c3 O-O h3 Nb8 d4 Nbd7 '
+        'c4 c6 cxb5 axb5 Nc3 Bb7 Bg5 b4 Nb1 h6 Bh4 c5 dxe5 Nxe4 Bxe7 Qxe7')
+
+VARIANTS = [
+    ('排序+置换表', True, True),
+    ('仅排序', True, False),
+    ('仅置换表', False, True),
+    ('都不用', False, False),
+]
+
+
+def bench_search(depth):
+    print(f'\n搜索器对比（深度 {depth}）')
+    print(f"{'局面':<12}{'配置':<10}{'节点数':>10}{'耗时(ms)':>11}{'nps':>9}")
+    for name, fen in POSITIONS.items():
+        for label, ordering, use_tt in VARIANTS:
+            searcher = Searcher(ordering=ordering, use_tt=use_tt)
+            board = chess.Board(fen)
+            start = time.perf_counter()
+            searcher.search(board, depth)
+            elapsed = time.perf_counter() - start
+            print(f'{name:<12}{label:<10}{searcher.nodes:>10}{elapsed * 1000:>11.1f}{int(searcher.nodes / elapsed):>9}')
+
+
+def game_fens():
+    board = chess.Board()
+    fens = [board.fen()]
+    for san in GAME.split():
+        board.push_san(san)
+        fens.append(board.fen())
+    return fens
+
+
+def bench_throughput(depth, workers_list):
+    fens = game_fens()
+    print(f'\n整盘分析吞吐（{len(fens)} 个局面，深度 {depth}）')
+    print(f"{'进程数':<8}{'耗时(s)':>9}{'节点数':>10}{'吞吐(节点/s)':>14}")
+    for workers in workers_list:
+        engine = AnalysisEngine(workers=workers, max_pending=1, queue_timeout=60)
+        try:
+            if workers > 0:
+                # 预热：进程池启动和子进程导入python-chess不计入耗时
+                engine.analyze(fens[:workers], 1)
+            start = time.perf_counter()
+            results = engine.analyze(fens, depth)
+            elapsed = time.perf_counter() - start
+        finally:
+            engine.shutdown()
+        nodes = sum(result['nodes'] for result in results)
+        print(f'{workers:<8}{elapsed:>9.2f}{nodes:>10}{int(nodes / elapsed):>14}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='棋局分析引擎基准测试')
+    parser.add_argument('--depth', type=int, default=3, help='搜索深度')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4], help='分析进程数，0表示在当前线程中搜索')
+    parser.add_argument('--skip-search', action='store_true', help='跳过搜索器对比')
+    args = parser.parse_args()
+
+    if chess is None:
+        print('未安装python-chess，无法运行', file=sys.stderr)
+        sys.exit(1)
+    if not args.skip_search:
+        bench_search(args.depth)
+    bench_throughput(args.depth, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+JSON编码与响应压缩基准测试
+
+对比标准库JSON提供者和orjson提供者生成列表响应的耗时，
+以及不同压缩算法下的传输字节数和压缩耗时。
+
+用法（在backend目录下执行）:
+    python -m benchmarks.bench_json
+    python -m benchmarks.bench_json --sizes 10 100 500 --iterations 500
+"""
+
+import argparse
+import gzip
+import time
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from benchmarks.sample_data import sample_list_response
+from utils.json_provider import OrjsonProvider, orjson
+from utils.compression import brotli
+
+
+def time_call(func, iterations):
+    """返回单次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_encode(app, payload, iterations):
+    results = {}
+    providers = {'stdlib': DefaultJSONProvider(app)}
+    if orjson is not None:
+        providers['orjson'] = OrjsonProvider(app)
+
+    with app.app_context():
+        for name, provider in providers.items():
+            results[name] = time_call(lambda: provider.response(payload).get_data(), iterations)
+    return results
+
+
+def bench_compress(body, iterations):
+    results = {'identity': (len(body), 0.0)}
+    for level in (1, 6):
+        compressed = gzip.compress(body, compresslevel=level)
+        results[f'gzip-{level}'] = (
+            len(compressed),
+            time_call(lambda: gzip.compress(body, compresslevel=level), iterations)
+        )
+    if brotli is not None:
+        for quality in (4, 11):
+            compressed = brotli.compress(body, quality=quality)
+            # 最高质量的brotli很慢，减少迭代次数
+            rounds = iterations if quality < 11 else max(1, iterations // 20)
+            results[f'br-{quality}'] = (
+                len(compressed),
+                time_call(lambda: brotli.compress(body, quality=quality), rounds)
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON编码与响应压缩基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200], help='每页棋谱条数')
+    parser.add_argument('--iterations', type=int, default=200, help='每项测试的迭代次数')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+
+    for size in args.sizes:
+        payload = sample_list_response(size)
+        print(f"\n===== 列表响应: {size} 条棋谱 =====")
+
+        encode = bench_encode(app, payload, args.iterations)
+        print(f"{'提供者':<12}{'编码耗时(us)':>16}")
+        for name, micros in encode.items():
+            print(f"{name:<12}{micros:>16.1f}")
+        if 'orjson' in encode:
+            print(f"orjson加速比: {encode['stdlib'] / encode['orjson']:.1f}x")
+
+        with app.app_context():
+            body = DefaultJSONProvider(app).response(payload).get_data()
+        print(f"\n{'编码':<12}{'字节数':>12}{'压缩率':>10}{'压缩耗时(us)':>16}")
+        for name, (size_bytes, micros) in bench_compress(body, args.iterations).items():
+            ratio = size_bytes / len(body)
+            print(f"{name:<12}{size_bytes:>12}{ratio:>10.1%}{micros:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
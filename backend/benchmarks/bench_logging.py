@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+请求热路径上的日志开销测量
+
+在独立子进程中用测试客户端反复请求棋谱列表接口，对比不同日志配置下每个请求的平均耗时：
+    off         - 完全关闭日志，作为基线
+    info        - INFO级别（生产默认）
+    debug-s0    - DEBUG级别，请求详情采样率为0
+    debug-async - DEBUG级别，全量采样，队列异步输出
+    debug-sync  - DEBUG级别，全量采样，请求线程同步输出
+
+用法（在backend目录下执行）:
+    python -m benchmarks.bench_logging
+    python -m benchmarks.bench_logging --requests 5000 --rounds 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    'off': {'LOG_LEVEL': 'CRITICAL', 'BENCH_DISABLE_LOGGING': '1'},
+    'info': {'LOG_LEVEL': 'INFO'},
+    'debug-s0': {'FLASK_DEBUG': 'True', 'LOG_SAMPLE_RATE': '0'},
+    'debug-async': {'FLASK_DEBUG': 'True', 'LOG_SAMPLE_RATE': '1', 'LOG_REQUEST_BODIES': 'True'},
+    'debug-sync': {'FLASK_DEBUG': 'True', 'LOG_SAMPLE_RATE': '1', 'LOG_REQUEST_BODIES': 'True', 'LOG_ASYNC': 'False'},
+}
+
+# 在子进程中执行的测量代码
+PROBE = r'''
+import json, logging, os, sys, time
+from app import create_app
+app = create_app()
+if os.getenv('BENCH_DISABLE_LOGGING'):
+    logging.disable(logging.CRITICAL)
+client = app.test_client()
+user = {'username': 'bench', 'email': 'bench@example.com', 'password': 'bench-password'}
+client.post('/api/auth/register', json=user)
+token = client.post('/api/auth/login', json=user).json['access_token']
+headers = {'Authorization': 'Bearer ' + token}
+client.post('/api/chess/notations', json={'title': 'bench', 'moves': '1.e4 e5'}, headers=headers)
+for _ in range(100):
+    client.get('/api/chess/notations', headers=headers)
+start = time.perf_counter()
+for _ in range(int(sys.argv[1])):
+    client.get('/api/chess/notations?page=1&size=10', headers=headers)
+elapsed = time.perf_counter() - start
+print(json.dumps({'us_per_request': elapsed / int(sys.argv[1]) * 1e6}), file=sys.__stdout__)
+'''
+
+
+def run_scenario(name, overrides, requests, tmpdir):
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URI': f"sqlite:///{os.path.join(tmpdir, name + '.db')}",
+        'SECRET_KEY': 'bench-secret',
+        'JWT_SECRET_KEY': 'bench-jwt-secret',
+        'DB_AUTO_UPGRADE': 'True',
+        'FLASK_DEBUG': 'False',
+        'UPLOAD_FOLDER': os.path.join(tmpdir, 'uploads'),
+        'PYTHONPATH': BACKEND_DIR,
+    })
+    env.update(overrides)
+    # 日志写入临时文件，模拟生产环境将标准错误重定向到文件
+    with open(os.path.join(tmpdir, name + '.log'), 'w') as log_file:
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE, str(requests)], cwd=BACKEND_DIR, env=env,
+            stdout=subprocess.PIPE, stderr=log_file, text=True, check=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])['us_per_request']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='请求热路径上的日志开销测量')
+    parser.add_argument('--requests', type=int, default=2000, help='每种配置的请求数')
+    parser.add_argument('--rounds', type=int, default=3, help='轮数，各配置交替执行并取最小值以减少噪声')
+    args = parser.parse_args()
+
+    results = {}
+    for round_index in range(args.rounds):
+        for name, overrides in SCENARIOS.items():
+            with tempfile.TemporaryDirectory() as tmpdir:
+                micros = run_scenario(name, overrides, args.requests, tmpdir)
+            results[name] = min(results.get(name, micros), micros)
+
+    baseline = results['off']
+    print(f"{'配置':<14}{'每请求耗时(us)':>16}{'相对基线':>12}")
+    for name, micros in results.items():
+        print(f"{name:<14}{micros:>16.1f}{(micros - baseline) / baseline:>+12.1%}")
+
+
+if __name__ == '__main__':
+    main()
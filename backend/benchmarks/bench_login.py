@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+登录吞吐量基准测试
+
+对每种密码哈希配置（算法 × 哈希进程数）分别用临时SQLite数据库启动 gunicorn wsgi:app，
+注册一批用户后并发请求登录接口，统计：
+    req/s        - 登录吞吐量
+    req/CPU-s    - 每消耗一个CPU秒完成的登录数，即每个核心跑满时的登录吞吐量
+                   （读取 /proc 统计服务进程及其哈希子进程的CPU时间，仅Linux）
+    p50/p99      - 登录延迟
+    probe p50/99 - 登录高峰期间另一个客户端请求 /api/auth/me 的延迟，
+                   反映哈希计算对同一worker中其他请求的影响
+
+哈希进程数为0表示在请求线程中直接计算（改造前的行为）。
+
+用法（在backend目录下执行）:
+    python -m benchmarks.bench_login
+    python -m benchmarks.bench_login --algorithms pbkdf2 scrypt argon2 --hash-workers 0 1 2 --concurrency 16
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_server import BACKEND_DIR, Client, free_port, wait_for_port
+
+PASSWORD = 'bench-password'
+
+
+def process_tree_cpu(pid):
+    """返回进程及其所有子孙进程累计的CPU秒数，无法读取 /proc 时返回None"""
+    if not os.path.isdir('/proc'):
+        return None
+    stats, children = {}, {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                # 进程名可能包含空格，从最后一个右括号之后开始解析
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        ppid, utime, stime = int(fields[1]), int(fields[11]), int(fields[12])
+        stats[int(name)] = utime + stime
+        children.setdefault(ppid, []).append(int(name))
+
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        total += stats.get(current, 0)
+        pending.extend(children.get(current, []))
+    return total / os.sysconf('SC_CLK_TCK')
+
+
+def start_server(port, env, args):
+    env = dict(env)
+    env.update({
+        'GUNICORN_WORKER_CLASS': 'gthread',
+        'GUNICORN_WORKERS': str(args.workers),
+        'GUNICORN_THREADS': str(args.threads),
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'GUNICORN_ACCESS_LOG': '',
+        'GUNICORN_LOG_LEVEL': 'warning',
+    })
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    wait_for_port(port)
+    return process
+
+
+def seed(port, users):
+    """注册测试用户，返回登录请求体列表"""
+    accounts = []
+    client = Client(port)
+    for index in range(users):
+        account = {'username': f'login{index}', 'email': f'login{index}@example.com', 'password': PASSWORD}
+        status, _ = client.request('POST', '/api/auth/register', account)
+        if status != 201:
+            raise RuntimeError(f'注册测试用户失败: {status}')
+        accounts.append({'email': account['email'], 'password': PASSWORD})
+    return accounts
+
+
+def pick(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000 if values else 0.0
+
+
+def run_load(port, accounts, args):
+    latencies, probes = [], []
+    errors = [0]
+    lock = threading.Lock()
+    stop = threading.Event()
+    deadline = time.perf_counter() + args.duration
+
+    def worker(index):
+        client = Client(port)
+        local, count = [], index
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status, _ = client.request('POST', '/api/auth/login', accounts[count % len(accounts)])
+            except Exception:
+                status = 0
+                client = Client(port)
+            local.append(time.perf_counter() - start)
+            count += 1
+            if status != 200:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    def probe(token):
+        client = Client(port, token)
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.request('GET', '/api/auth/me')
+            probes.append(time.perf_counter() - start)
+            time.sleep(0.02)
+
+    _, body = Client(port).request('POST', '/api/auth/login', accounts[0])
+    probe_thread = threading.Thread(target=probe, args=(body['access_token'],))
+    probe_thread.start()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stop.set()
+    probe_thread.join()
+
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / args.duration,
+        'p50_ms': pick(latencies, 50),
+        'p99_ms': pick(latencies, 99),
+        'probe_p50_ms': pick(probes, 50),
+        'probe_p99_ms': pick(probes, 99),
+        'errors': errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='登录吞吐量基准测试')
+    parser.add_argument('--algorithms', nargs='+', default=['pbkdf2', 'scrypt'], help='测试的哈希算法（argon2需安装argon2-cffi）')
+    parser.add_argument('--hash-workers', type=int, nargs='+', default=[0, 1, 2], help='每个worker的哈希进程数，0表示在请求线程中计算')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn worker进程数')
+    parser.add_argument('--threads', type=int, default=8, help='每个worker的线程数')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发登录客户端数')
+    parser.add_argument('--duration', type=float, default=10, help='每种配置的测试时长（秒）')
+    parser.add_argument('--users', type=int, default=20, help='测试用户数')
+    args = parser.parse_args()
+
+    results = {}
+    for algorithm in args.algorithms:
+        for hash_workers in args.hash_workers:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                env = dict(os.environ)
+                env.update({
+                    'DATABASE_URI': f"sqlite:///{os.path.join(tmpdir, 'login.db')}",
+                    'SECRET_KEY': 'bench-secret',
+                    'JWT_SECRET_KEY': 'bench-jwt-secret',
+                    'FLASK_DEBUG': 'False',
+                    'DB_AUTO_UPGRADE': 'True',
+                    'LOG_LEVEL': 'WARNING',
+                    'UPLOAD_FOLDER': os.path.join(tmpdir, 'uploads'),
+                    'GUNICORN_PID_FILE': os.path.join(tmpdir, 'gunicorn.pid'),
+                    'PASSWORD_HASH_ALGORITHM': algorithm,
+                    'PASSWORD_HASH_WORKERS': str(hash_workers),
+                    'PASSWORD_HASH_QUEUE_TIMEOUT': '30',
+                    # 多worker时memory后端不共享，gunicorn.conf.py 会拒绝启动；登录测试不依赖Redis
+                    'NOTATION_CACHE_BACKEND': 'memory' if args.workers == 1 else 'none',
+                    'USER_CACHE_BACKEND': 'memory' if args.workers == 1 else 'none',
+                })
+                port = free_port()
+                process = start_server(port, env, args)
+                try:
+                    print(f'{algorithm} / 哈希进程数 {hash_workers}: 注册 {args.users} 个用户...', file=sys.stderr)
+                    accounts = seed(port, args.users)
+                    cpu_before = process_tree_cpu(process.pid)
+                    result = run_load(port, accounts, args)
+                    cpu_after = process_tree_cpu(process.pid)
+                    cpu_seconds = cpu_after - cpu_before if cpu_before is not None else None
+                    result['cpu_s'] = cpu_seconds
+                    result['per_cpu_s'] = result['requests'] / cpu_seconds if cpu_seconds else None
+                    results[(algorithm, hash_workers)] = result
+                finally:
+                    process.send_signal(signal.SIGTERM)
+                    process.wait(timeout=60)
+
+    print(f"\nCPU核心数: {os.cpu_count()}, gunicorn worker: {args.workers} x {args.threads}线程, 并发: {args.concurrency}")
+    print(f"{'算法':<8}{'哈希进程':>8}{'请求数':>8}{'req/s':>9}{'req/CPU-s':>11}{'p50(ms)':>10}{'p99(ms)':>10}"
+          f"{'probe p50':>11}{'probe p99':>11}{'错误':>6}")
+    for (algorithm, hash_workers), result in results.items():
+        per_cpu = f"{result['per_cpu_s']:>11.1f}" if result['per_cpu_s'] else f"{'-':>11}"
+        print(f"{algorithm:<8}{hash_workers:>8}{result['requests']:>8}{result['rps']:>9.1f}{per_cpu}"
+              f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+              f"{result['probe_p50_ms']:>11.1f}{result['probe_p99_ms']:>11.1f}{result['errors']:>6}")
+
+
+if __name__ == '__main__':
+    main()
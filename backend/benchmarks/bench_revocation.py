@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+令牌撤销检查的开销测量
+
+在临时SQLite数据库中预置一批撤销记录，对比三种模式下单次检查的耗时和内存副本大小：
+    direct - 每次检查都查询数据库
+    set    - 内存中保存全部撤销记录（默认）
+    bloom  - 内存中只保存布隆过滤器，命中时回源确认
+并通过测试客户端请求 /api/auth/me，测量每个已认证请求因撤销检查增加的耗时。
+
+用法（在backend目录下执行）:
+    python -m benchmarks.bench_revocation
+    python -m benchmarks.bench_revocation --revoked 1000000 --checks 200000
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+
+class NoRevocation:
+    """不做任何检查，作为基线"""
+
+    def is_revoked(self, payload):
+        return False
+
+
+def populate(db, count, user_count):
+    """批量写入撤销记录，返回其中一部分jti用于命中测试"""
+    from datetime import datetime, timedelta
+    from models.token import RevokedToken
+
+    now = datetime.utcnow()
+    sample = []
+    batch = []
+    for index in range(count):
+        jti = str(uuid.uuid4())
+        if index % max(1, count // 1000) == 0:
+            sample.append(jti)
+        batch.append({
+            'key': f'jti:{jti}',
+            'user_id': index % user_count + 1,
+            'revoked_at': now - timedelta(seconds=index % 3600),
+            'expires_at': now + timedelta(days=1),
+        })
+        if len(batch) >= 10000:
+            db.session.execute(db.insert(RevokedToken), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(RevokedToken), batch)
+    db.session.commit()
+    return sample
+
+
+def measure_checks(store, payloads):
+    """返回每次检查的平均耗时（微秒）"""
+    store.is_revoked(payloads[0])
+    start = time.perf_counter()
+    for payload in payloads:
+        store.is_revoked(payload)
+    return (time.perf_counter() - start) / len(payloads) * 1e6
+
+
+def measure_memory(store, payload):
+    """测量首次同步（全量加载）后内存副本占用的字节数"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    store.is_revoked(payload)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+
+def measure_requests(client, headers, requests):
+    """返回 /api/auth/me 的平均耗时（微秒）"""
+    for _ in range(50):
+        client.get('/api/auth/me', headers=headers)
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get('/api/auth/me', headers=headers)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='令牌撤销检查的开销测量')
+    parser.add_argument('--revoked', type=int, default=100000, help='预置的撤销记录数')
+    parser.add_argument('--checks', type=int, default=50000, help='每种模式的检查次数')
+    parser.add_argument('--requests', type=int, default=2000, help='每种模式的接口请求数')
+    parser.add_argument('--revoked-ratio', type=float, default=0.01, help='检查中已撤销令牌的比例')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ.update({
+        'DATABASE_URI': f"sqlite:///{os.path.join(tmpdir, 'revocation.db')}",
+        'DB_AUTO_UPGRADE': 'True',
+        'SECRET_KEY': 'bench-secret',
+        'JWT_SECRET_KEY': 'bench-jwt-secret',
+        'UPLOAD_FOLDER': os.path.join(tmpdir, 'uploads'),
+        'LOG_LEVEL': 'WARNING',
+    })
+
+    from flask_jwt_extended import create_access_token, decode_token
+    from app import create_app
+    from models.db import db
+    from models.user import User
+    from utils.revocation import DatabaseRevocationBackend, RevocationStore
+
+    app = create_app()
+    logging.disable(logging.WARNING)
+    rng = random.Random(42)
+
+    with app.app_context():
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('bench-password')
+        db.session.add(user)
+        db.session.commit()
+
+        start = time.perf_counter()
+        revoked_sample = populate(db, args.revoked, 1000)
+        print(f"预置 {args.revoked} 条撤销记录，耗时 {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+        token = create_access_token(identity=str(user.id))
+        payload = decode_token(token)
+        payloads = []
+        for _ in range(args.checks):
+            jti = rng.choice(revoked_sample) if rng.random() < args.revoked_ratio else str(uuid.uuid4())
+            payloads.append(dict(payload, jti=jti))
+
+        modes = {
+            'none': lambda: NoRevocation(),
+            'direct': lambda: RevocationStore(DatabaseRevocationBackend(db), local=False),
+            'set': lambda: RevocationStore(DatabaseRevocationBackend(db)),
+            'bloom': lambda: RevocationStore(DatabaseRevocationBackend(db), bloom=True,
+                                             bloom_capacity=args.revoked),
+        }
+
+        results = {}
+        for name, factory in modes.items():
+            store = factory()
+            memory = measure_memory(store, payloads[0]) if name in ('set', 'bloom') else 0
+            check_us = measure_checks(store, payloads) if name != 'none' else 0.0
+            app.extensions['revocation_store'] = store
+            request_us = measure_requests(app.test_client(), {'Authorization': f'Bearer {token}'}, args.requests)
+            results[name] = (check_us, request_us, memory, store)
+
+    baseline = results['none'][1]
+    print(f"\n{'模式':<8}{'单次检查(us)':>14}{'/me请求(us)':>14}{'增加(us)':>10}{'内存副本(KB)':>14}{'回源次数':>10}")
+    for name, (check_us, request_us, memory, store) in results.items():
+        lookups = store.backend_lookups if hasattr(store, 'backend_lookups') else 0
+        print(f"{name:<8}{check_us:>14.2f}{request_us:>14.1f}{request_us - baseline:>+10.1f}"
+              f"{memory / 1024:>14.0f}{lookups:>10}")
+
+
+if __name__ == '__main__':
+    main()
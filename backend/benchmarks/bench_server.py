@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Gunicorn worker模式吞吐量基准测试
+
+依次以 sync、gthread、gevent 三种worker启动 wsgi:app（使用临时SQLite数据库），
+并发请求棋谱列表和详情接口，对比吞吐量和延迟。
+
+用法（在backend目录下执行）:
+    python -m benchmarks.bench_server
+    python -m benchmarks.bench_server --modes sync gthread --concurrency 32 --duration 15
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Client:
+    """基于http.client的简单客户端，每个线程复用一个长连接"""
+
+    def __init__(self, port, token=None):
+        self.port = port
+        self.token = token
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def request(self, method, path, body=None):
+        headers = {}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        payload = None
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+            payload = json.dumps(body)
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            # 连接被服务器关闭（如worker回收）时重连一次
+            self.conn.close()
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+        data = response.read()
+        return response.status, json.loads(data) if data else None
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"服务器未能在{timeout}秒内启动")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, env, args):
+    env = dict(env)
+    env.update({
+        'GUNICORN_WORKER_CLASS': mode,
+        'GUNICORN_WORKERS': str(args.workers),
+        'GUNICORN_THREADS': str(args.threads),
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'GUNICORN_ACCESS_LOG': '',
+        'GUNICORN_LOG_LEVEL': 'warning',
+    })
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    wait_for_port(port)
+    return process
+
+
+def seed(port, notations):
+    """注册测试用户并批量创建棋谱，返回访问令牌和棋谱ID列表"""
+    client = Client(port)
+    user = {'username': 'bench', 'email': 'bench@example.com', 'password': 'bench-password'}
+    client.request('POST', '/api/auth/register', user)
+    _, body = client.request('POST', '/api/auth/login', {'email': user['email'], 'password': user['password']})
+    client.token = body['access_token']
+
+    from benchmarks.sample_data import sample_list_response
+    items = [
+        {key: item[key] for key in ('title', 'description', 'moves', 'difficulty', 'tags')}
+        for item in sample_list_response(notations)['data']['data']
+    ]
+    _, body = client.request('POST', '/api/chess/notations/batch', {'items': items})
+    ids = [result['id'] for result in body['data']['results']]
+    return client.token, ids
+
+
+def run_load(port, token, ids, args):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def worker(index):
+        client = Client(port, token)
+        local, count = [], index
+        while time.perf_counter() < deadline:
+            # 列表和详情请求交替进行
+            if count % 2 == 0:
+                path = f'/api/chess/notations?page={count % 5 + 1}&size=10'
+            else:
+                path = f'/api/chess/notations/{ids[count % len(ids)]}'
+            count += 1
+            start = time.perf_counter()
+            try:
+                status, _ = client.request('GET', path)
+            except Exception:
+                status = 0
+            local.append(time.perf_counter() - start)
+            if status != 200:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    pick = lambda pct: latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))] * 1000 if latencies else 0.0
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / args.duration,
+        'p50_ms': pick(50),
+        'p99_ms': pick(99),
+        'errors': errors[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gunicorn worker模式吞吐量基准测试')
+    parser.add_argument('--modes', nargs='+', default=['sync', 'gthread', 'gevent'], help='待测试的worker类型')
+    parser.add_argument('--workers', type=int, default=2, help='worker进程数')
+    parser.add_argument('--threads', type=int, default=4, help='gthread每个worker的线程数')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发客户端数')
+    parser.add_argument('--duration', type=float, default=10, help='每种模式的测试时长（秒）')
+    parser.add_argument('--notations', type=int, default=200, help='预置棋谱数')
+    parser.add_argument('--cache', action='store_true', help='开启棋谱查询缓存（默认关闭以测量数据库路径；多worker时需要Redis）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = dict(os.environ)
+        env.update({
+            'DATABASE_URI': f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+            'SECRET_KEY': 'bench-secret',
+            'JWT_SECRET_KEY': 'bench-jwt-secret',
+            'FLASK_DEBUG': 'False',
+            'DB_AUTO_UPGRADE': 'True',
+            'UPLOAD_FOLDER': os.path.join(tmpdir, 'uploads'),
+            'GUNICORN_PID_FILE': os.path.join(tmpdir, 'gunicorn.pid'),
+            # 多worker时memory后端不共享，gunicorn.conf.py 会拒绝启动
+            'NOTATION_CACHE_BACKEND': ('memory' if args.workers == 1 else 'redis') if args.cache else 'none',
+            'USER_CACHE_BACKEND': 'memory' if args.workers == 1 else 'none',
+        })
+
+        token, ids, results = None, None, {}
+        for mode in args.modes:
+            port = free_port()
+            process = start_server(mode, port, env, args)
+            try:
+                if token is None:
+                    token, ids = seed(port, args.notations)
+                # 预热
+                warmup = Client(port, token)
+                for notation_id in ids[:20]:
+                    warmup.request('GET', f'/api/chess/notations/{notation_id}')
+                results[mode] = run_load(port, token, ids, args)
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait(timeout=60)
+
+    print(f"\n{'worker':<10}{'请求数':>10}{'req/s':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'错误':>8}")
+    for mode, result in results.items():
+        print(f"{mode:<10}{result['requests']:>10}{result['rps']:>10.1f}"
+              f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
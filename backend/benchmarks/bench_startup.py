@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+应用冷启动时间和内存占用测量
+
+在全新的子进程中执行 create_app()，记录耗时、常驻内存（RSS）和已加载的AI SDK。
+--eager 模式在创建应用前先导入全部AI SDK，模拟改为按需加载之前的行为，便于对比。
+
+用法（在backend目录下执行）:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SDK_MODULES = ['openai', 'google.generativeai', 'anthropic']
+
+# 在子进程中执行的测量代码
+PROBE = r'''
+import importlib, json, logging, sys, time
+start = time.perf_counter()
+for name in {eager}:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+from app import create_app
+logging.disable(logging.CRITICAL)
+app = create_app()
+elapsed = time.perf_counter() - start
+
+rss_kb = 0
+try:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                rss_kb = int(line.split()[1])
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss_kb //= 1024
+
+print(json.dumps({{
+    'seconds': elapsed,
+    'rss_mb': rss_kb / 1024,
+    'modules': len(sys.modules),
+    'sdks': [name for name in {sdks} if name in sys.modules],
+}}))
+'''
+
+
+def measure(eager, env):
+    code = PROBE.format(eager=SDK_MODULES if eager else [], sdks=SDK_MODULES)
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='应用冷启动时间和内存占用测量')
+    parser.add_argument('--runs', type=int, default=3, help='每种模式的重复次数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = dict(os.environ)
+        env.update({
+            'DATABASE_URI': f"sqlite:///{os.path.join(tmpdir, 'startup.db')}",
+            'SECRET_KEY': 'bench-secret',
+            'JWT_SECRET_KEY': 'bench-jwt-secret',
+            'DB_AUTO_UPGRADE': 'True',
+            'UPLOAD_FOLDER': os.path.join(tmpdir, 'uploads'),
+            'PYTHONPATH': BACKEND_DIR,
+        })
+        # 先执行一次，完成数据库迁移和字节码编译，避免影响第一轮测量
+        measure(False, env)
+
+        print(f"{'模式':<10}{'启动耗时(s)':>14}{'RSS(MB)':>10}{'模块数':>8}  已加载SDK")
+        for eager in (True, False):
+            results = [measure(eager, env) for _ in range(args.runs)]
+            label = 'eager' if eager else 'lazy'
+            print(f"{label:<10}"
+                  f"{statistics.median(r['seconds'] for r in results):>14.3f}"
+                  f"{statistics.median(r['rss_mb'] for r in results):>10.1f}"
+                  f"{results[-1]['modules']:>8}  {', '.join(results[-1]['sdks']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
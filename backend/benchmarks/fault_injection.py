@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+AI模型调用重试和熔断的故障注入测试
+
+在本地启动一个模拟 OpenAI（/v1/chat/completions）和 Anthropic（/v1/messages）接口的服务，
+按比例注入故障：
+    429    - 限流，带 Retry-After
+    500    - 服务端错误
+    503    - 服务不可用
+    slow   - 响应时间超过单次尝试的超时
+    reset  - 读取请求后直接断开连接
+    400    - 请求错误（不可重试）
+SDK通过 OPENAI_BASE_URL / ANTHROPIC_BASE_URL 指向该服务，在应用上下文中并发调用 parse_chess_notation，
+对比不重试（AI_RETRY_MAX_ATTEMPTS=1、不熔断）和默认策略下的成功率、延迟和发往上游的请求数。
+
+两种场景：
+    flaky   - 整个测试期间按 --fault-rate 随机注入故障
+    outage  - 前 --outage-seconds 秒全部返回503，之后恢复正常；按 --interval 的节奏持续调用 --duration 秒，
+              观察熔断期间发往上游的请求数，以及恢复后多久重新成功
+
+本脚本只对比效果，不做断言；分类、熔断和截止时间的正确性由 tests/test_resilience.py 验证。
+
+用法（在backend目录下执行）:
+    python -m benchmarks.fault_injection
+    python -m benchmarks.fault_injection --scenario outage --provider claude-3 --duration 10 --interval 0.1
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOVES = '1. e4 e5\n2. Nf3 Nc6'
+FAULTS = ['429', '500', '503', 'slow', 'reset', '400']
+
+
+class FaultServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, scenario, fault_rate, faults, slow_seconds, outage_seconds, seed):
+        super().__init__(('127.0.0.1', 0), FaultHandler)
+        self.scenario = scenario
+        self.fault_rate = fault_rate
+        self.faults = faults
+        self.slow_seconds = slow_seconds
+        self.outage_until = None
+        self.outage_seconds = outage_seconds
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = Counter()
+
+    def handle_error(self, request, client_address):
+        # slow故障的客户端超时断开后写响应失败，属于预期情况
+        pass
+
+    def start_outage(self):
+        self.outage_until = time.monotonic() + self.outage_seconds
+
+    def pick(self):
+        with self.lock:
+            if self.scenario == 'outage':
+                fault = '503' if self.outage_until and time.monotonic() < self.outage_until else None
+            elif self.rng.random() < self.fault_rate:
+                fault = self.rng.choice(self.faults)
+            else:
+                fault = None
+            self.requests[fault or 'ok'] += 1
+            return fault
+
+
+class FaultHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        fault = self.server.pick()
+        error = {'type': 'error', 'error': {'type': 'api_error', 'message': f'injected {fault}'}}
+        if fault == 'reset':
+            self.close_connection = True
+            self.connection.close()
+            return
+        if fault == 'slow':
+            time.sleep(self.server.slow_seconds)
+        elif fault is not None:
+            headers = {'Retry-After': '1'} if fault == '429' else None
+            self.send_json(int(fault), error, headers)
+            return
+
+        if self.path.endswith('/messages'):
+            self.send_json(200, {
+                'id': 'msg_fault', 'type': 'message', 'role': 'assistant', 'model': 'claude-3-opus-20240229',
+                'content': [{'type': 'text', 'text': MOVES}], 'stop_reason': 'end_turn',
+                'usage': {'input_tokens': 1, 'output_tokens': 1},
+            })
+        else:
+            self.send_json(200, {
+                'id': 'chatcmpl-fault', 'object': 'chat.completion', 'created': int(time.time()),
+                'model': 'gpt-4-vision-preview',
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': MOVES}, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2},
+            })
+
+
+def run_calls(app, provider, image_path, calls, concurrency, interval, duration=None):
+    """
+    并发调用 parse_chess_notation，共 calls 次；指定 duration 时改为持续调用 duration 秒
+
+    Returns:
+        [(结果, 开始时间, 耗时)]
+    """
+    from utils.ai import parse_chess_notation
+
+    results = []
+    lock = threading.Lock()
+    counter = iter(range(calls))
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker():
+        with app.app_context():
+            while True:
+                with lock:
+                    if deadline is None and next(counter, None) is None:
+                        return
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                start = time.perf_counter()
+                try:
+                    parse_chess_notation(image_path, provider, is_file_path=True)
+                    outcome = 'ok'
+                except Exception as e:
+                    outcome = type(e).__name__
+                with lock:
+                    results.append((outcome, start, time.perf_counter() - start))
+                time.sleep(interval)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AI模型调用重试和熔断的故障注入测试')
+    parser.add_argument('--scenario', choices=['flaky', 'outage'], default='flaky', help='故障场景')
+    parser.add_argument('--provider', choices=['gpt-4-vision', 'claude-3'], default='gpt-4-vision', help='测试的模型')
+    parser.add_argument('--calls', type=int, default=200, help='每种策略的调用次数')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发调用数')
+    parser.add_argument('--fault-rate', type=float, default=0.3, help='flaky场景的故障比例')
+    parser.add_argument('--faults', nargs='+', choices=FAULTS, default=['429', '500', '503', 'slow', 'reset'], help='注入的故障类型')
+    parser.add_argument('--slow-seconds', type=float, default=3.0, help='slow故障的响应时间')
+    parser.add_argument('--attempt-timeout', type=float, default=1.0, help='单次尝试的超时（秒）')
+    parser.add_argument('--total-timeout', type=float, default=6.0, help='含重试的总超时（秒）')
+    parser.add_argument('--outage-seconds', type=float, default=5.0, help='outage场景的故障持续时间')
+    parser.add_argument('--duration', type=float, default=10.0, help='outage场景的测试时长（秒）')
+    parser.add_argument('--breaker-reset', type=float, default=2.0, help='熔断后放行探测请求的间隔（秒）')
+    parser.add_argument('--interval', type=float, default=0.0, help='每个并发调用方两次调用之间的间隔（秒），outage场景建议0.1')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    image_path = os.path.join(tmpdir, 'board.png')
+    with open(image_path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+
+    server = FaultServer(args.scenario, args.fault_rate, args.faults, args.slow_seconds,
+                         args.outage_seconds, args.seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    os.environ.update({
+        'DATABASE_URI': f"sqlite:///{os.path.join(tmpdir, 'fault.db')}",
+        'DB_AUTO_UPGRADE': 'True',
+        'SECRET_KEY': 'bench-secret',
+        'JWT_SECRET_KEY': 'bench-jwt-secret',
+        'UPLOAD_FOLDER': os.path.join(tmpdir, 'uploads'),
+        'AI_ADMISSION_BACKEND': 'memory',
+        'AI_MAX_CONCURRENT': '0',
+        'LOG_LEVEL': 'ERROR',
+        'OPENAI_API_KEY': 'fault-injection',
+        'OPENAI_BASE_URL': f'{base_url}/v1',
+        'ANTHROPIC_API_KEY': 'fault-injection',
+        'ANTHROPIC_BASE_URL': base_url,
+    })
+    for key in ('HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy'):
+        os.environ.pop(key, None)
+
+    from app import create_app
+    from utils.resilience import ResiliencePolicy
+
+    app = create_app()
+    logging.disable(logging.CRITICAL)
+
+    policies = {
+        '不重试': ResiliencePolicy(max_attempts=1, attempt_timeout=args.attempt_timeout,
+                                 total_timeout=args.total_timeout, breaker_failures=0),
+        '重试+熔断': ResiliencePolicy(attempt_timeout=args.attempt_timeout, total_timeout=args.total_timeout,
+                                   breaker_reset=args.breaker_reset),
+    }
+    outage = args.scenario == 'outage'
+
+    rows = []
+    for name, policy in policies.items():
+        app.extensions['ai_resilience'] = policy
+        server.requests.clear()
+        server.rng.seed(args.seed)
+        print(f'{name}: 测试中...', file=sys.stderr)
+        start = time.perf_counter()
+        if outage:
+            server.start_outage()
+        results = run_calls(app, args.provider, image_path, args.calls, args.concurrency, args.interval,
+                            args.duration if outage else None)
+        elapsed = time.perf_counter() - start
+        latencies = sorted(duration for _, _, duration in results)
+        outcomes = Counter(outcome for outcome, _, _ in results)
+        # 故障结束后第一次成功返回的时间
+        recovered = min((begin + duration for outcome, begin, duration in results
+                         if outcome == 'ok' and begin + duration >= start + args.outage_seconds), default=None)
+        recovery = recovered - start - args.outage_seconds if outage and recovered else None
+        rows.append((name, outcomes, latencies, dict(server.requests), elapsed, recovery))
+
+    print(f"\n场景: {args.scenario}, 模型: {args.provider}, 并发: {args.concurrency}, "
+          f"单次超时: {args.attempt_timeout}s, 总超时: {args.total_timeout}s")
+    print(f"{'策略':<10}{'调用数':>7}{'成功率':>8}{'p50(ms)':>10}{'p99(ms)':>10}{'上游请求':>10}{'耗时(s)':>9}"
+          f"{'恢复(s)':>9}  失败类型 / 上游响应")
+    for name, outcomes, latencies, responses, elapsed, recovery in rows:
+        success = outcomes.get('ok', 0) / max(1, len(latencies))
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+        failures = {key: value for key, value in outcomes.items() if key != 'ok'}
+        recovery = f"{recovery:>9.2f}" if recovery is not None else f"{'-':>9}"
+        print(f"{name:<10}{len(latencies):>7}{success:>8.1%}{statistics.median(latencies) * 1000:>10.0f}{p99:>10.0f}"
+              f"{sum(responses.values()):>10}{elapsed:>9.1f}{recovery}  {failures} / {responses}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
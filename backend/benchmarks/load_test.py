@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+API端到端压测
+
+在子进程中启动 benchmarks.mock_app（临时SQLite数据库、mock识别模型），预置用户和棋谱后，
+按权重混合以下场景并发请求，统计吞吐量、各场景延迟分位数和错误率：
+    login   - 登录
+    list    - 棋谱列表，随机组合分页、关键词、难度和标签过滤
+    detail  - 棋谱详情
+    create  - 创建棋谱
+    update  - 更新棋谱
+    upload  - 上传棋谱图片（经过mock识别模型）
+
+结果可输出为JSON，用 --compare 与之前保存的结果对比，便于发现不同提交之间的性能回退。
+
+用法（在backend目录下执行）:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --concurrency 1 8 32 --duration 15 --output result.json
+    python -m benchmarks.load_test --server gunicorn --workers 4 --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+from collections import Counter
+from datetime import datetime
+
+from benchmarks.bench_server import BACKEND_DIR, Client, free_port, wait_for_port
+from benchmarks.sample_data import DIFFICULTIES, TAGS, random_moves
+
+# 场景权重（百分比）
+SCENARIO_WEIGHTS = {
+    'login': 5,
+    'list': 40,
+    'detail': 25,
+    'create': 10,
+    'update': 10,
+    'upload': 10,
+}
+
+# 1x1像素的PNG图片
+PNG_BYTES = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082'
+)
+
+KEYWORDS = ['练习', '比赛', '对局', '残局', '不存在的关键词']
+
+
+class LoadClient(Client):
+    """在长连接客户端的基础上增加文件上传"""
+
+    def upload(self, path, filename, data):
+        boundary = uuid.uuid4().hex
+        body = (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: image/png\r\n\r\n'
+        ).encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+        headers = {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        self.conn.request('POST', path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        payload = response.read()
+        return response.status, json.loads(payload) if payload else None
+
+
+def start_server(args, env, port):
+    if args.server == 'gunicorn':
+        env = dict(env)
+        env.update({
+            'GUNICORN_WORKERS': str(args.workers),
+            'GUNICORN_WORKER_CLASS': args.worker_class,
+            'GUNICORN_BIND': f'127.0.0.1:{port}',
+            'GUNICORN_ACCESS_LOG': '',
+            'GUNICORN_LOG_LEVEL': 'warning',
+        })
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'benchmarks.mock_app:app']
+    else:
+        command = [sys.executable, '-m', 'benchmarks.mock_app', str(port)]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_port(port)
+    return process
+
+
+def seed(port, users, notations, rng):
+    """注册测试用户并为每个用户批量创建棋谱，返回 [(账号, 棋谱ID列表)]"""
+    accounts = []
+    for index in range(users):
+        account = {'username': f'load{index}', 'email': f'load{index}@example.com', 'password': 'load-password'}
+        client = LoadClient(port)
+        client.request('POST', '/api/auth/register', account)
+        _, body = client.request('POST', '/api/auth/login', {'email': account['email'], 'password': account['password']})
+        client.token = body['access_token']
+        items = [{
+            'title': f'{rng.choice(["练习", "比赛"])}对局 #{i}',
+            'description': '压测数据',
+            'moves': random_moves(rng, rng.randint(20, 60)),
+            'difficulty': rng.choice(DIFFICULTIES),
+            'tags': rng.sample(TAGS, rng.randint(1, 3))
+        } for i in range(notations)]
+        _, body = client.request('POST', '/api/chess/notations/batch', {'items': items})
+        accounts.append((account, [result['id'] for result in body['data']['results']]))
+    return accounts
+
+
+def list_path(rng):
+    params = {'page': rng.randint(1, 3), 'size': rng.choice([10, 20, 50])}
+    if rng.random() < 0.3:
+        params['keyword'] = rng.choice(KEYWORDS)
+    if rng.random() < 0.3:
+        params['difficulty'] = rng.choice(DIFFICULTIES)
+    if rng.random() < 0.2:
+        params['tags'] = rng.choice(TAGS)
+    return '/api/chess/notations?' + urlencode(params)
+
+
+def run_scenario(name, client, account, ids, rng):
+    """执行一个场景，返回HTTP状态码"""
+    if name == 'login':
+        status, body = client.request('POST', '/api/auth/login', {'email': account['email'], 'password': account['password']})
+        if status == 200:
+            client.token = body['access_token']
+        return status
+    if name == 'list':
+        return client.request('GET', list_path(rng))[0]
+    if name == 'detail':
+        return client.request('GET', f'/api/chess/notations/{rng.choice(ids)}')[0]
+    if name == 'create':
+        status, body = client.request('POST', '/api/chess/notations', {
+            'title': '压测新建',
+            'moves': random_moves(rng, 30),
+            'difficulty': rng.choice(DIFFICULTIES),
+            'tags': rng.sample(TAGS, 2)
+        })
+        if status == 200:
+            ids.append(body['data']['id'])
+        return status
+    if name == 'update':
+        return client.request('PUT', f'/api/chess/notations/{rng.choice(ids)}', {'title': f'压测更新 {rng.random():.6f}'})[0]
+    if name == 'upload':
+        return client.upload('/api/chess/upload', 'board.png', PNG_BYTES)[0]
+    raise ValueError(f'未知场景: {name}')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def summarize(latencies, statuses, elapsed):
+    """把毫秒延迟列表和状态码计数汇总为统计结果"""
+    latencies = sorted(latencies)
+    total = len(latencies)
+    errors = sum(count for status, count in statuses.items() if status != 200)
+    return {
+        'requests': total,
+        'rps': round(total / elapsed, 2),
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'mean_ms': round(sum(latencies) / total, 3) if total else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p90_ms': round(percentile(latencies, 90), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+def run_load(port, accounts, concurrency, duration, seed_value):
+    names = list(SCENARIO_WEIGHTS)
+    weights = list(SCENARIO_WEIGHTS.values())
+    lock = threading.Lock()
+    latencies = {name: [] for name in names}
+    statuses = {name: Counter() for name in names}
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed_value + index)
+        account, ids = accounts[index % len(accounts)]
+        client = LoadClient(port)
+        run_scenario('login', client, account, ids, rng)
+        local_latencies = {name: [] for name in names}
+        local_statuses = {name: Counter() for name in names}
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = run_scenario(name, client, account, ids, rng)
+            except Exception:
+                status = 0
+                client = LoadClient(port, client.token)
+            local_latencies[name].append((time.perf_counter() - start) * 1000)
+            local_statuses[name][status] += 1
+        with lock:
+            for name in names:
+                latencies[name].extend(local_latencies[name])
+                statuses[name].update(local_statuses[name])
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    all_statuses = Counter()
+    for counter in statuses.values():
+        all_statuses.update(counter)
+    return {
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 3),
+        'total': summarize([value for values in latencies.values() for value in values], all_statuses, elapsed),
+        'scenarios': {name: summarize(latencies[name], statuses[name], elapsed) for name in names}
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def print_report(result, baseline=None):
+    """打印表格，提供基线时附加吞吐量和p95相对基线的变化"""
+    baseline_runs = {run['concurrency']: run for run in (baseline or {}).get('runs', [])}
+    for run in result['runs']:
+        print(f"\n并发 {run['concurrency']}，耗时 {run['duration_s']}s")
+        header = f"{'场景':<10}{'请求数':>8}{'req/s':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'错误率':>8}"
+        if run['concurrency'] in baseline_runs:
+            header += f"{'Δreq/s':>10}{'Δp95':>10}"
+        print(header)
+        rows = dict(run['scenarios'], total=run['total'])
+        for name, stats in rows.items():
+            line = (f"{name:<10}{stats['requests']:>8}{stats['rps']:>10.1f}{stats['p50_ms']:>10.2f}"
+                    f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['error_rate']:>8.2%}")
+            base_run = baseline_runs.get(run['concurrency'])
+            if base_run:
+                base = base_run['total'] if name == 'total' else base_run['scenarios'].get(name)
+                if base and base['rps'] and base['p95_ms']:
+                    line += f"{stats['rps'] / base['rps'] - 1:>+10.1%}{stats['p95_ms'] / base['p95_ms'] - 1:>+10.1%}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API端到端压测')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help='依次测试的并发客户端数')
+    parser.add_argument('--duration', type=float, default=10, help='每个并发级别的测试时长（秒）')
+    parser.add_argument('--server', choices=['werkzeug', 'gunicorn'], default='werkzeug', help='服务器类型')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker进程数')
+    parser.add_argument('--worker-class', default='gthread', help='gunicorn worker类型')
+    parser.add_argument('--users', type=int, default=4, help='预置用户数')
+    parser.add_argument('--notations', type=int, default=200, help='每个用户预置的棋谱数')
+    parser.add_argument('--mock-latency', type=float, default=200, help='mock识别模型的延迟（毫秒）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子，保证多次运行的请求序列一致')
+    parser.add_argument('--output', help='结果JSON的保存路径，- 表示输出到标准输出')
+    parser.add_argument('--compare', help='作为基线对比的历史结果JSON')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    result = {
+        'meta': {
+            'commit': git_commit(),
+            'time': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args),
+        },
+        'runs': []
+    }
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = dict(os.environ)
+        for key in ('OPENAI_API_KEY', 'GEMINI_API_KEY', 'ANTHROPIC_API_KEY'):
+            env.pop(key, None)
+        env.update({
+            'DATABASE_URI': f"sqlite:///{os.path.join(tmpdir, 'load.db')}",
+            'SECRET_KEY': 'load-secret',
+            'JWT_SECRET_KEY': 'load-jwt-secret',
+            'FLASK_DEBUG': 'False',
+            'DB_AUTO_UPGRADE': 'True',
+            'UPLOAD_FOLDER': os.path.join(tmpdir, 'uploads'),
+            'GUNICORN_PID_FILE': os.path.join(tmpdir, 'gunicorn.pid'),
+            'AI_MODEL': 'mock',
+            'MOCK_PROVIDER_LATENCY_MS': str(args.mock_latency),
+            'LOG_LEVEL': 'WARNING',
+            'PYTHONPATH': BACKEND_DIR,
+            'AI_ADMISSION_SQLITE_PATH': os.path.join(tmpdir, 'admission.db'),
+        })
+        # 压测默认不限速（上传场景远超每个用户的速率限制），可通过环境变量覆盖
+        env.setdefault('AI_RATE_LIMIT_USER', '0')
+        env.setdefault('AI_RATE_LIMIT_GLOBAL', '0')
+
+        port = free_port()
+        process = start_server(args, env, port)
+        try:
+            accounts = seed(port, args.users, args.notations, rng)
+            for concurrency in args.concurrency:
+                result['runs'].append(run_load(port, accounts, concurrency, args.duration, args.seed))
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=60)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    if args.output == '-':
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+用于压测的应用入口：注册一个不访问外部接口的 mock 识别模型
+
+mock 模型按 MOCK_PROVIDER_LATENCY_MS 休眠后返回固定棋谱，模拟AI接口的等待时间。
+环境变量 AI_MODEL=mock 时上传接口也会使用它。
+同时注册了协程版本（asyncio.sleep），通过 asgi_app 在ASGI入口中使用。
+
+用法（在backend目录下执行）:
+    python -m benchmarks.mock_app 5001                       # werkzeug多线程服务器
+    gunicorn -c gunicorn.conf.py benchmarks.mock_app:app     # gunicorn
+    GUNICORN_WORKER_CLASS=uvicorn gunicorn -c gunicorn.conf.py benchmarks.mock_app:asgi_app
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from api.chess_async import ASYNC_VIEWS
+from app import create_app
+from utils.ai import register_async_provider, register_provider
+from utils.asgi import AsgiApp
+
+MOCK_MOVES = '1.e4 e5\n2.Nf3 Nc6\n3.Bb5 a6\n4.Ba4 Nf6\n5.O-O Be7'
+
+
+@register_provider('mock', 'json')
+def parse_with_mock(image_path):
+    """模拟AI识别：固定延迟后返回固定棋谱"""
+    time.sleep(float(os.getenv('MOCK_PROVIDER_LATENCY_MS', 200)) / 1000)
+    return MOCK_MOVES
+
+
+@register_async_provider('mock', 'json')
+async def parse_with_mock_async(image_path):
+    """模拟AI识别的协程版本"""
+    await asyncio.sleep(float(os.getenv('MOCK_PROVIDER_LATENCY_MS', 200)) / 1000)
+    return MOCK_MOVES
+
+
+app = create_app()
+asgi_app = AsgiApp(app, ASYNC_VIEWS)
+
+
+if __name__ == '__main__':
+    from werkzeug.serving import make_server
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 5001
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
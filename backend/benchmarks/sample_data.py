@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+from datetime import datetime, timedelta
+
+# 常见的SAN走法，用于拼接看起来真实的棋谱
+SAN_MOVES = [
+    'e4', 'e5', 'd4', 'd5', 'c4', 'c5', 'Nf3', 'Nc6', 'Nf6', 'Nc3', 'Bb5', 'a6',
+    'Ba4', 'Be7', 'O-O', 'Re1', 'b5', 'Bb3', 'd6', 'c3', 'h3', 'Nb8', 'Nbd7', 'g6',
+    'Bg7', 'Be3', 'Qd2', 'O-O-O', 'exd5', 'Nxd4', 'cxd4', 'Bxf6', 'Qxd8+', 'Rxd8',
+    'Kg1', 'Rad1', 'Rfe8', 'f4', 'f5', 'g4', 'h5', 'a4', 'b4', 'Qe2', 'Qc7', 'Bd3'
+]
+
+TAGS = ['开局', '中局', '残局', '西西里防御', '西班牙开局', '后翼弃兵', '王翼印度', '战术', '练习', '比赛']
+DIFFICULTIES = ['beginner', 'intermediate', 'advanced']
+
+
+def random_moves(rng, full_moves=40):
+    """生成带回合编号的棋谱文本，如 '1.e4 e5 2.Nf3 Nc6'"""
+    # 一次抽取全部走法，比逐步调用 rng.choice 快数倍，生成大规模数据时差异明显
+    moves = rng.choices(SAN_MOVES, k=full_moves * 2)
+    return ' '.join(f"{number}.{moves[2 * number - 2]} {moves[2 * number - 1]}" for number in range(1, full_moves + 1))
+
+
+def sample_notation(rng, notation_id=1, user_id=1):
+    """生成一条与ChessNotation.to_dict()结构一致的棋谱字典"""
+    created_at = datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 500000))
+    return {
+        'id': notation_id,
+        'title': f"练习对局 #{notation_id}",
+        'description': '周末俱乐部比赛，注意第20步之后的战术组合。',
+        'moves': random_moves(rng, rng.randint(20, 60)),
+        'image_url': f"/uploads/{notation_id:08d}_board.png",
+        'difficulty': rng.choice(DIFFICULTIES),
+        'tags': rng.sample(TAGS, rng.randint(1, 3)),
+        'user_id': user_id,
+        'created_at': created_at.isoformat(),
+        'updated_at': created_at.isoformat()
+    }
+
+
+def sample_list_response(size=10, seed=42):
+    """生成与 /api/chess/notations 相同结构的列表响应"""
+    rng = random.Random(seed)
+    return {
+        'code': 200,
+        'message': '操作成功',
+        'data': {
+            'data': [sample_notation(rng, i + 1) for i in range(size)],
+            'total': size * 20,
+            'page': 1,
+            'size': size
+        }
+    }
@@ -16,30 +16,177 @@ class Config:
     # 数据库配置
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI', 'sqlite:///' + os.path.join(basedir, 'parent_assistant.db'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 启动时数据库结构落后是否自动执行迁移，生产环境应通过 flask db upgrade 显式升级
+    DB_AUTO_UPGRADE = os.getenv('DB_AUTO_UPGRADE', 'True').lower() in ('true', '1', 't')
+    
+    # SQLite引擎配置（通过连接事件执行PRAGMA）
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # 毫秒
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # 256MB
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -64000))  # 负数单位为KB，约64MB
+    
+    # PostgreSQL连接池配置
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))  # 秒
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # 秒
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True').lower() in ('true', '1', 't')
+    DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 30000))  # 毫秒
+    DB_LOCK_TIMEOUT = int(os.getenv('DB_LOCK_TIMEOUT', 0))  # 毫秒，0表示不限制
     
     # JWT配置
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt_dev_key')
-    print(f"JWT_SECRET_KEY: {JWT_SECRET_KEY}")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 86400)))  # 默认24小时
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(seconds=int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', 2592000)))  # 默认30天
     JWT_TOKEN_LOCATION = ['headers']
     JWT_HEADER_NAME = 'Authorization'
     JWT_HEADER_TYPE = 'Bearer'
     
+    # 令牌撤销配置（注销和修改密码后令牌立即失效）
+    JWT_REVOCATION_BACKEND = os.getenv('JWT_REVOCATION_BACKEND', 'database')  # database, redis
+    JWT_REVOCATION_LOCAL = os.getenv('JWT_REVOCATION_LOCAL', 'True').lower() in ('true', '1', 't')  # False时每次检查都查询后端
+    JWT_REVOCATION_SYNC_INTERVAL = float(os.getenv('JWT_REVOCATION_SYNC_INTERVAL', 1.0))  # 秒，其他worker的撤销记录最长延迟
+    JWT_REVOCATION_BLOOM = os.getenv('JWT_REVOCATION_BLOOM', 'False').lower() in ('true', '1', 't')  # 撤销记录很多时用布隆过滤器节省内存
+    JWT_REVOCATION_BLOOM_CAPACITY = int(os.getenv('JWT_REVOCATION_BLOOM_CAPACITY', 100000))
+    
+    # 密码哈希配置（修改算法或成本参数后，用户下次登录时自动重新哈希）
+    PASSWORD_HASH_ALGORITHM = os.getenv('PASSWORD_HASH_ALGORITHM', 'pbkdf2')  # pbkdf2, scrypt, argon2（需安装argon2-cffi）
+    PASSWORD_HASH_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_HASH_PBKDF2_ITERATIONS', 600000))
+    PASSWORD_HASH_SCRYPT_N = int(os.getenv('PASSWORD_HASH_SCRYPT_N', 2 ** 15))
+    PASSWORD_HASH_SCRYPT_R = int(os.getenv('PASSWORD_HASH_SCRYPT_R', 8))
+    PASSWORD_HASH_SCRYPT_P = int(os.getenv('PASSWORD_HASH_SCRYPT_P', 1))
+    PASSWORD_HASH_ARGON2_TIME_COST = int(os.getenv('PASSWORD_HASH_ARGON2_TIME_COST', 3))
+    PASSWORD_HASH_ARGON2_MEMORY_COST = int(os.getenv('PASSWORD_HASH_ARGON2_MEMORY_COST', 65536))  # KiB
+    PASSWORD_HASH_ARGON2_PARALLELISM = int(os.getenv('PASSWORD_HASH_ARGON2_PARALLELISM', 4))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 1))  # 每个worker进程的哈希进程数，0表示在请求线程中计算
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))  # 每个worker进程同时在途的哈希数上限
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 5.0))  # 秒，超时返回503
+    
     # 上传配置
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', os.path.join(basedir, 'uploads'))
+    # 上传目录清理：删除没有被棋谱或头像引用的文件（flask uploads gc，或按间隔在后台执行）
+    UPLOAD_GC_INTERVAL = float(os.getenv('UPLOAD_GC_INTERVAL', 3600))  # 秒，后台清理间隔，0表示只通过命令执行
+    UPLOAD_GC_GRACE = float(os.getenv('UPLOAD_GC_GRACE', 86400))  # 秒，修改时间在此之内的文件不删除，应大于上传到保存棋谱的间隔
+    UPLOAD_GC_BATCH_SIZE = int(os.getenv('UPLOAD_GC_BATCH_SIZE', 200))  # 每批删除的文件数
+    UPLOAD_GC_BATCH_PAUSE = float(os.getenv('UPLOAD_GC_BATCH_PAUSE', 1.0))  # 秒，两批之间的暂停
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
     
+    # 棋谱练习配置：提交的走法经写后缓冲批量写入数据库
+    PRACTICE_FLUSH_INTERVAL = float(os.getenv('PRACTICE_FLUSH_INTERVAL', 2.0))  # 秒，其他进程最多晚这么久看到新记录
+    PRACTICE_FLUSH_MAX_PENDING = int(os.getenv('PRACTICE_FLUSH_MAX_PENDING', 200))  # 累计多少步时立即写入
+    REVIEW_MAX_INTERVAL_DAYS = int(os.getenv('REVIEW_MAX_INTERVAL_DAYS', 365))  # 间隔重复复习的最长间隔（天）
+    
+    # 棋局分析配置（需要安装python-chess）：搜索在独立的进程池中执行
+    ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 2))  # 每个worker进程的分析进程数，0表示在请求线程中搜索
+    ANALYSIS_MAX_PENDING = int(os.getenv('ANALYSIS_MAX_PENDING', 4))  # 每个worker进程同时在途的分析请求数上限
+    ANALYSIS_QUEUE_TIMEOUT = float(os.getenv('ANALYSIS_QUEUE_TIMEOUT', 5.0))  # 秒，超时返回503
+    ANALYSIS_REQUEST_TIMEOUT = float(os.getenv('ANALYSIS_REQUEST_TIMEOUT', 60.0))  # 秒，一次请求的搜索时间上限，应小于GUNICORN_TIMEOUT，超时返回504
+    ANALYSIS_DEFAULT_DEPTH = int(os.getenv('ANALYSIS_DEFAULT_DEPTH', 4))
+    ANALYSIS_MAX_DEPTH = int(os.getenv('ANALYSIS_MAX_DEPTH', 8))
+    ANALYSIS_DEFAULT_MOVETIME_MS = int(os.getenv('ANALYSIS_DEFAULT_MOVETIME_MS', 500))  # 每个局面的搜索时间
+    ANALYSIS_MAX_MOVETIME_MS = int(os.getenv('ANALYSIS_MAX_MOVETIME_MS', 5000))
+    ANALYSIS_MAX_POSITIONS = int(os.getenv('ANALYSIS_MAX_POSITIONS', 200))  # 一次请求最多分析的局面数
+    ANALYSIS_TT_SIZE = int(os.getenv('ANALYSIS_TT_SIZE', 200000))  # 每个分析进程的置换表条目数
+    ANALYSIS_UCI_ENGINE = os.getenv('ANALYSIS_UCI_ENGINE', '')  # 本地UCI引擎路径（如 /usr/games/stockfish），为空时使用内置搜索器
+    ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', 500000))  # 分析结果缓存的条目数上限，超过时淘汰最久未用的，0表示不缓存
+    
+    # 头像处理配置（上传后生成多种尺寸的WebP和JPEG）
+    AVATAR_SIZES = tuple(int(s) for s in os.getenv('AVATAR_SIZES', '32,64,128,256').split(','))
+    AVATAR_DEFAULT_SIZE = int(os.getenv('AVATAR_DEFAULT_SIZE', 128))  # avatar字段返回的JPEG尺寸，须在AVATAR_SIZES中
+    AVATAR_WEBP_QUALITY = int(os.getenv('AVATAR_WEBP_QUALITY', 80))
+    AVATAR_JPEG_QUALITY = int(os.getenv('AVATAR_JPEG_QUALITY', 85))
+    AVATAR_MAX_UPLOAD_SIZE = int(os.getenv('AVATAR_MAX_UPLOAD_SIZE', 5 * 1024 * 1024))  # 5MB
+    AVATAR_MAX_PIXELS = int(os.getenv('AVATAR_MAX_PIXELS', 40000000))  # 拒绝像素数过大的图片（解压炸弹）
+    
     # AI模型配置
     AI_MODEL = os.getenv('AI_MODEL', 'openai')
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
     GEMINI_MODEL_NAME = os.getenv('GEMINI_MODEL_NAME', 'gemini-pro-vision')
     ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY', '')
+    # 启动时预加载SDK的模型（逗号分隔，如 gpt-4-vision），默认首次调用时才加载
+    AI_PRELOAD_PROVIDERS = [m for m in os.getenv('AI_PRELOAD_PROVIDERS', '').split(',') if m]
+    
+    # AI接口准入控制（/api/chess/upload 和 /api/chess/parse），速率和并发上限为0表示不限制
+    AI_ADMISSION_BACKEND = os.getenv('AI_ADMISSION_BACKEND', 'sqlite')  # sqlite（本机worker共享）, redis（多机共享）, memory（单进程）
+    AI_ADMISSION_SQLITE_PATH = os.getenv('AI_ADMISSION_SQLITE_PATH', os.path.join(basedir, 'admission.db'))
+    AI_RATE_LIMIT_USER = float(os.getenv('AI_RATE_LIMIT_USER', 10))  # 每个用户每分钟的请求数
+    AI_RATE_LIMIT_USER_BURST = int(os.getenv('AI_RATE_LIMIT_USER_BURST', 5))  # 每个用户允许的突发请求数
+    AI_RATE_LIMIT_GLOBAL = float(os.getenv('AI_RATE_LIMIT_GLOBAL', 120))  # 所有用户合计每分钟的请求数
+    AI_RATE_LIMIT_GLOBAL_BURST = int(os.getenv('AI_RATE_LIMIT_GLOBAL_BURST', 20))
+    AI_MAX_CONCURRENT = int(os.getenv('AI_MAX_CONCURRENT', 4))  # 每个模型同时在途的调用数上限
+    AI_MAX_CONCURRENT_OVERRIDES = os.getenv('AI_MAX_CONCURRENT_OVERRIDES', '')  # 按模型覆盖，如 claude-3-opus=2,gpt-4-vision=8
+    AI_QUEUE_SIZE = int(os.getenv('AI_QUEUE_SIZE', 8))  # 每个worker中等待并发名额的请求数上限，超出立即返回429
+    AI_QUEUE_TIMEOUT = float(os.getenv('AI_QUEUE_TIMEOUT', 10.0))  # 秒，等待并发名额的最长时间
+    AI_LEASE_TTL = float(os.getenv('AI_LEASE_TTL', 130.0))  # 秒，worker崩溃时并发名额自动回收的时间，应大于GUNICORN_TIMEOUT
+    AI_RETRY_AFTER = int(os.getenv('AI_RETRY_AFTER', 5))  # 并发名额不足时建议客户端重试的秒数
+    
+    # AI模型调用的重试、超时和熔断（AI_QUEUE_TIMEOUT + AI_TOTAL_TIMEOUT 应小于 GUNICORN_TIMEOUT）
+    AI_RETRY_MAX_ATTEMPTS = int(os.getenv('AI_RETRY_MAX_ATTEMPTS', 3))  # 每次调用的最多尝试次数，1表示不重试
+    AI_RETRY_BASE_DELAY = float(os.getenv('AI_RETRY_BASE_DELAY', 0.5))  # 秒，指数退避的初始等待上限
+    AI_RETRY_MAX_DELAY = float(os.getenv('AI_RETRY_MAX_DELAY', 8.0))  # 秒，单次退避等待的上限（提供者的Retry-After优先）
+    AI_ATTEMPT_TIMEOUT = float(os.getenv('AI_ATTEMPT_TIMEOUT', 60.0))  # 秒，单次尝试的超时
+    AI_TOTAL_TIMEOUT = float(os.getenv('AI_TOTAL_TIMEOUT', 100.0))  # 秒，含重试和等待的总超时
+    AI_BREAKER_FAILURES = int(os.getenv('AI_BREAKER_FAILURES', 5))  # 连续失败多少次后熔断，0表示不熔断
+    AI_BREAKER_RESET = float(os.getenv('AI_BREAKER_RESET', 30.0))  # 秒，熔断后多久放行一个探测请求
+    
+    # AI调用用量和费用（flask usage rollup 汇总明细，建议每天执行一次）
+    AI_PRICES = os.getenv('AI_PRICES', 'gpt-4-vision=10:30,gemini-pro-vision=0.5:1.5,claude-3=15:75')  # 美元/百万token，模型=输入:输出
+    AI_USER_DAILY_BUDGET = float(os.getenv('AI_USER_DAILY_BUDGET', 0))  # 美元，每个用户每天的估算费用上限，0表示不限制
+    AI_MAX_IMAGE_EDGE = int(os.getenv('AI_MAX_IMAGE_EDGE', 2048))  # 像素，长边超过该值的图片缩小后再发送给模型，0表示不缩小
+    AI_USAGE_RETENTION_DAYS = int(os.getenv('AI_USAGE_RETENTION_DAYS', 30))  # 调用明细的保留天数，按天汇总的数据不删除
+    
+    # ASGI入口（asgi:app）配置
+    ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 8))  # 每个worker中执行同步接口和数据库操作的线程数
     
     # 国际象棋工具配置
     CHESS_IMAGE_FORMATS = os.getenv('CHESS_IMAGE_FORMATS', 'jpg,jpeg,png').split(',')
     CHESS_MAX_UPLOAD_SIZE = int(os.getenv('CHESS_MAX_UPLOAD_SIZE', 5 * 1024 * 1024))  # 5MB
+    CHESS_BATCH_MAX_ITEMS = int(os.getenv('CHESS_BATCH_MAX_ITEMS', 1000))  # 单次批量操作的最大条数
+    
+    # 日志配置
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')  # FLASK_DEBUG开启时固定为DEBUG
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # text, json
+    LOG_ASYNC = os.getenv('LOG_ASYNC', 'True').lower() in ('true', '1', 't')  # 通过队列由后台线程输出日志
+    LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 1.0))  # DEBUG级别下请求详情日志的默认采样率
+    LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')  # 按路由前缀的采样率，如 /api/chess/notations=0.01
+    LOG_REQUEST_BODIES = os.getenv('LOG_REQUEST_BODIES', 'False').lower() in ('true', '1', 't')  # 是否记录（脱敏后的）请求体
+    
+    # Redis配置（可选，多个worker共享状态时使用）
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    
+    # 棋谱查询缓存配置
+    NOTATION_CACHE_BACKEND = os.getenv('NOTATION_CACHE_BACKEND') or 'memory'  # memory, redis, none；gunicorn多worker时未设置则为redis
+    NOTATION_CACHE_TTL = int(os.getenv('NOTATION_CACHE_TTL', 60))  # 秒
+    NOTATION_CACHE_MAX_ENTRIES = int(os.getenv('NOTATION_CACHE_MAX_ENTRIES', 1024))
+    
+    # 已认证用户缓存配置（每个请求解析当前用户时使用）
+    USER_CACHE_BACKEND = os.getenv('USER_CACHE_BACKEND') or 'memory'  # memory, redis, none；gunicorn多worker时未设置则为redis
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 30))  # 秒，使用memory后端时其他worker的修改最长延迟
+    USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', 10000))
+    
+    # JSON编码和响应压缩配置
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson')  # orjson, default
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'True').lower() in ('true', '1', 't')
+    COMPRESS_ALGORITHMS = os.getenv('COMPRESS_ALGORITHMS', 'br,gzip').split(',')  # 按优先级排列
+    COMPRESS_MIMETYPES = ['application/json']
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))  # 小于该字节数的响应不压缩
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+    
+    # 指标采集配置（Prometheus文本格式，GET /metrics）
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() in ('true', '1', 't')
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # 设置后抓取时需携带 Authorization: Bearer <token>，未设置时只接受本机抓取
+    METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')  # 多worker时各进程数据的共享目录，gunicorn多worker时未设置则自动创建临时目录
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))  # 秒，进程数据写入共享目录的最小间隔
+    
+    # 请求剖析配置（未设置密钥且采样率为0时关闭）
+    PROFILER_SECRET = os.getenv('PROFILER_SECRET', '')  # 签名剖析令牌的密钥，令牌由 flask profiler sign 生成
+    PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', 0.0))  # 随机剖析的请求比例
+    PROFILER_INTERVAL_MS = float(os.getenv('PROFILER_INTERVAL_MS', 5))  # 调用栈采样间隔
+    PROFILER_DIR = os.getenv('PROFILER_DIR', 'profiles')
+    PROFILER_MAX_FILES = int(os.getenv('PROFILER_MAX_FILES', 200))  # 超出后删除最旧的剖析结果
 
 class DevelopmentConfig(Config):
     """开发环境配置"""
@@ -61,6 +208,7 @@ class ProductionConfig(Config):
     
     # 生产环境可以使用更强大的数据库
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI')
+    DB_AUTO_UPGRADE = os.getenv('DB_AUTO_UPGRADE', 'False').lower() in ('true', '1', 't')
 
 # 配置映射
 config = {
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Gunicorn生产环境配置
+
+支持四种worker类型，通过 GUNICORN_WORKER_CLASS 选择:
+    sync    - 每个worker同时处理一个请求，适合CPU密集型接口
+    gthread - 每个worker内多个线程，适合混合负载（默认）
+    gevent  - 协程worker，适合大量等待AI接口返回的请求
+    uvicorn - ASGI worker，棋谱识别接口在事件循环中等待AI模型返回，
+              其余接口在线程池中执行（线程数见 ASGI_WSGI_THREADS），需使用 asgi:app
+
+用法（在backend目录下执行）:
+    gunicorn -c gunicorn.conf.py wsgi:app
+    GUNICORN_WORKER_CLASS=uvicorn gunicorn -c gunicorn.conf.py asgi:app
+"""
+
+import multiprocessing
+import os
+import tempfile
+from dotenv import load_dotenv
+
+# 与应用读取同一份 .env，下面按worker数检查缓存后端时看到的是应用实际使用的配置
+load_dotenv()
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+# gevent需要在导入应用之前打补丁，否则预加载的模块仍使用阻塞的socket和线程
+if worker_class == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+if worker_class == 'uvicorn':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+
+# 监听地址
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', 5001)}")
+
+# worker配置
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))  # 仅gthread生效
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))  # 仅gevent生效
+
+# memory缓存后端只在本进程内有效：一个worker中的修改只使本进程的缓存失效，
+# 其他worker会在TTL内继续返回旧的棋谱列表和用户信息。多worker时未配置后端则使用Redis，
+# 显式配置为memory则拒绝启动（需要时设为 none 关闭缓存，或 GUNICORN_WORKERS=1）
+if workers > 1:
+    for name in ('NOTATION_CACHE_BACKEND', 'USER_CACHE_BACKEND'):
+        backend = os.getenv(name, '').strip()
+        if not backend:
+            os.environ[name] = 'redis'
+        elif backend == 'memory':
+            raise RuntimeError(f"{name}=memory 在多个worker（{workers}个）之间不共享，请设为 redis 或 none")
+    # 指标默认只在各worker进程内累计，/metrics 返回的是恰好处理这次抓取的worker的数据；
+    # 未配置共享目录时在临时目录下创建一个，各worker把数据写入其中，抓取时汇总
+    if os.getenv('METRICS_ENABLED', 'True').lower() in ('true', '1', 't') and not os.getenv('METRICS_MULTIPROC_DIR'):
+        os.environ['METRICS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='chess-metrics-')
+
+# 在master进程中预加载应用，缩短worker启动时间并通过写时复制共享内存
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() in ('true', '1', 't')
+
+# worker处理一定数量请求后重启，防止内存缓慢增长；加入随机抖动避免所有worker同时重启
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# AI识别接口可能耗时较长，超时时间需要覆盖一次完整的模型调用
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+# 收到停止信号后，等待正在处理的请求完成的时间
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# 日志
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None  # 设为空字符串关闭访问日志
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+pidfile = os.getenv('GUNICORN_PID_FILE', 'gunicorn.pid')
+
+
+def on_starting(server):
+    """清理上次运行遗留的指标文件，避免重启后计数叠加"""
+    directory = os.getenv('METRICS_MULTIPROC_DIR')
+    if not directory or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith(('.json', '.tmp')):
+            os.remove(os.path.join(directory, name))
+
+
+def post_fork(server, worker):
+    """fork之后丢弃从master继承的数据库连接，避免多个进程共用同一个连接"""
+    if not server.cfg.preload_app:
+        return
+    
+    from models.db import db
+
+    # 取gunicorn实际加载的应用（wsgi:app、asgi:app 或 benchmarks.mock_app:app 等），
+    # 不能另行导入 wsgi，否则每个worker会再创建一个应用，继承的连接池却没有丢弃；
+    # ASGI入口（AsgiApp）包装的Flask应用在其 app 属性中
+    app = server.app.wsgi()
+    app = getattr(app, 'app', app)
+
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+from alembic import context
+from flask import has_app_context
+from sqlalchemy import create_engine
+
+# 直接使用alembic命令时，保证可以导入backend下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 导入模型，使它们注册到元数据中
+from models import db
+
+target_metadata = db.metadata
+
+
+def get_engine():
+    """在Flask应用上下文中复用应用的引擎，否则根据配置创建引擎"""
+    if has_app_context():
+        return db.engine
+
+    from config.config import Config
+    return create_engine(Config.SQLALCHEMY_DATABASE_URI)
+
+
+def run_migrations_offline():
+    """生成SQL脚本而不连接数据库"""
+    context.configure(
+        url=str(get_engine().url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """连接数据库执行迁移"""
+    with get_engine().connect() as connection:
+        sqlite = connection.dialect.name == 'sqlite'
+        if sqlite:
+            # 批量模式重建表时会先删除旧表，外键检查打开时会级联删除引用它的行，迁移期间关闭
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            # 结束执行PRAGMA时自动开始的事务，迁移才会在自己的事务中提交
+            connection.commit()
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite不支持大部分ALTER TABLE，使用批量模式重建表
+            render_as_batch=sqlite,
+            compare_type=True
+        )
+        try:
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            if sqlite:
+                connection.exec_driver_sql('PRAGMA foreign_keys=ON')
+                connection.commit()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,61 @@
+"""初始数据库结构：用户表和棋谱表
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 15:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 已有数据库由 db.create_all() 创建过表时跳过建表，直接纳入版本管理
+    existing_tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing_tables:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=64), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('password_hash', sa.String(length=128), nullable=False),
+            sa.Column('name', sa.String(length=64), nullable=True),
+            sa.Column('avatar', sa.String(length=256), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_users_username', 'users', ['username'], unique=True)
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    if 'chess_notations' not in existing_tables:
+        op.create_table(
+            'chess_notations',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=128), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('moves', sa.Text(), nullable=False),
+            sa.Column('image_url', sa.String(length=256), nullable=True),
+            sa.Column('difficulty', sa.String(length=20), nullable=True),
+            sa.Column('tags', sa.JSON(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('chess_notations')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,27 @@
+"""棋谱表复合索引：按用户分页和按难度筛选
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 15:30:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 列表接口按 user_id 过滤并按 created_at 倒序分页
+    op.create_index('ix_chess_notations_user_id_created_at', 'chess_notations', ['user_id', 'created_at'])
+    # 列表接口按 user_id + difficulty 筛选
+    op.create_index('ix_chess_notations_user_id_difficulty', 'chess_notations', ['user_id', 'difficulty'])
+
+
+def downgrade():
+    op.drop_index('ix_chess_notations_user_id_difficulty', table_name='chess_notations')
+    op.drop_index('ix_chess_notations_user_id_created_at', table_name='chess_notations')
@@ -0,0 +1,42 @@
+"""令牌撤销表
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 16:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('revoked_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_revoked_tokens_key', 'revoked_tokens', ['key'], unique=True)
+    op.create_index('ix_revoked_tokens_user_id', 'revoked_tokens', ['user_id'])
+    # worker按撤销时间增量同步
+    op.create_index('ix_revoked_tokens_revoked_at', 'revoked_tokens', ['revoked_at'])
+    # 定期清理已过期的记录
+    op.create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_revoked_tokens_expires_at', table_name='revoked_tokens')
+    op.drop_index('ix_revoked_tokens_revoked_at', table_name='revoked_tokens')
+    op.drop_index('ix_revoked_tokens_user_id', table_name='revoked_tokens')
+    op.drop_index('ix_revoked_tokens_key', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
@@ -0,0 +1,29 @@
+"""加长密码哈希字段，容纳scrypt哈希（约162个字符）
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 17:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite不支持ALTER COLUMN，batch模式会重建表
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=128),
+                              type_=sa.String(length=256), existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=256),
+                              type_=sa.String(length=128), existing_nullable=False)
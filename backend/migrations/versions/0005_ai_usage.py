@@ -0,0 +1,66 @@
+"""AI模型调用明细表和按天汇总表
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 19:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'ai_usage',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('provider', sa.String(length=32), nullable=False),
+        sa.Column('model', sa.String(length=64), nullable=True),
+        sa.Column('input_tokens', sa.Integer(), nullable=False),
+        sa.Column('output_tokens', sa.Integer(), nullable=False),
+        sa.Column('image_bytes', sa.Integer(), nullable=False),
+        sa.Column('image_pixels', sa.Integer(), nullable=False),
+        sa.Column('latency_ms', sa.Integer(), nullable=False),
+        sa.Column('outcome', sa.String(length=32), nullable=False),
+        sa.Column('cost_micros', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # 调用前按用户汇总当天花费
+    op.create_index('ix_ai_usage_user_id_day', 'ai_usage', ['user_id', 'day'])
+    # 按天汇总和清理
+    op.create_index('ix_ai_usage_day', 'ai_usage', ['day'])
+
+    op.create_table(
+        'ai_usage_daily',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('provider', sa.String(length=32), nullable=False),
+        sa.Column('model', sa.String(length=64), nullable=True),
+        sa.Column('calls', sa.Integer(), nullable=False),
+        sa.Column('failures', sa.Integer(), nullable=False),
+        sa.Column('input_tokens', sa.BigInteger(), nullable=False),
+        sa.Column('output_tokens', sa.BigInteger(), nullable=False),
+        sa.Column('image_bytes', sa.BigInteger(), nullable=False),
+        sa.Column('latency_ms', sa.BigInteger(), nullable=False),
+        sa.Column('cost_micros', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ai_usage_daily_day_user_id', 'ai_usage_daily', ['day', 'user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_ai_usage_daily_day_user_id', table_name='ai_usage_daily')
+    op.drop_table('ai_usage_daily')
+    op.drop_index('ix_ai_usage_day', table_name='ai_usage')
+    op.drop_index('ix_ai_usage_user_id_day', table_name='ai_usage')
+    op.drop_table('ai_usage')
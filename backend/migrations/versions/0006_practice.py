@@ -0,0 +1,57 @@
+"""棋谱练习记录表
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 21:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'practice_sessions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('notation_id', sa.Integer(), nullable=False),
+        sa.Column('total_plies', sa.Integer(), nullable=False),
+        sa.Column('current_ply', sa.Integer(), nullable=False),
+        sa.Column('correct', sa.Integer(), nullable=False),
+        sa.Column('incorrect', sa.Integer(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['notation_id'], ['chess_notations.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # 按用户和棋谱汇总练习进度
+    op.create_index('ix_practice_sessions_user_id_notation_id', 'practice_sessions', ['user_id', 'notation_id'])
+
+    op.create_table(
+        'practice_attempts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('ply', sa.Integer(), nullable=False),
+        sa.Column('move', sa.String(length=16), nullable=False),
+        sa.Column('is_correct', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['session_id'], ['practice_sessions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_practice_attempts_session_id_ply', 'practice_attempts', ['session_id', 'ply'])
+
+
+def downgrade():
+    op.drop_index('ix_practice_attempts_session_id_ply', table_name='practice_attempts')
+    op.drop_table('practice_attempts')
+    op.drop_index('ix_practice_sessions_user_id_notation_id', table_name='practice_sessions')
+    op.drop_table('practice_sessions')
@@ -0,0 +1,45 @@
+"""间隔重复复习项表
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 23:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'review_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('notation_id', sa.Integer(), nullable=False),
+        sa.Column('ply', sa.Integer(), nullable=False),
+        sa.Column('ease', sa.Float(), nullable=False),
+        sa.Column('interval_days', sa.Integer(), nullable=False),
+        sa.Column('repetitions', sa.Integer(), nullable=False),
+        sa.Column('lapses', sa.Integer(), nullable=False),
+        sa.Column('due_at', sa.DateTime(), nullable=False),
+        sa.Column('last_grade', sa.Integer(), nullable=True),
+        sa.Column('last_reviewed_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['notation_id'], ['chess_notations.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'notation_id', 'ply', name='uq_review_items_user_id_notation_id_ply')
+    )
+    # 到期队列：WHERE user_id = ? AND due_at <= ? ORDER BY due_at LIMIT N
+    op.create_index('ix_review_items_user_id_due_at', 'review_items', ['user_id', 'due_at'])
+
+
+def downgrade():
+    op.drop_index('ix_review_items_user_id_due_at', table_name='review_items')
+    op.drop_table('review_items')
@@ -0,0 +1,41 @@
+"""局面分析结果缓存表
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-20 01:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'analysis_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('position_hash', sa.BigInteger(), nullable=False),
+        sa.Column('engine', sa.String(length=100), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.Column('target_depth', sa.Integer(), nullable=False),
+        sa.Column('movetime_ms', sa.Integer(), nullable=True),
+        sa.Column('result', sa.Text(), nullable=False),
+        sa.Column('mate', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('position_hash', 'engine', name='uq_analysis_cache_position_hash_engine')
+    )
+    # LRU淘汰：按 last_used_at 找出最久未用的条目
+    op.create_index('ix_analysis_cache_last_used_at', 'analysis_cache', ['last_used_at'])
+
+
+def downgrade():
+    op.drop_index('ix_analysis_cache_last_used_at', table_name='analysis_cache')
+    op.drop_table('analysis_cache')
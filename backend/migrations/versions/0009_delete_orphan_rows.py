@@ -0,0 +1,36 @@
+"""删除已删除棋谱遗留的复习项和练习记录
+
+SQLite此前未开启外键检查，ON DELETE CASCADE 不生效，删除棋谱后其复习项、练习会话和走法记录仍留在库中。
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-20 10:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        'DELETE FROM review_items WHERE notation_id NOT IN (SELECT id FROM chess_notations)'
+    )
+    op.execute(
+        'DELETE FROM practice_attempts WHERE session_id NOT IN ('
+        'SELECT practice_sessions.id FROM practice_sessions '
+        'JOIN chess_notations ON chess_notations.id = practice_sessions.notation_id)'
+    )
+    op.execute(
+        'DELETE FROM practice_sessions WHERE notation_id NOT IN (SELECT id FROM chess_notations)'
+    )
+
+
+def downgrade():
+    # 删除的孤立行无法恢复，也不需要恢复
+    pass
@@ -5,4 +5,9 @@ from .db import db, init_db
 
 # 导入模型，使它们对ORM可见
 from .user import User
-from .chess import ChessNotation 
\ No newline at end of file
+from .chess import ChessNotation
+from .token import RevokedToken 
+from .usage import AIUsage, AIUsageDaily
+from .practice import PracticeSession, PracticeAttempt
+from .review import ReviewItem
+from .analysis import AnalysisCacheEntry
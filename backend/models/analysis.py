@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+from datetime import datetime
+from . import db
+
+class AnalysisCacheEntry(db.Model):
+    """局面分析结果缓存：每个局面（Zobrist哈希）和引擎版本保留搜索最深的一条结果"""
+    __tablename__ = 'analysis_cache'
+    __table_args__ = (
+        db.UniqueConstraint('position_hash', 'engine', name='uq_analysis_cache_position_hash_engine'),
+        # 超过条目上限时按最近使用时间淘汰最久未用的条目
+        db.Index('ix_analysis_cache_last_used_at', 'last_used_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # python-chess 的 polyglot Zobrist 哈希（64位），转换为有符号整数存储
+    position_hash = db.Column(db.BigInteger, nullable=False)
+    # 内置搜索器为名称-版本，UCI引擎为可执行文件名及其大小和修改时间，引擎升级后旧结果不再命中
+    engine = db.Column(db.String(100), nullable=False)
+    # 实际完成的深度，以及产生这条结果的搜索所要求的深度和时间（毫秒，NULL表示不限）
+    depth = db.Column(db.Integer, nullable=False)
+    target_depth = db.Column(db.Integer, nullable=False)
+    movetime_ms = db.Column(db.Integer)
+    # 分析结果（JSON，不含FEN），mate 非空时为已证明的将杀
+    result = db.Column(db.Text, nullable=False)
+    mate = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return dict(json.loads(self.result), depth=self.depth)
+    
+    def __repr__(self):
+        return f'<AnalysisCacheEntry {self.position_hash} {self.engine} d{self.depth}>'
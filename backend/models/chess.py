@@ -7,6 +7,11 @@ from . import db
 class ChessNotation(db.Model):
     """国际象棋棋谱模型"""
     __tablename__ = 'chess_notations'
+    __table_args__ = (
+        # 与迁移 0002 中的复合索引保持一致
+        db.Index('ix_chess_notations_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_chess_notations_user_id_difficulty', 'user_id', 'difficulty'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(128), nullable=False)
@@ -3,22 +3,99 @@
 
 from flask_sqlalchemy import SQLAlchemy
 from flask import current_app
+from sqlalchemy import event
 
 # 创建SQLAlchemy实例
 db = SQLAlchemy()
 
+def build_engine_options(config):
+    """
+    根据数据库类型生成SQLAlchemy引擎参数
+    
+    Args:
+        config: 应用配置（字典或app.config）
+    
+    Returns:
+        引擎参数字典，会与 SQLALCHEMY_ENGINE_OPTIONS 中显式配置的参数合并
+    """
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    
+    if uri.startswith('sqlite'):
+        # sqlite3驱动自身的锁等待超时（秒），与 busy_timeout 保持一致
+        connect_args = dict(options.get('connect_args') or {})
+        connect_args.setdefault('timeout', config.get('SQLITE_BUSY_TIMEOUT', 5000) / 1000)
+        options['connect_args'] = connect_args
+    elif uri.startswith('postgresql'):
+        options.setdefault('pool_size', config.get('DB_POOL_SIZE', 10))
+        options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 20))
+        options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 30))
+        options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 1800))
+        options.setdefault('pool_pre_ping', config.get('DB_POOL_PRE_PING', True))
+        
+        # 语句超时和锁等待超时（毫秒），防止慢查询长期占用连接
+        connect_args = dict(options.get('connect_args') or {})
+        server_options = [f"-c statement_timeout={config.get('DB_STATEMENT_TIMEOUT', 30000)}"]
+        if config.get('DB_LOCK_TIMEOUT'):
+            server_options.append(f"-c lock_timeout={config.get('DB_LOCK_TIMEOUT')}")
+        connect_args.setdefault('options', ' '.join(server_options))
+        options['connect_args'] = connect_args
+    
+    return options
+
+def sqlite_pragmas(config):
+    """
+    生成SQLite连接建立时执行的PRAGMA列表
+    
+    WAL模式下读写互不阻塞，synchronous=NORMAL 在WAL下仍能保证数据库一致性，
+    只在系统断电时可能丢失最近的事务。
+    SQLite默认不检查外键，须在每个连接上打开，删除棋谱时 ON DELETE CASCADE 才会删除
+    其练习记录和复习项。
+    """
+    pragmas = [
+        ('foreign_keys', 'ON'),
+        ('busy_timeout', config.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        ('synchronous', config.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('cache_size', config.get('SQLITE_CACHE_SIZE', -64000)),
+        ('mmap_size', config.get('SQLITE_MMAP_SIZE', 268435456)),
+        ('temp_store', 'MEMORY'),
+    ]
+    
+    # 内存数据库不支持WAL
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if ':memory:' not in uri and config.get('SQLITE_JOURNAL_MODE'):
+        pragmas.insert(0, ('journal_mode', config.get('SQLITE_JOURNAL_MODE')))
+    
+    return pragmas
+
+def register_sqlite_pragmas(engine, pragmas):
+    """在每个新建的SQLite连接上执行PRAGMA"""
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
 def init_db(app):
     """初始化数据库"""
+    # 根据数据库类型配置连接池和驱动参数
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config)
+    
     # 初始化SQLAlchemy
     db.init_app(app)
     
-    # 创建所有表
     with app.app_context():
-        current_app.logger.info("初始化数据库，创建所有表")
-        db.create_all()
+        if db.engine.dialect.name == 'sqlite':
+            register_sqlite_pragmas(db.engine, sqlite_pragmas(app.config))
         
         # 导入模型以确保它们被注册
         from .user import User
         from .chess import ChessNotation
+        from .token import RevokedToken
+        
+        # 表结构由Alembic迁移管理，启动时只检查版本
+        from .migrate import check_schema
+        check_schema(app)
         
         current_app.logger.info("数据库初始化完成") 
\ No newline at end of file
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import click
+from alembic import command
+from alembic.config import Config as AlembicConfig
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from flask.cli import AppGroup
+
+from .db import db
+
+# 迁移脚本目录
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# flask db 命令组
+db_cli = AppGroup('db', help='数据库迁移命令')
+
+def get_alembic_config():
+    """创建指向migrations目录的Alembic配置"""
+    config = AlembicConfig(os.path.join(MIGRATIONS_DIR, 'alembic.ini'))
+    config.set_main_option('script_location', MIGRATIONS_DIR)
+    return config
+
+def get_schema_versions():
+    """
+    获取数据库当前的迁移版本和代码中的最新版本
+
+    Returns:
+        (当前版本, 最新版本)，数据库未纳入版本管理时当前版本为None
+    """
+    script = ScriptDirectory.from_config(get_alembic_config())
+    with db.engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_revision()
+    return current, script.get_current_head()
+
+def check_schema(app):
+    """
+    启动时检查数据库结构版本
+
+    只读取一次 alembic_version，不再每次启动执行 create_all。
+    版本落后时，开启 DB_AUTO_UPGRADE 则自动升级（开发/测试环境），
+    否则记录警告，提示执行 flask db upgrade。
+    """
+    current, head = get_schema_versions()
+    if current == head:
+        app.logger.info(f"数据库结构已是最新版本: {head}")
+        return
+
+    if app.config.get('DB_AUTO_UPGRADE', False):
+        app.logger.info(f"数据库结构版本 {current} 落后于 {head}，自动升级")
+        command.upgrade(get_alembic_config(), 'head')
+        return
+
+    app.logger.warning(f"数据库结构版本 {current} 落后于 {head}，请执行 flask db upgrade")
+
+@db_cli.command('upgrade')
+@click.argument('revision', default='head')
+def upgrade(revision):
+    """升级数据库到指定版本（默认最新）"""
+    command.upgrade(get_alembic_config(), revision)
+    click.echo(f"数据库已升级到: {revision}")
+
+@db_cli.command('downgrade')
+@click.argument('revision', default='-1')
+def downgrade(revision):
+    """回退数据库到指定版本（默认回退一个版本）"""
+    command.downgrade(get_alembic_config(), revision)
+    click.echo(f"数据库已回退到: {revision}")
+
+@db_cli.command('current')
+def current():
+    """显示数据库当前版本和最新版本"""
+    current_revision, head = get_schema_versions()
+    click.echo(f"当前版本: {current_revision or '无'}, 最新版本: {head}")
+
+@db_cli.command('history')
+def history():
+    """显示迁移历史"""
+    command.history(get_alembic_config())
+
+@db_cli.command('revision')
+@click.option('-m', '--message', required=True, help='迁移说明')
+@click.option('--autogenerate', is_flag=True, help='根据模型与数据库的差异自动生成')
+def revision(message, autogenerate):
+    """创建新的迁移脚本"""
+    script = ScriptDirectory.from_config(get_alembic_config())
+    # 沿用四位数字递增的版本号
+    next_id = f"{int(script.get_current_head() or 0) + 1:04d}"
+    command.revision(get_alembic_config(), message=message, autogenerate=autogenerate, rev_id=next_id)
+
+@db_cli.command('stamp')
+@click.argument('revision', default='head')
+def stamp(revision):
+    """将数据库标记为指定版本而不执行迁移"""
+    command.stamp(get_alembic_config(), revision)
+    click.echo(f"数据库已标记为: {revision}")
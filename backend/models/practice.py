@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+from . import db
+
+class PracticeSession(db.Model):
+    """一次棋谱练习：按顺序走出棋谱中的每一步"""
+    __tablename__ = 'practice_sessions'
+    __table_args__ = (
+        # 按用户和棋谱汇总练习进度
+        db.Index('ix_practice_sessions_user_id_notation_id', 'user_id', 'notation_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    notation_id = db.Column(db.Integer, db.ForeignKey('chess_notations.id', ondelete='CASCADE'), nullable=False)
+    # 棋谱的总步数（半回合数），开始练习时确定
+    total_plies = db.Column(db.Integer, nullable=False)
+    # 下一步要走的半回合序号（从0开始），等于 total_plies 时练习完成
+    current_ply = db.Column(db.Integer, default=0, nullable=False)
+    correct = db.Column(db.Integer, default=0, nullable=False)
+    incorrect = db.Column(db.Integer, default=0, nullable=False)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        """转换为字典"""
+        attempts = self.correct + self.incorrect
+        return {
+            'id': self.id,
+            'notation_id': self.notation_id,
+            'total_plies': self.total_plies,
+            'current_ply': self.current_ply,
+            'correct': self.correct,
+            'incorrect': self.incorrect,
+            'accuracy': round(self.correct / attempts, 4) if attempts else None,
+            'completed': self.finished_at is not None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<PracticeSession {self.id}>'
+
+class PracticeAttempt(db.Model):
+    """练习中提交的一步棋，只追加不修改，经写后缓冲批量写入"""
+    __tablename__ = 'practice_attempts'
+    __table_args__ = (
+        db.Index('ix_practice_attempts_session_id_ply', 'session_id', 'ply'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('practice_sessions.id', ondelete='CASCADE'), nullable=False)
+    ply = db.Column(db.Integer, nullable=False)
+    move = db.Column(db.String(16), nullable=False)
+    is_correct = db.Column(db.Boolean, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<PracticeAttempt {self.session_id}:{self.ply}>'
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+from . import db
+
+class ReviewItem(db.Model):
+    """间隔重复复习项：棋谱中的一步（半回合），按SM-2算法安排下次复习时间"""
+    __tablename__ = 'review_items'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'notation_id', 'ply', name='uq_review_items_user_id_notation_id_ply'),
+        # 到期队列：按用户取 due_at 最早的N项，只扫描索引中的一段范围
+        db.Index('ix_review_items_user_id_due_at', 'user_id', 'due_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    notation_id = db.Column(db.Integer, db.ForeignKey('chess_notations.id', ondelete='CASCADE'), nullable=False)
+    ply = db.Column(db.Integer, nullable=False)
+    # SM-2 状态：难易系数、当前间隔（天）、连续答对次数、遗忘次数
+    ease = db.Column(db.Float, default=2.5, nullable=False)
+    interval_days = db.Column(db.Integer, default=0, nullable=False)
+    repetitions = db.Column(db.Integer, default=0, nullable=False)
+    lapses = db.Column(db.Integer, default=0, nullable=False)
+    # 复习时计算好下次到期时间，查询到期项时不再逐项计算间隔
+    due_at = db.Column(db.DateTime, nullable=False)
+    last_grade = db.Column(db.Integer)
+    last_reviewed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'notation_id': self.notation_id,
+            'ply': self.ply,
+            'ease': round(self.ease, 2),
+            'interval_days': self.interval_days,
+            'repetitions': self.repetitions,
+            'lapses': self.lapses,
+            'due_at': self.due_at.isoformat() if self.due_at else None,
+            'last_grade': self.last_grade,
+            'last_reviewed_at': self.last_reviewed_at.isoformat() if self.last_reviewed_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ReviewItem {self.notation_id}:{self.ply}>'
@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+from . import db
+
+class RevokedToken(db.Model):
+    """已撤销的令牌，多个worker通过该表共享撤销记录"""
+    __tablename__ = 'revoked_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # 'jti:<令牌ID>' 撤销单个令牌；'user:<用户ID>' 撤销该用户在 revoked_at 之前签发的所有令牌
+    key = db.Column(db.String(64), unique=True, index=True, nullable=False)
+    user_id = db.Column(db.Integer, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, index=True, nullable=False)
+    # 令牌本身过期后记录即可删除
+    expires_at = db.Column(db.DateTime, index=True, nullable=False)
+    
+    def __repr__(self):
+        return f'<RevokedToken {self.key}>'
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+from . import db
+
+class AIUsage(db.Model):
+    """AI模型调用明细，每次 parse_chess_notation 一行，只追加不修改"""
+    __tablename__ = 'ai_usage'
+    __table_args__ = (
+        # 调用前按用户汇总当天花费（预算检查）
+        db.Index('ix_ai_usage_user_id_day', 'user_id', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # 调用日期（UTC），汇总和清理按天进行
+    day = db.Column(db.Date, index=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    user_id = db.Column(db.Integer)
+    # 注册表中的模型名称（如 claude-3）和提供者返回的实际模型（如 claude-3-opus-20240229）
+    provider = db.Column(db.String(32), nullable=False)
+    model = db.Column(db.String(64))
+    input_tokens = db.Column(db.Integer, default=0, nullable=False)
+    output_tokens = db.Column(db.Integer, default=0, nullable=False)
+    # 实际发送给模型的图片（缩小之后）
+    image_bytes = db.Column(db.Integer, default=0, nullable=False)
+    image_pixels = db.Column(db.Integer, default=0, nullable=False)
+    latency_ms = db.Column(db.Integer, default=0, nullable=False)
+    # success 或异常类名
+    outcome = db.Column(db.String(32), nullable=False)
+    # 估算费用，单位为百万分之一美元
+    cost_micros = db.Column(db.Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f'<AIUsage {self.provider} {self.outcome}>'
+
+class AIUsageDaily(db.Model):
+    """按天、用户和模型汇总的调用量，由 flask usage rollup 从 ai_usage 生成"""
+    __tablename__ = 'ai_usage_daily'
+    __table_args__ = (
+        db.Index('ix_ai_usage_daily_day_user_id', 'day', 'user_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer)
+    provider = db.Column(db.String(32), nullable=False)
+    model = db.Column(db.String(64))
+    calls = db.Column(db.Integer, default=0, nullable=False)
+    failures = db.Column(db.Integer, default=0, nullable=False)
+    input_tokens = db.Column(db.BigInteger, default=0, nullable=False)
+    output_tokens = db.Column(db.BigInteger, default=0, nullable=False)
+    image_bytes = db.Column(db.BigInteger, default=0, nullable=False)
+    latency_ms = db.Column(db.BigInteger, default=0, nullable=False)
+    cost_micros = db.Column(db.BigInteger, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f'<AIUsageDaily {self.day} {self.provider}>'
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from utils.avatar import avatar_srcset
 from . import db
 
 class User(db.Model):
@@ -12,7 +12,7 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, index=True, nullable=False)
     email = db.Column(db.String(120), unique=True, index=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(256), nullable=False)
     name = db.Column(db.String(64))
     avatar = db.Column(db.String(256))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -28,12 +28,14 @@ class User(db.Model):
         self.avatar = avatar
     
     def set_password(self, password):
-        """设置密码"""
-        self.password_hash = generate_password_hash(password)
+        """设置密码（按配置的算法在哈希进程池中计算）"""
+        from utils.hashing import get_password_hasher
+        self.password_hash = get_password_hasher().hash(password)
     
     def verify_password(self, password):
-        """验证密码"""
-        return check_password_hash(self.password_hash, password)
+        """验证密码，哈希参数已变化时顺便更新哈希（需由调用方提交）"""
+        from utils.hashing import get_password_hasher
+        return get_password_hasher().verify_and_update(self, password)
     
     def to_dict(self):
         """转换为字典"""
@@ -43,6 +45,7 @@ class User(db.Model):
             'email': self.email,
             'name': self.name,
             'avatar': self.avatar,
+            'avatar_srcset': avatar_srcset(self.avatar),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
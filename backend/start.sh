@@ -108,11 +108,20 @@ start_dev_server() {
 # 启动生产服务器
 start_prod_server() {
   print_message "正在启动生产服务器..." "${BLUE}"
-  export FLASK_DEBUG=True
+  export FLASK_DEBUG=False
   export FLASK_APP=app.py
   
+  # 生产环境不自动迁移，启动前显式升级数据库结构
+  print_message "正在执行数据库迁移..." "${BLUE}"
+  flask db upgrade
+  
   if command -v gunicorn &> /dev/null; then
-    gunicorn -w 4 -b 0.0.0.0:5000 "app:create_app('production')"
+    # worker类型、数量和超时等参数见 gunicorn.conf.py，可通过 GUNICORN_* 环境变量调整
+    if [ "$GUNICORN_WORKER_CLASS" = "uvicorn" ]; then
+      gunicorn -c gunicorn.conf.py asgi:app
+    else
+      gunicorn -c gunicorn.conf.py wsgi:app
+    fi
   else
     print_message "警告: 未找到gunicorn，将使用Flask内置服务器" "${YELLOW}"
     $PYTHON_CMD app.py
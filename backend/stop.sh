@@ -34,8 +34,22 @@ stop_dev_server() {
 stop_prod_server() {
   print_message "正在停止生产服务器..." "${BLUE}"
   
-  # 查找Gunicorn进程
-  GUNICORN_PID=$(ps aux | grep "gunicorn.*app:create_app" | grep -v grep | awk '{print $2}')
+  # 优先读取gunicorn写入的pid文件（GUNICORN_PID_FILE，默认在backend目录下的 gunicorn.pid），
+  # 主进程收到TERM后会等待并停止全部工作进程
+  PID_FILE="${GUNICORN_PID_FILE:-gunicorn.pid}"
+  case "$PID_FILE" in
+    /*) ;;
+    *) PID_FILE="$(cd "$(dirname "$0")" && pwd)/$PID_FILE" ;;
+  esac
+  if [ -f "$PID_FILE" ] && kill -0 "$(cat "$PID_FILE")" 2>/dev/null; then
+    GUNICORN_PID=$(cat "$PID_FILE")
+    kill $GUNICORN_PID
+    print_message "已停止Gunicorn主进程，PID: $GUNICORN_PID" "${GREEN}"
+    return
+  fi
+  
+  # 没有pid文件时按命令行查找，WSGI（wsgi:app）和ASGI（asgi:app）入口都要匹配
+  GUNICORN_PID=$(ps aux | grep "gunicorn.*[aw]sgi:app" | grep -v grep | awk '{print $2}')
   
   if [ ! -z "$GUNICORN_PID" ]; then
     kill $GUNICORN_PID
@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+utils.resilience 的单元测试：异常分类、熔断器状态转换、重试的退避、截止时间和重试耗尽
+
+时钟、随机数和等待函数都用假的替换，测试不真正等待。
+
+用法（在backend目录下执行）:
+    python -m pytest tests
+"""
+
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils.resilience import (
+    CircuitBreaker, ProviderError, ProviderUnavailable, ResiliencePolicy, classify_exception
+)
+
+
+class FakeClock:
+    """假时钟，sleep 只推进时间"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class APIStatusError(Exception):
+    """模拟 openai/anthropic SDK 的异常：带 status_code 和 response"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f'HTTP {status_code}')
+        self.status_code = status_code
+        self.response = FakeResponse(headers or {})
+
+
+class GoogleAPIError(Exception):
+    """模拟 google-api-core 的异常：带整数 code"""
+
+    def __init__(self, code):
+        super().__init__(f'code {code}')
+        self.code = code
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_policy(clock, **kwargs):
+    options = dict(max_attempts=3, base_delay=1.0, max_delay=8.0, attempt_timeout=30.0, total_timeout=100.0,
+                   breaker_failures=0, rng=lambda: 1.0, clock=clock, sleep=clock.sleep)
+    options.update(kwargs)
+    return ResiliencePolicy(**options)
+
+
+def failing(errors, clock=None, elapsed=0.0):
+    """依次抛出 errors 中的异常，之后返回 'ok'；每次调用推进假时钟 elapsed 秒"""
+    calls = []
+
+    def func(arg):
+        calls.append(arg)
+        if clock is not None:
+            clock.now += elapsed
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return 'ok'
+    func.calls = calls
+    return func
+
+
+# ---------- classify_exception ----------
+
+def test_classify_429_with_retry_after_seconds():
+    assert classify_exception(APIStatusError(429, {'retry-after': '7'})) == (True, 429, 7.0)
+
+
+def test_classify_429_with_retry_after_ms():
+    assert classify_exception(APIStatusError(429, {'retry-after-ms': '1500', 'retry-after': '7'})) == (True, 429, 1.5)
+
+
+def test_classify_429_with_retry_after_http_date():
+    when = datetime.now(timezone.utc) + timedelta(seconds=30)
+    retryable, status, retry_after = classify_exception(APIStatusError(429, {'retry-after': format_datetime(when)}))
+    assert (retryable, status) == (True, 429)
+    assert 25 <= retry_after <= 30
+
+
+@pytest.mark.parametrize('status', [500, 502, 503, 504, 529])
+def test_classify_server_errors_are_retryable(status):
+    assert classify_exception(APIStatusError(status)) == (True, status, None)
+
+
+def test_classify_google_integer_code():
+    assert classify_exception(GoogleAPIError(503)) == (True, 503, None)
+
+
+@pytest.mark.parametrize('status', [400, 401, 403, 404, 422])
+def test_classify_client_errors_are_not_retryable(status):
+    assert classify_exception(APIStatusError(status)) == (False, status, None)
+
+
+@pytest.mark.parametrize('error', [TimeoutError(), ConnectionError(), APITimeoutError()])
+def test_classify_timeouts_and_connection_errors_are_retryable(error):
+    assert classify_exception(error) == (True, None, None)
+
+
+def test_classify_other_exceptions_are_not_retryable():
+    assert classify_exception(ValueError('bad image')) == (False, None, None)
+
+
+def test_classify_provider_error_keeps_its_classification():
+    error = ProviderError.wrap('调用失败', APIStatusError(429, {'retry-after': '3'}))
+    assert classify_exception(error) == (True, 429, 3.0)
+
+
+# ---------- CircuitBreaker ----------
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker('m', failure_threshold=2, reset_timeout=10.0, clock=clock)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 4
+    with pytest.raises(ProviderUnavailable) as info:
+        breaker.before_call()
+    assert info.value.retry_after == pytest.approx(6.0)
+
+
+def test_breaker_success_resets_failure_count(clock):
+    breaker = CircuitBreaker('m', failure_threshold=2, reset_timeout=10.0, clock=clock)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_half_open_allows_single_probe_then_closes(clock):
+    breaker = CircuitBreaker('m', failure_threshold=1, reset_timeout=10.0, clock=clock)
+    breaker.record_failure()
+    clock.now += 10
+
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # 探测请求未结束时其他调用仍被拒绝
+    with pytest.raises(ProviderUnavailable):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_breaker_failed_probe_reopens(clock):
+    breaker = CircuitBreaker('m', failure_threshold=1, reset_timeout=10.0, clock=clock)
+    breaker.record_failure()
+    clock.now += 10
+    breaker.before_call()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    # 重新打开后从探测失败的时刻起计时
+    clock.now += 9
+    with pytest.raises(ProviderUnavailable):
+        breaker.before_call()
+    clock.now += 1
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_breaker_release_frees_probe(clock):
+    breaker = CircuitBreaker('m', failure_threshold=1, reset_timeout=10.0, clock=clock)
+    breaker.record_failure()
+    clock.now += 10
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_breaker_disabled_with_zero_threshold(clock):
+    breaker = CircuitBreaker('m', failure_threshold=0, clock=clock)
+    for _ in range(10):
+        breaker.record_failure()
+    breaker.before_call()
+
+
+# ---------- ResiliencePolicy ----------
+
+def test_policy_retries_with_exponential_backoff(clock):
+    policy = make_policy(clock, max_attempts=4)
+    func = failing([APIStatusError(503)] * 3)
+    assert policy.call('m', func, 'img') == 'ok'
+    assert func.calls == ['img'] * 4
+    assert clock.sleeps == [1.0, 2.0, 4.0]
+
+
+def test_policy_backoff_capped_and_jittered(clock):
+    policy = make_policy(clock, max_attempts=6, base_delay=1.0, max_delay=3.0, rng=lambda: 0.5)
+    policy.call('m', failing([TimeoutError()] * 5), 'img')
+    assert clock.sleeps == [0.5, 1.0, 1.5, 1.5, 1.5]
+
+
+def test_policy_waits_at_least_retry_after(clock):
+    policy = make_policy(clock, rng=lambda: 0.0)
+    func = failing([APIStatusError(429, {'retry-after': '7'})])
+    assert policy.call('m', func, 'img') == 'ok'
+    assert clock.sleeps == [7.0]
+
+
+def test_policy_does_not_retry_client_errors(clock):
+    policy = make_policy(clock)
+    error = APIStatusError(400)
+    func = failing([error])
+    with pytest.raises(APIStatusError) as info:
+        policy.call('m', func, 'img')
+    assert info.value is error
+    assert len(func.calls) == 1
+    assert clock.sleeps == []
+
+
+def test_policy_exhausted(clock):
+    policy = make_policy(clock, max_attempts=3)
+    func = failing([APIStatusError(429, {'retry-after': '2'})] * 3)
+    with pytest.raises(ProviderUnavailable) as info:
+        policy.call('m', func, 'img')
+    assert len(func.calls) == 3
+    assert len(clock.sleeps) == 2
+    assert info.value.status == 429
+    assert info.value.retry_after == 2.0
+
+
+def test_policy_gives_up_when_retry_after_exceeds_deadline(clock):
+    policy = make_policy(clock, total_timeout=5.0)
+    func = failing([APIStatusError(503, {'retry-after': '10'})])
+    with pytest.raises(ProviderUnavailable) as info:
+        policy.call('m', func, 'img')
+    assert len(func.calls) == 1
+    assert clock.sleeps == []
+    assert info.value.retry_after == 10.0
+
+
+def test_policy_gives_up_when_attempts_use_up_deadline(clock):
+    policy = make_policy(clock, max_attempts=10, total_timeout=10.0)
+    func = failing([TimeoutError()] * 10, clock=clock, elapsed=6.0)
+    with pytest.raises(ProviderUnavailable):
+        policy.call('m', func, 'img')
+    # 第1次在 t+6 失败，等待1秒；第2次在 t+13 失败，已超过截止时间
+    assert len(func.calls) == 2
+    assert clock.sleeps == [1.0]
+
+
+def test_policy_request_timeout_shrinks_with_deadline(clock):
+    policy = make_policy(clock, attempt_timeout=30.0, total_timeout=40.0)
+    timeouts = []
+
+    def func(arg):
+        timeouts.append(policy.request_timeout())
+        clock.now += 25
+        if len(timeouts) == 1:
+            raise TimeoutError()
+        return 'ok'
+
+    assert policy.call('m', func, 'img') == 'ok'
+    assert timeouts == [30.0, pytest.approx(40.0 - 25 - 1.0)]
+    # 调用结束后恢复为单次尝试的超时
+    assert policy.request_timeout() == 30.0
+
+
+def test_policy_opens_breaker_and_rejects_without_calling(clock):
+    policy = make_policy(clock, max_attempts=5, breaker_failures=2, breaker_reset=30.0)
+    func = failing([APIStatusError(503)] * 5)
+    with pytest.raises(ProviderUnavailable):
+        policy.call('m', func, 'img')
+    assert len(func.calls) == 2
+    assert policy.stats() == {'m': CircuitBreaker.OPEN}
+
+    with pytest.raises(ProviderUnavailable):
+        policy.call('m', func, 'img')
+    assert len(func.calls) == 2
+
+
+def test_policy_client_error_does_not_trip_breaker(clock):
+    policy = make_policy(clock, breaker_failures=1)
+    with pytest.raises(APIStatusError):
+        policy.call('m', failing([APIStatusError(400)]), 'img')
+    assert policy.stats() == {'m': CircuitBreaker.CLOSED}
+    assert policy.call('m', failing([]), 'img') == 'ok'
+
+
+def test_policy_async_retries(clock):
+    policy = make_policy(clock, rng=lambda: 0.0)
+    func = failing([APIStatusError(502), APIStatusError(502)])
+
+    async def call(arg):
+        return func(arg)
+
+    assert asyncio.run(policy.call_async('m', call, 'img')) == 'ok'
+    assert len(func.calls) == 3
+
+
+def test_policy_async_exhausted(clock):
+    policy = make_policy(clock, max_attempts=2, rng=lambda: 0.0)
+
+    async def call(arg):
+        raise APIStatusError(503)
+
+    with pytest.raises(ProviderUnavailable):
+        asyncio.run(policy.call_async('m', call, 'img'))
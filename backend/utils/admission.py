@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import functools
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from flask import current_app
+from flask_jwt_extended import get_jwt_identity
+from utils.metrics import metrics
+
+# 等待并发名额时轮询共享状态的间隔（秒），同一进程内释放名额时会立即唤醒
+POLL_INTERVAL = 0.05
+# 每多少次取令牌清理一次长时间未使用的令牌桶
+BUCKET_CLEANUP_EVERY = 1000
+
+
+class AdmissionRejected(Exception):
+    """请求被准入控制拒绝，调用方返回429并通过 Retry-After 告知客户端何时重试"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f'请求被限流: {reason}')
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def _refill(tokens, updated, rate, capacity, now):
+    """按经过的时间补充令牌"""
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+class MemoryAdmissionBackend:
+    """进程内状态，只适用于单进程部署（开发环境、测试）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._leases = {}
+
+    def take(self, buckets, now):
+        with self._lock:
+            levels, wait = [], 0.0
+            for key, rate, capacity in buckets:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                tokens = _refill(tokens, updated, rate, capacity, now)
+                levels.append(tokens)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+            if wait:
+                return wait
+            for (key, _, _), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens - 1, now)
+            return 0.0
+
+    def acquire(self, key, limit, lease_id, expires, now):
+        with self._lock:
+            leases = self._leases.setdefault(key, {})
+            for expired in [lid for lid, deadline in leases.items() if deadline <= now]:
+                del leases[expired]
+            if len(leases) >= limit:
+                return False
+            leases[lease_id] = expires
+            return True
+
+    def release(self, key, lease_id):
+        with self._lock:
+            self._leases.get(key, {}).pop(lease_id, None)
+
+    def in_flight(self, key, now):
+        with self._lock:
+            return sum(1 for deadline in self._leases.get(key, {}).values() if deadline > now)
+
+
+class SQLiteAdmissionBackend:
+    """
+    本机SQLite文件中的共享状态，同一台机器上的所有worker共用
+
+    每次操作在一个 BEGIN IMMEDIATE 事务中完成，SQLite对写事务串行化，
+    因此“读取-计算-写回”是原子的。状态丢失只会让限额重新计满，关闭同步写盘以降低开销。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS leases (id TEXT PRIMARY KEY, key TEXT NOT NULL, expires REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS ix_leases_key_expires ON leases (key, expires);
+        ''')
+        self._ops = 0
+
+    def _connect(self):
+        # sqlite3连接不能跨线程和fork使用，每个进程的每个线程各自打开
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def take(self, buckets, now):
+        with self._transaction() as conn:
+            levels, wait = [], 0.0
+            for key, rate, capacity in buckets:
+                row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+                tokens = _refill(row[0], row[1], rate, capacity, now) if row else capacity
+                levels.append(tokens)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+            if wait:
+                return wait
+            conn.executemany(
+                'INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                [(key, tokens - 1, now) for (key, _, _), tokens in zip(buckets, levels)]
+            )
+            self._ops += 1
+            if self._ops % BUCKET_CLEANUP_EVERY == 0:
+                # 一天未使用的令牌桶早已补满，删除后与新建等价
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - 86400,))
+            return 0.0
+
+    def acquire(self, key, limit, lease_id, expires, now):
+        with self._transaction() as conn:
+            # 持有名额的worker崩溃时，租约到期后自动释放
+            conn.execute('DELETE FROM leases WHERE key = ? AND expires <= ?', (key, now))
+            count = conn.execute('SELECT COUNT(*) FROM leases WHERE key = ?', (key,)).fetchone()[0]
+            if count >= limit:
+                return False
+            conn.execute('INSERT INTO leases (id, key, expires) VALUES (?, ?, ?)', (lease_id, key, expires))
+            return True
+
+    def release(self, key, lease_id):
+        self._connect().execute('DELETE FROM leases WHERE id = ?', (lease_id,))
+
+    def in_flight(self, key, now):
+        return self._connect().execute(
+            'SELECT COUNT(*) FROM leases WHERE key = ? AND expires > ?', (key, now)
+        ).fetchone()[0]
+
+
+# 令牌桶：KEYS为各个桶，ARGV为 now, 以及每个桶的 rate, capacity；全部有令牌时才同时扣减
+_TAKE_SCRIPT = '''
+local now = tonumber(ARGV[1])
+local wait = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - 1), 'updated', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return '0'
+'''
+
+# 并发名额：有序集合的成员为租约ID，分数为到期时间
+_ACQUIRE_SCRIPT = '''
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[3])
+redis.call('EXPIREAT', KEYS[1], math.ceil(tonumber(ARGV[4])) + 1)
+return 1
+'''
+
+
+class RedisAdmissionBackend:
+    """Redis兼容后端，多台机器共享限额；每次操作是一个Lua脚本，天然原子"""
+
+    def __init__(self, url, prefix='admission:'):
+        # 延迟导入，未使用Redis时无需安装
+        import redis
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+        self._acquire = self._client.register_script(_ACQUIRE_SCRIPT)
+
+    def take(self, buckets, now):
+        args = [now]
+        for _, rate, capacity in buckets:
+            args += [rate, capacity]
+        return float(self._take(keys=[self.prefix + key for key, _, _ in buckets], args=args))
+
+    def acquire(self, key, limit, lease_id, expires, now):
+        return bool(self._acquire(keys=[self.prefix + key], args=[now, limit, lease_id, expires]))
+
+    def release(self, key, lease_id):
+        self._client.zrem(self.prefix + key, lease_id)
+
+    def in_flight(self, key, now):
+        return self._client.zcount(self.prefix + key, f'({now}', '+inf')
+
+
+class AdmissionController:
+    """
+    AI接口的准入控制
+
+    1. 令牌桶：每个用户一个桶，另有一个全局桶，两者都有令牌时才放行，否则立即拒绝；
+    2. 并发名额：每个AI模型同时在途的调用数有上限（所有worker共享）；
+    3. 等待队列：名额已满时请求在本进程中排队等待，队列已满或等待超时则拒绝。
+    速率为0表示不限速，并发上限为0表示不限并发。
+    """
+
+    def __init__(self, backend, user_rate=0.0, user_burst=1, global_rate=0.0, global_burst=1,
+                 max_concurrent=0, provider_limits=None, queue_size=8, queue_timeout=10.0,
+                 lease_ttl=130.0, retry_after=5, logger=None):
+        self.backend = backend
+        self.user_rate = user_rate
+        self.user_burst = max(1, user_burst)
+        self.global_rate = global_rate
+        self.global_burst = max(1, global_burst)
+        self.max_concurrent = max_concurrent
+        self.provider_limits = provider_limits or {}
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.lease_ttl = lease_ttl
+        self.retry_after = retry_after
+        self._logger = logger
+        self._waiters = {}
+        self._waiters_lock = threading.Lock()
+        self._released = threading.Condition()
+
+    def check_rate(self, user_id):
+        """扣减用户桶和全局桶的令牌，任一不足时抛出 AdmissionRejected"""
+        buckets = []
+        if self.user_rate > 0:
+            buckets.append((f'user:{user_id}', self.user_rate, self.user_burst))
+        if self.global_rate > 0:
+            buckets.append(('global', self.global_rate, self.global_burst))
+        if not buckets:
+            return
+        wait = self.backend.take(buckets, time.time())
+        if wait:
+            metrics.inc('ai_admission_rejected_total', {'reason': 'rate_limited'})
+            raise AdmissionRejected('rate_limited', wait)
+
+    def limit_for(self, provider):
+        return self.provider_limits.get(provider, self.max_concurrent)
+
+    def _try_acquire(self, provider, lease_id):
+        now = time.time()
+        return self.backend.acquire(f'provider:{provider}', self.limit_for(provider), lease_id, now + self.lease_ttl, now)
+
+    def _reject(self, reason):
+        metrics.inc('ai_admission_rejected_total', {'reason': reason})
+        raise AdmissionRejected(reason, self.retry_after)
+
+    def _enqueue(self, provider):
+        """进入本进程的等待队列，队列已满时拒绝"""
+        with self._waiters_lock:
+            if self._waiters.get(provider, 0) >= self.queue_size:
+                queue_full = True
+            else:
+                queue_full = False
+                self._waiters[provider] = self._waiters.get(provider, 0) + 1
+        if queue_full:
+            self._reject('queue_full')
+
+    def _dequeue(self, provider, start):
+        with self._waiters_lock:
+            self._waiters[provider] -= 1
+        metrics.observe('ai_admission_wait_seconds', {'provider': provider}, time.perf_counter() - start)
+
+    def _release(self, provider, lease_id):
+        try:
+            self.backend.release(f'provider:{provider}', lease_id)
+        except Exception as e:
+            # 释放失败时租约到期后自动回收
+            if self._logger:
+                self._logger.warning(f"释放AI并发名额失败: {str(e)}")
+        with self._released:
+            self._released.notify()
+
+    @contextmanager
+    def provider_slot(self, provider):
+        """占用一个AI模型的并发名额，名额已满时在有界队列中等待"""
+        if self.limit_for(provider) <= 0:
+            yield
+            return
+
+        lease_id = uuid.uuid4().hex
+        if not self._try_acquire(provider, lease_id):
+            self._enqueue(provider)
+            start = time.perf_counter()
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject('queue_timeout')
+                    with self._released:
+                        self._released.wait(min(POLL_INTERVAL, remaining))
+                    if self._try_acquire(provider, lease_id):
+                        break
+            finally:
+                self._dequeue(provider, start)
+
+        try:
+            yield
+        finally:
+            self._release(provider, lease_id)
+
+    @asynccontextmanager
+    async def async_provider_slot(self, provider):
+        """
+        provider_slot 的协程版本，供ASGI入口使用
+
+        排队时以 asyncio.sleep 轮询，不占用线程；共享状态的读写（SQLite/Redis）放到线程中执行，
+        不阻塞事件循环。队列长度和等待超时与同步版本共用同一套限制。
+        """
+        if self.limit_for(provider) <= 0:
+            yield
+            return
+
+        lease_id = uuid.uuid4().hex
+        if not await asyncio.to_thread(self._try_acquire, provider, lease_id):
+            self._enqueue(provider)
+            start = time.perf_counter()
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject('queue_timeout')
+                    await asyncio.sleep(min(POLL_INTERVAL, remaining))
+                    if await asyncio.to_thread(self._try_acquire, provider, lease_id):
+                        break
+            finally:
+                self._dequeue(provider, start)
+
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(self._release, provider, lease_id)
+
+    def stats(self):
+        now = time.time()
+        providers = set(self.provider_limits) | set(self._waiters)
+        return {
+            provider: {
+                'limit': self.limit_for(provider),
+                'in_flight': self.backend.in_flight(f'provider:{provider}', now),
+                'waiting': self._waiters.get(provider, 0),
+            }
+            for provider in sorted(providers)
+        }
+
+
+def _parse_limits(value):
+    """解析 模型=上限 的逗号分隔列表，如 claude-3-opus=2,gpt-4-vision=4"""
+    limits = {}
+    for item in value.split(','):
+        if '=' in item:
+            model, limit = item.split('=', 1)
+            limits[model.strip()] = int(limit)
+    return limits
+
+
+def init_admission(app):
+    """根据配置初始化AI接口准入控制"""
+    backend_name = app.config.get('AI_ADMISSION_BACKEND', 'sqlite')
+    if backend_name == 'redis':
+        backend = RedisAdmissionBackend(app.config.get('REDIS_URL'))
+    elif backend_name == 'memory':
+        backend = MemoryAdmissionBackend()
+    else:
+        backend = SQLiteAdmissionBackend(app.config.get('AI_ADMISSION_SQLITE_PATH', 'admission.db'))
+
+    controller = AdmissionController(
+        backend,
+        user_rate=app.config.get('AI_RATE_LIMIT_USER', 10) / 60.0,
+        user_burst=app.config.get('AI_RATE_LIMIT_USER_BURST', 5),
+        global_rate=app.config.get('AI_RATE_LIMIT_GLOBAL', 120) / 60.0,
+        global_burst=app.config.get('AI_RATE_LIMIT_GLOBAL_BURST', 20),
+        max_concurrent=app.config.get('AI_MAX_CONCURRENT', 4),
+        provider_limits=_parse_limits(app.config.get('AI_MAX_CONCURRENT_OVERRIDES', '')),
+        queue_size=app.config.get('AI_QUEUE_SIZE', 8),
+        queue_timeout=app.config.get('AI_QUEUE_TIMEOUT', 10.0),
+        lease_ttl=app.config.get('AI_LEASE_TTL', 130.0),
+        retry_after=app.config.get('AI_RETRY_AFTER', 5),
+        logger=app.logger
+    )
+    app.extensions['admission'] = controller
+    app.logger.info(f"AI准入控制已初始化，后端: {backend_name}")
+    return controller
+
+
+def get_admission_controller():
+    """获取当前应用的AI准入控制"""
+    return current_app.extensions['admission']
+
+
+def rate_limited(view):
+    """视图装饰器：按当前用户扣减令牌桶，须放在 jwt_required 之后"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        get_admission_controller().check_rate(get_jwt_identity())
+        return view(*args, **kwargs)
+    return wrapper
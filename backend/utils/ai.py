@@ -2,14 +2,101 @@
 # -*- coding: utf-8 -*-
 
 import os
-import requests
+import asyncio
+import importlib
+import threading
 from flask import current_app
-import openai
-import google.generativeai as genai
-from anthropic import Anthropic
 import re
+from utils.metrics import instrument_async_provider, instrument_provider
+from utils.resilience import ProviderError, get_resilience
+from utils.usage import get_usage_tracker, record_response_usage
 
-def parse_chess_notation(image_url, model='gpt-4-vision', is_file_path=False):
+# AI提供者注册表：模型名称 -> (解析函数, SDK模块名)
+# SDK体积较大，只在首次调用对应模型时才导入，避免每个worker都加载全部SDK
+PROVIDERS = {}
+
+# 协程版本的AI提供者注册表：模型名称 -> (解析协程函数, SDK模块名)
+# 只供ASGI入口使用，未注册协程版本的模型在线程中调用同步版本
+ASYNC_PROVIDERS = {}
+
+# 已导入的SDK模块缓存
+_sdk_modules = {}
+_sdk_lock = threading.Lock()
+
+def register_provider(model, sdk_module):
+    """
+    注册AI提供者的装饰器
+    
+    Args:
+        model: 模型名称，即 parse_chess_notation 的 model 参数
+        sdk_module: 该提供者依赖的SDK模块名，首次使用时才导入
+    """
+    def decorator(func):
+        # 注册表中保存带指标采集的版本，按模型记录调用耗时和结果
+        PROVIDERS[model] = (instrument_provider(model, func), sdk_module)
+        return func
+    return decorator
+
+def register_async_provider(model, sdk_module):
+    """
+    注册AI提供者协程版本的装饰器，参数同 register_provider
+    """
+    def decorator(func):
+        ASYNC_PROVIDERS[model] = (instrument_async_provider(model, func), sdk_module)
+        return func
+    return decorator
+
+def load_sdk(module_name):
+    """按需导入SDK模块，多线程下只导入一次"""
+    module = _sdk_modules.get(module_name)
+    if module is not None:
+        return module
+    
+    with _sdk_lock:
+        if module_name not in _sdk_modules:
+            current_app.logger.info(f"首次使用，加载SDK: {module_name}")
+            _sdk_modules[module_name] = importlib.import_module(module_name)
+        return _sdk_modules[module_name]
+
+def preload_providers(app):
+    """
+    预加载 AI_PRELOAD_PROVIDERS 中配置的模型SDK
+    
+    配合gunicorn的preload_app使用时，SDK在master进程中导入一次，
+    worker通过fork共享这部分内存，首个请求也无需等待导入。
+    """
+    for model in app.config.get('AI_PRELOAD_PROVIDERS', []):
+        if model not in PROVIDERS:
+            app.logger.warning(f"预加载的模型未注册: {model}")
+            continue
+        with app.app_context():
+            load_sdk(PROVIDERS[model][1])
+
+def _slotted(model, func):
+    """
+    每次尝试单独占用模型的并发名额
+
+    重试前的退避和 Retry-After 等待可能长达 AI_TOTAL_TIMEOUT，期间不应占着名额让其他请求排队。
+    """
+    from utils.admission import get_admission_controller
+    controller = get_admission_controller()
+
+    def call(*args):
+        with controller.provider_slot(model):
+            return func(*args)
+    return call
+
+def _async_slotted(model, func):
+    """_slotted 的协程版本"""
+    from utils.admission import get_admission_controller
+    controller = get_admission_controller()
+
+    async def call(*args):
+        async with controller.async_provider_slot(model):
+            return await func(*args)
+    return call
+
+def parse_chess_notation(image_url, model='gpt-4-vision', is_file_path=False, user_id=None):
     """
     使用AI模型解析棋谱图片
     
@@ -17,6 +104,7 @@ def parse_chess_notation(image_url, model='gpt-4-vision', is_file_path=False):
         image_url: 图片URL或文件路径
         model: 使用的模型，支持 'gpt-4-vision', 'gemini-pro-vision', 'claude-3-opus'
         is_file_path: 是否直接传入文件路径
+        user_id: 发起调用的用户ID，用于记录用量和检查每日预算
     
     Returns:
         解析后的棋谱步骤
@@ -37,14 +125,60 @@ def parse_chess_notation(image_url, model='gpt-4-vision', is_file_path=False):
         image_path = image_url
     
     # 根据选择的模型调用不同的API
-    if model == 'gpt-4-vision':
-        return parse_with_gpt4_vision(image_path)
-    elif model == 'gemini-pro-vision':
-        return parse_with_gemini(image_path)
-    elif model == 'claude-3':
-        return parse_with_claude(image_path)
-    else:
+    if model not in PROVIDERS:
         raise ValueError(f"不支持的模型: {model}")
+    
+    parse_func, _ = PROVIDERS[model]
+    # 用户当天的费用超过预算时抛出 AdmissionRejected
+    tracker = get_usage_tracker()
+    tracker.check_budget(user_id)
+    send_path = shrink_image(image_path, current_app.config.get('AI_MAX_IMAGE_EDGE', 0))
+    # 临时错误按策略重试，模型不可用时抛出 ProviderUnavailable；
+    # 每次尝试占用该模型的一个并发名额，名额已满时排队等待或抛出 AdmissionRejected
+    try:
+        with tracker.track(model, user_id, send_path):
+            return get_resilience().call(model, _slotted(model, parse_func), send_path)
+    finally:
+        if send_path != image_path:
+            os.remove(send_path)
+
+async def parse_chess_notation_async(image_path, model='gpt-4-vision', user_id=None):
+    """
+    parse_chess_notation 的协程版本，需在应用上下文中调用
+
+    等待模型响应期间不占用线程，一个事件循环可以同时挂起大量请求；
+    没有协程版本的模型在线程中调用同步版本。
+
+    Args:
+        image_path: 本地图片文件路径
+        model: 使用的模型
+        user_id: 发起调用的用户ID，用于记录用量和检查每日预算
+
+    Returns:
+        解析后的棋谱步骤
+    """
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"图片文件不存在: {image_path}")
+    if model not in PROVIDERS:
+        raise ValueError(f"不支持的模型: {model}")
+
+    policy = get_resilience()
+    tracker = get_usage_tracker()
+    await asyncio.to_thread(tracker.check_budget, user_id)
+    send_path = await asyncio.to_thread(shrink_image, image_path, current_app.config.get('AI_MAX_IMAGE_EDGE', 0))
+    try:
+        async with tracker.track_async(model, user_id, send_path):
+            if model in ASYNC_PROVIDERS:
+                parse_func, sdk_module = ASYNC_PROVIDERS[model]
+                if sdk_module not in _sdk_modules:
+                    # 首次导入SDK耗时较长，不在事件循环中执行
+                    await asyncio.to_thread(load_sdk, sdk_module)
+                return await policy.call_async(model, _async_slotted(model, parse_func), send_path)
+            parse_func, _ = PROVIDERS[model]
+            return await asyncio.to_thread(policy.call, model, _slotted(model, parse_func), send_path)
+    finally:
+        if send_path != image_path:
+            os.remove(send_path)
 
 def normalize_chess_notation(moves):
     """
@@ -96,6 +230,119 @@ def normalize_chess_notation(moves):
     
     return '\n'.join(normalized_lines)
 
+# 棋谱解析的提示词，同步和异步调用共用
+OPENAI_SYSTEM_PROMPT = "你是一个国际象棋专家，擅长解析棋谱图片。请分析图片中的棋谱，并以标准代数记号(SAN)格式返回所有步骤。请确保格式正确，每步棋必须包含白方和黑方的走法在同一行，例如：'1. e4 e5'，而不是分开显示。如果某一步只有一方的走法，也要保持格式一致。只返回棋步，不要有其他解释。"
+OPENAI_USER_PROMPT = "请解析这张棋谱图片，以标准代数记号(SAN)格式返回所有步骤。确保每步棋都包含白方和黑方的走法在同一行，例如：'1. e4 e5'，'2. Nf3 Nc6'等。"
+CHESS_PROMPT = "你是一个国际象棋专家，擅长解析棋谱图片。请分析图片中的棋谱，并以标准代数记号(SAN)格式返回所有步骤。请确保格式正确，每步棋必须包含白方和黑方的走法在同一行，例如：'1. e4 e5'，'2. Nf3 Nc6'等，而不是分开显示。如果某一步只有一方的走法，也要保持格式一致。只返回棋步，不要有其他解释。"
+
+def _image_mime_type(image_path):
+    """根据扩展名确定图片MIME类型，未知类型按jpeg处理"""
+    file_extension = os.path.splitext(image_path)[1].lower()
+    if file_extension == '.png':
+        return 'image/png'
+    return 'image/jpeg'
+
+def shrink_image(image_path, max_edge):
+    """
+    长边超过 max_edge 像素的本地图片按比例缩小，另存为临时文件
+
+    模型把图片切分为图块计入输入token，超大图片的费用成倍增加，识别效果却没有提升。
+    PNG保持PNG，其他格式转为JPEG；无法识别的文件原样发送。
+
+    Returns:
+        实际发送的图片路径，未缩小时为原路径
+    """
+    if not max_edge or not os.path.isfile(image_path):
+        return image_path
+    from PIL import Image
+    try:
+        with Image.open(image_path) as image:
+            if max(image.size) <= max_edge:
+                return image_path
+            original_size = image.size
+            image.thumbnail((max_edge, max_edge))
+            root, ext = os.path.splitext(image_path)
+            if ext.lower() == '.png':
+                target = f"{root}.ai.png"
+                image.save(target, 'PNG', optimize=True)
+            else:
+                target = f"{root}.ai.jpg"
+                image.convert('RGB').save(target, 'JPEG', quality=90)
+    except (OSError, Image.DecompressionBombError) as e:
+        current_app.logger.warning(f"缩小图片失败，按原图发送: {str(e)}")
+        return image_path
+    current_app.logger.info(f"图片已缩小: {original_size[0]}x{original_size[1]} -> {image.size[0]}x{image.size[1]}")
+    return target
+
+def _openai_request(image_data):
+    """OpenAI chat.completions.create 的请求参数"""
+    return {
+        "model": "gpt-4-vision-preview",
+        "messages": [
+            {"role": "system", "content": OPENAI_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": OPENAI_USER_PROMPT},
+                    {"type": "image", "image": image_data}
+                ]
+            }
+        ],
+        "max_tokens": 1000,
+    }
+
+def _claude_request(image_base64, media_type):
+    """Anthropic messages.create 的请求参数"""
+    return {
+        "model": "claude-3-opus-20240229",
+        "max_tokens": 1000,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": CHESS_PROMPT},
+                    {
+                        "type": "image",
+                        "source": {"type": "base64", "media_type": media_type, "data": image_base64}
+                    }
+                ]
+            }
+        ],
+    }
+
+def _gemini_model(genai, model_name):
+    """创建Gemini模型实例"""
+    generation_config = {
+        "temperature": 0,
+        "top_p": 1,
+        "top_k": 32,
+        "max_output_tokens": 1024,
+    }
+    safety_settings = [
+        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+    ]
+    return genai.GenerativeModel(
+        model_name=model_name,
+        generation_config=generation_config,
+        safety_settings=safety_settings,
+    )
+
+def _gemini_contents(image_base64, mime_type):
+    """Gemini generate_content 的请求内容"""
+    return [
+        {
+            "role": "user",
+            "parts": [
+                {"text": CHESS_PROMPT},
+                {"inline_data": {"mime_type": mime_type, "data": image_base64}}
+            ]
+        }
+    ]
+
+@register_provider('gpt-4-vision', 'openai')
 def parse_with_gpt4_vision(image_path):
     """使用GPT-4 Vision解析棋谱"""
     # 设置API密钥
@@ -110,7 +357,10 @@ def parse_with_gpt4_vision(image_path):
         original_http_proxy = os.environ.pop('HTTP_PROXY', None)
         original_https_proxy = os.environ.pop('HTTPS_PROXY', None)
         
+        openai = load_sdk('openai')
         openai.api_key = api_key
+        # 重试由 utils.resilience 统一负责，关闭SDK自带的重试，避免重试次数相乘
+        openai.max_retries = 0
         
         # 打印调试信息
         current_app.logger.info(f"解析图片路径: {image_path}")
@@ -138,23 +388,8 @@ def parse_with_gpt4_vision(image_path):
         try:
             # 调用API
             current_app.logger.info("开始调用 OpenAI API...")
-            response = openai.chat.completions.create(
-                model="gpt-4-vision-preview",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一个国际象棋专家，擅长解析棋谱图片。请分析图片中的棋谱，并以标准代数记号(SAN)格式返回所有步骤。请确保格式正确，每步棋必须包含白方和黑方的走法在同一行，例如：'1. e4 e5'，而不是分开显示。如果某一步只有一方的走法，也要保持格式一致。只返回棋步，不要有其他解释。"
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": "请解析这张棋谱图片，以标准代数记号(SAN)格式返回所有步骤。确保每步棋都包含白方和黑方的走法在同一行，例如：'1. e4 e5'，'2. Nf3 Nc6'等。"},
-                            {"type": "image", "image": image_data}
-                        ]
-                    }
-                ],
-                max_tokens=1000
-            )
+            response = openai.chat.completions.create(**_openai_request(image_data), timeout=get_resilience().request_timeout())
+            record_response_usage(response)
             
             # 提取结果
             moves = response.choices[0].message.content.strip()
@@ -167,7 +402,7 @@ def parse_with_gpt4_vision(image_path):
             return normalized_moves
         except Exception as e:
             current_app.logger.error(f"调用 OpenAI API 失败: {str(e)}")
-            raise RuntimeError(f"调用 OpenAI API 失败: {str(e)}")
+            raise ProviderError.wrap("调用 OpenAI API 失败", e)
     finally:
         # 恢复环境变量中的代理设置
         if original_http_proxy:
@@ -175,6 +410,7 @@ def parse_with_gpt4_vision(image_path):
         if original_https_proxy:
             os.environ['HTTPS_PROXY'] = original_https_proxy
 
+@register_provider('gemini-pro-vision', 'google.generativeai')
 def parse_with_gemini(image_path):
     """使用Gemini Pro Vision解析棋谱"""
     # 设置API密钥
@@ -186,6 +422,7 @@ def parse_with_gemini(image_path):
     
 
     # 配置Gemini API
+    genai = load_sdk('google.generativeai')
     genai.configure(api_key=api_key)
     
     # 从配置文件获取模型名称
@@ -197,7 +434,6 @@ def parse_with_gemini(image_path):
     try:
         # 导入必要的库
         import base64
-        import pathlib
         
         # 读取图片文件为base64
         with open(image_path, "rb") as image_file:
@@ -205,62 +441,22 @@ def parse_with_gemini(image_path):
             current_app.logger.info(f"读取本地图片成功，大小: {len(image_bytes)} 字节")
         
         # 确定图片MIME类型
-        file_extension = pathlib.Path(image_path).suffix.lower()
-        if file_extension in ['.jpg', '.jpeg']:
-            mime_type = 'image/jpeg'
-        elif file_extension == '.png':
-            mime_type = 'image/png'
-        else:
-            mime_type = 'image/jpeg'  # 默认使用jpeg
+        mime_type = _image_mime_type(image_path)
         
         current_app.logger.info(f"图片MIME类型: {mime_type}")
         
-        # 创建模型配置
-        generation_config = {
-            "temperature": 0,
-            "top_p": 1,
-            "top_k": 32,
-            "max_output_tokens": 1024,
-        }
-        
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-        ]
-        
         # 创建模型实例
-        model = genai.GenerativeModel(
-            model_name=model_name,
-            generation_config=generation_config,
-            safety_settings=safety_settings,
-        )
+        model = _gemini_model(genai, model_name)
         
         current_app.logger.info(f"开始调用 Gemini API，模型: {model_name}...")
         
-        # 将图片转换为base64字符串
-        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-        
         # 创建请求内容
-        contents = [
-            {
-                "role": "user",
-                "parts": [
-                    {"text": "你是一个国际象棋专家，擅长解析棋谱图片。请分析图片中的棋谱，并以标准代数记号(SAN)格式返回所有步骤。请确保格式正确，每步棋必须包含白方和黑方的走法在同一行，例如：'1. e4 e5'，'2. Nf3 Nc6'等，而不是分开显示。如果某一步只有一方的走法，也要保持格式一致。只返回棋步，不要有其他解释。"},
-                    {
-                        "inline_data": {
-                            "mime_type": mime_type,
-                            "data": image_base64
-                        }
-                    }
-                ]
-            }
-        ]
+        contents = _gemini_contents(base64.b64encode(image_bytes).decode('utf-8'), mime_type)
         
         # 调用API
         current_app.logger.info("发送请求到Gemini API...")
-        response = model.generate_content(contents)
+        response = model.generate_content(contents, request_options={'timeout': get_resilience().request_timeout()})
+        record_response_usage(response, model_name)
         
         # 提取结果
         moves = response.text.strip()
@@ -276,8 +472,9 @@ def parse_with_gemini(image_path):
         # 打印更详细的错误信息
         import traceback
         current_app.logger.error(f"详细错误: {traceback.format_exc()}")
-        raise RuntimeError(f"调用 Gemini API 失败: {str(e)}")
+        raise ProviderError.wrap("调用 Gemini API 失败", e)
 
+@register_provider('claude-3', 'anthropic')
 def parse_with_claude(image_path):
     """使用Claude 3解析棋谱"""
     # 设置API密钥
@@ -292,8 +489,9 @@ def parse_with_claude(image_path):
         original_http_proxy = os.environ.pop('HTTP_PROXY', None)
         original_https_proxy = os.environ.pop('HTTPS_PROXY', None)
         
-        # 创建Anthropic客户端，只传入必要的参数
-        client = Anthropic(api_key=api_key)
+        # 创建Anthropic客户端，只传入必要的参数；重试由 utils.resilience 统一负责
+        anthropic = load_sdk('anthropic')
+        client = anthropic.Anthropic(api_key=api_key, max_retries=0)
         
         current_app.logger.info(f"解析图片路径: {image_path}")
         current_app.logger.info(f"使用模型: claude-3-opus-20240229")
@@ -308,13 +506,7 @@ def parse_with_claude(image_path):
                 image_base64 = base64.b64encode(image_bytes).decode('utf-8')
                 
                 # 构建媒体类型
-                file_extension = os.path.splitext(image_path)[1].lower()
-                if file_extension in ['.jpg', '.jpeg']:
-                    media_type = 'image/jpeg'
-                elif file_extension == '.png':
-                    media_type = 'image/png'
-                else:
-                    media_type = 'image/jpeg'  # 默认使用jpeg
+                media_type = _image_mime_type(image_path)
         except Exception as e:
             current_app.logger.error(f"读取图片文件失败: {str(e)}")
             raise FileNotFoundError(f"无法读取图片文件: {str(e)}")
@@ -322,29 +514,8 @@ def parse_with_claude(image_path):
         current_app.logger.info("开始调用 Claude API...")
         
         # 调用Claude API
-        response = client.messages.create(
-            model="claude-3-opus-20240229",
-            max_tokens=1000,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "你是一个国际象棋专家，擅长解析棋谱图片。请分析图片中的棋谱，并以标准代数记号(SAN)格式返回所有步骤。请确保格式正确，每步棋必须包含白方和黑方的走法在同一行，例如：'1. e4 e5'，'2. Nf3 Nc6'等，而不是分开显示。如果某一步只有一方的走法，也要保持格式一致。只返回棋步，不要有其他解释。"
-                        },
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": media_type,
-                                "data": image_base64
-                            }
-                        }
-                    ]
-                }
-            ]
-        )
+        response = client.messages.create(**_claude_request(image_base64, media_type), timeout=get_resilience().request_timeout())
+        record_response_usage(response)
         
         # 提取结果
         moves = response.content[0].text.strip()
@@ -357,10 +528,127 @@ def parse_with_claude(image_path):
         return normalized_moves
     except Exception as e:
         current_app.logger.error(f"调用 Claude API 失败: {str(e)}")
-        raise RuntimeError(f"调用 Claude API 失败: {str(e)}")
+        raise ProviderError.wrap("调用 Claude API 失败", e)
     finally:
         # 恢复环境变量中的代理设置
         if original_http_proxy:
             os.environ['HTTP_PROXY'] = original_http_proxy
         if original_https_proxy:
-            os.environ['HTTPS_PROXY'] = original_https_proxy 
\ No newline at end of file
+            os.environ['HTTPS_PROXY'] = original_https_proxy 
+
+# 异步客户端缓存：(SDK, API密钥, 事件循环) -> 客户端
+# 客户端的连接池绑定创建它的事件循环，每个worker的事件循环各自复用一个客户端
+_async_clients = {}
+
+def _async_client(sdk, client_class, api_key):
+    """获取或创建当前事件循环的异步客户端"""
+    key = (sdk.__name__, api_key, asyncio.get_running_loop())
+    client = _async_clients.get(key)
+    if client is None:
+        # 不读取环境变量中的代理设置，作用同同步版本中临时清除 HTTP(S)_PROXY，
+        # 但不修改进程级的环境变量，并发请求之间互不影响。
+        # 较新的SDK提供带默认超时和连接数的 DefaultAsyncHttpxClient，旧版本直接使用httpx
+        http_client_class = getattr(sdk, 'DefaultAsyncHttpxClient', None)
+        if http_client_class is None:
+            import httpx
+            http_client_class = httpx.AsyncClient
+        client = client_class(api_key=api_key, http_client=http_client_class(trust_env=False), max_retries=0)
+        _async_clients[key] = client
+    return client
+
+async def close_async_clients():
+    """关闭当前事件循环创建的异步客户端，在ASGI应用关闭时调用"""
+    loop = asyncio.get_running_loop()
+    for key in [key for key in _async_clients if key[2] is loop]:
+        client = _async_clients.pop(key)
+        await client.close()
+
+def _read_image(image_path):
+    import base64
+    with open(image_path, "rb") as image_file:
+        return base64.b64encode(image_file.read()).decode('utf-8')
+
+@register_async_provider('gpt-4-vision', 'openai')
+async def parse_with_gpt4_vision_async(image_path):
+    """使用GPT-4 Vision解析棋谱（协程版本）"""
+    api_key = current_app.config.get('OPENAI_API_KEY')
+    if not api_key:
+        return parse_with_gpt4_vision(image_path)
+
+    openai = load_sdk('openai')
+    client = _async_client(openai, openai.AsyncOpenAI, api_key)
+    try:
+        image_base64 = await asyncio.to_thread(_read_image, image_path)
+    except Exception as e:
+        current_app.logger.error(f"读取图片文件失败: {str(e)}")
+        raise FileNotFoundError(f"无法读取图片文件: {str(e)}")
+
+    try:
+        current_app.logger.info("开始调用 OpenAI API...")
+        response = await client.chat.completions.create(
+            **_openai_request({"data": f"data:image/jpeg;base64,{image_base64}"}),
+            timeout=get_resilience().request_timeout()
+        )
+        record_response_usage(response)
+        moves = response.choices[0].message.content.strip()
+        current_app.logger.info(f"API调用成功，解析结果: {moves[:100]}...")
+        return normalize_chess_notation(moves)
+    except Exception as e:
+        current_app.logger.error(f"调用 OpenAI API 失败: {str(e)}")
+        raise ProviderError.wrap("调用 OpenAI API 失败", e)
+
+@register_async_provider('gemini-pro-vision', 'google.generativeai')
+async def parse_with_gemini_async(image_path):
+    """使用Gemini Pro Vision解析棋谱（协程版本）"""
+    api_key = current_app.config.get('GEMINI_API_KEY')
+    if not api_key:
+        return parse_with_gemini(image_path)
+
+    genai = load_sdk('google.generativeai')
+    genai.configure(api_key=api_key)
+    model_name = current_app.config.get('GEMINI_MODEL_NAME', 'gemini-pro-vision')
+
+    try:
+        image_base64 = await asyncio.to_thread(_read_image, image_path)
+        model = _gemini_model(genai, model_name)
+        current_app.logger.info(f"开始调用 Gemini API，模型: {model_name}...")
+        response = await model.generate_content_async(
+            _gemini_contents(image_base64, _image_mime_type(image_path)),
+            request_options={'timeout': get_resilience().request_timeout()}
+        )
+        record_response_usage(response, model_name)
+        moves = response.text.strip()
+        current_app.logger.info(f"API调用成功，解析结果: {moves[:100]}...")
+        return normalize_chess_notation(moves)
+    except Exception as e:
+        current_app.logger.error(f"调用 Gemini API 失败: {str(e)}")
+        raise ProviderError.wrap("调用 Gemini API 失败", e)
+
+@register_async_provider('claude-3', 'anthropic')
+async def parse_with_claude_async(image_path):
+    """使用Claude 3解析棋谱（协程版本）"""
+    api_key = current_app.config.get('ANTHROPIC_API_KEY')
+    if not api_key:
+        return parse_with_claude(image_path)
+
+    anthropic = load_sdk('anthropic')
+    client = _async_client(anthropic, anthropic.AsyncAnthropic, api_key)
+    try:
+        image_base64 = await asyncio.to_thread(_read_image, image_path)
+    except Exception as e:
+        current_app.logger.error(f"读取图片文件失败: {str(e)}")
+        raise FileNotFoundError(f"无法读取图片文件: {str(e)}")
+
+    try:
+        current_app.logger.info("开始调用 Claude API...")
+        response = await client.messages.create(
+            **_claude_request(image_base64, _image_mime_type(image_path)),
+            timeout=get_resilience().request_timeout()
+        )
+        record_response_usage(response)
+        moves = response.content[0].text.strip()
+        current_app.logger.info(f"API调用成功，解析结果: {moves[:100]}...")
+        return normalize_chess_notation(moves)
+    except Exception as e:
+        current_app.logger.error(f"调用 Claude API 失败: {str(e)}")
+        raise ProviderError.wrap("调用 Claude API 失败", e)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from utils.metrics import metrics
+
+# 命中的条目距上次使用超过此时间才更新 last_used_at，避免热门开局局面每次命中都写库
+TOUCH_INTERVAL = timedelta(minutes=1)
+# 超过条目上限时一次淘汰到上限的90%，分摊淘汰的开销
+EVICT_LOW_WATERMARK = 0.9
+EVICT_BATCH_SIZE = 1000
+# 每个进程每写入上限的1%条新条目才统计一次条目数，避免每次写入都 COUNT(*) 全表
+EVICT_CHECK_RATIO = 0.01
+# 缓存的结果字段（FEN 中的半回合计数和回合数因棋谱而异，命中时换成当前局面的FEN）
+RESULT_FIELDS = ('best_move', 'best_move_san', 'score_cp', 'mate', 'pv', 'nodes', 'time_ms', 'nps', 'engine')
+
+
+def position_hash(board):
+    """局面的 polyglot Zobrist 哈希，转换为有符号64位整数以便存入 BIGINT 列"""
+    import chess.polyglot
+    value = chess.polyglot.zobrist_hash(board)
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _budget(movetime_ms):
+    """搜索时间，None（不限）视为无穷大以便比较"""
+    return float('inf') if movetime_ms is None else movetime_ms
+
+
+class AnalysisCache:
+    """
+    持久化的局面分析结果缓存
+
+    不同棋谱的开局大量重合，同一局面只需搜索一次。按 (Zobrist哈希, 引擎版本) 每个局面保留一条结果：
+    新结果比已有的更深时替换，不会被更浅的结果覆盖。下列情况视为命中：
+      - 已完成的深度不低于请求的深度；
+      - 结果是已证明的将杀（迭代加深先找到最快的将杀，再加深结果不变）；
+      - 产生结果的搜索要求的深度和时间都不少于本次请求（搜索因超时停在较浅的深度，
+        重新搜索同样会停在那里）。
+    条目数超过 max_entries 时按 last_used_at 淘汰最久未用的条目（LRU）。统计条目数需要扫描全表，
+    每个进程累计写入 max_entries 的1%条新条目后才检查一次，多个worker时条目数可能略超上限。
+
+    缓存只是加速手段，读写失败时记录警告并按未命中处理，不影响分析本身。
+    """
+
+    def __init__(self, db, max_entries=500000, logger=None):
+        """
+        Args:
+            db: Flask-SQLAlchemy实例
+            max_entries: 缓存条目数上限
+        """
+        from models.analysis import AnalysisCacheEntry
+        self._db = db
+        self._entries = AnalysisCacheEntry.__table__
+        self.max_entries = max_entries
+        self._logger = logger
+        self._inserted = 0
+        self._inserted_lock = threading.Lock()
+
+    @staticmethod
+    def covers(row, depth, movetime_ms):
+        """缓存的结果是否满足本次请求的深度和时间"""
+        if row['depth'] >= depth or row['mate'] is not None:
+            return True
+        return row['target_depth'] >= depth and _budget(row['movetime_ms']) >= _budget(movetime_ms)
+
+    @staticmethod
+    def _better(result, target_depth, movetime_ms, row):
+        """新结果是否应替换已缓存的结果：更深，或同样深度而搜索要求的深度和时间都不少于原来的"""
+        if result['depth'] != row['depth']:
+            return result['depth'] > row['depth']
+        wider = (target_depth, _budget(movetime_ms))
+        current = (row['target_depth'], _budget(row['movetime_ms']))
+        return wider != current and wider[0] >= current[0] and wider[1] >= current[1]
+
+    def _rows(self, conn, hashes, engine):
+        entries = self._entries
+        return {row['position_hash']: row for row in conn.execute(
+            sa.select(entries).where(entries.c.engine == engine, entries.c.position_hash.in_(list(hashes)))
+        ).mappings()}
+
+    def lookup(self, hashes, engine, depth, movetime_ms):
+        """
+        查找满足请求的缓存结果，并刷新命中条目的最近使用时间
+
+        Args:
+            hashes: 局面哈希集合
+            engine: 引擎版本标识
+            depth: 请求的搜索深度
+            movetime_ms: 请求的每个局面的搜索时间（毫秒），None表示不限
+
+        Returns:
+            {局面哈希: 分析结果（不含FEN）}
+        """
+        if not hashes:
+            return {}
+        now = datetime.utcnow()
+        try:
+            with self._db.engine.begin() as conn:
+                rows = self._rows(conn, hashes, engine)
+                hits = {key: row for key, row in rows.items() if self.covers(row, depth, movetime_ms)}
+                stale = [row['id'] for row in hits.values() if row['last_used_at'] < now - TOUCH_INTERVAL]
+                if stale:
+                    entries = self._entries
+                    conn.execute(entries.update().where(entries.c.id.in_(stale)).values(last_used_at=now))
+        except Exception as e:
+            if self._logger:
+                self._logger.warning(f"读取分析缓存失败: {str(e)}")
+            return {}
+        return {key: dict(json.loads(row['result']), depth=row['depth']) for key, row in hits.items()}
+
+    def store(self, results, engine, target_depth, movetime_ms):
+        """
+        写入新的分析结果，已缓存的结果只被更深的结果替换
+
+        Args:
+            results: {局面哈希: 分析结果}
+            engine: 引擎版本标识
+            target_depth: 产生这些结果的搜索要求的深度
+            movetime_ms: 产生这些结果的搜索时间（毫秒），None表示不限
+        """
+        if not results:
+            return
+        now = datetime.utcnow()
+        entries = self._entries
+        try:
+            with self._db.engine.begin() as conn:
+                rows = self._rows(conn, results.keys(), engine)
+                inserts, updates = [], []
+                for key, result in results.items():
+                    values = {
+                        'depth': result['depth'],
+                        'target_depth': target_depth,
+                        'movetime_ms': movetime_ms,
+                        'result': json.dumps({field: result[field] for field in RESULT_FIELDS}, ensure_ascii=False),
+                        'mate': result['mate'],
+                        'last_used_at': now,
+                    }
+                    row = rows.get(key)
+                    if row is None:
+                        inserts.append(dict(values, position_hash=key, engine=engine, created_at=now))
+                    elif self._better(result, target_depth, movetime_ms, row):
+                        updates.append(dict(values, entry_id=row['id']))
+                if inserts:
+                    conn.execute(entries.insert(), inserts)
+                if updates:
+                    conn.execute(entries.update().where(entries.c.id == sa.bindparam('entry_id')), updates)
+            if inserts and self._should_check(len(inserts)):
+                self.evict()
+        except Exception as e:
+            # 并发请求同时写入同一局面时唯一约束冲突，丢弃这一批即可
+            if self._logger:
+                self._logger.warning(f"写入分析缓存失败: {str(e)}")
+
+    def _should_check(self, inserted):
+        """累计新写入的条目数，达到检查间隔时返回True并重新计数"""
+        with self._inserted_lock:
+            self._inserted += inserted
+            if self._inserted < max(1, int(self.max_entries * EVICT_CHECK_RATIO)):
+                return False
+            self._inserted = 0
+            return True
+
+    def evict(self):
+        """
+        条目数超过上限时淘汰最久未用的条目，直到上限的90%
+
+        Returns:
+            删除的条目数
+        """
+        if self.max_entries <= 0:
+            return 0
+        entries = self._entries
+        with self._db.engine.begin() as conn:
+            count = conn.execute(sa.select(sa.func.count()).select_from(entries)).scalar()
+            if count <= self.max_entries:
+                return 0
+            # 同一批写入的条目 last_used_at 相同，不能按时间截断，先在索引上取出最旧的N个id再分批删除
+            # （MySQL不支持 IN 子查询中的 LIMIT）
+            excess = count - int(self.max_entries * EVICT_LOW_WATERMARK)
+            ids = conn.execute(
+                sa.select(entries.c.id).order_by(entries.c.last_used_at, entries.c.id).limit(excess)
+            ).scalars().all()
+            deleted = 0
+            for start in range(0, len(ids), EVICT_BATCH_SIZE):
+                batch = ids[start:start + EVICT_BATCH_SIZE]
+                deleted += conn.execute(entries.delete().where(entries.c.id.in_(batch))).rowcount
+        metrics.inc('analysis_cache_evictions_total', {}, deleted)
+        return deleted
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import contextvars
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.exceptions import HTTPException
+
+
+class AsyncView:
+    """
+    ASGI入口上的异步视图，分三步处理一个请求：
+
+    1. prepare：在线程中执行，有完整的请求上下文，负责认证、限流、读取表单和保存文件，
+       返回 (状态, 响应)，响应不为None时直接返回该响应；
+    2. call：在事件循环中执行，只有应用上下文，负责等待AI模型等外部I/O；
+    3. finish：回到线程中的同一个请求上下文，根据 call 的结果或异常构建响应。
+
+    等待外部I/O期间不占用线程，一个worker可以同时挂起大量请求。
+    """
+
+    def prepare(self):
+        return None, None
+
+    async def call(self, state):
+        return None
+
+    def finish(self, state, result, error):
+        if error is not None:
+            raise error
+        return result
+
+
+class AsgiApp:
+    """
+    把Flask应用包装为ASGI应用
+
+    注册了异步视图的端点按 AsyncView 的三步处理，其余请求在线程池中交给Flask按WSGI处理。
+    不使用 asgiref 的 WsgiToAsgi：它默认在同一个线程中串行执行所有WSGI调用。
+    同步请求的响应体会被完整读入内存后再发送，不适合大文件下载。
+    """
+
+    def __init__(self, app, views=None, threads=None):
+        """
+        Args:
+            app: Flask应用
+            views: {端点名: AsyncView实例}，端点名即 url_for 使用的名称，如 'chess.parse_notation'
+            threads: 执行同步代码的线程数，默认读取 ASGI_WSGI_THREADS 配置
+        """
+        self.app = app
+        self.views = views or {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads or app.config.get('ASGI_WSGI_THREADS', 8),
+            thread_name_prefix='asgi-wsgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            # 不支持WebSocket
+            await send({'type': 'websocket.close', 'code': 1000})
+            return
+
+        environ = await self._environ(scope, receive)
+        view = self.views.get(self._endpoint(environ))
+        loop = asyncio.get_running_loop()
+        if view is None:
+            status, headers, body = await loop.run_in_executor(self.executor, self._run_wsgi, self.app, environ)
+        else:
+            status, headers, body = await self._dispatch(view, environ)
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                from utils.ai import close_async_clients
+                await close_async_clients()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _environ(self, scope, receive):
+        """根据ASGI scope构建WSGI environ，请求体读入内存"""
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+            'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+            'QUERY_STRING': scope['query_string'].decode('ascii'),
+            'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        server = scope.get('server') or ('localhost', 80)
+        environ['SERVER_NAME'], environ['SERVER_PORT'] = server[0], str(server[1] or 80)
+        if scope.get('client'):
+            environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+
+        for name, value in scope['headers']:
+            name = name.decode('latin1').upper().replace('-', '_')
+            value = value.decode('latin1')
+            if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+                name = f'HTTP_{name}'
+            environ[name] = f"{environ[name]},{value}" if name in environ else value
+
+        # 声明或实际的请求体超过 MAX_CONTENT_LENGTH 时不再读取，由Flask返回413
+        max_length = self.app.config.get('MAX_CONTENT_LENGTH')
+        declared = int(environ.get('CONTENT_LENGTH') or 0)
+        chunks, received = [], 0
+        if not max_length or declared <= max_length:
+            more_body = True
+            while more_body:
+                message = await receive()
+                chunks.append(message.get('body', b''))
+                received += len(chunks[-1])
+                more_body = message.get('more_body', False)
+                if max_length and received > max_length:
+                    environ['CONTENT_LENGTH'] = str(received)
+                    chunks = []
+                    break
+        environ['wsgi.input'] = io.BytesIO(b''.join(chunks))
+        # 分块传输的请求没有 Content-Length，请求体已完整读入，告知werkzeug读到末尾即可
+        environ['wsgi.input_terminated'] = True
+        return environ
+
+    def _endpoint(self, environ):
+        if not self.views:
+            return None
+        try:
+            endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return None
+        return endpoint
+
+    @staticmethod
+    def _run_wsgi(wsgi_app, environ):
+        """调用WSGI应用，返回 (状态码, 响应头, 响应体)"""
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            captured['status'] = int(status.split(' ', 1)[0])
+            captured['headers'] = headers
+
+        result = wsgi_app(environ, start_response)
+        try:
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return captured['status'], captured['headers'], body
+
+    def _handle(self, e):
+        """按Flask的方式处理视图中的异常，返回 (响应, 未处理的异常)"""
+        try:
+            return self.app.handle_user_exception(e), None
+        except Exception as unhandled:
+            return self.app.handle_exception(unhandled), unhandled
+
+    async def _dispatch(self, view, environ):
+        """
+        执行异步视图
+
+        同一个请求的两段同步代码可能运行在不同线程中，请求上下文保存在同一个
+        contextvars.Context 里，before_request / after_request / teardown_request 各执行一次。
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.Context()
+        request_ctx = self.app.request_context(environ)
+        outcome = {'state': None, 'response': None, 'unhandled': None}
+
+        def begin():
+            request_ctx.push()
+            try:
+                response = self.app.preprocess_request()
+                if response is None:
+                    outcome['state'], response = view.prepare()
+                outcome['response'] = response
+            except Exception as e:
+                outcome['response'], outcome['unhandled'] = self._handle(e)
+
+        try:
+            await loop.run_in_executor(self.executor, context.run, begin)
+        except Exception as e:
+            # 调试模式下Flask会把未处理的异常继续抛出
+            await loop.run_in_executor(self.executor, context.run, request_ctx.pop, e)
+            raise
+
+        result = error = None
+        if outcome['response'] is None:
+            with self.app.app_context():
+                try:
+                    result = await view.call(outcome['state'])
+                except Exception as e:
+                    error = e
+
+        def end():
+            try:
+                response = outcome['response']
+                if response is None:
+                    try:
+                        response = view.finish(outcome['state'], result, error)
+                    except Exception as e:
+                        response, outcome['unhandled'] = self._handle(e)
+                try:
+                    response = self.app.finalize_request(response)
+                except Exception as e:
+                    response, outcome['unhandled'] = self.app.handle_exception(e), e
+                return self._run_wsgi(response, environ)
+            finally:
+                request_ctx.pop(outcome['unhandled'])
+
+        return await loop.run_in_executor(self.executor, context.run, end)
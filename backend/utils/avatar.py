@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import io
+import os
+import re
+import tempfile
+from flask import current_app
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# 输出格式：格式 -> (文件扩展名, MIME类型)
+FORMATS = {
+    'webp': ('webp', 'image/webp'),
+    'jpeg': ('jpg', 'image/jpeg'),
+}
+
+DEFAULT_SIZES = (32, 64, 128, 256)
+
+# 头像URL中的内容哈希长度（十六进制字符数）
+DIGEST_LENGTH = 20
+
+# 处理后的头像URL：/uploads/avatars/<内容哈希>_<尺寸>.<扩展名>
+AVATAR_URL_PATTERN = re.compile(r'^/uploads/avatars/([0-9a-f]{%d})_(\d+)\.(webp|jpg)$' % DIGEST_LENGTH)
+
+
+class AvatarError(ValueError):
+    """上传的文件无法作为头像处理"""
+
+
+def avatar_url(digest, size, fmt):
+    """指定尺寸和格式的头像URL"""
+    return f"/uploads/avatars/{digest}_{size}.{FORMATS[fmt][0]}"
+
+
+def _square(image, largest):
+    """校正EXIF方向后居中裁剪为最大输出尺寸的正方形"""
+    if image.format == 'JPEG':
+        # JPEG可在解码时按 1/2、1/4、1/8 缩小，大照片解码快数倍
+        image.draft('RGB', (largest * 2, largest * 2))
+    image = ImageOps.exif_transpose(image)
+    # 调色板、灰度、CMYK等模式统一转换，调色板模式无法做高质量缩放
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    # 小于输出尺寸的图片会被放大，保证srcset中标注的宽度与实际一致
+    return ImageOps.fit(image, (largest, largest), Image.LANCZOS, centering=(0.5, 0.5))
+
+
+def _flatten(image):
+    """JPEG不支持透明通道，透明部分填充白色"""
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _write(path, image, fmt, quality):
+    """写入临时文件后原子替换；相同内容的文件已存在时跳过"""
+    if os.path.exists(path):
+        # 更新修改时间，上传目录清理不会删除刚被重新引用的文件
+        os.utime(path)
+        return os.path.getsize(path)
+    # 新建的图像不带任何元数据（EXIF、ICC、XMP）
+    image.info = {}
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, 'WEBP', quality=quality, method=4)
+    else:
+        _flatten(image).save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, path)
+    return len(buffer.getvalue())
+
+
+def process_avatar(data, directory, sizes=DEFAULT_SIZES, webp_quality=80, jpeg_quality=85,
+                   max_pixels=40000000):
+    """
+    处理上传的头像：居中裁剪为正方形，生成多种尺寸的WebP和JPEG，去除元数据
+
+    文件名包含原始文件内容和处理参数的哈希，两者不变则URL不变，可长期缓存；
+    不同用户上传同一张图片时共用同一组文件。
+
+    Args:
+        data: 上传文件的字节内容
+        directory: 头像保存目录
+        sizes: 输出的边长（像素）
+        webp_quality: WebP质量（0-100）
+        jpeg_quality: JPEG质量（0-100）
+        max_pixels: 允许的最大像素数，防止解压炸弹
+
+    Returns:
+        (内容哈希, {尺寸: {格式: 字节数}})
+    """
+    params = f'{sorted(sizes)}|{webp_quality}|{jpeg_quality}'.encode()
+    digest = hashlib.sha256(data + params).hexdigest()[:DIGEST_LENGTH]
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > max_pixels:
+            raise AvatarError('图片尺寸过大')
+        square = _square(image, max(sizes))
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise AvatarError('无法识别的图片文件') from e
+
+    os.makedirs(directory, exist_ok=True)
+    written = {}
+    # 从大到小依次缩放，每一级都从上一级结果缩小，比每次从原图缩放更快
+    for size in sorted(sizes, reverse=True):
+        if square.width > size:
+            square = square.resize((size, size), Image.LANCZOS)
+        written[size] = {
+            fmt: _write(os.path.join(directory, os.path.basename(avatar_url(digest, size, fmt))), square, fmt, quality)
+            for fmt, quality in (('webp', webp_quality), ('jpeg', jpeg_quality))
+        }
+    return digest, written
+
+
+def avatar_srcset(avatar, sizes=None):
+    """
+    根据头像URL生成各格式的srcset字符串，供前端 <picture> / <img srcset> 使用
+
+    Args:
+        avatar: 用户的头像URL
+        sizes: 已生成的尺寸，默认读取 AVATAR_SIZES 配置
+
+    Returns:
+        {MIME类型: "url 32w, url 64w, ..."}；不是处理后的头像（外部URL或旧头像）时返回None
+    """
+    match = AVATAR_URL_PATTERN.match(avatar or '')
+    if not match:
+        return None
+    digest = match.group(1)
+    sizes = sizes or current_app.config.get('AVATAR_SIZES', DEFAULT_SIZES)
+    return {
+        mimetype: ', '.join(f"{avatar_url(digest, size, fmt)} {size}w" for size in sorted(sizes))
+        for fmt, (_, mimetype) in FORMATS.items()
+    }
@@ -0,0 +1,458 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached, object_session
+
+
+class MemoryCacheBackend:
+    """进程内缓存后端，支持TTL过期和LRU淘汰"""
+
+    def __init__(self, max_entries=1024, default_ttl=60):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        # key -> (过期时间, 值, 估算字节数)
+        self._data = OrderedDict()
+        # 计数器（如库版本号）单独存放，按最近使用淘汰，条目数上限与缓存相同。
+        # 被淘汰的计数器再次读取时返回已淘汰计数器的最大值（_counter_floor），版本号只会前进，
+        # 不会回退到仍有缓存条目的旧版本
+        self._counters = OrderedDict()
+        self._counter_floor = 0
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        size = _estimate_size(value)
+        expires_at = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires_at, value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def incr(self, key):
+        with self._lock:
+            value = self._counters.get(key, self._counter_floor) + 1
+            self._counters[key] = value
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.max_entries:
+                _, evicted = self._counters.popitem(last=False)
+                self._counter_floor = max(self._counter_floor, evicted)
+            return value
+
+    def get_counter(self, key):
+        with self._lock:
+            value = self._counters.get(key)
+            if value is None:
+                return self._counter_floor
+            self._counters.move_to_end(key)
+            return value
+
+    def stats(self):
+        return {
+            'backend': 'memory',
+            'entries': len(self._data),
+            'counters': len(self._counters),
+            'max_entries': self.max_entries,
+            'memory_bytes': self._bytes,
+            'evictions': self.evictions
+        }
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+
+class RedisCacheBackend:
+    """Redis兼容缓存后端，多个worker共享同一份缓存"""
+
+    def __init__(self, url, default_ttl=60, prefix='cache:'):
+        # 延迟导入，未使用Redis时无需安装
+        import redis
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        self._client.setex(self.prefix + key, ttl or self.default_ttl, json.dumps(value))
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def incr(self, key):
+        return self._client.incr(self.prefix + key)
+
+    def get_counter(self, key):
+        raw = self._client.get(self.prefix + key)
+        return int(raw) if raw is not None else 0
+
+    def stats(self):
+        info = self._client.info('memory')
+        return {
+            'backend': 'redis',
+            'entries': self._client.dbsize(),
+            'memory_bytes': info.get('used_memory')
+        }
+
+
+class NotationCache:
+    """
+    棋谱查询的读穿透缓存
+
+    缓存键由用户ID、该用户的库版本号和查询参数组成。
+    创建/更新/删除棋谱时递增库版本号，该用户的所有旧缓存随即失效，
+    其他用户的缓存不受影响。
+    """
+
+    def __init__(self, backend, logger=None):
+        self.backend = backend
+        self.logger = logger
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get_or_load(self, user_id, namespace, params, loader):
+        """
+        读取缓存，未命中时调用loader加载并写入缓存
+
+        Args:
+            user_id: 用户ID
+            namespace: 查询类型，如 'list'、'detail'
+            params: 查询参数字典
+            loader: 未命中时调用的加载函数，返回None时不缓存
+
+        Returns:
+            缓存的值或loader的返回值
+        """
+        try:
+            key = self._make_key(user_id, namespace, params)
+            value = self.backend.get(key)
+        except Exception as e:
+            # 缓存故障时降级为直接查询数据库
+            self._on_error('读取', e)
+            return loader()
+
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = loader()
+        if value is not None:
+            try:
+                self.backend.set(key, value)
+            except Exception as e:
+                self._on_error('写入', e)
+        return value
+
+    def invalidate_user(self, user_id):
+        """使某个用户的所有棋谱缓存失效"""
+        try:
+            self.backend.incr(self._version_key(user_id))
+        except Exception as e:
+            self._on_error('失效', e)
+
+    def stats(self):
+        """返回缓存命中率和内存占用"""
+        lookups = self.hits + self.misses
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+        try:
+            stats.update(self.backend.stats())
+        except Exception as e:
+            self._on_error('统计', e)
+        return stats
+
+    def _make_key(self, user_id, namespace, params):
+        version = self.backend.get_counter(self._version_key(user_id))
+        digest = hashlib.sha1(
+            json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        return f"notations:{user_id}:v{version}:{namespace}:{digest}"
+
+    @staticmethod
+    def _version_key(user_id):
+        return f"notations:{user_id}:version"
+
+    def _on_error(self, action, error):
+        self.errors += 1
+        if self.logger:
+            self.logger.warning(f"棋谱缓存{action}失败: {str(error)}")
+
+
+class NullCache(NotationCache):
+    """禁用缓存时使用，所有查询直接穿透到数据库"""
+
+    def __init__(self):
+        super().__init__(backend=None)
+
+    def get_or_load(self, user_id, namespace, params, loader):
+        self.misses += 1
+        return loader()
+
+    def invalidate_user(self, user_id):
+        pass
+
+    def stats(self):
+        return {'backend': 'none', 'hits': 0, 'misses': self.misses, 'errors': 0, 'hit_rate': 0.0}
+
+
+class UserCache:
+    """
+    已认证用户的短TTL缓存
+
+    缓存用户表的行数据（不含密码哈希），命中时通过 session.merge(load=False) 放入当前会话的
+    标识映射，不执行查询；对象仍可修改和提交，密码哈希在首次访问时才单独加载。
+    用户行被更新或删除并提交后自动失效，资料、头像和密码修改无需各自处理缓存。
+    """
+
+    FIELDS = ('id', 'username', 'email', 'name', 'avatar', 'created_at', 'updated_at')
+    DATETIME_FIELDS = ('created_at', 'updated_at')
+
+    def __init__(self, backend, db, logger=None):
+        self.backend = backend
+        self.db = db
+        self.logger = logger
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, user_id):
+        """
+        按ID获取用户
+
+        Args:
+            user_id: 用户ID，可以是JWT中的字符串形式
+
+        Returns:
+            绑定到当前会话的User对象，用户不存在或ID格式错误时返回None
+        """
+        from models.user import User
+
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        # 当前会话中已有该用户时直接使用
+        user = self.db.session.identity_map.get(self.db.session.identity_key(User, user_id))
+        if user is not None:
+            return user
+
+        try:
+            row = self.backend.get(self._key(user_id))
+        except Exception as e:
+            self._on_error('读取', e)
+            row = None
+
+        if row is not None:
+            self.hits += 1
+            # 不经过 __init__ 创建实例，再标记为已持久化的游离对象
+            user = inspect(User).class_manager.new_instance()
+            for field in self.FIELDS:
+                value = row[field]
+                if field in self.DATETIME_FIELDS and value is not None:
+                    value = datetime.fromisoformat(value)
+                setattr(user, field, value)
+            make_transient_to_detached(user)
+            return self.db.session.merge(user, load=False)
+
+        self.misses += 1
+        user = self.db.session.get(User, user_id)
+        if user is not None:
+            try:
+                self.backend.set(self._key(user_id), self._serialize(user))
+            except Exception as e:
+                self._on_error('写入', e)
+        return user
+
+    def invalidate(self, user_id):
+        try:
+            self.backend.delete(self._key(user_id))
+        except Exception as e:
+            self._on_error('失效', e)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def _serialize(self, user):
+        row = {}
+        for field in self.FIELDS:
+            value = getattr(user, field)
+            if field in self.DATETIME_FIELDS and value is not None:
+                value = value.isoformat()
+            row[field] = value
+        return row
+
+    @staticmethod
+    def _key(user_id):
+        return f"users:{user_id}"
+
+    def _on_error(self, action, error):
+        self.errors += 1
+        if self.logger:
+            self.logger.warning(f"用户缓存{action}失败: {str(error)}")
+
+
+class NullUserCache(UserCache):
+    """禁用缓存时使用，每次都查询数据库"""
+
+    def __init__(self, db):
+        super().__init__(backend=None, db=db)
+
+    def get(self, user_id):
+        from models.user import User
+        try:
+            return self.db.session.get(User, int(user_id))
+        except (TypeError, ValueError):
+            return None
+
+    def invalidate(self, user_id):
+        pass
+
+
+def _remember_changed_user(mapper, connection, target):
+    object_session(target).info.setdefault('changed_user_ids', set()).add(target.id)
+
+
+def _invalidate_changed_users(session):
+    user_ids = session.info.pop('changed_user_ids', ())
+    # 监听器是进程全局的，失效当前应用的缓存；应用上下文之外（如独立脚本）没有缓存需要失效
+    cache = current_app.extensions.get('user_cache') if has_app_context() else None
+    if cache is not None:
+        for user_id in user_ids:
+            cache.invalidate(user_id)
+
+
+def _forget_changed_users(session):
+    session.info.pop('changed_user_ids', None)
+
+
+_user_invalidation_registered = False
+_user_invalidation_lock = threading.Lock()
+
+
+def _register_user_invalidation(db):
+    """
+    用户行在flush时被更新或删除的，记录下来，事务提交后再失效缓存
+
+    SQLAlchemy的事件监听器挂在模型类和会话上，对整个进程生效，只注册一次；
+    多次 create_app（测试、基准脚本）不会叠加监听器。
+    """
+    global _user_invalidation_registered
+    from models.user import User
+
+    with _user_invalidation_lock:
+        if _user_invalidation_registered:
+            return
+        event.listen(User, 'after_update', _remember_changed_user)
+        event.listen(User, 'after_delete', _remember_changed_user)
+        event.listen(db.session, 'after_commit', _invalidate_changed_users)
+        event.listen(db.session, 'after_rollback', _forget_changed_users)
+        _user_invalidation_registered = True
+
+
+def _estimate_size(value):
+    """按JSON序列化后的长度估算缓存值占用的字节数"""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def init_cache(app):
+    """根据配置初始化棋谱缓存"""
+    backend_name = app.config.get('NOTATION_CACHE_BACKEND', 'memory')
+    ttl = app.config.get('NOTATION_CACHE_TTL', 60)
+
+    if backend_name == 'none':
+        cache = NullCache()
+    elif backend_name == 'redis':
+        backend = RedisCacheBackend(app.config.get('REDIS_URL'), default_ttl=ttl)
+        cache = NotationCache(backend, logger=app.logger)
+    else:
+        backend = MemoryCacheBackend(
+            max_entries=app.config.get('NOTATION_CACHE_MAX_ENTRIES', 1024),
+            default_ttl=ttl
+        )
+        cache = NotationCache(backend, logger=app.logger)
+
+    app.extensions['notation_cache'] = cache
+    app.logger.info(f"棋谱缓存已初始化，后端: {backend_name}, TTL: {ttl}秒")
+    return cache
+
+
+def get_notation_cache():
+    """获取当前应用的棋谱缓存"""
+    return current_app.extensions['notation_cache']
+
+
+
+def init_user_cache(app):
+    """根据配置初始化已认证用户缓存"""
+    from models.db import db
+
+    backend_name = app.config.get('USER_CACHE_BACKEND', 'memory')
+    ttl = app.config.get('USER_CACHE_TTL', 30)
+
+    if backend_name == 'none':
+        cache = NullUserCache(db)
+    else:
+        if backend_name == 'redis':
+            backend = RedisCacheBackend(app.config.get('REDIS_URL'), default_ttl=ttl)
+        else:
+            backend = MemoryCacheBackend(max_entries=app.config.get('USER_CACHE_MAX_ENTRIES', 10000), default_ttl=ttl)
+        cache = UserCache(backend, db, logger=app.logger)
+        _register_user_invalidation(db)
+
+    app.extensions['user_cache'] = cache
+    app.logger.info(f"用户缓存已初始化，后端: {backend_name}, TTL: {ttl}秒")
+    return cache
+
+
+def get_user_cache():
+    """获取当前应用的已认证用户缓存"""
+    return current_app.extensions['user_cache']
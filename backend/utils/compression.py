@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import gzip
+from flask import request
+
+# brotli为可选依赖，未安装时只提供gzip压缩
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _compress_gzip(data, app):
+    return gzip.compress(data, compresslevel=app.config.get('COMPRESS_GZIP_LEVEL', 6))
+
+
+def _compress_brotli(data, app):
+    return brotli.compress(data, quality=app.config.get('COMPRESS_BROTLI_QUALITY', 4))
+
+
+# 编码名称 -> 压缩函数
+COMPRESSORS = {'gzip': _compress_gzip}
+if brotli is not None:
+    COMPRESSORS['br'] = _compress_brotli
+
+
+def choose_encoding(accept_encodings, algorithms):
+    """
+    根据客户端的Accept-Encoding选择压缩算法
+
+    Args:
+        accept_encodings: werkzeug解析后的Accept-Encoding
+        algorithms: 服务端按优先级排列的算法列表
+
+    Returns:
+        选中的编码名称，没有可用编码时返回None
+    """
+    best, best_quality = None, 0
+    for name in algorithms:
+        if name not in COMPRESSORS:
+            continue
+        quality = accept_encodings.quality(name)
+        # 质量相同时保留服务端优先级更高的算法
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def init_compression(app):
+    """注册响应压缩处理"""
+    if not app.config.get('COMPRESS_ENABLED', True):
+        return
+
+    algorithms = app.config.get('COMPRESS_ALGORITHMS', ['br', 'gzip'])
+    mimetypes = set(app.config.get('COMPRESS_MIMETYPES', ['application/json']))
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+
+    @app.after_request
+    def compress_response(response):
+        # 流式响应、已编码响应和没有响应体的状态（1xx、204、304）不压缩；错误响应的JSON同样压缩
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in mimetypes):
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        encoding = choose_encoding(request.accept_encodings, algorithms)
+        if encoding is None:
+            return response
+
+        response.set_data(COMPRESSORS[encoding](data, app))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    app.logger.info(f"响应压缩已启用，算法: {[a for a in algorithms if a in COMPRESSORS]}, 最小尺寸: {min_size}字节")
@@ -0,0 +1,845 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import atexit
+import multiprocessing
+import math
+import os
+import queue
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from utils.metrics import metrics
+from utils.analysis_cache import AnalysisCache, position_hash
+
+# python-chess为可选依赖：走法生成和UCI引擎通信都依赖它，未安装时无法分析
+try:
+    import chess
+except ImportError:
+    chess = None
+
+# 内置搜索器的名称和版本，评估函数或搜索算法变化时递增版本
+ENGINE_NAME = 'builtin'
+ENGINE_VERSION = '1'
+
+MATE_SCORE = 100000
+# 绝对值超过此值的分数表示将杀
+MATE_THRESHOLD = MATE_SCORE - 1000
+INFINITY = 10 ** 6
+MAX_PLY = 128
+
+# UCI引擎超过搜索时间这么多秒仍未给出结果时发送 stop，stop 之后再等这么多秒仍无结果则杀死引擎进程
+UCI_GRACE = 2.0
+# UCI引擎启动（uci/isready）和未限制搜索时间时的等待上限（秒）
+UCI_TIMEOUT = 30.0
+
+# 置换表条目类型
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# 子力价值，按 python-chess 的棋子类型编号（1兵 2马 3象 4车 5后 6王）索引
+PIECE_VALUES = (0, 100, 320, 330, 500, 900, 0)
+
+# 位置分表（Simplified Evaluation Function），按白方视角从第8横排到第1横排排列
+PIECE_SQUARE_TABLES = {
+    1: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ),
+    2: (
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ),
+    3: (
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ),
+    4: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ),
+    5: (
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ),
+    # 王：中局躲在易位后的位置
+    6: (
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ),
+}
+# 王：残局走向中心
+KING_ENDGAME_TABLE = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+# 双方马、象、车、后的总价值不超过此值时按残局评估王的位置
+ENDGAME_MATERIAL = 2 * (PIECE_VALUES[4] + PIECE_VALUES[3])
+
+
+def _square_values(table, value):
+    """把位置分表展开为 [颜色][格子] -> 子力价值+位置分，格子按 python-chess 的编号（a1=0）"""
+    # 白方a1在表中的下标为56，即 square ^ 56；黑方按横排镜像后恰好为 square
+    return (
+        tuple(value + table[square] for square in range(64)),
+        tuple(value + table[square ^ 56] for square in range(64)),
+    )
+
+
+# [棋子类型] -> (黑方各格分值, 白方各格分值)，与 python-chess 的 BLACK=False(0)、WHITE=True(1) 对应
+SQUARE_VALUES = {piece_type: _square_values(table, PIECE_VALUES[piece_type])
+                 for piece_type, table in PIECE_SQUARE_TABLES.items()}
+KING_ENDGAME_VALUES = _square_values(KING_ENDGAME_TABLE, 0)
+
+
+class AnalysisBusyError(Exception):
+    """等待分析的请求超过上限，调用方应返回503让客户端稍后重试"""
+
+    def __init__(self, retry_after=1):
+        super().__init__('棋局分析服务繁忙')
+        self.retry_after = retry_after
+
+
+class AnalysisTimeoutError(Exception):
+    """分析请求超过时间上限（或UCI引擎无响应），调用方应返回504"""
+
+
+class AnalysisTooLargeError(ValueError):
+    """按局面数、搜索时间和分析进程数估算，请求不可能在时间上限内完成"""
+
+
+class EngineTimeout(Exception):
+    """UCI引擎在期限内没有输出期望的行"""
+
+
+class SearchTimeout(Exception):
+    """搜索时间用完，放弃当前这一轮迭代加深"""
+
+
+def evaluate(board):
+    """静态评估：子力价值加位置分，返回走棋方视角的分数（厘兵）"""
+    scores = [0, 0]
+    non_pawn = 0
+    for piece_type in (1, 2, 3, 4, 5):
+        values = SQUARE_VALUES[piece_type]
+        for color in (0, 1):
+            table = values[color]
+            for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                scores[color] += table[square]
+                if piece_type != 1:
+                    non_pawn += PIECE_VALUES[piece_type]
+    king_values = KING_ENDGAME_VALUES if non_pawn <= ENDGAME_MATERIAL else SQUARE_VALUES[6]
+    for color in (0, 1):
+        king = board.king(color)
+        if king is not None:
+            scores[color] += king_values[color][king]
+    score = scores[1] - scores[0]
+    return score if board.turn else -score
+
+
+def _to_tt(score, ply):
+    """将杀分数存入置换表时转换为相对当前节点的距离，取出时再转换回来"""
+    if score > MATE_THRESHOLD:
+        return score + ply
+    if score < -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def _from_tt(score, ply):
+    if score > MATE_THRESHOLD:
+        return score - ply
+    if score < -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+class Searcher:
+    """
+    纯Python的alpha-beta搜索器
+
+    迭代加深的负极大值搜索，叶子节点做只搜吃子的静态搜索。走法排序依次为：
+    置换表中的最佳走法、吃子（MVV-LVA：先吃价值高的子，同样的目标先用价值低的子吃）、升变、
+    杀手走法（同一层中造成剪枝的非吃子走法）、历史启发分数。
+    置换表在同一进程的多次搜索之间保留（同一盘棋相邻局面的子树大量重合），超过 tt_size 条时清空。
+    """
+
+    def __init__(self, tt_size=200000, ordering=True, use_tt=True):
+        """
+        Args:
+            tt_size: 置换表最多保存的条目数
+            ordering: 是否对走法排序（关闭用于对比测试）
+            use_tt: 是否使用置换表（关闭用于对比测试）
+        """
+        self.tt_size = tt_size
+        self.ordering = ordering
+        self.use_tt = use_tt
+        self.tt = {}
+        self.nodes = 0
+        self._deadline = None
+        self._killers = []
+        self._history = {}
+        self._root_move = None
+
+    def search(self, board, depth, movetime=None):
+        """
+        在 board 上搜索到指定深度，或直到 movetime 秒用完（至少完成深度1）
+
+        Returns:
+            (分数（走棋方视角）, 最佳走法, 主要变例, 完成的深度)
+        """
+        self.nodes = 0
+        self._deadline = None
+        self._killers = [[None, None] for _ in range(MAX_PLY)]
+        self._history = {}
+        self._root_move = None
+        start = time.perf_counter()
+        result = (0, None, [], 0)
+        for current in range(1, depth + 1):
+            if current > 1 and movetime is not None:
+                self._deadline = start + movetime
+            try:
+                score = self._negamax(board, current, -INFINITY, INFINITY, 0)
+            except SearchTimeout:
+                break
+            pv = self._principal_variation(board, self._root_move, current)
+            result = (score, self._root_move, pv, current)
+            # 已找到最快的将杀，继续加深没有意义
+            if abs(score) > MATE_THRESHOLD:
+                break
+        return result
+
+    def _principal_variation(self, board, root_move, depth):
+        """从根节点的最佳走法开始，沿置换表中的最佳走法取出主要变例"""
+        if root_move is None:
+            return []
+        pv = [root_move]
+        board.push(root_move)
+        seen = set()
+        for _ in range(depth - 1):
+            key = board._transposition_key()
+            entry = self.tt.get(key)
+            if entry is None or entry[3] is None or key in seen or not board.is_legal(entry[3]):
+                break
+            seen.add(key)
+            pv.append(entry[3])
+            board.push(entry[3])
+        for _ in pv:
+            board.pop()
+        return pv
+
+    def _check_time(self):
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+
+    def _order(self, board, moves, tt_move, ply):
+        if not self.ordering:
+            return moves
+        killers = self._killers[ply] if ply < MAX_PLY else (None, None)
+        history = self._history
+
+        def key(move):
+            if move == tt_move:
+                return -10 ** 9
+            if board.is_capture(move):
+                # 吃过路兵时目标格上没有棋子
+                victim = board.piece_type_at(move.to_square) or 1
+                return -(10 ** 6 + PIECE_VALUES[victim] * 16 - board.piece_type_at(move.from_square))
+            if move.promotion:
+                return -(9 * 10 ** 5 + PIECE_VALUES[move.promotion])
+            if move == killers[0]:
+                return -8 * 10 ** 5
+            if move == killers[1]:
+                return -8 * 10 ** 5 + 1
+            return -history.get((move.from_square, move.to_square), 0)
+
+        return sorted(moves, key=key)
+
+    def _store(self, key, depth, flag, score, move):
+        if not self.use_tt:
+            return
+        entry = self.tt.get(key)
+        if entry is not None and entry[0] > depth:
+            return
+        if entry is None and len(self.tt) >= self.tt_size:
+            self.tt.clear()
+        self.tt[key] = (depth, flag, score, move)
+
+    def _negamax(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_time()
+        if ply > 0 and (board.halfmove_clock >= 100 or board.is_repetition(2)):
+            return 0
+
+        # python-chess 内部用于判断重复局面的键（各棋子位图、走棋方、易位权、吃过路兵格），
+        # 比逐子计算 chess.polyglot.zobrist_hash 快约20倍
+        key = board._transposition_key()
+        entry = self.tt.get(key) if self.use_tt else None
+        tt_move = None
+        if entry is not None:
+            tt_move = entry[3]
+            if entry[0] >= depth and ply > 0:
+                score = _from_tt(entry[2], ply)
+                if entry[1] == EXACT:
+                    return score
+                if entry[1] == LOWER and score >= beta:
+                    return score
+                if entry[1] == UPPER and score <= alpha:
+                    return score
+
+        in_check = board.is_check()
+        if depth <= 0 and not in_check:
+            return self._quiesce(board, alpha, beta)
+        moves = list(board.legal_moves)
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+        if in_check:
+            # 被将军时延伸一层，避免在将军序列中间截断
+            depth = max(depth, 0) + 1
+
+        alpha_orig = alpha
+        best_score = -INFINITY
+        best_move = None
+        for move in self._order(board, moves, tt_move, ply):
+            board.push(move)
+            try:
+                score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not board.is_capture(move) and ply < MAX_PLY:
+                    killers = self._killers[ply]
+                    if killers[0] != move:
+                        killers[1], killers[0] = killers[0], move
+                    history_key = (move.from_square, move.to_square)
+                    self._history[history_key] = self._history.get(history_key, 0) + depth * depth
+                break
+
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self._store(key, depth, flag, _to_tt(best_score, ply), best_move)
+        if ply == 0:
+            self._root_move = best_move
+        return best_score
+
+    def _quiesce(self, board, alpha, beta):
+        """只搜索吃子，直到局面平静，避免在交换中途评估"""
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_time()
+        stand_pat = evaluate(board)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        captures = list(board.generate_legal_captures())
+        for move in self._order(board, captures, None, MAX_PLY):
+            board.push(move)
+            try:
+                score = -self._quiesce(board, -beta, -alpha)
+            finally:
+                board.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+
+class UCIEngine:
+    """
+    通过标准输入输出管道与本地UCI引擎进程通信
+
+    每个分析进程启动一个引擎进程并复用。引擎的输出由守护线程逐行读入队列，等待输出时都有期限，
+    引擎无响应不会让分析进程永远阻塞；守护线程也不会让分析进程退出时挂起。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.process = subprocess.Popen(
+            [path], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, bufsize=1
+        )
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+        self.name = os.path.basename(path)
+        try:
+            for line in self._command('uci', 'uciok', UCI_TIMEOUT):
+                if line.startswith('id name '):
+                    self.name = line[len('id name '):].strip()
+            self._command('isready', 'readyok', UCI_TIMEOUT)
+        except Exception:
+            self.kill()
+            raise
+
+    def _read(self):
+        for line in self.process.stdout:
+            self._lines.put(line)
+        self._lines.put(None)
+
+    def _send(self, command):
+        self.process.stdin.write(command + '\n')
+        self.process.stdin.flush()
+
+    def _read_until(self, until, timeout):
+        """读取输出直到以 until 开头的行，返回读到的全部行；timeout 秒内没有读到时抛出 EngineTimeout"""
+        deadline = time.monotonic() + timeout
+        lines = []
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise EngineTimeout(f'UCI引擎{timeout:.1f}秒内未返回 {until}: {self.path}')
+            if line is None:
+                raise RuntimeError(f'UCI引擎已退出: {self.path}')
+            lines.append(line.strip())
+            if line.startswith(until):
+                return lines
+
+    def _command(self, command, until, timeout):
+        """发送一条命令，读取输出直到以 until 开头的行"""
+        self._send(command)
+        return self._read_until(until, timeout)
+
+    def analyse(self, board, depth, movetime=None):
+        """
+        搜索一个局面
+
+        Returns:
+            {'depth', 'nodes', 'nps', 'score': ('cp'|'mate', 走棋方视角的值), 'pv': [UCI走法]}
+        """
+        self._send(f'position fen {board.fen()}')
+        go = f'go depth {depth}'
+        if movetime:
+            go += f' movetime {max(1, int(movetime * 1000))}'
+        try:
+            lines = self._command(go, 'bestmove', (movetime or UCI_TIMEOUT) + UCI_GRACE)
+        except EngineTimeout:
+            # 超时后要求引擎停止并给出当前结果，仍无响应时由调用方杀死引擎进程
+            self._send('stop')
+            lines = self._read_until('bestmove', UCI_GRACE)
+        info = {}
+        for line in lines:
+            tokens = line.split()
+            # 只取带主要变例的完整信息行（多主变时为第一条）
+            if not tokens or tokens[0] != 'info' or 'pv' not in tokens or 'score' not in tokens:
+                continue
+            if 'multipv' in tokens and tokens[tokens.index('multipv') + 1] != '1':
+                continue
+            for key in ('depth', 'nodes', 'nps'):
+                if key in tokens:
+                    info[key] = int(tokens[tokens.index(key) + 1])
+            index = tokens.index('score')
+            info['score'] = (tokens[index + 1], int(tokens[index + 2]))
+            info['pv'] = tokens[tokens.index('pv') + 1:]
+        return info
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+
+    def quit(self):
+        try:
+            self.process.stdin.write('quit\n')
+            self.process.stdin.flush()
+            self.process.wait(timeout=1)
+        except Exception:
+            self.process.kill()
+
+
+# 每个分析进程中的搜索器（保留置换表）和已启动的UCI引擎
+_searcher = None
+_uci_engines = {}
+
+
+def _quit_uci_engines():
+    for engine in _uci_engines.values():
+        engine.quit()
+
+
+atexit.register(_quit_uci_engines)
+
+
+def engine_label(engine_path=None):
+    """分析结果中的引擎标识：内置搜索器为名称-版本，UCI引擎为可执行文件名"""
+    return os.path.basename(engine_path) if engine_path else f'{ENGINE_NAME}-{ENGINE_VERSION}'
+
+
+def engine_version(engine_path=None):
+    """
+    分析缓存中的引擎版本标识
+
+    UCI引擎只能在启动后才知道名称，这里用可执行文件名、大小和修改时间代替，替换引擎文件后旧结果不再命中。
+    """
+    if not engine_path:
+        return f'{ENGINE_NAME}-{ENGINE_VERSION}'
+    try:
+        stat = os.stat(engine_path)
+    except OSError:
+        return os.path.basename(engine_path)[:64]
+    return f'{os.path.basename(engine_path)[:64]}:{stat.st_size}:{int(stat.st_mtime)}'
+
+
+def _format_score(score_white, mate_white, board, pv, depth, nodes, elapsed, engine):
+    """整理分析结果，分数统一为白方视角"""
+    san_pv = []
+    replay = board.copy(stack=False)
+    for move in pv:
+        san_pv.append(replay.san(move))
+        replay.push(move)
+    return {
+        'fen': board.fen(),
+        'best_move': pv[0].uci() if pv else None,
+        'best_move_san': san_pv[0] if san_pv else None,
+        'score_cp': score_white,
+        'mate': mate_white,
+        'pv': san_pv,
+        'depth': depth,
+        'nodes': nodes,
+        'time_ms': round(elapsed * 1000, 1),
+        'nps': int(nodes / elapsed) if elapsed > 0 else 0,
+        'engine': engine,
+    }
+
+
+def _analyze_builtin(board, depth, movetime, tt_size):
+    global _searcher
+    if _searcher is None or _searcher.tt_size != tt_size:
+        _searcher = Searcher(tt_size=tt_size)
+    start = time.perf_counter()
+    score, _, pv, reached = _searcher.search(board, depth, movetime)
+    elapsed = time.perf_counter() - start
+    sign = 1 if board.turn == chess.WHITE else -1
+    if abs(score) > MATE_THRESHOLD:
+        # 距将杀的步数（半回合）换算为回合数，正数表示白方将杀
+        score_white, mate_white = None, sign * (1 if score > 0 else -1) * ((MATE_SCORE - abs(score) + 1) // 2)
+    else:
+        score_white, mate_white = sign * score, None
+    return _format_score(score_white, mate_white, board, pv, reached, _searcher.nodes, elapsed, engine_label())
+
+
+def _analyze_uci(board, depth, movetime, engine_path):
+    engine = _uci_engines.get(engine_path)
+    if engine is None or engine.process.poll() is not None:
+        engine = _uci_engines[engine_path] = UCIEngine(engine_path)
+    start = time.perf_counter()
+    try:
+        info = engine.analyse(board, depth, movetime)
+    except EngineTimeout as e:
+        # 无响应的引擎进程直接杀死，下一个局面重新启动
+        engine.kill()
+        _uci_engines.pop(engine_path, None)
+        raise AnalysisTimeoutError(str(e))
+    elapsed = time.perf_counter() - start
+
+    sign = 1 if board.turn == chess.WHITE else -1
+    kind, value = info.get('score', ('cp', 0))
+    score_white, mate_white = (sign * value, None) if kind == 'cp' else (None, sign * value)
+    # 只保留主要变例中能在棋盘上走出的部分
+    pv = []
+    replay = board.copy(stack=False)
+    for uci in info.get('pv', []):
+        try:
+            move = chess.Move.from_uci(uci)
+        except ValueError:
+            break
+        if not replay.is_legal(move):
+            break
+        pv.append(move)
+        replay.push(move)
+    result = _format_score(score_white, mate_white, board, pv, info.get('depth', 0), info.get('nodes', 0),
+                           elapsed, engine.name)
+    if info.get('nps'):
+        result['nps'] = info['nps']
+    return result
+
+
+def analyze_position(fen, depth, movetime=None, engine_path=None, tt_size=200000):
+    """
+    分析一个局面（在进程池中执行，须为模块级函数以便序列化）
+
+    Args:
+        fen: 局面
+        depth: 搜索深度（半回合）
+        movetime: 最长搜索时间（秒），None表示不限
+        engine_path: UCI引擎可执行文件路径，为空时使用内置搜索器
+
+    Returns:
+        分析结果字典，分数为白方视角（厘兵），mate为距将杀的回合数（正数表示白方将杀）
+    """
+    board = chess.Board(fen)
+    outcome = board.outcome()
+    if outcome is not None:
+        # 已被将杀时 mate 为0，和棋（逼和、子力不足等）时分数为0
+        mated = outcome.winner is not None
+        return _format_score(None if mated else 0, 0 if mated else None, board, [], 0, 0, 0,
+                             engine_label(engine_path))
+    if engine_path:
+        return _analyze_uci(board, depth, movetime, engine_path)
+    return _analyze_builtin(board, depth, movetime, tt_size)
+
+
+class AnalysisEngine:
+    """
+    棋局分析服务
+
+    搜索是CPU密集型操作，交给独立的进程池执行，请求线程只等待结果，不占用worker进程的GIL，
+    一个请求中的多个局面分发到池中的各个进程并行搜索。每个worker进程中同时在途的分析请求数有上限，
+    超过上限的请求最多等待 queue_timeout 秒，仍无空位则抛出 AnalysisBusyError。
+    每个请求的搜索最多持续 request_timeout 秒（应小于gunicorn的worker超时）：按局面数、每局面搜索时间
+    和进程数估算明显超时的请求直接抛出 AnalysisTooLargeError，到期仍未完成的取消剩余局面并抛出
+    AnalysisTimeoutError。
+    配置了 engine_path 时由各分析进程通过管道与本地的UCI引擎（如Stockfish）通信，代替内置搜索器。
+
+    配置了 cache 时先查分析结果缓存，只搜索未命中的局面，同一请求中重复的局面也只搜索一次。
+
+    workers 为0时在请求线程中直接搜索（开发环境和单元测试）。
+    """
+
+    def __init__(self, workers=2, max_pending=4, queue_timeout=5.0, tt_size=200000, engine_path=None,
+                 start_method='spawn', cache=None, request_timeout=60.0, logger=None):
+        self.workers = workers
+        self.request_timeout = request_timeout
+        self.cache = cache
+        self.queue_timeout = queue_timeout
+        self.tt_size = tt_size
+        self.engine_path = engine_path or None
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._context = multiprocessing.get_context(start_method)
+        self._logger = logger
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    @property
+    def available(self):
+        return chess is not None
+
+    @property
+    def engine_name(self):
+        return engine_label(self.engine_path)
+
+    @property
+    def engine_version(self):
+        return engine_version(self.engine_path)
+
+    def _get_executor(self):
+        # gunicorn预加载应用后fork出worker，进程池必须在使用它的进程中创建
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _reset_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _submit_all(self, executor, fens, depth, movetime, deadline):
+        futures = [executor.submit(analyze_position, fen, depth, movetime, self.engine_path, self.tt_size)
+                   for fen in fens]
+        try:
+            return [future.result(timeout=max(0, deadline - time.monotonic())) for future in futures]
+        except FutureTimeoutError:
+            # 未开始的局面直接取消；正在搜索的局面受 movetime 和UCI引擎的期限约束，很快会结束
+            for future in futures:
+                future.cancel()
+            raise AnalysisTimeoutError(f'{len(fens)} 个局面未能在 {self.request_timeout} 秒内完成分析')
+
+    def check_budget(self, count, movetime):
+        """
+        按局面数、每局面搜索时间和进程数估算请求能否在 request_timeout 内完成
+
+        Args:
+            count: 需要搜索的局面数
+            movetime: 每个局面的最长搜索时间（秒），None时无法估算，不检查
+
+        Raises:
+            AnalysisTooLargeError: 估算的搜索时间超过 request_timeout
+        """
+        if not movetime or count <= 0:
+            return
+        rounds = math.ceil(count / max(1, self.workers))
+        if rounds * movetime > self.request_timeout:
+            raise AnalysisTooLargeError(
+                f'{count} 个局面每个搜索 {movetime:g} 秒预计需要 {rounds * movetime:g} 秒，'
+                f'超过上限 {self.request_timeout:g} 秒，请减少局面数或搜索时间'
+            )
+
+    def _cache_keys(self, fens, depth):
+        """各局面的缓存键，50回合规则可能影响搜索结果的局面（哈希中不含半回合计数）不使用缓存"""
+        keys = []
+        for fen in fens:
+            board = chess.Board(fen)
+            keys.append(position_hash(board) if board.halfmove_clock + depth < 100 else None)
+        return keys
+
+    def analyze(self, fens, depth, movetime=None):
+        """
+        分析一组局面
+
+        Args:
+            fens: 局面列表
+            depth: 搜索深度
+            movetime: 每个局面的最长搜索时间（秒），None表示只受 request_timeout 限制
+
+        Returns:
+            与 fens 顺序一致的分析结果列表，命中缓存的结果 cached 为True
+        """
+        if movetime:
+            budget = movetime
+        else:
+            # 不限时间的搜索也不能超过请求的时间上限，否则请求到期后仍占着分析进程；无法预估耗时，不做预检
+            budget, movetime = None, self.request_timeout
+        if self.cache is None:
+            self.check_budget(len(fens), budget)
+            return [dict(result, cached=False) for result in self._search(fens, depth, movetime)]
+
+        engine = self.engine_version
+        movetime_ms = int(movetime * 1000)
+        keys = self._cache_keys(fens, depth)
+        hits = self.cache.lookup({key for key in keys if key is not None}, engine, depth, movetime_ms)
+        # 未命中的局面去重后交给搜索，同一局面在请求中多次出现时只搜索一次
+        pending = {}
+        for fen, key in zip(fens, keys):
+            if key not in hits:
+                pending.setdefault(fen if key is None else key, fen)
+        self.check_budget(len(pending), budget)
+        searched = dict(zip(pending, self._search(list(pending.values()), depth, movetime)))
+        metrics.inc('analysis_cache_hits_total', {}, sum(1 for key in keys if key in hits))
+        metrics.inc('analysis_cache_misses_total', {}, len(pending))
+        self.cache.store({key: result for key, result in searched.items()
+                          if isinstance(key, int) and result['depth'] > 0}, engine, depth, movetime_ms)
+
+        results = []
+        for fen, key in zip(fens, keys):
+            if key in hits:
+                results.append(dict(hits[key], fen=fen, cached=True))
+            else:
+                results.append(dict(searched[fen if key is None else key], fen=fen, cached=False))
+        return results
+
+    def _search(self, fens, depth, movetime):
+        """搜索一组局面（不查缓存）"""
+        if not fens:
+            return []
+        deadline = time.monotonic() + self.request_timeout
+        if self.workers <= 0:
+            results = []
+            for fen in fens:
+                if time.monotonic() > deadline:
+                    raise AnalysisTimeoutError(f'{len(fens)} 个局面未能在 {self.request_timeout} 秒内完成分析')
+                results.append(analyze_position(fen, depth, movetime, self.engine_path, self.tt_size))
+        else:
+            if not self._slots.acquire(timeout=self.queue_timeout):
+                metrics.inc('analysis_rejected_total', {})
+                raise AnalysisBusyError(retry_after=max(1, int(self.queue_timeout)))
+            try:
+                executor = self._get_executor()
+                try:
+                    results = self._submit_all(executor, fens, depth, movetime, deadline)
+                except BrokenProcessPool:
+                    # 子进程被杀死（如OOM）时重建进程池并重试一次
+                    if self._logger:
+                        self._logger.warning("棋局分析进程池已损坏，重新创建")
+                    self._reset_executor(executor)
+                    results = self._submit_all(self._get_executor(), fens, depth, movetime, deadline)
+            finally:
+                self._slots.release()
+
+        for result in results:
+            metrics.inc('analysis_positions_total', {'engine': result['engine']})
+            metrics.inc('analysis_nodes_total', {'engine': result['engine']}, result['nodes'])
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def init_analysis_engine(app):
+    """根据配置初始化棋局分析服务"""
+    engine_path = app.config.get('ANALYSIS_UCI_ENGINE') or None
+    if chess is None:
+        app.logger.warning("未安装python-chess，棋局分析不可用")
+    elif engine_path and not os.access(engine_path, os.X_OK):
+        app.logger.warning(f"UCI引擎不可执行: {engine_path}，使用内置搜索器")
+        engine_path = None
+
+    cache = None
+    if app.config.get('ANALYSIS_CACHE_MAX_ENTRIES', 500000) > 0:
+        from models.db import db
+        cache = AnalysisCache(db, max_entries=app.config['ANALYSIS_CACHE_MAX_ENTRIES'], logger=app.logger)
+
+    app.extensions['analysis_engine'] = AnalysisEngine(
+        workers=app.config.get('ANALYSIS_WORKERS', 2),
+        max_pending=app.config.get('ANALYSIS_MAX_PENDING', 4),
+        queue_timeout=app.config.get('ANALYSIS_QUEUE_TIMEOUT', 5.0),
+        tt_size=app.config.get('ANALYSIS_TT_SIZE', 200000),
+        engine_path=engine_path,
+        cache=cache,
+        request_timeout=app.config.get('ANALYSIS_REQUEST_TIMEOUT', 60.0),
+        logger=app.logger,
+    )
+
+
+def get_analysis_engine():
+    """获取当前应用的棋局分析服务"""
+    return current_app.extensions['analysis_engine']
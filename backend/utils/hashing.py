@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# argon2-cffi为可选依赖，未安装时无法使用argon2算法
+try:
+    import argon2
+except ImportError:
+    argon2 = None
+
+ALGORITHMS = ('pbkdf2', 'scrypt', 'argon2')
+
+# 各算法的默认成本参数
+DEFAULT_PARAMS = {
+    'pbkdf2': {'iterations': 600000},
+    'scrypt': {'n': 2 ** 15, 'r': 8, 'p': 1},
+    'argon2': {'time_cost': 3, 'memory_cost': 65536, 'parallelism': 4},
+}
+
+
+class HashingBusyError(Exception):
+    """等待哈希的请求超过上限，调用方应返回503让客户端稍后重试"""
+
+    def __init__(self, retry_after=1):
+        super().__init__('密码哈希服务繁忙')
+        self.retry_after = retry_after
+
+
+def _werkzeug_method(algorithm, params):
+    """werkzeug哈希字符串中 $ 之前的方法部分，同时用于判断是否需要重新哈希"""
+    if algorithm == 'scrypt':
+        return f"scrypt:{params['n']}:{params['r']}:{params['p']}"
+    return f"pbkdf2:sha256:{params['iterations']}"
+
+
+def _argon2_hasher(params):
+    return argon2.PasswordHasher(
+        time_cost=params['time_cost'],
+        memory_cost=params['memory_cost'],
+        parallelism=params['parallelism']
+    )
+
+
+def _hash(algorithm, params, password):
+    """计算密码哈希（在进程池中执行，须为模块级函数以便序列化）"""
+    if algorithm == 'argon2':
+        return _argon2_hasher(params).hash(password)
+    return generate_password_hash(password, method=_werkzeug_method(algorithm, params))
+
+
+def _verify(password_hash, password):
+    """校验密码（在进程池中执行），算法和参数从哈希字符串中读取"""
+    if password_hash.startswith('$argon2'):
+        if argon2 is None:
+            raise RuntimeError('校验argon2哈希需要安装argon2-cffi')
+        try:
+            return argon2.PasswordHasher().verify(password_hash, password)
+        except (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHash):
+            return False
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """
+    密码哈希服务
+
+    哈希计算是CPU密集型操作，交给独立的进程池执行，请求线程只等待结果，
+    不会在登录高峰时占满worker的CPU时间片而拖慢同一进程中的其他请求。
+    每个worker进程中同时在途（排队加执行）的哈希数有上限，超过上限的请求
+    最多等待 queue_timeout 秒，仍无空位则抛出 HashingBusyError。
+
+    workers 为0时在请求线程中直接计算（开发环境和单元测试）。
+    """
+
+    def __init__(self, algorithm='pbkdf2', params=None, workers=1, max_pending=16,
+                 queue_timeout=5.0, start_method='spawn', logger=None):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f'不支持的密码哈希算法: {algorithm}')
+        self.algorithm = algorithm
+        self.params = dict(DEFAULT_PARAMS[algorithm], **(params or {}))
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._context = multiprocessing.get_context(start_method)
+        self._logger = logger
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._counts = {'hashed': 0, 'verified': 0, 'rehashed': 0, 'rejected': 0}
+
+    def _get_executor(self):
+        # gunicorn预加载应用后fork出worker，进程池必须在使用它的进程中创建
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _reset_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._counts['rejected'] += 1
+            raise HashingBusyError(retry_after=max(1, int(self.queue_timeout)))
+        try:
+            executor = self._get_executor()
+            try:
+                return executor.submit(func, *args).result()
+            except BrokenProcessPool:
+                # 子进程被杀死（如OOM）时重建进程池并重试一次
+                if self._logger:
+                    self._logger.warning("密码哈希进程池已损坏，重新创建")
+                self._reset_executor(executor)
+                return self._get_executor().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """使用当前配置的算法和参数计算密码哈希"""
+        self._counts['hashed'] += 1
+        return self._run(_hash, self.algorithm, self.params, password)
+
+    def verify(self, password_hash, password):
+        """校验密码是否与哈希匹配"""
+        if not password_hash:
+            return False
+        self._counts['verified'] += 1
+        return self._run(_verify, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """哈希使用的算法或成本参数与当前配置不同时返回True"""
+        if self.algorithm == 'argon2':
+            return not password_hash.startswith('$argon2') or \
+                _argon2_hasher(self.params).check_needs_rehash(password_hash)
+        return password_hash.split('$', 1)[0] != _werkzeug_method(self.algorithm, self.params)
+
+    def verify_and_update(self, user, password):
+        """
+        校验用户密码，参数已变化时顺便用新参数重新计算哈希（不提交事务）
+
+        Args:
+            user: 用户对象
+            password: 明文密码
+
+        Returns:
+            密码是否正确
+        """
+        if not self.verify(user.password_hash, password):
+            return False
+        if self.needs_rehash(user.password_hash):
+            user.password_hash = self.hash(password)
+            self._counts['rehashed'] += 1
+        return True
+
+    def stats(self):
+        return dict(self._counts, algorithm=self.algorithm, workers=self.workers)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def _config_params(config, algorithm):
+    """从配置中读取指定算法的成本参数"""
+    if algorithm == 'scrypt':
+        return {
+            'n': config.get('PASSWORD_HASH_SCRYPT_N', 2 ** 15),
+            'r': config.get('PASSWORD_HASH_SCRYPT_R', 8),
+            'p': config.get('PASSWORD_HASH_SCRYPT_P', 1),
+        }
+    if algorithm == 'argon2':
+        return {
+            'time_cost': config.get('PASSWORD_HASH_ARGON2_TIME_COST', 3),
+            'memory_cost': config.get('PASSWORD_HASH_ARGON2_MEMORY_COST', 65536),
+            'parallelism': config.get('PASSWORD_HASH_ARGON2_PARALLELISM', 4),
+        }
+    return {'iterations': config.get('PASSWORD_HASH_PBKDF2_ITERATIONS', 600000)}
+
+
+def init_password_hasher(app):
+    """根据配置初始化密码哈希服务"""
+    algorithm = app.config.get('PASSWORD_HASH_ALGORITHM', 'pbkdf2')
+    if algorithm == 'argon2' and argon2 is None:
+        app.logger.warning("未安装argon2-cffi，密码哈希回退到scrypt")
+        algorithm = 'scrypt'
+
+    hasher = PasswordHasher(
+        algorithm,
+        params=_config_params(app.config, algorithm),
+        workers=app.config.get('PASSWORD_HASH_WORKERS', 1),
+        max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING', 16),
+        queue_timeout=app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5.0),
+        logger=app.logger
+    )
+    app.extensions['password_hasher'] = hasher
+    app.logger.info(f"密码哈希服务已初始化，算法: {algorithm}, 参数: {hasher.params}, 进程数: {hasher.workers}")
+    return hasher
+
+
+def get_password_hasher():
+    """获取当前应用的密码哈希服务"""
+    return current_app.extensions['password_hasher']
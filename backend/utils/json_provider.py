@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from flask.json.provider import DefaultJSONProvider
+
+# orjson为可选依赖，未安装时回退到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    基于orjson的JSON提供者
+
+    orjson的编码速度约为标准库的数倍，且直接输出UTF-8字节，
+    生成响应时无需再做一次str到bytes的转换。
+    orjson不支持的类型（如Decimal、UUID）交给Flask默认的default函数处理。
+    """
+
+    # datetime交给default处理，与Flask默认的HTTP日期格式保持一致
+    option = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        # 需要缩进或排序等orjson无法完全兼容的参数时，回退到标准库
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.option | orjson.OPT_APPEND_NEWLINE
+
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option),
+            mimetype=self.mimetype
+        )
+
+
+def init_json_provider(app):
+    """根据配置注册JSON提供者"""
+    provider = app.config.get('JSON_PROVIDER', 'orjson')
+
+    if provider == 'orjson':
+        if orjson is None:
+            app.logger.warning("未安装orjson，使用标准库JSON编码器")
+            return
+        app.json = OrjsonProvider(app)
+
+    app.logger.info(f"JSON提供者: {type(app.json).__name__}")
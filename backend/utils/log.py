@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, request
+
+# 日志中需要脱敏的请求头和JSON字段（小写）
+SENSITIVE_HEADERS = {'authorization', 'cookie', 'set-cookie', 'x-api-key'}
+SENSITIVE_FIELDS = {'password', 'old_password', 'new_password', 'token', 'access_token', 'refresh_token'}
+REDACTED = '***'
+
+# LogRecord的标准属性，其余属性视为通过 extra 传入的结构化字段
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# 挂载在根日志器上的处理器和后台日志线程，每个进程只创建一个
+_root_handler = None
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """将日志记录格式化为单行JSON，extra 中的字段作为独立的键输出"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # 经过QueueHandler时异常信息已被格式化为exc_text
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def init_logging(app, level):
+    """
+    配置日志
+
+    日志记录先放入内存队列，由后台线程写入输出，请求线程不再直接执行同步I/O。
+    重复调用（如测试中多次创建应用）只更新日志级别。
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+
+    # 先在根日志器上挂载处理器，再访问app.logger，Flask检测到已有处理器就不会再添加默认处理器
+    if _root_handler is None:
+        _install_handlers(app, root)
+
+    app.logger.setLevel(level)
+
+
+def _install_handlers(app, root):
+    global _root_handler, _listener
+
+    if app.config.get('LOG_FORMAT', 'text') == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    if not app.config.get('LOG_ASYNC', True):
+        root.addHandler(stream_handler)
+        _root_handler = stream_handler
+        return
+
+    _root_handler = QueueHandler(queue.Queue(-1))
+    root.addHandler(_root_handler)
+    _listener = QueueListener(_root_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+    # fork之后子进程中没有后台线程，需要换新队列并重新启动监听线程（gunicorn预加载应用时）
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_restart_listener)
+
+
+def _restart_listener():
+    global _listener
+    if _listener is None:
+        return
+    handlers = _listener.handlers
+    _root_handler.queue = queue.Queue(-1)
+    _listener = QueueListener(_root_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def redact_headers(headers):
+    """返回脱敏后的请求头字典"""
+    return {
+        key: REDACTED if key.lower() in SENSITIVE_HEADERS else value
+        for key, value in headers.items()
+    }
+
+
+def redact_body(data, max_length=500):
+    """对JSON请求体中的令牌和密码字段脱敏，并截断过长的内容"""
+    if isinstance(data, dict):
+        data = {
+            key: REDACTED if key.lower() in SENSITIVE_FIELDS else redact_body(value, max_length)
+            for key, value in data.items()
+        }
+    elif isinstance(data, list):
+        data = [redact_body(item, max_length) for item in data[:20]]
+    elif isinstance(data, str) and len(data) > max_length:
+        data = f"{data[:max_length]}...({len(data)}字符)"
+    return data
+
+
+def parse_sample_rates(value):
+    """解析 '/api/chess/notations=0.01,/api/auth=1' 形式的按路由采样率配置"""
+    rates = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            prefix, rate = item.split('=', 1)
+            rates[prefix.strip()] = float(rate)
+    return rates
+
+
+def get_sample_rate(rates, default_rate, path):
+    """按最长路由前缀匹配采样率，未匹配时使用默认采样率"""
+    best = None
+    for prefix in rates:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return rates[best] if best is not None else default_rate
+
+
+def register_request_logging(app):
+    """
+    注册请求/响应调试日志
+
+    只有DEBUG级别开启且请求被采样时才会收集请求头和请求体，
+    INFO及以上级别时每个请求只多一次级别判断。
+    """
+    logger = app.logger
+    rates = parse_sample_rates(app.config.get('LOG_SAMPLE_RATES', ''))
+    default_rate = app.config.get('LOG_SAMPLE_RATE', 1.0)
+    log_bodies = app.config.get('LOG_REQUEST_BODIES', False)
+
+    @app.before_request
+    def log_request_info():
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        g.log_sampled = random.random() < get_sample_rate(rates, default_rate, request.path)
+        if not g.log_sampled:
+            return
+
+        logger.debug('请求方法: %s, 路径: %s', request.method, request.path)
+        logger.debug('请求头: %s', redact_headers(request.headers))
+        if log_bodies and request.is_json:
+            logger.debug('请求JSON: %s', redact_body(request.get_json(silent=True)))
+
+    @app.after_request
+    def log_response_info(response):
+        if logger.isEnabledFor(logging.DEBUG) and g.get('log_sampled'):
+            logger.debug('响应状态: %s, 路径: %s', response.status, request.path)
+            logger.debug('响应头: %s', redact_headers(response.headers))
+        return response
@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import atexit
+import fcntl
+import functools
+import glob
+import ipaddress
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+# 延迟类指标的桶边界（秒），上限覆盖较慢的AI模型调用
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# 字节数类指标的桶边界
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# 每个请求SQL语句数的桶边界
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# 批量写入条数的桶边界
+BATCH_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+# 指标定义：名称 -> (类型, 说明, 桶边界)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP请求总数', None),
+    'http_request_duration_seconds': ('histogram', 'HTTP请求处理耗时', LATENCY_BUCKETS),
+    'http_request_size_bytes': ('histogram', 'HTTP请求体大小', SIZE_BUCKETS),
+    'http_response_size_bytes': ('histogram', 'HTTP响应体大小', SIZE_BUCKETS),
+    'http_request_exceptions_total': ('counter', '请求处理中未捕获的异常数', None),
+    'db_queries_per_request': ('histogram', '每个请求执行的SQL语句数', COUNT_BUCKETS),
+    'db_query_seconds_per_request': ('histogram', '每个请求的SQL总耗时', LATENCY_BUCKETS),
+    'db_query_duration_seconds': ('histogram', '单条SQL语句耗时', LATENCY_BUCKETS),
+    'ai_provider_requests_total': ('counter', 'AI模型调用次数', None),
+    'ai_provider_duration_seconds': ('histogram', 'AI模型调用耗时', LATENCY_BUCKETS),
+    'ai_provider_image_bytes': ('histogram', '发送给AI模型的图片大小', SIZE_BUCKETS),
+    'ai_admission_rejected_total': ('counter', 'AI接口被准入控制拒绝的请求数', None),
+    'ai_admission_wait_seconds': ('histogram', '等待AI模型并发名额的时间', LATENCY_BUCKETS),
+    'ai_provider_retries_total': ('counter', 'AI模型调用失败后的重试次数（按失败原因）', None),
+    'ai_provider_unavailable_total': ('counter', '因重试耗尽、超时或熔断而放弃的AI模型调用数', None),
+    'ai_circuit_transitions_total': ('counter', 'AI模型熔断器的状态切换次数', None),
+    'ai_provider_tokens_total': ('counter', 'AI模型调用消耗的token数（输入/输出）', None),
+    'ai_provider_cost_micros_total': ('counter', 'AI模型调用的估算费用（百万分之一美元）', None),
+    'uploads_gc_deleted_files_total': ('counter', '清理上传目录删除的孤立文件数', None),
+    'uploads_gc_reclaimed_bytes_total': ('counter', '清理上传目录回收的字节数', None),
+    'write_behind_batch_size': ('histogram', '写后缓冲每次提交的记录数', BATCH_BUCKETS),
+    'write_behind_flush_errors_total': ('counter', '写后缓冲写入失败的次数', None),
+    'analysis_positions_total': ('counter', '分析的局面数', None),
+    'analysis_nodes_total': ('counter', '棋局分析搜索的节点数', None),
+    'analysis_rejected_total': ('counter', '分析进程池繁忙而被拒绝的请求数', None),
+    'analysis_cache_hits_total': ('counter', '命中分析结果缓存的局面数', None),
+    'analysis_cache_misses_total': ('counter', '未命中分析结果缓存而需要搜索的局面数', None),
+    'analysis_cache_evictions_total': ('counter', '分析结果缓存淘汰的条目数', None),
+}
+
+
+class MetricsRegistry:
+    """
+    进程内指标注册表
+
+    多个gunicorn worker时，每个进程定期把自己的数据写入 METRICS_MULTIPROC_DIR
+    下的独立文件，/metrics 抓取时合并目录中所有文件，得到整个服务的汇总数据。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (名称, 标签元组) -> 值
+        self._counters = {}
+        # (名称, 标签元组) -> [各桶计数..., 总和, 总数]
+        self._histograms = {}
+        self._directory = None
+        self._file = None
+        self._flush_interval = 5
+        self._last_flush = 0
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [0] * (len(buckets) + 2)
+            # 只记录落入的第一个桶，输出时再累加
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def configure_multiprocess(self, directory, flush_interval=5):
+        """开启多进程模式，数据写入共享目录"""
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._flush_interval = flush_interval
+        self._reset_process_file()
+        atexit.register(self.flush)
+        if hasattr(os, 'register_at_fork'):
+            # fork出的worker从空白数据开始，写入自己的文件，避免重复统计master的数据
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._reset_process_file()
+
+    def _reset_process_file(self):
+        # pid可能被复用，文件名中加入随机后缀
+        self._file = os.path.join(self._directory, f"metrics_{os.getpid()}_{uuid.uuid4().hex[:8]}.json")
+
+    def maybe_flush(self):
+        if self._directory and time.monotonic() - self._last_flush >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        """把当前进程的数据写入共享目录"""
+        if not self._directory:
+            return
+        with self._lock:
+            data = self._snapshot()
+        tmp_path = f"{self._file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._file)
+        self._last_flush = time.monotonic()
+
+    def _snapshot(self):
+        return {
+            'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+            'histograms': [[name, list(labels), state] for (name, labels), state in self._histograms.items()]
+        }
+
+    def collect(self):
+        """返回合并后的 (counters, histograms)"""
+        if not self._directory:
+            with self._lock:
+                return dict(self._counters), {key: list(state) for key, state in self._histograms.items()}
+
+        self.flush()
+        counters, histograms = {}, {}
+        with _DirectoryLock(self._directory):
+            _compact_dead_processes(self._directory)
+            for path in glob.glob(os.path.join(self._directory, '*.json')):
+                try:
+                    with open(path) as f:
+                        _merge(json.load(f), counters, histograms)
+                except (OSError, ValueError):
+                    continue
+        return counters, histograms
+
+    def render(self):
+        """生成Prometheus文本格式"""
+        counters, histograms = self.collect()
+        lines = []
+        for name, (kind, description, buckets) in METRICS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            for (metric, labels), state in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, state):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {state[-1]}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {state[-2]}")
+                lines.append(f"{name}_count{_format_labels(labels)} {state[-1]}")
+        return '\n'.join(lines) + '\n'
+
+
+class _DirectoryLock:
+    """合并和压缩共享目录时使用的文件锁"""
+
+    def __init__(self, directory):
+        self._path = os.path.join(directory, '.lock')
+
+    def __enter__(self):
+        self._file = open(self._path, 'w')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+def _merge(data, counters, histograms):
+    for name, labels, value in data.get('counters', []):
+        key = (name, tuple(tuple(pair) for pair in labels))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, state in data.get('histograms', []):
+        key = (name, tuple(tuple(pair) for pair in labels))
+        existing = histograms.get(key)
+        histograms[key] = state if existing is None else [a + b for a, b in zip(existing, state)]
+
+
+def _compact_dead_processes(directory):
+    """把已退出进程（如被回收的worker）的文件合并到归档文件中，避免文件数无限增长"""
+    archive_path = os.path.join(directory, 'archive.json')
+    dead = []
+    for path in glob.glob(os.path.join(directory, 'metrics_*.json')):
+        pid = int(os.path.basename(path).split('_')[1])
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            dead.append(path)
+        except PermissionError:
+            continue
+    if not dead:
+        return
+
+    counters, histograms = {}, {}
+    for path in [archive_path] + dead:
+        try:
+            with open(path) as f:
+                _merge(json.load(f), counters, histograms)
+        except (OSError, ValueError):
+            continue
+    tmp_path = f"{archive_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, list(labels), state] for (name, labels), state in histograms.items()]
+        }, f)
+    os.replace(tmp_path, archive_path)
+    for path in dead:
+        os.remove(path)
+
+
+def _format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    parts = []
+    for key, value in items:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+# 进程级全局注册表
+metrics = MetricsRegistry()
+
+
+def instrument_provider(provider, func):
+    """包装 parse_with_* 函数，记录调用次数、耗时、结果和图片大小"""
+    @functools.wraps(func)
+    def wrapper(image_path, *args, **kwargs):
+        if os.path.isfile(image_path):
+            metrics.observe('ai_provider_image_bytes', {'provider': provider}, os.path.getsize(image_path))
+        start = time.perf_counter()
+        outcome = 'success'
+        try:
+            return func(image_path, *args, **kwargs)
+        except Exception as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            metrics.observe('ai_provider_duration_seconds', {'provider': provider}, time.perf_counter() - start)
+            metrics.inc('ai_provider_requests_total', {'provider': provider, 'outcome': outcome})
+    return wrapper
+
+
+def instrument_async_provider(provider, func):
+    """instrument_provider 的协程版本，记录同一组指标"""
+    @functools.wraps(func)
+    async def wrapper(image_path, *args, **kwargs):
+        if os.path.isfile(image_path):
+            metrics.observe('ai_provider_image_bytes', {'provider': provider}, os.path.getsize(image_path))
+        start = time.perf_counter()
+        outcome = 'success'
+        try:
+            return await func(image_path, *args, **kwargs)
+        except Exception as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            metrics.observe('ai_provider_duration_seconds', {'provider': provider}, time.perf_counter() - start)
+            metrics.inc('ai_provider_requests_total', {'provider': provider, 'outcome': outcome})
+    return wrapper
+
+
+def _is_local_request():
+    """请求是否由本机直接发起（回环地址且没有代理转发头）"""
+    if request.headers.get('X-Forwarded-For') or request.headers.get('Forwarded'):
+        return False
+    try:
+        return ipaddress.ip_address(request.remote_addr or '').is_loopback
+    except ValueError:
+        return False
+
+
+def init_metrics(app, engine):
+    """注册请求钩子、SQL事件和 /metrics 接口"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    if app.config.get('METRICS_MULTIPROC_DIR') and not metrics._directory:
+        metrics.configure_multiprocess(app.config['METRICS_MULTIPROC_DIR'], app.config.get('METRICS_FLUSH_INTERVAL', 5))
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info['metrics_query_start'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop('metrics_query_start', time.perf_counter())
+        metrics.observe('db_query_duration_seconds', {}, elapsed)
+        if has_request_context():
+            g.metrics_queries = g.get('metrics_queries', 0) + 1
+            g.metrics_query_seconds = g.get('metrics_query_seconds', 0.0) + elapsed
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        labels = {'method': request.method, 'endpoint': endpoint, 'status': str(response.status_code)}
+        metrics.inc('http_requests_total', labels)
+        metrics.observe('http_request_duration_seconds', labels, time.perf_counter() - start)
+        metrics.observe('http_request_size_bytes', {'endpoint': endpoint}, request.content_length or 0)
+        if not response.is_streamed:
+            metrics.observe('http_response_size_bytes', {'endpoint': endpoint}, response.calculate_content_length() or 0)
+        metrics.observe('db_queries_per_request', {'endpoint': endpoint}, g.get('metrics_queries', 0))
+        metrics.observe('db_query_seconds_per_request', {'endpoint': endpoint}, g.get('metrics_query_seconds', 0.0))
+        metrics.maybe_flush()
+        return response
+
+    @app.teardown_request
+    def record_request_exception(error):
+        if error is not None:
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.inc('http_request_exceptions_total', {'endpoint': endpoint, 'exception': type(error).__name__})
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        token = current_app.config.get('METRICS_TOKEN')
+        if token:
+            if request.headers.get('Authorization') != f'Bearer {token}':
+                return Response('unauthorized\n', status=401, mimetype='text/plain')
+        elif not _is_local_request():
+            # 未设置令牌时只允许本机直接抓取，经反向代理转发的请求同样拒绝
+            return Response('forbidden\n', status=403, mimetype='text/plain')
+        return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    if not app.config.get('METRICS_TOKEN'):
+        app.logger.warning("未设置 METRICS_TOKEN，/metrics 只接受本机的抓取请求")
+    app.logger.info(f"指标采集已启用，多进程目录: {app.config.get('METRICS_MULTIPROC_DIR') or '无'}")
@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import functools
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import sqlalchemy as sa
+from flask import current_app
+from utils.review import PRACTICE_CORRECT_GRADE, PRACTICE_WRONG_GRADE
+from utils.write_behind import WriteBehindBuffer
+
+# 可选依赖：安装 python-chess 时按局面校验走法，支持 e2e4 / e2-e4 形式的提交
+try:
+    import chess
+except ImportError:
+    chess = None
+
+# 注释 {...} 和 ; 行注释
+_COMMENT = re.compile(r'\{[^}]*\}|;[^\n]*')
+# 最内层的变着 (...)
+_VARIATION = re.compile(r'\([^()]*\)')
+# 回合数：1. / 1... / 12.
+_MOVE_NUMBER = re.compile(r'^\d+\.+')
+# 将军、将杀和注释符号
+_SAN_SUFFIX = re.compile(r'[+#!?]+$')
+# 对局结果
+RESULTS = {'1-0', '0-1', '1/2-1/2', '½-½', '*'}
+
+
+def split_moves(text):
+    """把棋谱文本拆分为逐步（半回合）的走法，去掉回合数、注释、变着、NAG和结果"""
+    text = _COMMENT.sub(' ', text or '')
+    # 嵌套的变着由内向外逐层去掉
+    while True:
+        stripped = _VARIATION.sub(' ', text)
+        if stripped == text:
+            break
+        text = stripped
+    plies = []
+    for token in text.split():
+        token = _MOVE_NUMBER.sub('', token)
+        if not token or token in RESULTS or token.startswith('$'):
+            continue
+        plies.append(token)
+    return plies
+
+
+def normalize_san(move):
+    """规范化SAN写法：去掉将军/注释符号和吃过路兵标记，0-0 写作 O-O"""
+    move = move.strip()
+    if move.endswith('e.p.'):
+        move = move[:-4].strip()
+    move = _SAN_SUFFIX.sub('', move)
+    return move.replace('0-0-0', 'O-O-O').replace('0-0', 'O-O')
+
+
+@functools.lru_cache(maxsize=512)
+def game_plies(moves_text):
+    """
+    把棋谱拆分为逐步的 (可接受的SAN写法集合, UCI)
+
+    安装了 python-chess 时从初始局面逐步走棋，每一步同时接受棋谱中的写法和标准写法（如 Nbd7 与 Nd7），
+    并得到UCI；遇到无法走出的步骤（如识别错误）时，从该步起只按棋谱中的SAN比较，UCI为None。
+    以棋谱文本为键缓存，棋谱修改后文本不同，自然使用新的结果。
+    """
+    sans = [normalize_san(move) for move in split_moves(moves_text)]
+    if chess is None:
+        return tuple((frozenset([san]), None) for san in sans)
+
+    board = chess.Board()
+    plies = []
+    for index, san in enumerate(sans):
+        try:
+            move = board.parse_san(san)
+        except ValueError:
+            plies.extend((frozenset([rest]), None) for rest in sans[index:])
+            break
+        plies.append((frozenset([san, normalize_san(board.san(move))]), move.uci()))
+        board.push(move)
+    return tuple(plies)
+
+
+def match_move(expected, submitted):
+    """
+    判断提交的走法是否与棋谱中的这一步一致
+
+    Args:
+        expected: game_plies 返回的一项
+        submitted: SAN（如 Nf3、O-O）或坐标（如 e2e4、e2-e4、e7e8q）
+    """
+    sans, uci = expected
+    if uci and submitted.replace('-', '').strip().lower() == uci:
+        return True
+    return normalize_san(submitted) in sans
+
+
+class PracticeTracker:
+    """
+    棋谱练习记录
+
+    提交的每一步只在内存中校验（棋谱按文本缓存解析结果，会话按ID缓存所属用户、棋谱和下一步序号），
+    记录经写后缓冲批量写入：一次提交插入这段时间内的全部走法，并按会话累加正确/错误数和进度，
+    练习中的每次点击不再各自提交一次事务。每一步的首次尝试在同一事务中记为一次间隔重复复习。
+
+    进度须按顺序推进：current_ply 只前进到从第0步起连续走对的位置，直接提交后面的步骤不算进度。
+    写入时按数据库中已走对的步骤重新计算，与各批次（包括其他worker进程的批次）写入的先后无关。
+    """
+
+    def __init__(self, db, interval=2.0, max_pending=200, session_cache_size=4096, scheduler=None, logger=None):
+        from models.practice import PracticeAttempt, PracticeSession
+        self._db = db
+        # 每一步的首次尝试同时作为一次复习，交给复习安排更新下次复习时间
+        self._scheduler = scheduler
+        self._sessions = PracticeSession.__table__
+        self._attempts = PracticeAttempt.__table__
+        self._session_cache = OrderedDict()
+        self._session_cache_size = session_cache_size
+        self._cache_lock = threading.Lock()
+        self.buffer = WriteBehindBuffer('practice_attempts', self._write, interval=interval,
+                                        max_pending=max_pending, logger=logger)
+
+    def remember_session(self, session_id, user_id, moves_text, next_ply=0, solved=()):
+        with self._cache_lock:
+            # solved 为下一步之后已走对的步骤，前面的步骤补上后进度直接越过它们
+            self._session_cache[session_id] = [user_id, moves_text, next_ply, set(solved)]
+            self._session_cache.move_to_end(session_id)
+            while len(self._session_cache) > self._session_cache_size:
+                self._session_cache.popitem(last=False)
+
+    def _load_session(self, session_id):
+        """
+        从数据库读取会话所属用户、棋谱文本、下一步序号和其后已走对的步骤
+
+        Returns:
+            [user_id, moves_text, next_ply, solved]，会话不存在时返回None
+        """
+        from models.chess import ChessNotation
+        notations, attempts = ChessNotation.__table__, self._attempts
+        with self._db.engine.connect() as conn:
+            row = conn.execute(
+                sa.select(self._sessions.c.user_id, notations.c.moves, self._sessions.c.current_ply)
+                .join(notations, notations.c.id == self._sessions.c.notation_id)
+                .where(self._sessions.c.id == session_id)
+            ).first()
+            if row is None:
+                return None
+            solved = set(conn.execute(
+                sa.select(attempts.c.ply).distinct()
+                .where(attempts.c.session_id == session_id, attempts.c.is_correct, attempts.c.ply > row[2])
+            ).scalars())
+        return [row[0], row[1], row[2], solved]
+
+    def _session_info(self, session_id):
+        """会话所属用户、棋谱文本和（本进程所知的）下一步序号，不存在时返回None"""
+        with self._cache_lock:
+            info = self._session_cache.get(session_id)
+        if info is not None:
+            return info
+        info = self._load_session(session_id)
+        if info is None:
+            return None
+        self.remember_session(session_id, *info)
+        with self._cache_lock:
+            return self._session_cache.get(session_id, info)
+
+    def _advance(self, session_id, info, ply, correct):
+        """
+        按顺序推进会话的下一步序号，返回推进后的序号
+
+        提交的步骤在本进程记录的下一步之后时，前面的步骤可能由其他worker进程接收，
+        先写入本进程的缓冲再按数据库中的进度和已走对的步骤重新确定；仍在其后则记为已走对的步骤，
+        暂不推进。补上下一步时越过其后连续已走对的步骤，与写入时 _reached 的计算一致。
+        """
+        if ply > info[2]:
+            self.buffer.flush()
+            row = self._load_session(session_id)
+            if row is not None:
+                with self._cache_lock:
+                    info[2] = max(info[2], row[2])
+                    info[3].update(row[3])
+        with self._cache_lock:
+            if correct and ply >= info[2]:
+                info[3].add(ply)
+            while info[2] in info[3]:
+                info[3].discard(info[2])
+                info[2] += 1
+            return info[2]
+
+    def submit(self, session_id, user_id, ply, move):
+        """
+        校验一步棋并放入写后缓冲
+
+        Args:
+            ply: 这一步的半回合序号（从0开始）
+            move: 提交的走法
+
+        Returns:
+            {'ply', 'correct', 'next_ply', 'completed'}，next_ply 为从头连续走对后的下一步；
+            会话不存在或不属于该用户时返回None
+
+        Raises:
+            ValueError: 序号超出棋谱范围或走法为空
+        """
+        info = self._session_info(session_id)
+        if info is None or info[0] != int(user_id):
+            return None
+        plies = game_plies(info[1])
+        if not 0 <= ply < len(plies):
+            raise ValueError(f"步骤序号须在0到{len(plies) - 1}之间")
+        move = (move or '').strip()
+        if not move or len(move) > 16:
+            raise ValueError("走法不能为空且不超过16个字符")
+
+        correct = match_move(plies[ply], move)
+        self.buffer.add((session_id, ply, move, correct, datetime.utcnow()))
+        next_ply = self._advance(session_id, info, ply, correct)
+        return {
+            'ply': ply,
+            'correct': correct,
+            'next_ply': next_ply,
+            'completed': next_ply >= len(plies)
+        }
+
+    def _reached(self, conn, current):
+        """
+        按已走对的步骤计算各会话从头连续走对到的位置
+
+        Args:
+            current: {会话ID: 当前的 current_ply}
+
+        Returns:
+            {会话ID: 新的 current_ply}
+        """
+        attempts = self._attempts
+        solved = {}
+        for session_id, ply in conn.execute(
+            sa.select(attempts.c.session_id, attempts.c.ply).distinct()
+            .where(attempts.c.session_id.in_(list(current)), attempts.c.is_correct,
+                   attempts.c.ply >= min(current.values()))
+        ).tuples():
+            solved.setdefault(session_id, set()).add(ply)
+        reached = {}
+        for session_id, ply in current.items():
+            plies = solved.get(session_id, ())
+            while ply in plies:
+                ply += 1
+            reached[session_id] = ply
+        return reached
+
+    def _write(self, items):
+        """在一个事务中写入一批走法，并按会话累加计数和进度"""
+        sessions, attempts = self._sessions, self._attempts
+        totals = {}
+        for session_id, ply, _, correct, created_at in items:
+            total = totals.setdefault(session_id, {'sid': session_id, 'dc': 0, 'di': 0, 'now': created_at})
+            total['dc' if correct else 'di'] += 1
+            total['now'] = max(total['now'], created_at)
+
+        with self._db.engine.begin() as conn:
+            # 缓冲期间被删除的会话（棋谱或用户被删除，外键级联删除）的记录直接丢弃；
+            # 锁住会话行，同一会话的并发批次依次计算进度，后一批能看到前一批写入的走法
+            existing, current = {}, {}
+            for session_id, user_id, notation_id, current_ply in conn.execute(
+                sa.select(sessions.c.id, sessions.c.user_id, sessions.c.notation_id, sessions.c.current_ply)
+                .where(sessions.c.id.in_(list(totals)))
+                .with_for_update()
+            ):
+                existing[session_id] = (user_id, notation_id)
+                current[session_id] = current_ply
+            rows = [
+                {'session_id': session_id, 'ply': ply, 'move': move, 'is_correct': correct, 'created_at': created_at}
+                for session_id, ply, move, correct, created_at in items if session_id in existing
+            ]
+            if not rows:
+                return
+            if self._scheduler is not None:
+                self._scheduler.record(conn, self._first_attempts(conn, items, existing))
+            conn.execute(attempts.insert(), rows)
+            for session_id, ply in self._reached(conn, current).items():
+                totals[session_id]['reached'] = ply
+            reached = sa.bindparam('reached')
+            now = sa.bindparam('now')
+            conn.execute(
+                sessions.update().where(sessions.c.id == sa.bindparam('sid')).values(
+                    correct=sessions.c.correct + sa.bindparam('dc'),
+                    incorrect=sessions.c.incorrect + sa.bindparam('di'),
+                    current_ply=sa.case((sessions.c.current_ply < reached, reached), else_=sessions.c.current_ply),
+                    updated_at=now,
+                    finished_at=sa.case(
+                        (sa.and_(sessions.c.finished_at.is_(None), reached >= sessions.c.total_plies), now),
+                        else_=sessions.c.finished_at
+                    ),
+                ),
+                [total for session_id, total in totals.items() if session_id in existing]
+            )
+
+    def _first_attempts(self, conn, items, existing):
+        """找出这批记录中每个会话每一步的首次尝试（之前批次已尝试过的步骤不算），转换为复习结果"""
+        attempts = self._attempts
+        seen = set(conn.execute(
+            sa.select(attempts.c.session_id, attempts.c.ply).distinct()
+            .where(attempts.c.session_id.in_(list(existing)), attempts.c.ply.in_(list({item[1] for item in items})))
+        ).tuples())
+        reviews = []
+        for session_id, ply, _, correct, created_at in items:
+            if session_id not in existing or (session_id, ply) in seen:
+                continue
+            seen.add((session_id, ply))
+            user_id, notation_id = existing[session_id]
+            grade = PRACTICE_CORRECT_GRADE if correct else PRACTICE_WRONG_GRADE
+            reviews.append((user_id, notation_id, ply, grade, created_at))
+        return reviews
+
+    def progress(self, user_id, notation_id=None):
+        """
+        按棋谱汇总用户的练习进度和正确率
+
+        读取前先写入本进程缓冲中的记录；其他进程缓冲中的记录最多晚 PRACTICE_FLUSH_INTERVAL 秒可见。
+        """
+        self.buffer.flush()
+        from models.chess import ChessNotation
+        sessions, notations = self._sessions, ChessNotation.__table__
+        query = (
+            sa.select(
+                sessions.c.notation_id,
+                sa.func.count(),
+                sa.func.count(sessions.c.finished_at),
+                sa.func.sum(sessions.c.correct),
+                sa.func.sum(sessions.c.incorrect),
+                sa.func.max(sessions.c.current_ply * 1.0 / sessions.c.total_plies),
+                sa.func.max(sessions.c.updated_at),
+            )
+            # 只统计仍存在的棋谱（外键检查打开之前删除的棋谱可能留下练习记录）
+            .join(notations, notations.c.id == sessions.c.notation_id)
+            .where(sessions.c.user_id == int(user_id))
+            .group_by(sessions.c.notation_id)
+            .order_by(sa.func.max(sessions.c.updated_at).desc())
+        )
+        if notation_id is not None:
+            query = query.where(sessions.c.notation_id == notation_id)
+        with self._db.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        result = []
+        for nid, count, completed, correct, incorrect, best_progress, last_practiced in rows:
+            attempts = (correct or 0) + (incorrect or 0)
+            result.append({
+                'notation_id': nid,
+                'sessions': count,
+                'completed_sessions': completed,
+                'attempts': attempts,
+                'correct': correct or 0,
+                'incorrect': incorrect or 0,
+                'accuracy': round(correct / attempts, 4) if attempts else None,
+                'best_progress': round(best_progress or 0, 4),
+                'last_practiced_at': last_practiced.isoformat() if last_practiced else None
+            })
+        return result
+
+    def hardest_plies(self, user_id, notation_id, limit=5):
+        """用户在某个棋谱中出错最多的步骤"""
+        sessions, attempts = self._sessions, self._attempts
+        mistakes = sa.func.sum(sa.case((attempts.c.is_correct, 0), else_=1))
+        with self._db.engine.connect() as conn:
+            rows = conn.execute(
+                sa.select(attempts.c.ply, mistakes, sa.func.count())
+                .join(sessions, sessions.c.id == attempts.c.session_id)
+                .where(sessions.c.user_id == int(user_id), sessions.c.notation_id == notation_id)
+                .group_by(attempts.c.ply)
+                .having(mistakes > 0)
+                .order_by(mistakes.desc(), attempts.c.ply)
+                .limit(limit)
+            ).all()
+        return [{'ply': ply, 'mistakes': count, 'attempts': total} for ply, count, total in rows]
+
+
+def init_practice(app):
+    """根据配置初始化棋谱练习记录"""
+    from models.db import db
+    app.extensions['practice'] = PracticeTracker(
+        db,
+        interval=app.config.get('PRACTICE_FLUSH_INTERVAL', 2.0),
+        max_pending=app.config.get('PRACTICE_FLUSH_MAX_PENDING', 200),
+        scheduler=app.extensions.get('review_scheduler'),
+        logger=app.logger,
+    )
+
+
+def get_practice_tracker():
+    """获取当前应用的棋谱练习记录"""
+    return current_app.extensions['practice']
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按需的单请求性能剖析
+
+请求满足以下任一条件时被剖析：
+    1. 携带管理员签名的 X-Profile 请求头或 _profile 查询参数（由 flask profiler sign 生成，有过期时间）
+    2. 按 PROFILER_SAMPLE_RATE 随机采样
+
+剖析期间由后台线程定时采集请求线程的调用栈（统计式剖析，开销与采样间隔有关而与调用次数无关），
+同时记录请求执行的SQL语句及耗时。结果以JSON保存在 PROFILER_DIR 中，超出 PROFILER_MAX_FILES 时删除最旧的文件，
+可通过 /api/admin/profiles 接口列出和下载（折叠栈格式，可直接交给 flamegraph.pl 或 speedscope）。
+"""
+
+import click
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import sysconfig
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+from flask import current_app, g, has_request_context, request
+from flask.cli import AppGroup
+from sqlalchemy import event
+
+# 剖析结果ID格式，同时用于防止下载接口的路径穿越
+PROFILE_ID_PATTERN = re.compile(r'^\d{14}-[0-9a-f]{8}$')
+
+# 每个请求最多记录的SQL语句数
+MAX_SQL_STATEMENTS = 500
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SITE_PACKAGES = sysconfig.get_paths()['purelib']
+
+# flask profiler 命令组
+profiler_cli = AppGroup('profiler', help='请求剖析命令')
+
+
+class StackSampler:
+    """
+    统计式调用栈采样器
+
+    所有被剖析的请求共用一个后台线程，没有被剖析的请求时线程自动退出。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 线程ID -> 折叠栈计数
+        self._active = {}
+        self._thread = None
+        self.interval = 0.005
+
+    def start(self, thread_id):
+        with self._lock:
+            self._active[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._active.pop(thread_id, Counter())
+
+    def reset(self):
+        """fork之后子进程中没有采样线程，清空状态"""
+        self._lock = threading.Lock()
+        self._active = {}
+        self._thread = None
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                targets = list(self._active.items())
+            frames = sys._current_frames()
+            for thread_id, counter in targets:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    counter[collapse_stack(frame)] += 1
+
+
+sampler = StackSampler()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=sampler.reset)
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename):
+    for prefix in (SITE_PACKAGES, BACKEND_DIR):
+        if filename.startswith(prefix):
+            return os.path.relpath(filename, prefix)
+    return filename
+
+
+def collapse_stack(frame):
+    """把调用栈转换为折叠栈格式：从外到内的帧以分号连接"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def sign_token(secret, ttl):
+    """生成在 ttl 秒后过期的剖析令牌"""
+    expires = int(time.time()) + ttl
+    signature = hmac.new(secret.encode(), f'profile:{expires}'.encode(), hashlib.sha256).hexdigest()
+    return f'{expires}.{signature}'
+
+
+def verify_token(secret, token):
+    """校验剖析令牌的签名和过期时间"""
+    if not secret or not token or '.' not in token:
+        return False
+    expires, signature = token.split('.', 1)
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(secret.encode(), f'profile:{expires}'.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def request_token():
+    """从请求头或查询参数中取出剖析令牌"""
+    return request.headers.get('X-Profile') or request.args.get('_profile')
+
+
+def save_profile(directory, profile, max_files):
+    """保存剖析结果，超出数量上限时删除最旧的文件"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{profile['id']}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(profile, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+    # ID以时间戳开头，按文件名排序即按时间排序
+    files = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+    for name in files[:max(0, len(files) - max_files)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+
+def list_profiles(directory):
+    """按时间倒序返回剖析结果的摘要（不含调用栈和SQL详情）"""
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            continue
+        profile.pop('stacks', None)
+        sql = profile.pop('sql', [])
+        profile['sql_count'] = len(sql)
+        profile['sql_ms'] = round(sum(item['ms'] for item in sql), 3)
+        summaries.append(profile)
+    return summaries
+
+
+def load_profile(directory, profile_id):
+    """读取单个剖析结果，ID不合法或不存在时返回None"""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(directory, f'{profile_id}.json')
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def to_collapsed(profile):
+    """转换为折叠栈文本，每行为 '帧1;帧2;... 采样数'"""
+    return ''.join(f'{stack} {count}\n' for stack, count in profile['stacks'].items())
+
+
+def init_profiler(app, engine):
+    """
+    注册剖析钩子
+
+    未配置 PROFILER_SECRET 且采样率为0时不注册任何钩子，请求路径上没有额外开销。
+    """
+    secret = app.config.get('PROFILER_SECRET')
+    sample_rate = app.config.get('PROFILER_SAMPLE_RATE', 0.0)
+    if not secret and sample_rate <= 0:
+        return
+
+    directory = app.config.get('PROFILER_DIR', 'profiles')
+    max_files = app.config.get('PROFILER_MAX_FILES', 200)
+    sampler.interval = app.config.get('PROFILER_INTERVAL_MS', 5) / 1000
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def profile_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and g.get('profile') is not None:
+            conn.info['profile_query_start'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def profile_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop('profile_query_start', None)
+        if start is None or not has_request_context():
+            return
+        profile = g.get('profile')
+        if profile is not None and len(profile['sql']) < MAX_SQL_STATEMENTS:
+            # 只记录语句模板，不记录参数，避免把用户数据写入磁盘
+            profile['sql'].append({'statement': statement, 'ms': round((time.perf_counter() - start) * 1000, 3)})
+
+    @app.before_request
+    def start_profile():
+        # 剖析结果管理接口本身不剖析
+        if request.blueprint == 'profiles':
+            return
+        if verify_token(secret, request_token()):
+            reason = 'signed'
+        elif sample_rate > 0 and random.random() < sample_rate:
+            reason = 'sampled'
+        else:
+            return
+        # 记录开始采样的线程，ASGI入口中同一请求的前后两段可能运行在不同线程
+        g.profile = {'reason': reason, 'start': time.perf_counter(), 'sql': [], 'status': None,
+                     'thread': threading.get_ident()}
+        sampler.start(g.profile['thread'])
+
+    @app.after_request
+    def record_profile_status(response):
+        profile = g.get('profile')
+        if profile is not None:
+            profile['status'] = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_profile(error):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return
+        stacks = sampler.stop(profile['thread'])
+        now = datetime.utcnow()
+        result = {
+            'id': f"{now:%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}",
+            'time': now.isoformat(),
+            'method': request.method,
+            'path': request.path,
+            # 查询参数只记录参数名，参数值可能含用户数据（搜索词等），不写入磁盘
+            'query_keys': sorted(key for key in request.args if key != '_profile'),
+            'endpoint': request.endpoint,
+            'status': profile['status'] or 500,
+            'error': type(error).__name__ if error is not None else None,
+            'reason': profile['reason'],
+            'pid': os.getpid(),
+            'duration_ms': round((time.perf_counter() - profile['start']) * 1000, 3),
+            'interval_ms': sampler.interval * 1000,
+            'samples': sum(stacks.values()),
+            'stacks': dict(stacks),
+            'sql': profile['sql']
+        }
+        try:
+            save_profile(directory, result, max_files)
+        except OSError as e:
+            current_app.logger.error('保存剖析结果失败: %s', e)
+
+    app.logger.info('请求剖析已启用，采样率: %s, 保存目录: %s', sample_rate, directory)
+
+
+@profiler_cli.command('sign')
+@click.option('--ttl', default=600, show_default=True, help='令牌有效期（秒）')
+def sign_command(ttl):
+    """生成剖析令牌，放在 X-Profile 请求头或 _profile 查询参数中"""
+    secret = current_app.config.get('PROFILER_SECRET')
+    if not secret:
+        raise click.ClickException('未配置 PROFILER_SECRET')
+    click.echo(sign_token(secret, ttl))
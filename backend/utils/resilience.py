@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import random
+import threading
+import time
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from flask import current_app
+from utils.metrics import metrics
+
+# 可重试的HTTP状态码：请求超时、冲突、限流、服务端错误，529为Anthropic的过载状态
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+# 没有状态码的异常按类名判断：超时和连接错误可重试
+RETRYABLE_NAMES = ('Timeout', 'Connection', 'DeadlineExceeded', 'ServiceUnavailable')
+
+# 当前这次模型调用（含重试）的截止时间（time.monotonic()），线程和协程各自独立
+_deadline = ContextVar('ai_call_deadline', default=None)
+
+
+class ProviderError(RuntimeError):
+    """
+    AI提供者调用失败
+
+    Attributes:
+        retryable: 是否为临时错误（限流、服务端错误、超时），重试可能成功
+        status: 提供者返回的HTTP状态码，没有时为None
+        retry_after: 提供者要求的重试等待秒数，没有时为None
+    """
+
+    def __init__(self, message, retryable=False, status=None, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status = status
+        self.retry_after = retry_after
+
+    @classmethod
+    def wrap(cls, message, exc):
+        """把SDK抛出的异常包装为 ProviderError，保留分类信息"""
+        retryable, status, retry_after = classify_exception(exc)
+        return cls(f"{message}: {str(exc)}", retryable, status, retry_after)
+
+
+class ProviderUnavailable(ProviderError):
+    """提供者暂时不可用（重试耗尽或熔断打开），调用方返回503并通过 Retry-After 告知客户端何时重试"""
+
+    def __init__(self, message, retry_after=None, status=None):
+        super().__init__(message, retryable=True, status=status, retry_after=retry_after)
+
+
+def _parse_retry_after(headers):
+    """解析 retry-after-ms / Retry-After 响应头（秒数或HTTP日期）"""
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_exception(exc):
+    """
+    判断异常是否可重试
+
+    兼容 openai、anthropic（异常带 status_code 和 response）和 google-api-core（异常带整数 code）。
+
+    Returns:
+        (是否可重试, HTTP状态码, Retry-After秒数)
+    """
+    if isinstance(exc, ProviderError):
+        return exc.retryable, exc.status, exc.retry_after
+
+    status = getattr(exc, 'status_code', None)
+    if status is None and isinstance(getattr(exc, 'code', None), int):
+        status = exc.code
+    response = getattr(exc, 'response', None)
+    retry_after = _parse_retry_after(getattr(response, 'headers', None))
+
+    if status is not None:
+        return status in RETRYABLE_STATUS, status, retry_after
+    retryable = isinstance(exc, (TimeoutError, ConnectionError)) or \
+        any(name in type(exc).__name__ for name in RETRYABLE_NAMES)
+    return retryable, None, retry_after
+
+
+class CircuitBreaker:
+    """
+    单个提供者的熔断器
+
+    连续 failure_threshold 次可重试的失败后打开，打开期间直接拒绝调用；
+    reset_timeout 秒后进入半开状态，只放行一个探测请求，成功则关闭，失败则重新打开。
+    不可重试的错误（如图片格式不被接受）说明提供者本身正常，不计入失败次数。
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def _transition(self, state):
+        self.state = state
+        metrics.inc('ai_circuit_transitions_total', {'provider': self.name, 'state': state})
+
+    def before_call(self):
+        """调用前检查，熔断打开时抛出 ProviderUnavailable"""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            remaining = self._opened_at + self.reset_timeout - self._clock()
+            if self.state == self.OPEN and remaining <= 0:
+                self._transition(self.HALF_OPEN)
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+        metrics.inc('ai_provider_unavailable_total', {'provider': self.name, 'reason': 'circuit_open'})
+        raise ProviderUnavailable(f"AI模型 {self.name} 暂时不可用（熔断中）", retry_after=max(1.0, remaining))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = self._clock()
+                self._transition(self.OPEN)
+
+    def release(self):
+        """调用因与提供者无关的原因结束（如不可重试的错误）时释放半开状态的探测名额"""
+        with self._lock:
+            self._probing = False
+
+
+class ResiliencePolicy:
+    """
+    AI模型调用的重试和熔断策略
+
+    1. 可重试的错误按指数退避加随机抖动（full jitter）重试，提供者给出 Retry-After 时至少等待该时长；
+    2. 每次尝试的超时为 attempt_timeout，整个调用（含重试和等待）不超过 total_timeout；
+    3. 每个提供者一个熔断器（进程内），熔断打开时不发起调用。
+    重试耗尽、剩余时间不足以等待或熔断打开时抛出 ProviderUnavailable。
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0, attempt_timeout=60.0,
+                 total_timeout=100.0, breaker_failures=5, breaker_reset=30.0, logger=None, rng=random.random,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.total_timeout = total_timeout
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self._logger = logger
+        self._rng = rng
+        # 时钟和同步等待函数可替换，测试中用假时钟验证退避和截止时间
+        self._clock = clock
+        self._sleep = sleep
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+
+    def breaker(self, provider):
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            with self._breakers_lock:
+                breaker = self._breakers.setdefault(
+                    provider, CircuitBreaker(provider, self.breaker_failures, self.breaker_reset, self._clock))
+        return breaker
+
+    def request_timeout(self):
+        """本次尝试可用的超时秒数，提供者函数传给SDK"""
+        deadline = _deadline.get()
+        if deadline is None:
+            return self.attempt_timeout
+        return max(0.1, min(self.attempt_timeout, deadline - self._clock()))
+
+    def _backoff(self, provider, attempt, error, deadline):
+        """
+        计算下一次重试前的等待秒数，不应重试时抛出异常
+
+        Args:
+            attempt: 已完成的尝试次数
+            error: 本次尝试的异常
+            deadline: 整个调用的截止时间
+        """
+        retryable, status, retry_after = classify_exception(error)
+        if not retryable:
+            raise error
+        reason = str(status) if status else type(error).__name__
+        if attempt >= self.max_attempts:
+            metrics.inc('ai_provider_unavailable_total', {'provider': provider, 'reason': 'exhausted'})
+            raise ProviderUnavailable(f"AI模型 {provider} 暂时不可用: {str(error)}", retry_after, status) from error
+
+        delay = self._rng() * min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if self._clock() + delay >= deadline:
+            metrics.inc('ai_provider_unavailable_total', {'provider': provider, 'reason': 'deadline'})
+            raise ProviderUnavailable(f"AI模型 {provider} 暂时不可用: {str(error)}", max(delay, 1.0), status) from error
+
+        metrics.inc('ai_provider_retries_total', {'provider': provider, 'reason': reason})
+        if self._logger:
+            self._logger.warning(f"调用 {provider} 失败（第{attempt}次，{reason}），{delay:.2f}秒后重试")
+        return delay
+
+    def _record(self, breaker, error):
+        if error is None:
+            breaker.record_success()
+        elif classify_exception(error)[0]:
+            breaker.record_failure()
+        else:
+            breaker.release()
+
+    def call(self, provider, func, *args):
+        """同步调用 func(*args)，按策略重试"""
+        breaker = self.breaker(provider)
+        deadline = self._clock() + self.total_timeout
+        token = _deadline.set(deadline)
+        try:
+            attempt = 0
+            while True:
+                breaker.before_call()
+                attempt += 1
+                try:
+                    result = func(*args)
+                except Exception as e:
+                    self._record(breaker, e)
+                    self._sleep(self._backoff(provider, attempt, e, deadline))
+                    continue
+                except BaseException:
+                    # 请求被取消（如客户端断开）时不影响熔断状态
+                    breaker.release()
+                    raise
+                self._record(breaker, None)
+                return result
+        finally:
+            _deadline.reset(token)
+
+    async def call_async(self, provider, func, *args):
+        """协程版本，func 为协程函数"""
+        breaker = self.breaker(provider)
+        deadline = self._clock() + self.total_timeout
+        token = _deadline.set(deadline)
+        try:
+            attempt = 0
+            while True:
+                breaker.before_call()
+                attempt += 1
+                try:
+                    result = await asyncio.wait_for(func(*args), max(0.1, deadline - self._clock()))
+                except Exception as e:
+                    self._record(breaker, e)
+                    await asyncio.sleep(self._backoff(provider, attempt, e, deadline))
+                    continue
+                except BaseException:
+                    # 请求被取消（如客户端断开）时不影响熔断状态
+                    breaker.release()
+                    raise
+                self._record(breaker, None)
+                return result
+        finally:
+            _deadline.reset(token)
+
+    def stats(self):
+        return {name: breaker.state for name, breaker in sorted(self._breakers.items())}
+
+
+def init_resilience(app):
+    """根据配置初始化AI模型调用的重试和熔断策略"""
+    app.extensions['ai_resilience'] = ResiliencePolicy(
+        max_attempts=app.config.get('AI_RETRY_MAX_ATTEMPTS', 3),
+        base_delay=app.config.get('AI_RETRY_BASE_DELAY', 0.5),
+        max_delay=app.config.get('AI_RETRY_MAX_DELAY', 8.0),
+        attempt_timeout=app.config.get('AI_ATTEMPT_TIMEOUT', 60.0),
+        total_timeout=app.config.get('AI_TOTAL_TIMEOUT', 100.0),
+        breaker_failures=app.config.get('AI_BREAKER_FAILURES', 5),
+        breaker_reset=app.config.get('AI_BREAKER_RESET', 30.0),
+        logger=app.logger,
+    )
+
+
+def get_resilience():
+    """获取当前应用的重试和熔断策略"""
+    return current_app.extensions['ai_resilience']
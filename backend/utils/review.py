@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from flask import current_app
+
+# SM-2 初始难易系数和下限
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# 评分为0-5，3及以上表示记住了
+PASS_GRADE = 3
+# 练习中每一步的首次尝试作为一次复习：走对记4分，走错记1分
+PRACTICE_CORRECT_GRADE = 4
+PRACTICE_WRONG_GRADE = 1
+# 复习后写回的状态列
+STATE_COLUMNS = ('ease', 'interval_days', 'repetitions', 'lapses', 'due_at', 'last_grade', 'last_reviewed_at')
+
+
+def sm2(ease, interval_days, repetitions, grade):
+    """
+    SM-2：根据本次评分计算新的难易系数、复习间隔和连续记住的次数
+
+    Args:
+        grade: 评分0-5，小于3表示没有记住，间隔重新从1天开始
+
+    Returns:
+        (ease, interval_days, repetitions)
+    """
+    ease = max(MIN_EASE, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    if grade < PASS_GRADE:
+        return ease, 1, 0
+    if repetitions == 0:
+        interval_days = 1
+    elif repetitions == 1:
+        interval_days = 6
+    else:
+        interval_days = max(interval_days + 1, round(interval_days * ease))
+    return ease, interval_days, repetitions + 1
+
+
+class ReviewScheduler:
+    """
+    间隔重复复习安排
+
+    每个复习项是某个棋谱中的一步。复习（练习中首次走这一步，或在复习队列中作答）时按SM-2
+    计算下次复习时间写入 due_at；查询到期项时只需在 (user_id, due_at) 索引上做一次范围扫描，
+    取最早到期的N项，与用户拥有的复习项数量无关，也不用逐项计算间隔。
+    """
+
+    def __init__(self, db, max_interval_days=365, logger=None):
+        """
+        Args:
+            db: Flask-SQLAlchemy实例
+            max_interval_days: 复习间隔上限（天）
+        """
+        from models.review import ReviewItem
+        self._db = db
+        self._items = ReviewItem.__table__
+        self.max_interval_days = max_interval_days
+        self._logger = logger
+
+    def next_state(self, state, grade, reviewed_at):
+        """根据当前状态和评分计算复习后的状态列"""
+        ease, interval_days, repetitions = sm2(state['ease'], state['interval_days'], state['repetitions'], grade)
+        interval_days = min(interval_days, self.max_interval_days)
+        lapsed = grade < PASS_GRADE and state['repetitions'] > 0
+        return {
+            'ease': ease,
+            'interval_days': interval_days,
+            'repetitions': repetitions,
+            'lapses': state['lapses'] + (1 if lapsed else 0),
+            'due_at': reviewed_at + timedelta(days=interval_days),
+            'last_grade': grade,
+            'last_reviewed_at': reviewed_at,
+        }
+
+    def record(self, conn, reviews):
+        """
+        在调用方的事务中批量记录复习结果，复习项不存在时创建
+
+        Args:
+            conn: 数据库连接（已开始事务）
+            reviews: [(user_id, notation_id, ply, grade, reviewed_at)]，按时间先后排列
+        """
+        if not reviews:
+            return
+        items = self._items
+        pairs = list({(user_id, notation_id) for user_id, notation_id, _, _, _ in reviews})
+        plies = list({ply for _, _, ply, _, _ in reviews})
+        states = {}
+        for row in conn.execute(
+            sa.select(items).where(sa.tuple_(items.c.user_id, items.c.notation_id).in_(pairs), items.c.ply.in_(plies))
+        ).mappings():
+            states[(row['user_id'], row['notation_id'], row['ply'])] = dict(row)
+
+        inserts, updates = {}, {}
+        for user_id, notation_id, ply, grade, reviewed_at in reviews:
+            key = (user_id, notation_id, ply)
+            state = states.get(key)
+            if state is None:
+                state = states[key] = inserts[key] = {
+                    'user_id': user_id, 'notation_id': notation_id, 'ply': ply, 'ease': DEFAULT_EASE,
+                    'interval_days': 0, 'repetitions': 0, 'lapses': 0, 'created_at': reviewed_at,
+                }
+            elif key not in inserts:
+                updates[key] = state
+            state.update(self.next_state(state, grade, reviewed_at))
+
+        if inserts:
+            conn.execute(items.insert(), list(inserts.values()))
+        if updates:
+            conn.execute(
+                items.update().where(items.c.id == sa.bindparam('item_id')),
+                [dict({column: state[column] for column in STATE_COLUMNS}, item_id=state['id'])
+                 for state in updates.values()]
+            )
+
+    def grade(self, user_id, item_id, grade, now=None):
+        """
+        记录对一个复习项的作答
+
+        Returns:
+            更新后的 ReviewItem，不存在或不属于该用户时返回None
+        """
+        from models.review import ReviewItem
+        item = ReviewItem.query.filter_by(id=item_id, user_id=user_id).with_for_update().first()
+        if item is None:
+            return None
+        state = {column: getattr(item, column) for column in ('ease', 'interval_days', 'repetitions', 'lapses')}
+        for column, value in self.next_state(state, grade, now or datetime.utcnow()).items():
+            setattr(item, column, value)
+        self._db.session.commit()
+        return item
+
+    @staticmethod
+    def _owned_notation():
+        """连接复习项所属的棋谱（棋谱须仍属于该用户）的参数"""
+        from models.chess import ChessNotation
+        from models.review import ReviewItem
+        return ChessNotation, sa.and_(ChessNotation.id == ReviewItem.notation_id,
+                                      ChessNotation.user_id == ReviewItem.user_id)
+
+    def due(self, user_id, limit=20, now=None):
+        """
+        最早到期的 limit 个复习项（WHERE user_id = ? AND due_at <= ? ORDER BY due_at LIMIT ?）
+
+        连接棋谱表，只返回棋谱仍属于该用户的复习项：外键未生效时（如开启外键检查之前的SQLite数据库）
+        被删除棋谱留下的复习项到期最早，否则会一直排在队首且无法作答。
+        """
+        from models.review import ReviewItem
+        return (
+            ReviewItem.query
+            .join(*self._owned_notation())
+            .filter(ReviewItem.user_id == user_id, ReviewItem.due_at <= (now or datetime.utcnow()))
+            .order_by(ReviewItem.due_at)
+            .limit(limit)
+            .all()
+        )
+
+    def due_count(self, user_id, now=None, cap=1000):
+        """
+        到期的复习项数量，最多数到 cap
+
+        积压很多的用户（几十万项到期）完整计数要扫描整段索引，超过 cap 时只需显示"cap+"。
+        """
+        from models.review import ReviewItem
+        due = (
+            self._db.session.query(ReviewItem.id)
+            .join(*self._owned_notation())
+            .filter(ReviewItem.user_id == user_id, ReviewItem.due_at <= (now or datetime.utcnow()))
+            .limit(cap)
+            .subquery()
+        )
+        return self._db.session.query(sa.func.count()).select_from(due).scalar()
+
+    def next_due_at(self, user_id, now=None):
+        """下一个尚未到期的复习项的到期时间，没有时返回None"""
+        from models.review import ReviewItem
+        return (
+            self._db.session.query(sa.func.min(ReviewItem.due_at))
+            .join(*self._owned_notation())
+            .filter(ReviewItem.user_id == user_id, ReviewItem.due_at > (now or datetime.utcnow()))
+            .scalar()
+        )
+
+
+def init_review(app):
+    """根据配置初始化间隔重复复习安排"""
+    from models.db import db
+    app.extensions['review_scheduler'] = ReviewScheduler(
+        db,
+        max_interval_days=app.config.get('REVIEW_MAX_INTERVAL_DAYS', 365),
+        logger=app.logger,
+    )
+
+
+def get_review_scheduler():
+    """获取当前应用的间隔重复复习安排"""
+    return current_app.extensions['review_scheduler']
@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from flask import current_app
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy.exc import IntegrityError
+
+# 同步时向前多取的秒数，覆盖其他worker写入时间早于提交时间的记录
+SYNC_OVERLAP = 10
+# 布隆过滤器命中后回源确认的结果缓存条数
+CHECKED_MAX_ENTRIES = 10000
+
+
+def _epoch(value):
+    """把数据库中的UTC时间转换为时间戳"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _utc(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+class DatabaseRevocationBackend:
+    """使用 revoked_tokens 表保存撤销记录，使用独立连接，不影响请求中的会话事务"""
+
+    def __init__(self, db):
+        self._db = db
+        from models.token import RevokedToken
+        self._table = RevokedToken.__table__
+
+    def add(self, key, user_id, revoked_at, expires_at):
+        table = self._table
+        values = {'user_id': user_id, 'revoked_at': _utc(revoked_at), 'expires_at': _utc(expires_at)}
+        update = table.update().where(table.c.key == key).values(**values)
+        try:
+            with self._db.engine.begin() as conn:
+                if not conn.execute(update).rowcount:
+                    conn.execute(table.insert().values(key=key, **values))
+        except IntegrityError:
+            # 并发写入同一键（重复注销同一令牌、同时修改两次密码）时对方已先插入，改为更新该行
+            with self._db.engine.begin() as conn:
+                conn.execute(update)
+
+    def contains(self, key):
+        table = self._table
+        with self._db.engine.connect() as conn:
+            row = conn.execute(
+                self._db.select(table.c.revoked_at)
+                .where(table.c.key == key, table.c.expires_at > datetime.utcnow())
+            ).first()
+        return _epoch(row[0]) if row else None
+
+    def changes_since(self, since):
+        """返回 revoked_at >= since 且未过期的 (key, 撤销时间戳, 过期时间戳)"""
+        table = self._table
+        with self._db.engine.connect() as conn:
+            rows = conn.execute(
+                self._db.select(table.c.key, table.c.revoked_at, table.c.expires_at)
+                .where(table.c.revoked_at >= _utc(since), table.c.expires_at > datetime.utcnow())
+            ).all()
+        return [(key, _epoch(revoked_at), _epoch(expires_at)) for key, revoked_at, expires_at in rows]
+
+    def purge(self):
+        table = self._table
+        with self._db.engine.begin() as conn:
+            return conn.execute(table.delete().where(table.c.expires_at <= datetime.utcnow())).rowcount
+
+
+class RedisRevocationBackend:
+    """Redis兼容后端：每条记录一个带TTL的键，另用有序集合按撤销时间索引以便增量同步"""
+
+    def __init__(self, url, prefix='revoked:'):
+        # 延迟导入，未使用Redis时无需安装
+        import redis
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def add(self, key, user_id, revoked_at, expires_at):
+        ttl = max(1, int(expires_at - time.time()))
+        pipe = self._client.pipeline()
+        pipe.setex(self.prefix + key, ttl, revoked_at)
+        pipe.zadd(self.prefix + 'index', {f'{key}|{expires_at}': revoked_at})
+        pipe.execute()
+
+    def contains(self, key):
+        raw = self._client.get(self.prefix + key)
+        return float(raw) if raw is not None else None
+
+    def changes_since(self, since):
+        now = time.time()
+        changes = []
+        for member, score in self._client.zrangebyscore(self.prefix + 'index', since, '+inf', withscores=True):
+            key, expires_at = member.decode().rsplit('|', 1)
+            if float(expires_at) > now:
+                changes.append((key, score, float(expires_at)))
+        return changes
+
+    def purge(self):
+        # 索引中只删除过期的成员，键本身由Redis按TTL删除
+        now = time.time()
+        expired = [
+            member for member in self._client.zrange(self.prefix + 'index', 0, -1)
+            if float(member.decode().rsplit('|', 1)[1]) <= now
+        ]
+        if expired:
+            self._client.zrem(self.prefix + 'index', *expired)
+        return len(expired)
+
+
+class BloomFilter:
+    """布隆过滤器，只会误判为“可能存在”，不会漏判"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def memory_bytes(self):
+        return len(self._bits)
+
+
+class RevocationStore:
+    """
+    令牌撤销存储
+
+    撤销记录写入共享后端（数据库表或Redis），每个worker在内存中维护一份副本，
+    每隔 sync_interval 秒增量同步一次，因此常规的“未撤销”检查不需要访问后端：
+        - 默认模式：内存中保存全部未过期的撤销记录（带过期时间的集合）
+        - 布隆过滤器模式：只保存位数组，命中时才回源确认，撤销记录很多时内存占用小得多
+        - local=False：每次检查都查询后端，撤销立即在所有worker生效
+    本worker撤销的令牌立即生效，其他worker最多延迟 sync_interval 秒。
+    按用户撤销（修改密码）记录为该用户的截止时间，在此之前签发的令牌全部失效。
+    """
+
+    def __init__(self, backend, sync_interval=1.0, local=True, bloom=False,
+                 bloom_capacity=100000, bloom_error_rate=0.01, rebuild_interval=3600, logger=None):
+        self.backend = backend
+        self.sync_interval = sync_interval
+        self.local = local
+        self.use_bloom = bloom
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.rebuild_interval = rebuild_interval
+        self.logger = logger
+        self._lock = threading.Lock()
+        # 'jti:<令牌ID>' -> 过期时间戳（未启用布隆过滤器时）
+        self._revoked = {}
+        # 用户ID（字符串） -> (截止时间戳, 过期时间戳)
+        self._user_cutoffs = {}
+        # 布隆过滤器命中后回源确认的结果
+        self._checked = OrderedDict()
+        self._bloom = None
+        self._last_sync = None
+        self._next_sync = 0
+        self._next_rebuild = 0
+        self.checks = 0
+        self.backend_lookups = 0
+        self.errors = 0
+
+    def revoke_token(self, jti, user_id, expires_at):
+        """撤销单个令牌，expires_at 为令牌的过期时间戳（exp）"""
+        now = time.time()
+        key = f'jti:{jti}'
+        self.backend.add(key, user_id, now, expires_at)
+        with self._lock:
+            self._apply(key, now, expires_at)
+
+    def revoke_user(self, user_id, ttl):
+        """撤销用户此前签发的所有令牌，ttl 取最长的令牌有效期"""
+        now = time.time()
+        key = f'user:{user_id}'
+        self.backend.add(key, user_id, now, now + ttl)
+        with self._lock:
+            self._apply(key, now, now + ttl)
+
+    def is_revoked(self, payload):
+        """检查JWT载荷对应的令牌是否已被撤销"""
+        self.checks += 1
+        jti_key = f"jti:{payload['jti']}"
+        user_key = f"user:{payload.get('sub')}"
+        try:
+            if not self.local:
+                self.backend_lookups += 1
+                cutoff = self.backend.contains(user_key)
+                return (cutoff is not None and payload.get('iat', 0) < int(cutoff)) or \
+                    self.backend.contains(jti_key) is not None
+            self._maybe_sync()
+        except Exception as e:
+            # 后端故障时使用内存中已有的数据，不阻断所有请求
+            self._on_error('同步', e)
+
+        cutoff = self._user_cutoffs.get(str(payload.get('sub')))
+        # iat 精确到秒，截止时间所在的那一秒内签发的令牌（如修改密码后立即签发的新令牌）视为有效
+        if cutoff is not None and payload.get('iat', 0) < int(cutoff[0]):
+            return True
+
+        if self._bloom is None:
+            expires_at = self._revoked.get(jti_key)
+            return expires_at is not None and expires_at > time.time()
+
+        if jti_key not in self._bloom:
+            return False
+        return self._confirm(jti_key)
+
+    def stats(self):
+        stats = {
+            'mode': 'direct' if not self.local else ('bloom' if self.use_bloom else 'set'),
+            'checks': self.checks,
+            'backend_lookups': self.backend_lookups,
+            'errors': self.errors,
+            'user_cutoffs': len(self._user_cutoffs),
+            'last_sync': self._last_sync,
+        }
+        if self._bloom is not None:
+            stats.update({'bloom_entries': self._bloom.count, 'bloom_bytes': self._bloom.memory_bytes})
+        else:
+            stats['revoked_entries'] = len(self._revoked)
+        return stats
+
+    def _confirm(self, key):
+        """布隆过滤器命中（已撤销或误判）时回源确认，结果缓存到该键下次被同步为止"""
+        result = self._checked.get(key)
+        if result is not None:
+            return result
+        self.backend_lookups += 1
+        try:
+            result = self.backend.contains(key) is not None
+        except Exception as e:
+            self._on_error('查询', e)
+            return False
+        with self._lock:
+            self._checked[key] = result
+            if len(self._checked) > CHECKED_MAX_ENTRIES:
+                self._checked.popitem(last=False)
+        return result
+
+    def _maybe_sync(self):
+        now = time.time()
+        if now < self._next_sync:
+            return
+        # 同一时间只需一个线程同步，其他线程直接使用现有数据
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            # 先推迟下次同步时间，后端故障时不会每个请求都重试
+            self._next_sync = now + self.sync_interval
+            if now >= self._next_rebuild:
+                self._rebuild(now)
+                return
+            changes = self.backend.changes_since(self._last_sync - SYNC_OVERLAP)
+            for key, revoked_at, expires_at in changes:
+                self._apply(key, revoked_at, expires_at)
+            self._last_sync = now
+        finally:
+            self._lock.release()
+
+    def _rebuild(self, now):
+        """从后端全量加载，丢弃已过期的记录；布隆过滤器按实际数量重新分配容量"""
+        try:
+            self.backend.purge()
+        except Exception as e:
+            self._on_error('清理', e)
+        changes = self.backend.changes_since(0)
+        self._revoked = {}
+        self._user_cutoffs = {}
+        self._checked = OrderedDict()
+        self._bloom = BloomFilter(max(self.bloom_capacity, len(changes) * 2), self.bloom_error_rate) \
+            if self.use_bloom else None
+        for key, revoked_at, expires_at in changes:
+            self._apply(key, revoked_at, expires_at)
+        self._last_sync = now
+        self._next_rebuild = now + self.rebuild_interval
+
+    def _apply(self, key, revoked_at, expires_at):
+        """把一条撤销记录写入内存副本（调用方持有锁）"""
+        if key.startswith('user:'):
+            user_id = key[5:]
+            current = self._user_cutoffs.get(user_id)
+            if current is None or current[0] < revoked_at:
+                self._user_cutoffs[user_id] = (revoked_at, expires_at)
+        elif self._bloom is not None:
+            self._bloom.add(key)
+            self._checked.pop(key, None)
+            if self._bloom.count > self._bloom.capacity:
+                # 超出容量后误判率上升，下次同步时重建
+                self._next_rebuild = 0
+        else:
+            self._revoked[key] = expires_at
+
+    def _on_error(self, action, error):
+        self.errors += 1
+        if self.logger:
+            self.logger.warning("令牌撤销记录%s失败: %s", action, error)
+
+
+def init_revocation(app):
+    """根据配置初始化令牌撤销存储"""
+    from models.db import db
+
+    backend_name = app.config.get('JWT_REVOCATION_BACKEND', 'database')
+    if backend_name == 'redis':
+        backend = RedisRevocationBackend(app.config.get('REDIS_URL'))
+    else:
+        backend = DatabaseRevocationBackend(db)
+
+    store = RevocationStore(
+        backend,
+        sync_interval=app.config.get('JWT_REVOCATION_SYNC_INTERVAL', 1.0),
+        local=app.config.get('JWT_REVOCATION_LOCAL', True),
+        bloom=app.config.get('JWT_REVOCATION_BLOOM', False),
+        bloom_capacity=app.config.get('JWT_REVOCATION_BLOOM_CAPACITY', 100000),
+        logger=app.logger
+    )
+    app.extensions['revocation_store'] = store
+    app.logger.info("令牌撤销存储已初始化，后端: %s, 模式: %s", backend_name, store.stats()['mode'])
+    return store
+
+
+def get_revocation_store():
+    """获取当前应用的令牌撤销存储"""
+    return current_app.extensions['revocation_store']
+
+
+def revoke_user_tokens(user_id):
+    """
+    撤销用户此前签发的所有令牌（修改密码后调用）
+
+    Args:
+        user_id: 用户ID
+
+    Returns:
+        为当前客户端新签发的访问令牌和刷新令牌
+    """
+    ttl = current_app.config['JWT_REFRESH_TOKEN_EXPIRES'].total_seconds()
+    get_revocation_store().revoke_user(user_id, ttl)
+    return {
+        'access_token': create_access_token(identity=str(user_id)),
+        'refresh_token': create_refresh_token(identity=str(user_id))
+    }
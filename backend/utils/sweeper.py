@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import fcntl
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import click
+import sqlalchemy as sa
+from flask import current_app
+from flask.cli import AppGroup
+from utils.avatar import AVATAR_URL_PATTERN, FORMATS, avatar_url
+from utils.metrics import metrics
+
+# 锁文件：同一台机器上同时只有一个进程在清理，文件内容为上次清理完成的时间戳
+LOCK_FILE = '.gc.lock'
+
+# flask uploads 命令组
+sweeper_cli = AppGroup('uploads', help='上传目录维护命令')
+
+
+def upload_relpath(url):
+    """
+    把 image_url / avatar 中的上传文件URL转换为相对上传目录的路径
+
+    兼容 /uploads/x.png、uploads/x.png 和 http://host/uploads/x.png，不是上传文件时返回None。
+    """
+    if not url:
+        return None
+    path = '/' + urlsplit(url).path.lstrip('/')
+    index = path.find('/uploads/')
+    if index < 0:
+        return None
+    return os.path.normpath(path[index + len('/uploads/'):])
+
+
+def _file_key(relpath):
+    """处理后的头像按内容哈希引用（同一哈希的所有尺寸和格式），其他文件按路径引用"""
+    match = AVATAR_URL_PATTERN.match(f'/uploads/{relpath}')
+    if match:
+        return 'avatar', match.group(1)
+    return 'file', relpath
+
+
+def _walk(directory):
+    """递归列出目录下的文件，跳过以.开头的文件和目录（.gitkeep、锁文件）"""
+    stack = [directory]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+class UploadSweeper:
+    """
+    清理上传目录中没有被引用的文件
+
+    上传后未创建棋谱的图片、进程中途退出遗留的解析临时文件、被替换的头像都不会被删除，
+    这里按 ChessNotation.image_url 和 User.avatar 找出不再被引用、且修改时间早于宽限期的文件，分批删除：
+    1. 先列出超过宽限期的文件，再按主键分段读取两张表中的引用，每段一个短查询，不长时间占用数据库；
+    2. 每批删除前按精确URL再查一次引用，并重新检查修改时间，避免误删刚被引用或刚写入的文件；
+    3. 每批之间暂停，限制删除速度，不与请求争抢磁盘I/O。
+    宽限期应大于上传图片到保存棋谱之间的最长间隔。
+    """
+
+    def __init__(self, db, upload_folder, grace=86400.0, batch_size=200, batch_pause=1.0, interval=0.0,
+                 avatar_sizes=(32, 64, 128, 256), scan_chunk=1000, logger=None):
+        """
+        Args:
+            db: Flask-SQLAlchemy实例
+            upload_folder: 上传目录
+            grace: 宽限期（秒），修改时间在此之内的文件不删除
+            batch_size: 每批删除的文件数
+            batch_pause: 两批之间暂停的秒数
+            interval: 后台定期清理的间隔（秒），0表示只通过 flask uploads gc 执行
+            avatar_sizes: 头像的尺寸列表，用于按内容哈希复查引用
+            scan_chunk: 读取引用时每个查询的行数
+        """
+        self._db = db
+        self.upload_folder = upload_folder
+        self.grace = grace
+        self.batch_size = max(1, batch_size)
+        self.batch_pause = batch_pause
+        self.interval = interval
+        self.avatar_sizes = avatar_sizes
+        self.scan_chunk = scan_chunk
+        self._logger = logger
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _tables(self):
+        from models.chess import ChessNotation
+        from models.user import User
+        return ChessNotation.__table__, User.__table__
+
+    def _referenced(self):
+        """读取所有被引用的文件键，按主键分段查询"""
+        notations, users = self._tables()
+        keys = set()
+        for table, column in ((notations, notations.c.image_url), (users, users.c.avatar)):
+            last_id = 0
+            while True:
+                with self._db.engine.connect() as conn:
+                    rows = conn.execute(
+                        sa.select(table.c.id, column)
+                        .where(table.c.id > last_id, column.isnot(None), column != '')
+                        .order_by(table.c.id).limit(self.scan_chunk)
+                    ).all()
+                for _, url in rows:
+                    relpath = upload_relpath(url)
+                    if relpath:
+                        keys.add(_file_key(relpath))
+                if len(rows) < self.scan_chunk:
+                    break
+                last_id = rows[-1][0]
+        return keys
+
+    def _still_referenced(self, batch):
+        """按精确URL复查一批候选文件在读取引用之后是否被引用，返回被引用的文件键"""
+        notations, users = self._tables()
+        urls = [f'/uploads/{relpath}' for relpath, _, key in batch if key[0] == 'file']
+        avatar_urls = {
+            avatar_url(key[1], size, fmt): key
+            for _, _, key in batch if key[0] == 'avatar'
+            for size in self.avatar_sizes for fmt in FORMATS
+        }
+        keys = set()
+        with self._db.engine.connect() as conn:
+            if urls:
+                keys.update(('file', upload_relpath(url)) for url in conn.execute(
+                    sa.select(notations.c.image_url).where(notations.c.image_url.in_(urls))
+                ).scalars())
+            if avatar_urls:
+                keys.update(avatar_urls[url] for url in conn.execute(
+                    sa.select(users.c.avatar).where(users.c.avatar.in_(list(avatar_urls)))
+                ).scalars())
+        return keys
+
+    def _delete(self, batch, cutoff, stats):
+        referenced = self._still_referenced(batch)
+        for relpath, size, key in batch:
+            if key in referenced:
+                continue
+            path = os.path.join(self.upload_folder, relpath)
+            try:
+                # 列出文件之后被重新写入（如同一张头像再次上传）的不删除
+                if os.stat(path).st_mtime >= cutoff:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                stats['errors'] += 1
+                if self._logger:
+                    self._logger.warning(f"删除上传文件失败: {path}: {str(e)}")
+                continue
+            stats['deleted'] += 1
+            stats['reclaimed_bytes'] += size
+
+    def sweep(self, dry_run=False, force=False):
+        """
+        执行一次清理
+
+        Args:
+            dry_run: 只统计不删除
+            force: 忽略 interval，距上次清理不久也执行
+
+        Returns:
+            统计结果字典；其他进程正在清理或距上次清理不足 interval 时返回None
+        """
+        os.makedirs(self.upload_folder, exist_ok=True)
+        with open(os.path.join(self.upload_folder, LOCK_FILE), 'a+') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            lock.seek(0)
+            last_run = float(lock.read().strip() or 0)
+            if not force and time.time() - last_run < self.interval:
+                return None
+
+            start = time.time()
+            stats = self._sweep(dry_run, start)
+            stats['seconds'] = round(time.time() - start, 2)
+            if not dry_run:
+                lock.seek(0)
+                lock.truncate()
+                lock.write(str(time.time()))
+                lock.flush()
+        if not dry_run:
+            metrics.inc('uploads_gc_deleted_files_total', {}, stats['deleted'])
+            metrics.inc('uploads_gc_reclaimed_bytes_total', {}, stats['reclaimed_bytes'])
+        if self._logger:
+            self._logger.info(
+                f"上传目录清理完成: 扫描 {stats['scanned']} 个文件，孤立 {stats['orphans']} 个"
+                f"（{stats['orphan_bytes'] / 1048576:.1f}MB），删除 {stats['deleted']} 个，"
+                f"回收 {stats['reclaimed_bytes'] / 1048576:.1f}MB，耗时 {stats['seconds']}秒"
+            )
+        return stats
+
+    def _sweep(self, dry_run, now):
+        cutoff = now - self.grace
+        stats = {'scanned': 0, 'orphans': 0, 'orphan_bytes': 0, 'deleted': 0, 'reclaimed_bytes': 0,
+                 'errors': 0, 'dry_run': dry_run}
+        # 先列出文件再读取引用：读取引用期间新上传的文件都在宽限期内，不会被误删
+        candidates = []
+        for entry in _walk(self.upload_folder):
+            stats['scanned'] += 1
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime < cutoff:
+                relpath = os.path.relpath(entry.path, self.upload_folder)
+                candidates.append((relpath, stat.st_size, _file_key(relpath)))
+        if not candidates:
+            return stats
+
+        referenced = self._referenced()
+        orphans = [candidate for candidate in candidates if candidate[2] not in referenced]
+        stats['orphans'] = len(orphans)
+        stats['orphan_bytes'] = sum(size for _, size, _ in orphans)
+        if dry_run:
+            return stats
+
+        for index in range(0, len(orphans), self.batch_size):
+            if index:
+                time.sleep(self.batch_pause)
+            self._delete(orphans[index:index + self.batch_size], cutoff, stats)
+        return stats
+
+    def maybe_start(self, app):
+        """
+        在当前进程中启动后台定期清理线程
+
+        gunicorn预加载应用时fork出的worker中没有该线程，由每个进程的首个请求启动；
+        各进程通过锁文件协调，每个 interval 内只有一个进程执行清理。
+        """
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, args=(app,), name='upload-sweeper', daemon=True).start()
+
+    def _run(self, app):
+        while True:
+            # 随机间隔，避免多个worker同时检查
+            time.sleep(self.interval * random.uniform(0.5, 1.0))
+            try:
+                with app.app_context():
+                    self.sweep()
+            except Exception as e:
+                if self._logger:
+                    self._logger.error(f"上传目录清理失败: {str(e)}")
+
+
+def init_sweeper(app):
+    """根据配置初始化上传目录清理，UPLOAD_GC_INTERVAL 大于0时在处理请求的进程中启动后台线程"""
+    from models.db import db
+    sweeper = UploadSweeper(
+        db,
+        app.config['UPLOAD_FOLDER'],
+        grace=app.config.get('UPLOAD_GC_GRACE', 86400.0),
+        batch_size=app.config.get('UPLOAD_GC_BATCH_SIZE', 200),
+        batch_pause=app.config.get('UPLOAD_GC_BATCH_PAUSE', 1.0),
+        interval=app.config.get('UPLOAD_GC_INTERVAL', 0.0),
+        avatar_sizes=app.config.get('AVATAR_SIZES', (32, 64, 128, 256)),
+        logger=app.logger,
+    )
+    app.extensions['upload_sweeper'] = sweeper
+
+    if sweeper.interval > 0:
+        # 只在处理请求的进程中启动，flask 命令和脚本中不启动
+        @app.before_request
+        def start_upload_sweeper():
+            sweeper.maybe_start(app)
+
+
+def get_sweeper():
+    """获取当前应用的上传目录清理"""
+    return current_app.extensions['upload_sweeper']
+
+
+@sweeper_cli.command('gc')
+@click.option('--dry-run', is_flag=True, help='只统计孤立文件，不删除')
+@click.option('--grace', type=float, help='宽限期（秒），默认读取 UPLOAD_GC_GRACE')
+def gc_command(dry_run, grace):
+    """删除上传目录中没有被棋谱或头像引用的文件"""
+    sweeper = get_sweeper()
+    if grace is not None:
+        sweeper.grace = grace
+    stats = sweeper.sweep(dry_run=dry_run, force=True)
+    if stats is None:
+        raise click.ClickException('另一个进程正在清理上传目录')
+    verb = '可删除' if dry_run else '已删除'
+    click.echo(
+        f"扫描 {stats['scanned']} 个文件，孤立 {stats['orphans']} 个（{stats['orphan_bytes'] / 1048576:.1f}MB），"
+        f"{verb} {stats['orphans'] if dry_run else stats['deleted']} 个，"
+        f"回收 {(stats['orphan_bytes'] if dry_run else stats['reclaimed_bytes']) / 1048576:.1f}MB，"
+        f"失败 {stats['errors']} 个，耗时 {stats['seconds']}秒"
+    )
@@ -0,0 +1,379 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+import click
+import sqlalchemy as sa
+from flask import current_app
+from flask.cli import AppGroup
+from utils.admission import AdmissionRejected
+from utils.metrics import metrics
+
+# 当前这次 parse_chess_notation 调用的用量记录，提供者函数通过 record_response_usage 填写
+_current = ContextVar('ai_usage_record', default=None)
+
+# 报表中图片大小的分档：(上限字节数, 名称)
+IMAGE_SIZE_BANDS = (
+    (256 * 1024, '<256KB'),
+    (1024 * 1024, '256KB-1MB'),
+    (4 * 1024 * 1024, '1MB-4MB'),
+    (None, '>=4MB'),
+)
+
+# 报表可用的分组字段
+GROUP_COLUMNS = ('user_id', 'provider', 'model', 'day')
+
+# flask usage 命令组
+usage_cli = AppGroup('usage', help='AI调用用量命令')
+
+
+class UsageRecord:
+    """一次模型调用（含重试）的用量，重试的多次尝试合计"""
+
+    __slots__ = ('provider', 'user_id', 'model', 'input_tokens', 'output_tokens',
+                 'image_bytes', 'image_pixels', 'start')
+
+    def __init__(self, provider, user_id, image_bytes, image_pixels):
+        self.provider = provider
+        self.user_id = user_id
+        self.model = None
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.image_bytes = image_bytes
+        self.image_pixels = image_pixels
+        self.start = time.perf_counter()
+
+
+def record_response_usage(response, model=None):
+    """
+    从提供者的响应中读取token用量，累加到当前调用的记录
+
+    兼容 OpenAI（usage.prompt_tokens/completion_tokens）、Anthropic（usage.input_tokens/output_tokens）
+    和 Gemini（usage_metadata.prompt_token_count/candidates_token_count）。不在 track 中调用时不做任何事。
+
+    Args:
+        response: SDK返回的响应对象
+        model: 响应中没有模型名称时使用的名称
+    """
+    record = _current.get()
+    if record is None:
+        return
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        input_tokens = getattr(usage, 'prompt_tokens', None) or getattr(usage, 'input_tokens', 0)
+        output_tokens = getattr(usage, 'completion_tokens', None) or getattr(usage, 'output_tokens', 0)
+    else:
+        usage = getattr(response, 'usage_metadata', None)
+        input_tokens = getattr(usage, 'prompt_token_count', 0)
+        output_tokens = getattr(usage, 'candidates_token_count', 0)
+    record.input_tokens += input_tokens or 0
+    record.output_tokens += output_tokens or 0
+    record.model = getattr(response, 'model', None) or model or record.model
+
+
+def _image_size(image_path):
+    """返回 (字节数, 像素数)，只读取图片头部；不是本地图片时为0"""
+    if not os.path.isfile(image_path):
+        return 0, 0
+    image_bytes = os.path.getsize(image_path)
+    try:
+        from PIL import Image
+        with Image.open(image_path) as image:
+            width, height = image.size
+    except Exception:
+        return image_bytes, 0
+    return image_bytes, width * height
+
+
+def _parse_prices(value):
+    """解析 模型=输入价格:输出价格 的逗号分隔列表（美元/百万token），如 claude-3=15:75"""
+    prices = {}
+    for item in value.split(','):
+        if '=' in item and ':' in item:
+            model, price = item.split('=', 1)
+            input_price, output_price = price.split(':', 1)
+            prices[model.strip()] = (float(input_price), float(output_price))
+    return prices
+
+
+def _seconds_until_midnight(now=None):
+    """距离下一个UTC零点（预算重置）的秒数"""
+    now = now or datetime.utcnow()
+    return (datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) - now).total_seconds()
+
+
+class UsageTracker:
+    """
+    AI模型调用的用量和费用记录
+
+    1. 每次 parse_chess_notation 在 ai_usage 表中追加一行：模型、token数、图片大小、耗时、结果和估算费用；
+    2. 调用前汇总用户当天的费用，超过每日预算时拒绝；
+    3. flask usage rollup 把今天之前的明细汇总到 ai_usage_daily，并删除超过保留天数的明细。
+    写入使用独立连接，不影响请求中的会话事务；写入失败只记录日志，不影响识别结果。
+    """
+
+    def __init__(self, db, prices=None, daily_budget=0.0, retention_days=30, logger=None):
+        """
+        Args:
+            db: Flask-SQLAlchemy实例
+            prices: {模型名称: (输入价格, 输出价格)}，单位为美元/百万token
+            daily_budget: 每个用户每天的费用上限（美元），0表示不限制
+            retention_days: 明细保留天数
+        """
+        from models.usage import AIUsage, AIUsageDaily
+        self._db = db
+        self._usage = AIUsage.__table__
+        self._daily = AIUsageDaily.__table__
+        self.prices = prices or {}
+        self.daily_budget = daily_budget
+        self.retention_days = retention_days
+        self._logger = logger
+
+    def cost_micros(self, provider, input_tokens, output_tokens):
+        """估算费用，单位为百万分之一美元（美元/百万token x token数）"""
+        input_price, output_price = self.prices.get(provider, (0.0, 0.0))
+        return int(round(input_tokens * input_price + output_tokens * output_price))
+
+    def spent_today(self, user_id):
+        """用户今天（UTC）的调用次数和估算费用（百万分之一美元）"""
+        usage = self._usage
+        with self._db.engine.connect() as conn:
+            calls, cost = conn.execute(
+                sa.select(sa.func.count(), sa.func.coalesce(sa.func.sum(usage.c.cost_micros), 0))
+                .where(usage.c.user_id == int(user_id), usage.c.day == datetime.utcnow().date())
+            ).one()
+        return calls, cost
+
+    def check_budget(self, user_id):
+        """用户当天的费用已达到每日预算时抛出 AdmissionRejected，UTC零点后恢复"""
+        if self.daily_budget <= 0 or user_id is None:
+            return
+        _, cost = self.spent_today(user_id)
+        if cost >= self.daily_budget * 1000000:
+            metrics.inc('ai_admission_rejected_total', {'reason': 'budget_exceeded'})
+            raise AdmissionRejected('budget_exceeded', _seconds_until_midnight())
+
+    def _start(self, provider, user_id, image_path):
+        image_bytes, image_pixels = _image_size(image_path)
+        return UsageRecord(provider, int(user_id) if user_id is not None else None, image_bytes, image_pixels)
+
+    def _finish(self, record, error):
+        """根据调用结果生成 ai_usage 的一行，并更新token和费用指标"""
+        now = datetime.utcnow()
+        cost = self.cost_micros(record.provider, record.input_tokens, record.output_tokens)
+        labels = {'provider': record.provider}
+        metrics.inc('ai_provider_tokens_total', {**labels, 'kind': 'input'}, record.input_tokens)
+        metrics.inc('ai_provider_tokens_total', {**labels, 'kind': 'output'}, record.output_tokens)
+        metrics.inc('ai_provider_cost_micros_total', labels, cost)
+        return {
+            'day': now.date(),
+            'created_at': now,
+            'user_id': record.user_id,
+            'provider': record.provider,
+            'model': record.model,
+            'input_tokens': record.input_tokens,
+            'output_tokens': record.output_tokens,
+            'image_bytes': record.image_bytes,
+            'image_pixels': record.image_pixels,
+            'latency_ms': int((time.perf_counter() - record.start) * 1000),
+            'outcome': 'success' if error is None else type(error).__name__[:32],
+            'cost_micros': cost,
+        }
+
+    def write(self, row):
+        try:
+            with self._db.engine.begin() as conn:
+                conn.execute(self._usage.insert().values(**row))
+        except Exception as e:
+            if self._logger:
+                self._logger.warning(f"记录AI调用用量失败: {str(e)}")
+
+    @contextmanager
+    def track(self, provider, user_id, image_path):
+        """记录一次模型调用的用量，包住重试在内的整个调用"""
+        record = self._start(provider, user_id, image_path)
+        token = _current.set(record)
+        error = None
+        try:
+            yield record
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _current.reset(token)
+            self.write(self._finish(record, error))
+
+    @asynccontextmanager
+    async def track_async(self, provider, user_id, image_path):
+        """track 的协程版本，读取图片和写入数据库在线程中执行"""
+        record = await asyncio.to_thread(self._start, provider, user_id, image_path)
+        token = _current.set(record)
+        error = None
+        try:
+            yield record
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _current.reset(token)
+            await asyncio.to_thread(self.write, self._finish(record, error))
+
+    def _rolled_days(self, conn, start, end):
+        daily = self._daily
+        return {row[0] for row in conn.execute(
+            sa.select(daily.c.day).where(daily.c.day.between(start, end)).distinct()
+        )}
+
+    def rollup(self, today=None):
+        """
+        把今天之前尚未汇总的明细按天、用户和模型汇总到 ai_usage_daily，再删除超过保留天数的明细
+
+        过去的日期不会再有新的明细，每天只需汇总一次；已汇总的日期会被跳过，重复执行结果不变。
+
+        Returns:
+            (汇总的天数, 删除的明细行数)
+        """
+        today = today or datetime.utcnow().date()
+        usage, daily = self._usage, self._daily
+        with self._db.engine.begin() as conn:
+            pending = conn.execute(
+                sa.select(usage.c.day).where(usage.c.day < today, usage.c.day.notin_(sa.select(daily.c.day)))
+                .distinct()
+            ).scalars().all()
+            for day in pending:
+                conn.execute(daily.insert().from_select(
+                    ['day', 'user_id', 'provider', 'model', 'calls', 'failures', 'input_tokens',
+                     'output_tokens', 'image_bytes', 'latency_ms', 'cost_micros'],
+                    sa.select(
+                        usage.c.day, usage.c.user_id, usage.c.provider, usage.c.model,
+                        sa.func.count(),
+                        sa.func.sum(sa.case((usage.c.outcome == 'success', 0), else_=1)),
+                        sa.func.sum(usage.c.input_tokens), sa.func.sum(usage.c.output_tokens),
+                        sa.func.sum(usage.c.image_bytes), sa.func.sum(usage.c.latency_ms),
+                        sa.func.sum(usage.c.cost_micros),
+                    ).where(usage.c.day == day)
+                    .group_by(usage.c.day, usage.c.user_id, usage.c.provider, usage.c.model)
+                ))
+            cutoff = today - timedelta(days=self.retention_days)
+            deleted = conn.execute(usage.delete().where(usage.c.day < cutoff)).rowcount
+        return len(pending), deleted
+
+    def report(self, start, end, group_by='user_id'):
+        """
+        汇总 [start, end] 日期范围内的调用量，按费用倒序
+
+        已汇总的日期读取 ai_usage_daily，其余日期（含今天）直接汇总明细。
+
+        Args:
+            group_by: 分组字段，user_id / provider / model / day
+        """
+        usage, daily = self._usage, self._daily
+        totals = {}
+
+        def merge(rows):
+            for key, *values in rows:
+                current = totals.setdefault(key, [0] * len(values))
+                for i, value in enumerate(values):
+                    current[i] += value or 0
+
+        with self._db.engine.connect() as conn:
+            rolled = self._rolled_days(conn, start, end)
+            merge(conn.execute(
+                sa.select(daily.c[group_by], sa.func.sum(daily.c.calls), sa.func.sum(daily.c.failures),
+                          sa.func.sum(daily.c.input_tokens), sa.func.sum(daily.c.output_tokens),
+                          sa.func.sum(daily.c.image_bytes), sa.func.sum(daily.c.latency_ms),
+                          sa.func.sum(daily.c.cost_micros))
+                .where(daily.c.day.between(start, end)).group_by(daily.c[group_by])
+            ))
+            merge(conn.execute(
+                sa.select(usage.c[group_by], sa.func.count(),
+                          sa.func.sum(sa.case((usage.c.outcome == 'success', 0), else_=1)),
+                          sa.func.sum(usage.c.input_tokens), sa.func.sum(usage.c.output_tokens),
+                          sa.func.sum(usage.c.image_bytes), sa.func.sum(usage.c.latency_ms),
+                          sa.func.sum(usage.c.cost_micros))
+                .where(usage.c.day.between(start, end), usage.c.day.notin_(rolled))
+                .group_by(usage.c[group_by])
+            ))
+
+        rows = []
+        for key, (calls, failures, input_tokens, output_tokens, image_bytes, latency_ms, cost) in totals.items():
+            rows.append({
+                group_by: key.isoformat() if group_by == 'day' else key,
+                'calls': calls,
+                'failures': failures,
+                'input_tokens': input_tokens,
+                'output_tokens': output_tokens,
+                'avg_image_kb': round(image_bytes / calls / 1024, 1) if calls else 0,
+                'avg_latency_ms': round(latency_ms / calls) if calls else 0,
+                'cost_usd': cost / 1000000,
+            })
+        rows.sort(key=lambda row: row['cost_usd'], reverse=True)
+        return rows
+
+    def image_report(self, start, end, limit=10):
+        """
+        按图片大小分档统计调用量和费用，并列出最大的若干张图片（只覆盖明细保留期内的数据）
+
+        图片按像素计入输入token，这里可以看出大图片占了多少费用、缩小图片的上限是否合适。
+        """
+        usage = self._usage
+        band = sa.case(*[(usage.c.image_bytes < limit_bytes, index)
+                         for index, (limit_bytes, _) in enumerate(IMAGE_SIZE_BANDS) if limit_bytes],
+                       else_=len(IMAGE_SIZE_BANDS) - 1).label('band')
+        in_range = usage.c.day.between(start, end)
+        with self._db.engine.connect() as conn:
+            bands = conn.execute(
+                sa.select(band, sa.func.count(), sa.func.avg(usage.c.input_tokens), sa.func.sum(usage.c.cost_micros))
+                .where(in_range).group_by(band).order_by(band)
+            ).all()
+            largest = conn.execute(
+                sa.select(usage.c.created_at, usage.c.user_id, usage.c.provider, usage.c.image_bytes,
+                          usage.c.image_pixels, usage.c.input_tokens, usage.c.cost_micros)
+                .where(in_range).order_by(usage.c.image_bytes.desc()).limit(limit)
+            ).all()
+        return {
+            'bands': [{
+                'band': IMAGE_SIZE_BANDS[index][1],
+                'calls': calls,
+                'avg_input_tokens': round(avg_tokens or 0),
+                'cost_usd': (cost or 0) / 1000000,
+            } for index, calls, avg_tokens, cost in bands],
+            'largest': [{
+                'created_at': created_at.isoformat(),
+                'user_id': user_id,
+                'provider': provider,
+                'image_kb': round(image_bytes / 1024, 1),
+                'image_pixels': image_pixels,
+                'input_tokens': input_tokens,
+                'cost_usd': cost / 1000000,
+            } for created_at, user_id, provider, image_bytes, image_pixels, input_tokens, cost in largest],
+        }
+
+
+def init_usage(app):
+    """根据配置初始化AI调用用量记录"""
+    from models.db import db
+    app.extensions['ai_usage'] = UsageTracker(
+        db,
+        prices=_parse_prices(app.config.get('AI_PRICES', '')),
+        daily_budget=app.config.get('AI_USER_DAILY_BUDGET', 0.0),
+        retention_days=app.config.get('AI_USAGE_RETENTION_DAYS', 30),
+        logger=app.logger,
+    )
+
+
+def get_usage_tracker():
+    """获取当前应用的AI调用用量记录"""
+    return current_app.extensions['ai_usage']
+
+
+@usage_cli.command('rollup')
+def rollup_command():
+    """汇总今天之前的调用明细并清理过期明细，建议每天执行一次（如cron）"""
+    days, deleted = get_usage_tracker().rollup()
+    click.echo(f"已汇总 {days} 天的明细，删除过期明细 {deleted} 行")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import atexit
+import os
+import threading
+from utils.metrics import metrics
+
+
+class WriteBehindBuffer:
+    """
+    写后缓冲：add() 只把记录追加到进程内的列表，后台线程每 interval 秒、
+    或累计 max_pending 条时调用一次 flush_func(记录列表)，在一个事务中写入。
+
+    高频的小写入（如练习中的每一步）合并为一次提交，代价是：
+    1. 其他进程最多晚 interval 秒看到这些记录，本进程读取前可先调用 flush()；
+    2. 进程被强制终止时最多丢失 interval 秒内的记录，正常退出时（atexit）会写入剩余记录。
+    写入失败的记录放回缓冲区等待下次重试，最多保留 max_retained 条，超出时丢弃最旧的。
+    """
+
+    def __init__(self, name, flush_func, interval=2.0, max_pending=200, max_retained=10000, logger=None):
+        """
+        Args:
+            name: 缓冲区名称，用于指标标签和线程名
+            flush_func: 写入函数，参数为记录列表，在应用上下文中调用
+            interval: 定期写入的间隔（秒）
+            max_pending: 累计多少条时立即写入
+            max_retained: 写入失败时最多保留的记录数
+        """
+        self.name = name
+        self.interval = interval
+        self.max_pending = max(1, max_pending)
+        self.max_retained = max_retained
+        self._flush_func = flush_func
+        self._logger = logger
+        self._items = []
+        self._lock = threading.Lock()
+        # 同一时间只有一个线程在写入，保证记录按追加顺序写入
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._app = None
+        self._pid = None
+
+    def add(self, item):
+        """追加一条记录，首次调用时在当前进程中启动后台写入线程"""
+        with self._lock:
+            self._items.append(item)
+            pending = len(self._items)
+        if self._pid != os.getpid():
+            self._start()
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._items)
+
+    def flush(self):
+        """
+        立即写入缓冲区中的全部记录
+
+        Returns:
+            写入的记录数，写入失败时为0
+        """
+        with self._flush_lock:
+            with self._lock:
+                items, self._items = self._items, []
+            if not items:
+                return 0
+            try:
+                self._flush_func(items)
+            except Exception as e:
+                with self._lock:
+                    self._items = (items + self._items)[-self.max_retained:]
+                metrics.inc('write_behind_flush_errors_total', {'buffer': self.name})
+                if self._logger:
+                    self._logger.error(f"写后缓冲 {self.name} 写入失败，{len(items)} 条记录等待重试: {str(e)}")
+                return 0
+        metrics.observe('write_behind_batch_size', {'buffer': self.name}, len(items))
+        return len(items)
+
+    def _start(self):
+        # 与 add 在同一个应用上下文中，fork后的子进程重新启动线程
+        from flask import current_app
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            first = self._pid is None
+            self._pid = os.getpid()
+            self._app = current_app._get_current_object()
+        threading.Thread(target=self._run, name=f'write-behind-{self.name}', daemon=True).start()
+        if first:
+            atexit.register(self._flush_in_context)
+
+    def _flush_in_context(self):
+        if self._app is None or self._pid != os.getpid():
+            return
+        with self._app.app_context():
+            self.flush()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self._flush_in_context()
+            except Exception as e:
+                if self._logger:
+                    self._logger.error(f"写后缓冲 {self.name} 后台线程异常: {str(e)}")
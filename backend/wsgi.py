@@ -0,0 +1,14 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+生产环境WSGI入口
+
+配合 gunicorn.conf.py 使用:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from app import create_app
+
+# 在master进程中预加载应用（preload_app），worker通过fork共享已导入的模块
+app = create_app()